@@ -10,26 +10,46 @@
 #   limitations under the License.
 
 import pandas as pd
-import webbrowser
+import importlib
 import os.path as path
 import sys
 import warnings
 
 # Function imports
-from .file_download import download
+from .file_download import download, set_offline, is_offline, set_check_ttl
 from .file_download import download_text as _download_text
+from .file_download import get_recent_check as _get_recent_check
+from .file_download import record_check as _record_check
 from .exceptions import CptacError, CptacWarning, InvalidParameterError, NoInternetError, OldPackageVersionWarning
 
-# Dataset imports
-from .brca import Brca
-from .ccrcc import Ccrcc
-from .colon import Colon
-from .endometrial import Endometrial
-from .gbm import Gbm
-from .hnscc import Hnscc
-from .lscc import Lscc
-from .luad import Luad
-from .ovarian import Ovarian
+# Dataset imports. Each dataset's module is only imported the first time the dataset's class is accessed, by the module __getattr__ below, so importing cptac doesn't import all nine of them.
+_dataset_modules = {
+    "Brca": ".brca",
+    "Ccrcc": ".ccrcc",
+    "Colon": ".colon",
+    "Endometrial": ".endometrial",
+    "Gbm": ".gbm",
+    "Hnscc": ".hnscc",
+    "Lscc": ".lscc",
+    "Luad": ".luad",
+    "Ovarian": ".ovarian",
+}
+
+def __getattr__(name):
+    """Import a dataset's module the first time its class is accessed (PEP 562)."""
+    module_name = _dataset_modules.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    dataset_class = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = dataset_class # So later accesses don't go through __getattr__
+    return dataset_class
+
+def __dir__():
+    return sorted(set(globals()) | set(_dataset_modules))
+
+if sys.version_info < (3, 7): # Module __getattr__ isn't supported before Python 3.7, so we import the datasets right away
+    for _name in _dataset_modules:
+        __getattr__(_name)
 
 def list_datasets():
     """List all available datasets."""
@@ -55,6 +75,7 @@ def embargo():
     """Open CPTAC embargo details in web browser."""
     message = "Opening embargo details in web browser..."
     print(message, end = '\r')
+    import webbrowser # Only imported when needed, to keep importing cptac fast
     webbrowser.open("https://proteomics.cancer.gov/data-portal/about/data-use-agreement")
     print(" " * len(message), end='\r') # Erase the message
 
@@ -90,14 +111,18 @@ sys.excepthook = _exception_handler # Set our custom exception hook
 warnings.showwarning = _warning_displayer # And our custom warning displayer
 warnings.simplefilter("always", category=CptacWarning) # Edit the warnings filter to show multiple occurences of cptac-generated warnings
 
-# Check whether the package is up-to-date
+# Check whether the package is up-to-date. If we checked recently, we use the version we got then, so we don't make a network request on every import. In offline mode, _download_text raises a NoInternetError without trying.
 version_url = "https://byu.box.com/shared/static/kbwivmqnrdnn5im2gu6khoybk5a3rfl0.txt"
-try:
-    remote_version = _download_text(version_url)
-except NoInternetError:
-    pass
-else:
+remote_version = _get_recent_check("package_version")
+if remote_version is None:
+    try:
+        remote_version = _download_text(version_url)
+    except NoInternetError:
+        pass
+    else:
+        _record_check("package_version", remote_version)
+
+if remote_version is not None:
     local_version = version()
     if remote_version != local_version:
         warnings.warn(f"Your version of cptac ({local_version}) is out-of-date. Latest is {remote_version}. Please run 'pip install --upgrade cptac' to update it.", OldPackageVersionWarning, stacklevel=2)
-
@@ -11,16 +11,26 @@
 
 import pandas as pd
 import numpy as np
-import os
 import warnings
-from .dataset import DataSet
+from .dataset import DataSet, FileParser
+from .file_tools import read_gct
 from .dataframe_tools import *
 from .exceptions import FailedReindexWarning, ReindexMapError
 
 class Brca(DataSet):
 
-    def __init__(self, version="latest"):
-        """Load all of the brca dataframes as values in the self._data dict variable, with names as keys, and format them properly."""
+    def __init__(self, version="latest", use_cache=True, lazy=False, n_jobs=1, executor=None, dtype="float64", profile=False):
+        """Load all of the brca dataframes as values in the self._data dict variable, with names as keys, and format them properly.
+
+        Parameters:
+        version (str, optional): The version number to load, or the string "latest" to just load the latest version. Default is "latest".
+        use_cache (bool, optional): Whether to load the formatted dataframes from the on-disk cache if a valid one exists, and to save them to the cache after parsing the data files if not. Default is True.
+        lazy (bool, optional): Whether to wait to read each dataframe from the cache until it's first used, instead of reading them all when the dataset is loaded. This saves time and memory if you only use a few of the dataframes. Requires use_cache to be True. Default is False.
+        n_jobs (int, optional): The number of threads to use to parse the data files, if they aren't loaded from the cache. -1 uses one thread per CPU. Default is 1, which parses them one at a time.
+        executor (concurrent.futures.Executor, optional): An executor to parse the data files with instead, e.g. a concurrent.futures.ProcessPoolExecutor. If passed, n_jobs is ignored, and the executor is not shut down afterwards. Default is None.
+        dtype (str, optional): "float64" to keep the omics dataframes at full precision, or "float32" to store and return them as float32, and also make the repeated string columns in the clinical, experimental_design and somatic_mutation dataframes categorical. "float32" about halves the memory the dataset uses. Default is "float64".
+        profile (bool or function, optional): Whether to measure memory use while loading, in addition to the timings that are always recorded. Get the results by calling get_load_report. If a function, it is also called with the report once the dataset is loaded, e.g. to log it. Default is False.
+        """
 
         # Set some needed variables, and pass them to the parent DataSet class __init__ function
 
@@ -45,167 +55,204 @@ class Brca(DataSet):
                 "prosp-brca-v3.1-sample-annotation.csv.gz"],
         }
 
-        super().__init__(cancer_type="brca", version=version, valid_versions=valid_versions, data_files=data_files)
-
-        # Load the data into dataframes in the self._data dict
-        loading_msg = "Loading dataframes"
-        for file_path in self._data_files_paths: # Loops through files variable
-
-            # Print a loading message. We add a dot every time, so the user knows it's not frozen.
-            loading_msg = loading_msg + "."
-            print(loading_msg, end='\r')
-
-            path_elements = file_path.split(os.sep) # Get a list of the levels of the path
-            file_name = path_elements[-1] # The last element will be the name of the file
-
-            if file_name == "prosp-brca-v3.1-acetylome-ratio-norm-NArm.gct.gz":
-                df = pd.read_csv(file_path, sep='\t', skiprows=2, dtype=object) # First two rows of file aren't part of the dataframe. Also, due to extra metadata rows we're going to remove, all cols have mixed types, so we pass dtype=object for now.
-                df = df[df["GeneSymbol"] != "na"] # There are several metadata rows at the beginning of the dataframe, which duplicate the clinical and derived_molecular dataframes. They all don't have a value for GeneSymbol, so we'll use that to filter them out.
-
-                # Prepare some columns we'll need later for the multiindex
-                df["variableSites"] = df["variableSites"].str.replace(r"[a-z\s]", "") # Get rid of all lowercase delimeters and whitespace in the sites
-                df = df.rename(columns={
-                    "GeneSymbol": "Name",
-                    "variableSites": "Site",
-                    "sequence": "Peptide", # We take this instead of sequenceVML, to match the other datasets' format
-                    "accession_numbers": "Database_ID" # We take all accession numbers they have, instead of the singular accession_number column
-                    })
-
-                # Some rows have at least one localized acetylation site, but also have other acetylations that aren't localized. We'll drop those rows, if their localized sites are duplicated in another row, to avoid creating duplicates, because we only preserve information about the localized sites in a given row. However, if the localized sites aren't duplicated in another row, we'll keep the row.
-                split_ids = df["id"].str.split('_', expand=True)
-                unlocalized_to_drop = df.index[~split_ids[3].eq(split_ids[4]) & df.duplicated(["Name", "Site", "Peptide", "Database_ID"], keep=False)] # Column 3 of the split "id" column is number of phosphorylations detected, and column 4 is number of phosphorylations localized, so if the two values aren't equal, the row has at least one unlocalized site
-                df = df.drop(index=unlocalized_to_drop)
-
-                # Give it a multiindex
-                df = df.set_index(["Name", "Site", "Peptide", "Database_ID"])                
-
-                df = df.drop(columns=["id", "id.description", "geneSymbol", "numColumnsVMsiteObserved", "bestScore", "bestDeltaForwardReverseScore", 
-                "Best_scoreVML", "sequenceVML", "accessionNumber_VMsites_numVMsitesPresent_numVMsitesLocalizedBest_earliestVMsiteAA_latestVMsiteAA",
-                "protein_mw", "species", "speciesMulti", "orfCategory", "accession_number", "protein_group_num", "entry_name"]) # We don't need these. The dropped columns include a "geneSymbol" column that is a duplicate of the original GeneSymbol.
-                df = df.apply(pd.to_numeric) # Now that we've dropped all the extra metadata columns, convert everything to floats.
-                df = df.sort_index()
-                df = df.transpose()
-                df = df.sort_index()
-                df.index.name = "Patient_ID"
-                self._data["acetylproteomics"] = df
-
-            elif file_name == "prosp-brca-v3.1-gene-level-cnv-gistic2-all_data_by_genes.gct.gz":
-                df = pd.read_csv(file_path, sep='\t', skiprows=2, index_col=0, dtype=object) # First two rows of file aren't part of the dataframe. Also, due to extra metadata rows we're going to remove, all cols have mixed types, so we pass dtype=object for now.
-                df = df[df["geneSymbol"] != "na"] # There are several metadata rows at the beginning of the dataframe, which duplicate the clinical and derived_molecular dataframes. They all don't have a value for geneSymbol, so we'll use that to filter them out.
-                df = df.drop(columns="Cytoband")
-                df["geneSymbol"] = df["geneSymbol"].str.rsplit('|', n=1, expand=True)[0] # Some of the geneSymbols have the gene IDs appended to them, to get rid of duplicates. We're going to create a multiindex with all the gene names and gene IDs, so we can drop the appended IDs.
-                df = df.rename(columns={"geneSymbol": "Name", "Gene.ID": "Database_ID"})
-                df = df.set_index(["Name", "Database_ID"])
-                df = df.apply(pd.to_numeric) # Now that we've dropped all the extra metadata columns, convert everything to floats.
-                df = df.sort_index()
-                df = df.transpose()
-                df = df.sort_index()
-                df.index.name = "Patient_ID"
-                self._data["CNV"] = df
-
-            elif file_name == "prosp-brca-v3.1-phosphoproteome-ratio-norm-NArm.gct.gz":
-                df = pd.read_csv(file_path, sep='\t', skiprows=2, dtype=object) # First two rows of file aren't part of the dataframe. Also, due to extra metadata rows we're going to remove, all cols have mixed types, so we pass dtype=object for now.
-                df = df[df["GeneSymbol"] != "na"] # There are several metadata rows at the beginning of the dataframe, which duplicate the clinical and derived_molecular dataframes. They all don't have a value for GeneSymbol, so we'll use that to filter them out.
-
-                # Prepare some columns we'll need later for the multiindex
-                df["variableSites"] = df["variableSites"].str.replace(r"[a-z\s]", "") # Get rid of all lowercase delimeters and whitespace in the sites
-                df = df.rename(columns={
-                    "GeneSymbol": "Name",
-                    "variableSites": "Site",
-                    "sequence": "Peptide", # We take this instead of sequenceVML, to match the other datasets' format
-                    "accession_numbers": "Database_ID" # We take all accession numbers they have, instead of the singular accession_number column
-                    })
-
-                # Some rows have at least one localized phosphorylation site, but also have other phosphorylations that aren't localized. We'll drop those rows, if their localized sites are duplicated in another row, to avoid creating duplicates, because we only preserve information about the localized sites in a given row. However, if the localized sites aren't duplicated in another row, we'll keep the row.
-                split_ids = df["id"].str.split('_', expand=True)
-                unlocalized_to_drop = df.index[~split_ids[3].eq(split_ids[4]) & df.duplicated(["Name", "Site", "Peptide", "Database_ID"], keep=False)] # Column 3 of the split "id" column is number of phosphorylations detected, and column 4 is number of phosphorylations localized, so if the two values aren't equal, the row has at least one unlocalized site
-                df = df.drop(index=unlocalized_to_drop)
-
-                # Give it a multiindex
-                df = df.set_index(["Name", "Site", "Peptide", "Database_ID"])                
-
-                df = df.drop(columns=["id", "id.description", "geneSymbol", "numColumnsVMsiteObserved", "bestScore", "bestDeltaForwardReverseScore",
-                "Best_scoreVML", "Best_numActualVMSites_sty", "Best_numLocalizedVMsites_sty", "sequenceVML",
-                "accessionNumber_VMsites_numVMsitesPresent_numVMsitesLocalizedBest_earliestVMsiteAA_latestVMsiteAA", "protein_mw", "species",
-                "speciesMulti", "orfCategory", "accession_number", "protein_group_num", "entry_name"]) # We don't need these. The dropped columns include a "geneSymbol" column that is a duplicate of the original GeneSymbol.
-                df = df.apply(pd.to_numeric) # Now that we've dropped all the extra metadata columns, convert everything to floats.
-                df = df.sort_index()
-                df = df.transpose()
-                df = df.sort_index()
-                df.index.name = "Patient_ID"
-                self._data["phosphoproteomics"] = df
-
-            elif file_name == "prosp-brca-v3.1-proteome-ratio-norm-NArm.gct.gz":
-                df = pd.read_csv(file_path, sep='\t', skiprows=2, dtype=object) # First two rows of file aren't part of the dataframe. Also, due to extra metadata rows we're going to remove, all cols have mixed types, so we pass dtype=object for now.
-                df = df[df["GeneSymbol"] != "na"] # There are several metadata rows at the beginning of the dataframe, which duplicate the clinical and derived_molecular dataframes. They all don't have a value for GeneSymbol, so we'll use that to filter them out.
-
-                df = df.rename(columns={"GeneSymbol": "Name", "accession_numbers": "Database_ID"})
-                df = df.set_index(["Name", "Database_ID"])
-                df = df.drop(columns=["id", "id.description", "geneSymbol", "numColumnsProteinObserved", "numSpectraProteinObserved",
-                "protein_mw", "percentCoverage", "numPepsUnique", "scoreUnique", "species", "orfCategory", "accession_number", 
-                "subgroupNum", "entry_name"]) # We don't need these. The dropped columns include a "geneSymbol" column that is a duplicate of GeneSymbol.
-                df = df.apply(pd.to_numeric) # Now that we've dropped all the extra metadata columns, convert everything to floats.
-                df = df.sort_index()
-                df = df.transpose()
-                df = df.sort_index()
-                df.index.name = "Patient_ID"
-                self._data["proteomics"] = df
-
-            elif file_name == "prosp-brca-v3.1-rnaseq-fpkm-log2-row-norm-2comp.gct.gz":
-                df = pd.read_csv(file_path, sep='\t', skiprows=2, index_col=0, dtype=object) # First two rows of file aren't part of the dataframe. Also, due to extra metadata rows we're going to remove, all cols have mixed types, so we pass dtype=object for now.
-                df = df[df["geneSymbol"] != "na"] # There are several metadata rows at the beginning of the dataframe, which duplicate the clinical and derived_molecular dataframes. They all don't have a value for GeneSymbol, so we'll use that to filter them out.
-                df = df.set_index("geneSymbol")
-                df = df.drop(columns="description") # We don't need this.
-                df = df.apply(pd.to_numeric) # Now that we've dropped all the extra metadata columns, convert everything to floats.
-                df = df.sort_index()
-                df = df.transpose()
-                df = df.sort_index()
-                df.index.name = "Patient_ID"
-                self._data["transcriptomics"] = df
-
-            elif file_name == "prosp-brca-v3.1-sample-annotation.csv.gz":
-                df = pd.read_csv(file_path, index_col=0)
-                df = df.drop(columns="Participant") # This column is just a duplicate of the index
-                df = df.rename(columns={"Sample.IDs": "Replicate_Measurement_IDs", "Type": "Sample_Tumor_Normal"})
-                df = df.replace("unknown", np.nan)
-                df = df.astype({"Age.in.Month": np.float64})
-                df.index.name = "Patient_ID"
-                self._data["metadata"] = df
-
-            elif file_name == "Breast_One_Year_Clinical_Data_20160927.xls" and self._version == "3.1.1":
-                df = pd.read_excel(file_path)
-
-                # Replace redundant values for "not reported" with NaN
-                nan_equivalents = ['Not Reported/ Unknown', 'Reported/ Unknown', 'Not Reported / Unknown', 'Not Reported /Unknown',
-                    'Not Applicable', 'not applicable', 'Not applicable;', 'na', 'Not Performed', 'Not Performed;',
-                    'Unknown tumor status', 'Unknown Tumor Status','Unknown', 'unknown', 'Not specified', 'Not Reported/ Unknown;']
-
-                df = df.replace(nan_equivalents, np.nan)
-
-                # Set and name the index
-                df = df.rename(columns={"Participant ID": "Patient_ID"})
-                df["Patient_ID"] = "X" + df["Patient_ID"]
-                df = df.set_index("Patient_ID")
-                df = df.sort_index()
-
-                self._data["followup"] = df
-
-            elif file_name == "prosp-brca-v3.0-v1.4.somatic.variants.070918.maf.gz" and self._version == "3.1.1":
-                df = pd.read_csv(file_path, sep='\t')
-                df = df.rename(columns={"Sample.ID": "Patient_ID"})
-
-                df = df[['Patient_ID','Hugo_Symbol','Variant_Classification','HGVSp_Short']]
-                df = df.rename(columns={
-                    "Hugo_Symbol":"Gene",
-                    "Variant_Classification":"Mutation",
-                    "HGVSp_Short":"Location"}) # Rename the columns we want to keep to the appropriate names
-
-                df = df.sort_values(by=["Patient_ID", "Gene"])
-                df = df.set_index("Patient_ID")
-
-                self._data["somatic_mutation"] = df
-
-        print(' ' * len(loading_msg), end='\r') # Erase the loading message
+        # Map each data file to the method that parses it, and the names of the dataframes that method returns. The first parser that matches the file name and the dataset version is used.
+        file_parsers = [
+            FileParser(file_patterns=["prosp-brca-v3.1-acetylome-ratio-norm-NArm.gct.gz"], versions=None, tables=["acetylproteomics"], parse=self._parse_acetylproteomics),
+            FileParser(file_patterns=["prosp-brca-v3.1-gene-level-cnv-gistic2-all_data_by_genes.gct.gz"], versions=None, tables=["CNV"], parse=self._parse_cnv),
+            FileParser(file_patterns=["prosp-brca-v3.1-phosphoproteome-ratio-norm-NArm.gct.gz"], versions=None, tables=["phosphoproteomics"], parse=self._parse_phosphoproteomics),
+            FileParser(file_patterns=["prosp-brca-v3.1-proteome-ratio-norm-NArm.gct.gz"], versions=None, tables=["proteomics"], parse=self._parse_proteomics),
+            FileParser(file_patterns=["prosp-brca-v3.1-rnaseq-fpkm-log2-row-norm-2comp.gct.gz"], versions=None, tables=["transcriptomics"], parse=self._parse_transcriptomics),
+            FileParser(file_patterns=["prosp-brca-v3.1-sample-annotation.csv.gz"], versions=None, tables=["metadata"], parse=self._parse_sample_annotation),
+            FileParser(file_patterns=["Breast_One_Year_Clinical_Data_20160927.xls"], versions=["3.1.1"], tables=["followup"], parse=self._parse_followup),
+            FileParser(file_patterns=["prosp-brca-v3.0-v1.4.somatic.variants.070918.maf.gz"], versions=["3.1.1"], tables=["somatic_mutation"], parse=self._parse_somatic_mutation),
+        ]
+
+        super().__init__(cancer_type="brca", version=version, valid_versions=valid_versions, data_files=data_files, file_parsers=file_parsers, use_cache=use_cache, lazy=lazy, n_jobs=n_jobs, executor=executor, dtype=dtype, profile=profile)
+
+    def _parse_acetylproteomics(self, file_path):
+        """Parse the acetylproteomics data file."""
+        tables = {}
+
+        df = read_gct(file_path) # Skips the column metadata rows at the beginning of the file, which duplicate the clinical and derived_molecular dataframes, and parses the data columns directly as floats.
+        df = df[df["GeneSymbol"] != "na"] # Filter out any rows that don't have a value for GeneSymbol.
+
+        # Prepare some columns we'll need later for the multiindex
+        df["variableSites"] = df["variableSites"].str.replace(r"[a-z\s]", "") # Get rid of all lowercase delimeters and whitespace in the sites
+        df = df.rename(columns={
+            "GeneSymbol": "Name",
+            "variableSites": "Site",
+            "sequence": "Peptide", # We take this instead of sequenceVML, to match the other datasets' format
+            "accession_numbers": "Database_ID" # We take all accession numbers they have, instead of the singular accession_number column
+            })
+
+        # Some rows have at least one localized acetylation site, but also have other acetylations that aren't localized. We'll drop those rows, if their localized sites are duplicated in another row, to avoid creating duplicates, because we only preserve information about the localized sites in a given row. However, if the localized sites aren't duplicated in another row, we'll keep the row.
+        split_ids = df["id"].str.split('_', expand=True)
+        unlocalized_to_drop = df.index[~split_ids[3].eq(split_ids[4]) & df.duplicated(["Name", "Site", "Peptide", "Database_ID"], keep=False)] # Column 3 of the split "id" column is number of phosphorylations detected, and column 4 is number of phosphorylations localized, so if the two values aren't equal, the row has at least one unlocalized site
+        df = df.drop(index=unlocalized_to_drop)
+
+        # Give it a multiindex
+        df = df.set_index(["Name", "Site", "Peptide", "Database_ID"])                
+
+        df = df.drop(columns=["id", "id.description", "geneSymbol", "numColumnsVMsiteObserved", "bestScore", "bestDeltaForwardReverseScore", 
+        "Best_scoreVML", "sequenceVML", "accessionNumber_VMsites_numVMsitesPresent_numVMsitesLocalizedBest_earliestVMsiteAA_latestVMsiteAA",
+        "protein_mw", "species", "speciesMulti", "orfCategory", "accession_number", "protein_group_num", "entry_name"]) # We don't need these. The dropped columns include a "geneSymbol" column that is a duplicate of the original GeneSymbol.
+        df = df.sort_index()
+        df = df.transpose()
+        df = df.sort_index()
+        df.index.name = "Patient_ID"
+        tables["acetylproteomics"] = df
+
+        return tables
+
+    def _parse_cnv(self, file_path):
+        """Parse the CNV data file."""
+        tables = {}
+
+        df = read_gct(file_path, index_col=0) # Skips the column metadata rows at the beginning of the file, which duplicate the clinical and derived_molecular dataframes, and parses the data columns directly as floats.
+        df = df[df["geneSymbol"] != "na"] # Filter out any rows that don't have a value for geneSymbol.
+        df = df.drop(columns="Cytoband")
+        df["geneSymbol"] = df["geneSymbol"].str.rsplit('|', n=1, expand=True)[0] # Some of the geneSymbols have the gene IDs appended to them, to get rid of duplicates. We're going to create a multiindex with all the gene names and gene IDs, so we can drop the appended IDs.
+        df = df.rename(columns={"geneSymbol": "Name", "Gene.ID": "Database_ID"})
+        df = df.set_index(["Name", "Database_ID"])
+        df = df.sort_index()
+        df = df.transpose()
+        df = df.sort_index()
+        df.index.name = "Patient_ID"
+        tables["CNV"] = df
+
+        return tables
+
+    def _parse_phosphoproteomics(self, file_path):
+        """Parse the phosphoproteomics data file."""
+        tables = {}
+
+        df = read_gct(file_path) # Skips the column metadata rows at the beginning of the file, which duplicate the clinical and derived_molecular dataframes, and parses the data columns directly as floats.
+        df = df[df["GeneSymbol"] != "na"] # Filter out any rows that don't have a value for GeneSymbol.
+
+        # Prepare some columns we'll need later for the multiindex
+        df["variableSites"] = df["variableSites"].str.replace(r"[a-z\s]", "") # Get rid of all lowercase delimeters and whitespace in the sites
+        df = df.rename(columns={
+            "GeneSymbol": "Name",
+            "variableSites": "Site",
+            "sequence": "Peptide", # We take this instead of sequenceVML, to match the other datasets' format
+            "accession_numbers": "Database_ID" # We take all accession numbers they have, instead of the singular accession_number column
+            })
+
+        # Some rows have at least one localized phosphorylation site, but also have other phosphorylations that aren't localized. We'll drop those rows, if their localized sites are duplicated in another row, to avoid creating duplicates, because we only preserve information about the localized sites in a given row. However, if the localized sites aren't duplicated in another row, we'll keep the row.
+        split_ids = df["id"].str.split('_', expand=True)
+        unlocalized_to_drop = df.index[~split_ids[3].eq(split_ids[4]) & df.duplicated(["Name", "Site", "Peptide", "Database_ID"], keep=False)] # Column 3 of the split "id" column is number of phosphorylations detected, and column 4 is number of phosphorylations localized, so if the two values aren't equal, the row has at least one unlocalized site
+        df = df.drop(index=unlocalized_to_drop)
+
+        # Give it a multiindex
+        df = df.set_index(["Name", "Site", "Peptide", "Database_ID"])                
+
+        df = df.drop(columns=["id", "id.description", "geneSymbol", "numColumnsVMsiteObserved", "bestScore", "bestDeltaForwardReverseScore",
+        "Best_scoreVML", "Best_numActualVMSites_sty", "Best_numLocalizedVMsites_sty", "sequenceVML",
+        "accessionNumber_VMsites_numVMsitesPresent_numVMsitesLocalizedBest_earliestVMsiteAA_latestVMsiteAA", "protein_mw", "species",
+        "speciesMulti", "orfCategory", "accession_number", "protein_group_num", "entry_name"]) # We don't need these. The dropped columns include a "geneSymbol" column that is a duplicate of the original GeneSymbol.
+        df = df.sort_index()
+        df = df.transpose()
+        df = df.sort_index()
+        df.index.name = "Patient_ID"
+        tables["phosphoproteomics"] = df
+
+        return tables
+
+    def _parse_proteomics(self, file_path):
+        """Parse the proteomics data file."""
+        tables = {}
+
+        df = read_gct(file_path) # Skips the column metadata rows at the beginning of the file, which duplicate the clinical and derived_molecular dataframes, and parses the data columns directly as floats.
+        df = df[df["GeneSymbol"] != "na"] # Filter out any rows that don't have a value for GeneSymbol.
+
+        df = df.rename(columns={"GeneSymbol": "Name", "accession_numbers": "Database_ID"})
+        df = df.set_index(["Name", "Database_ID"])
+        df = df.drop(columns=["id", "id.description", "geneSymbol", "numColumnsProteinObserved", "numSpectraProteinObserved",
+        "protein_mw", "percentCoverage", "numPepsUnique", "scoreUnique", "species", "orfCategory", "accession_number", 
+        "subgroupNum", "entry_name"]) # We don't need these. The dropped columns include a "geneSymbol" column that is a duplicate of GeneSymbol.
+        df = df.sort_index()
+        df = df.transpose()
+        df = df.sort_index()
+        df.index.name = "Patient_ID"
+        tables["proteomics"] = df
+
+        return tables
+
+    def _parse_transcriptomics(self, file_path):
+        """Parse the transcriptomics data file."""
+        tables = {}
+
+        df = read_gct(file_path, index_col=0) # Skips the column metadata rows at the beginning of the file, which duplicate the clinical and derived_molecular dataframes, and parses the data columns directly as floats.
+        df = df[df["geneSymbol"] != "na"] # Filter out any rows that don't have a value for GeneSymbol.
+        df = df.set_index("geneSymbol")
+        df = df.drop(columns="description") # We don't need this.
+        df = df.sort_index()
+        df = df.transpose()
+        df = df.sort_index()
+        df.index.name = "Patient_ID"
+        tables["transcriptomics"] = df
+
+        return tables
+
+    def _parse_sample_annotation(self, file_path):
+        """Parse the sample annotation data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, index_col=0)
+        df = df.drop(columns="Participant") # This column is just a duplicate of the index
+        df = df.rename(columns={"Sample.IDs": "Replicate_Measurement_IDs", "Type": "Sample_Tumor_Normal"})
+        df = df.replace("unknown", np.nan)
+        df = df.astype({"Age.in.Month": np.float64})
+        df.index.name = "Patient_ID"
+        tables["metadata"] = df
+
+        return tables
+
+    def _parse_followup(self, file_path):
+        """Parse the followup data file."""
+        tables = {}
+
+        df = pd.read_excel(file_path)
+
+        # Replace redundant values for "not reported" with NaN
+        nan_equivalents = ['Not Reported/ Unknown', 'Reported/ Unknown', 'Not Reported / Unknown', 'Not Reported /Unknown',
+            'Not Applicable', 'not applicable', 'Not applicable;', 'na', 'Not Performed', 'Not Performed;',
+            'Unknown tumor status', 'Unknown Tumor Status','Unknown', 'unknown', 'Not specified', 'Not Reported/ Unknown;']
+
+        df = df.replace(nan_equivalents, np.nan)
+
+        # Set and name the index
+        df = df.rename(columns={"Participant ID": "Patient_ID"})
+        df["Patient_ID"] = "X" + df["Patient_ID"]
+        df = df.set_index("Patient_ID")
+        df = df.sort_index()
+
+        tables["followup"] = df
+
+        return tables
+
+    def _parse_somatic_mutation(self, file_path):
+        """Parse the somatic mutation data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t')
+        df = df.rename(columns={"Sample.ID": "Patient_ID"})
+
+        df = df[['Patient_ID','Hugo_Symbol','Variant_Classification','HGVSp_Short']]
+        df = df.rename(columns={
+            "Hugo_Symbol":"Gene",
+            "Variant_Classification":"Mutation",
+            "HGVSp_Short":"Location"}) # Rename the columns we want to keep to the appropriate names
+
+        df = df.sort_values(by=["Patient_ID", "Gene"])
+        df = df.set_index("Patient_ID")
+
+        tables["somatic_mutation"] = df
+
+        return tables
+
+    def _format_dataframes(self):
+        """Format the brca dataframes in the self._data dict, once all the data files have been parsed."""
         formatting_msg = "Formatting dataframes..."
         print(formatting_msg, end='\r')
 
@@ -227,12 +274,12 @@ class Brca(DataSet):
             "ESTIMATE.ImmuneScore", "ESTIMATE.StromalScore", "xCell.ImmuneScore", "xCell.StromaScore", "Cibersort.Absolute.score", "Stemness.Score"]]
         self._data["derived_molecular"] = derived_molecular
 
-        # Get a union of all dataframes' indices, with duplicates removed
-        master_index = unionize_indices(self._data)
+        # Get a union of all dataframes' indices, with duplicates removed, and where each dataframe's rows are in it
+        master_index, index_codes = unionize_indices(self._data, return_codes=True)
 
         # Use the master index to reindex the clinical dataframe, so the clinical dataframe has a record of every sample in the dataset. Rows that didn't exist before (such as the rows for normal samples) are filled with NaN.
         clinical = self._data["clinical"]
-        clinical = clinical.reindex(master_index)
+        clinical = reindex_from_codes(clinical, master_index, index_codes["clinical"])
 
         # Fill in NaNs in the clinical table's Sample_Tumor_Normal column
         clinical["Sample_Tumor_Normal"] = clinical["Sample_Tumor_Normal"].where(cond=~(pd.isnull(clinical["Sample_Tumor_Normal"]) & ~clinical.index.str.endswith(".N")), other="Tumor")
@@ -240,10 +287,7 @@ class Brca(DataSet):
         # Replace the clinical dataframe in the data dictionary with our new and improved version!
         self._data['clinical'] = clinical
 
-        # Call function from dataframe_tools.py to sort all tables first by sample status, and then by the index
-        self._data = sort_all_rows(self._data)
-
-        # Call function from dataframe_tools.py to standardize the names of the index and column axes
-        self._data = standardize_axes_names(self._data)
+        # Call function from dataframe_tools.py to sort all tables first by sample status, and then by the index, and standardize the names of the index and column axes
+        self._data = finalize_all_dataframes(self._data)
 
-        print(" " * len(formatting_msg), end='\r') # Erase the formatting message
+        print(" " * len(formatting_msg), end='\r') # Erase the formatting message
\ No newline at end of file
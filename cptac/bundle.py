@@ -0,0 +1,166 @@
+#   Copyright 2018 Samuel Payne sam_payne@byu.edu
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import os
+import pickle
+import struct
+import tempfile
+import numpy as np
+import pandas as pd
+from .exceptions import InvalidParameterError
+
+# A bundle is a single file holding all of a dataset's dataframes. It's laid out as:
+#   A fixed size header: the magic bytes, the format version, and the offset and length of the metadata
+#   The values of each dataframe that's all one numeric dtype, e.g. the omics dataframes, each starting at a multiple of BUNDLE_ALIGNMENT bytes. Each is stored column by column, the same way pandas stores a single dtype dataframe in memory, so it can be used straight from the file.
+#   The metadata, pickled: the index and columns and the location in the file of each of those dataframes, all the other dataframes (e.g. clinical and somatic_mutation), and whatever else the caller wants to save with them
+# Reading a bundle maps the whole file into memory with numpy.memmap, and builds the numeric dataframes on top of the mapped values without copying them. The OS only reads each page from disk when it's first used, and processes that open the same bundle share the pages through the page cache.
+BUNDLE_MAGIC = b"CPTACBUNDLE\x00"
+BUNDLE_FORMAT_VERSION = 1
+BUNDLE_ALIGNMENT = 64 # Bytes
+_HEADER = struct.Struct("<12sIQQ") # Magic bytes, format version, metadata offset, metadata length
+
+def write_bundle(path, data, info):
+    """Save a dataset's dataframes to a bundle file. The file is written to a temporary file and then renamed, so a process reading the bundle at the same time never sees it half written.
+
+    Parameters:
+    path (str): The path to save the bundle to. If a file already exists there, it's replaced.
+    data (dict): The dataframes to save, with names as keys.
+    info (dict): Anything else to save in the bundle, e.g. the dataset's definitions. Must be picklable.
+
+    Returns: None
+    """
+    tables, arrays, size = layout_tables(data)
+    metadata = pickle.dumps({"tables": tables, "info": info}, protocol=pickle.HIGHEST_PROTOCOL)
+    metadata_offset = BUNDLE_ALIGNMENT + size # The header fits in the first BUNDLE_ALIGNMENT bytes, and the values start right after it
+
+    directory = os.path.dirname(os.path.abspath(path))
+    temp_fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+
+    try:
+        with os.fdopen(temp_fd, 'wb') as bundle_file:
+            bundle_file.write(_HEADER.pack(BUNDLE_MAGIC, BUNDLE_FORMAT_VERSION, metadata_offset, len(metadata)))
+            for offset, values in arrays:
+                bundle_file.write(b"\x00" * (BUNDLE_ALIGNMENT + offset - bundle_file.tell())) # Padding
+                bundle_file.write(values.data)
+            bundle_file.write(b"\x00" * (metadata_offset - bundle_file.tell()))
+            bundle_file.write(metadata)
+
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.isfile(temp_path):
+            os.remove(temp_path)
+        raise
+
+def read_bundle(path):
+    """Load the dataframes from a bundle file. The numeric dataframes are backed by a copy-on-write memory map of the file, so this doesn't read their values from disk until they're used, and they don't take up any memory of their own unless they're edited.
+
+    Parameters:
+    path (str): The path to the bundle file.
+
+    Returns:
+    dict: The dataframes, with names as keys.
+    dict: The info that was saved with them.
+    """
+    if not os.path.isfile(path):
+        raise InvalidParameterError(f"No bundle file found at {path}.")
+
+    with open(path, 'rb') as bundle_file:
+        header = bundle_file.read(_HEADER.size)
+        if len(header) < _HEADER.size or header[:len(BUNDLE_MAGIC)] != BUNDLE_MAGIC:
+            raise InvalidParameterError(f"{path} is not a cptac dataset bundle.")
+
+        magic, format_version, metadata_offset, metadata_length = _HEADER.unpack(header)
+        if format_version != BUNDLE_FORMAT_VERSION:
+            raise InvalidParameterError(f"{path} is a version {format_version} bundle, but this version of cptac reads version {BUNDLE_FORMAT_VERSION} bundles. Please export it again.")
+
+        bundle_file.seek(metadata_offset)
+        metadata = pickle.loads(bundle_file.read(metadata_length))
+
+    buffer = np.memmap(path, dtype=np.uint8, mode='c') # Copy-on-write, so editing a dataframe changes only this process's copy of those pages, never the file
+    data = build_dataframes(buffer[BUNDLE_ALIGNMENT:metadata_offset], metadata["tables"])
+    return data, metadata["info"]
+
+def layout_tables(data):
+    """Work out where each dataframe's values go in a bundle's values section. This layout is also used for datasets in shared memory.
+
+    Parameters:
+    data (dict): The dataframes, with names as keys.
+
+    Returns:
+    dict: For each dataframe, either where its values are and its index and columns, or the whole dataframe, if it isn't all one numeric dtype. Pass this to build_dataframes to get the dataframes back.
+    list of tuple: The offset to write each numeric dataframe's values at, and the values, as a C order numpy array.
+    int: The total size of the values section, in bytes, padded to a multiple of BUNDLE_ALIGNMENT.
+    """
+    tables = {}
+    arrays = []
+    size = 0
+    for name, df in data.items():
+        values = _get_mappable_values(df)
+        if values is None: # Not all one numeric dtype, so it's pickled with the metadata
+            tables[name] = {"frame": df}
+            continue
+
+        tables[name] = {
+            "offset": size,
+            "dtype": values.dtype.str,
+            "shape": values.shape,
+            "index": df.index,
+            "columns": df.columns,
+        }
+        arrays.append((size, values))
+        size += values.nbytes
+        size += -size % BUNDLE_ALIGNMENT # So the next one starts aligned
+
+    return tables, arrays, size
+
+def build_dataframes(buffer, tables):
+    """Make the dataframes from a values section laid out by layout_tables, without copying the values.
+
+    Parameters:
+    buffer (numpy array of uint8): The values section.
+    tables (dict): The layout from layout_tables.
+
+    Returns:
+    dict: The dataframes, with names as keys. The numeric ones use the buffer's memory, and are writeable only if the buffer is.
+    """
+    data = {}
+    for name, table in tables.items():
+        if "frame" in table:
+            data[name] = table["frame"]
+            continue
+
+        dtype = np.dtype(table["dtype"])
+        shape = tuple(table["shape"])
+        start = table["offset"]
+        stop = start + int(np.prod(shape)) * dtype.itemsize
+        values = buffer[start:stop].view(dtype).reshape(shape)
+        data[name] = pd.DataFrame(values.T, index=table["index"], columns=table["columns"], copy=False) # The values are stored column by column, so transposing them gives the dataframe's shape without copying anything
+
+    return data
+
+def _get_mappable_values(df):
+    """Get the values of a dataframe laid out the way they're stored in a bundle, if the dataframe can be stored that way.
+
+    Parameters:
+    df (pandas DataFrame): The dataframe.
+
+    Returns:
+    numpy array: The values, with one row for each column of the dataframe, in C order. None if the dataframe isn't all one numeric dtype, or has no columns.
+    """
+    dtypes = set(df.dtypes)
+    if len(dtypes) != 1:
+        return None
+
+    dtype = dtypes.pop()
+    if not isinstance(dtype, np.dtype) or dtype.kind not in "biuf": # Extension dtypes, like categorical, and object columns can't be mapped
+        return None
+
+    return np.ascontiguousarray(df.values.T) # A single dtype dataframe's values are already stored column by column, so this usually doesn't copy
@@ -11,16 +11,25 @@
 
 import pandas as pd
 import numpy as np
-import os
 import warnings
-from .dataset import DataSet
+from .dataset import DataSet, FileParser
 from .dataframe_tools import *
 from .exceptions import FailedReindexWarning, ReindexMapError
 
 class Ccrcc(DataSet):
 
-    def __init__(self, version="latest"):
-        """Load all of the ccrcc dataframes as values in the self._data dict variable, with names as keys, and format them properly."""
+    def __init__(self, version="latest", use_cache=True, lazy=False, n_jobs=1, executor=None, dtype="float64", profile=False):
+        """Load all of the ccrcc dataframes as values in the self._data dict variable, with names as keys, and format them properly.
+
+        Parameters:
+        version (str, optional): The version number to load, or the string "latest" to just load the latest version. Default is "latest".
+        use_cache (bool, optional): Whether to load the formatted dataframes from the on-disk cache if a valid one exists, and to save them to the cache after parsing the data files if not. Default is True.
+        lazy (bool, optional): Whether to wait to read each dataframe from the cache until it's first used, instead of reading them all when the dataset is loaded. This saves time and memory if you only use a few of the dataframes. Requires use_cache to be True. Default is False.
+        n_jobs (int, optional): The number of threads to use to parse the data files, if they aren't loaded from the cache. -1 uses one thread per CPU. Default is 1, which parses them one at a time.
+        executor (concurrent.futures.Executor, optional): An executor to parse the data files with instead, e.g. a concurrent.futures.ProcessPoolExecutor. If passed, n_jobs is ignored, and the executor is not shut down afterwards. Default is None.
+        dtype (str, optional): "float64" to keep the omics dataframes at full precision, or "float32" to store and return them as float32, and also make the repeated string columns in the clinical, experimental_design and somatic_mutation dataframes categorical. "float32" about halves the memory the dataset uses. Default is "float64".
+        profile (bool or function, optional): Whether to measure memory use while loading, in addition to the timings that are always recorded. Get the results by calling get_load_report. If a function, it is also called with the report once the dataset is loaded, e.g. to log it. Default is False.
+        """
 
         # Set some needed variables, and pass them to the parent DataSet class __init__ function
 
@@ -65,195 +74,264 @@ class Ccrcc(DataSet):
                 "Table S7.xlsx"],
         }
 
-        super().__init__(cancer_type="ccrcc", version=version, valid_versions=valid_versions, data_files=data_files)
+        # We're going to need to drop the samples below from a couple dataframes when we parse the data files
+        self._nci_labels = ["NCI7-1", "NCI7-2", "NCI7-3", "NCI7-4", "NCI7-5"]
+        self._nci_dotted_labels = [label.replace("-", ".") for label in self._nci_labels]
+        self._qc_labels = ["QC1", "QC2", "QC3", "QC4", "QC5", "QC6", "QC7", "QC8"]
+
+        # Map each data file to the method that parses it, and the names of the dataframes that method returns. The first parser that matches the file name and the dataset version is used.
+        file_parsers = [
+            FileParser(file_patterns=["6_CPTAC3_CCRCC_Phospho_abundance_gene_protNorm=2_CB_imputed.tsv.gz"], versions=None, tables=["phosphoproteomics_gene"], parse=self._parse_phosphoproteomics_gene),
+            FileParser(file_patterns=["6_CPTAC3_CCRCC_Phospho_abundance_phosphosite_protNorm=2_CB.tsv.gz"], versions=None, tables=["phosphoproteomics"], parse=self._parse_phosphoproteomics),
+            FileParser(file_patterns=["6_CPTAC3_CCRCC_Whole_abundance_protein_pep=unique_protNorm=2_CB.tsv.gz"], versions=None, tables=["proteomics"], parse=self._parse_proteomics),
+            FileParser(file_patterns=["Clinical Table S1.xlsx"], versions=None, tables=["authoritative_clinical"], parse=self._parse_authoritative_clinical),
+            FileParser(file_patterns=["ccrcc.somatic.consensus.gdc.umichigan.wu.112918.maf.gz"], versions=None, tables=["somatic_mutation"], parse=self._parse_somatic_mutation),
+            FileParser(file_patterns=["ccrccMethylGeneLevelByMean.txt.gz"], versions=None, tables=["methylation"], parse=self._parse_methylation),
+            FileParser(file_patterns=["cptac-metadata.xls.gz"], versions=None, tables=["metadata_and_keys"], parse=self._parse_metadata_and_keys),
+            FileParser(file_patterns=["kirc_wgs_cnv_gene.csv.gz"], versions=None, tables=["CNV"], parse=self._parse_cnv),
+            FileParser(file_patterns=["RNA_Normal_Tumor_185_samples.tsv.gz"], versions=None, tables=["transcriptomics"], parse=self._parse_transcriptomics),
+            FileParser(file_patterns=["S044_CPTAC_CCRCC_Discovery_Cohort_Clinical_Data_r3_Mar2019.xlsx"], versions=None, tables=["Patient_Clinical_Attributes", "Other_Medical_Information", "Specimen_Attributes"], parse=self._parse_clinical_sheets),
+            FileParser(file_patterns=["Table S7.xlsx"], versions=None, tables=["immune_groups"], parse=self._parse_immune_groups),
+            FileParser(file_patterns=["CCRCC_followup_9_12.xlsx"], versions=["0.1.1"], tables=["followup"], parse=self._parse_followup),
+        ]
+
+        super().__init__(cancer_type="ccrcc", version=version, valid_versions=valid_versions, data_files=data_files, file_parsers=file_parsers, use_cache=use_cache, lazy=lazy, n_jobs=n_jobs, executor=executor, dtype=dtype, profile=profile)
+
+    def _parse_phosphoproteomics_gene(self, file_path):
+        """Parse the gene level phosphoproteomics data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t', index_col=0)
+        ref_intensities = df["ReferenceIntensity"] # Copy this out, so we can subtract the reference intensities later
+        df = df.drop(columns=["NumberPSM", "Proteins", "ReferenceIntensity"] + self._nci_dotted_labels + self._qc_labels)
+        df = df.subtract(ref_intensities, axis="index") # Subtract reference intensities from all the values, to get ratios
+        df = df.transpose()
+        tables["phosphoproteomics_gene"] = df
+
+        return tables
+
+    def _parse_phosphoproteomics(self, file_path):
+        """Parse the phosphoproteomics data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t')
+
+        # Drop unlocalized sites
+        unlocalized_sites = (df["Index"].str.rsplit("_", n=1, expand=True)[1] == '0') 
+        df = df[~unlocalized_sites]
+
+        # Drop unwanted samples
+        df = df.drop(columns=self._nci_labels + self._qc_labels)
+
+        # Subtract reference intensities from numerical data columns, to get ratios
+        df = df.rename(columns={"Gene": "Name"})
+        metadata_cols = ["Index", "Name", "Peptide", "ReferenceIntensity"]
+        metadata = df[metadata_cols] # Extract these for later
+        df = df.drop(columns=metadata_cols) # Get the df to contain just the numerical data columns
+        ref_intensities = metadata["ReferenceIntensity"]
+        df = df.subtract(ref_intensities, axis="index") # Subtract reference intensities
+        df = metadata.join(df, how="outer") # Put the metadata columns back in
+        df = df.drop(columns="ReferenceIntensity") # Don't need this anymore
+
+        # Parse a few columns out of the "Index" column that we'll need for our multiindex
+        split_ids = df["Index"].str.split('_', expand=True)
+        df = df.drop(columns="Index")
+        sites = split_ids.iloc[:, -1]
+        database_ids = split_ids[0].str.cat(split_ids[1], sep='_')
+        df = df.assign(**{"Site": sites, "Database_ID": database_ids})
+
+        # Some rows have at least one localized phosphorylation site, but also have other phosphorylations that aren't localized. We'll drop those rows, if their localized sites are duplicated in another row, to avoid creating duplicates, because we only preserve information about the localized sites in a given row. However, if the localized sites aren't duplicated in another row, we'll keep the row.
+        unlocalized_to_drop = df.index[~split_ids[4].eq(split_ids[5]) & df.duplicated(["Name", "Site", "Peptide", "Database_ID"], keep=False)] # Column 4 of the split "Index" column is number of phosphorylations detected, and column 5 is number of phosphorylations localized, so if the two values aren't equal, the row has at least one unlocalized site
+        df = df.drop(index=unlocalized_to_drop)
+
+        # Give it a multiindex
+        df = df.set_index(["Name", "Site", "Peptide", "Database_ID"]) # This will create a multiindex from these columns, in this order.
+        df = df.sort_index()
+        df = df.transpose()
+        df = df.sort_index()
+        tables["phosphoproteomics"] = df
+
+        return tables
+
+    def _parse_proteomics(self, file_path):
+        """Parse the proteomics data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t')
+        df = df.rename(columns={"Proteins": "Name", "Index": "Database_ID"})
+        df = df.set_index(["Name", "Database_ID"])
+        ref_intensities = df["ReferenceIntensity"] # Copy this out, so we can subtract the reference intensities later
+        df = df.drop(columns=["NumberPSM", "ReferenceIntensity"] + self._nci_labels + self._qc_labels)
+        df = df.subtract(ref_intensities, axis="index") # Subtract reference intensities from all the values, to get ratios
+        df = df.sort_index()
+        df = df.transpose()
+        df = df.sort_index()
+        tables["proteomics"] = df
+
+        return tables
+
+    def _parse_authoritative_clinical(self, file_path):
+        """Parse the authoritative clinical data file."""
+        tables = {}
+
+        df = pd.read_excel(file_path, sheet_name="ccrcc_clinical_characteristics", index_col=0) # This file has multiple sheets, but we only want the one
+        df.index.name = "Patient_ID" # The index is currently "case_id", but we call that "Patient_ID"
+        tables["authoritative_clinical"] = df.copy()
+
+        return tables
+
+    def _parse_somatic_mutation(self, file_path):
+        """Parse the somatic mutation data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t', dtype={"PUBMED":object}) # "PUBMED" column has mixed types, so we specify object as the dtype to prevent a warning from printing. We don't actually use the column, so that's all we need to do.
+        split_barcode = df["Tumor_Sample_Barcode"].str.split("_", n=1, expand=True) # The first part of the barcode is the patient id, which we need want to make the index
+        df["Tumor_Sample_Barcode"] = split_barcode[0]
+        df = df[["Tumor_Sample_Barcode","Hugo_Symbol","Variant_Classification","HGVSp_Short"]]
+        df = df.rename(columns={"Tumor_Sample_Barcode":"Patient_ID","Hugo_Symbol":"Gene","Variant_Classification":"Mutation","HGVSp_Short":"Location"})                
+        df = df.sort_values(by=["Patient_ID", "Gene"])
+        df = df.set_index("Patient_ID")
+        tables["somatic_mutation"] = df
+
+        return tables
+
+    def _parse_methylation(self, file_path):
+        """Parse the methylation data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t')
+        df = df.sort_index()
+        df = df.transpose()
+        df.index.name = "Patient_ID"
+        tables["methylation"] = df
+
+        return tables
+
+    def _parse_metadata_and_keys(self, file_path):
+        """Parse the metadata and keys data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, index_col=0)
+        df = df.drop(index=["pooled sample"] + self._nci_labels + self._qc_labels) # Drop the pooled samples in addition to other samples to exclude
+        tables["metadata_and_keys"] = df
+
+        return tables
+
+    def _parse_cnv(self, file_path):
+        """Parse the CNV data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path)
+        df = df.rename(columns={"gene_name": "Name", "gene_id": "Database_ID"})
+        df = df.set_index(["Name", "Database_ID"])
+        df = df.sort_index()
+        df = df.transpose()
+
+        # The dataframe contains 4 rows for each sample: lr.loc_***,  lr.seg_***, mzd.loc_***, or  mzd.seg_*** where *** is the 
+        # Patient_ID. "lr" stands for log ratio, and "mzd" stands for Mean Zygosity Deviation. “lr.loc” is based on average of lr 
+        # of probes belonging to each gene. “lr.seg” is based on segmented CNV result (i.e. first performed segmentation based on 
+        # probe level data, and then use the lr of the representative segment of each gene as the gene-level lr). They used the
+        # lr.seg values in the paper, so we'll use those.
+        df = df.drop(index=df[~df.index.str.startswith("lr.seg")].index)
+
+        # Parse a Patient_ID index out of the current index
+        barcode_col = df.index.to_series()
+        split_barcode = barcode_col.str.split("_", n=1, expand=True) # The second part of the barcode is the patient id, which we want to make the index
+        df.index = pd.Index(split_barcode[1])
+        df.index.name = "Patient_ID"
 
-        # We're going to need to drop the samples below from a couple dataframes
-        nci_labels = ["NCI7-1", "NCI7-2", "NCI7-3", "NCI7-4", "NCI7-5"]
-        nci_dotted_labels = [label.replace("-", ".") for label in nci_labels]
-        qc_labels = ["QC1", "QC2", "QC3", "QC4", "QC5", "QC6", "QC7", "QC8"]
+        df = df.sort_index()
+        tables["CNV"] = df
 
-        # We have multiple clinical files, so we'll load those into a separate dict, and combine them later
-        clinical_dfs = {}
+        return tables
+
+    def _parse_transcriptomics(self, file_path):
+        """Parse the transcriptomics data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t')
+        df = df.sort_index()
+        df = df.transpose()
+
+        # There are a couple duplicate column headers, but they're full of just zeros. We'll drop them.
+        # You can do this with a one liner: df =  df.loc[:, ~df.columns.duplicated(keep=False) | (df != 0).any(axis=0)]
+        # But the one liner is about 100 times slower.
+        dups = df.loc[:, df.columns.duplicated(keep=False)] # Select all the columns with duplicated headers
+        dups = dups.loc[:, (dups != 0).any(axis=0)] # Get only the columns that aren't all zeros
+        df = df.loc[:, ~df.columns.duplicated(keep=False)] # Get rid of the duplicate columns from the original dataframe
+        df = df.join(dups, how="outer") # Sub in our un-duplicated selections
+        df = df.sort_index(axis="columns") # Get all the column names in order again
+
+        tables["transcriptomics"] = df
+
+        return tables
+
+    def _parse_clinical_sheets(self, file_path):
+        """Parse the clinical data data file."""
+        tables = {}
+
+        clinical_sheets = pd.read_excel(file_path, # This file has multiple sheets, but we only need the ones specified on the next line.
+            sheet_name=['Patient_Clinical_Attributes', 'Other_Medical_Information', 'Specimen_Attributes'],
+            index_col=0,
+            usecols=lambda x: x != "tumor_code") # Don't load the tumor_code column in any of them--it's just "CCRCC" for every row.
+
+        for sheet, df in clinical_sheets.items(): # We'll combine these with the other clinical tables when we format the dataframes
+            df.index.name = "Patient_ID" # The indices are currently "case_id", but we call that "Patient_ID"
+            tables[sheet] = df.copy()
+
+        return tables
+
+    def _parse_immune_groups(self, file_path):
+        """Parse the immune groups data file."""
+        tables = {}
+
+        immune_groups = pd.read_excel(file_path, sheet_name="xCell Signatures", index_col=0).transpose()
+        immune_groups = immune_groups[["Samples", "Immune Group"]] # We only need these columns
+        immune_groups = immune_groups.set_index("Samples")
+        tables["immune_groups"] = immune_groups
+
+        return tables
 
-        # Load the data into dataframes in the self._data dict
-        loading_msg = "Loading dataframes"
-        for file_path in self._data_files_paths: # Loops through files variable
-
-            # Print a loading message. We add a dot every time, so the user knows it's not frozen.
-            loading_msg = loading_msg + "."
-            print(loading_msg, end='\r')
-
-            path_elements = file_path.split(os.sep) # Get a list of the levels of the path
-            file_name = path_elements[-1] # The last element will be the name of the file
-            df_name = file_name.split(".")[0] # Our dataframe name will be the first section of file name (i.e. proteomics.txt.gz becomes proteomics)
-
-            if file_name == "6_CPTAC3_CCRCC_Phospho_abundance_gene_protNorm=2_CB_imputed.tsv.gz":
-                df = pd.read_csv(file_path, sep='\t', index_col=0)
-                ref_intensities = df["ReferenceIntensity"] # Copy this out, so we can subtract the reference intensities later
-                df = df.drop(columns=["NumberPSM", "Proteins", "ReferenceIntensity"] + nci_dotted_labels + qc_labels)
-                df = df.subtract(ref_intensities, axis="index") # Subtract reference intensities from all the values, to get ratios
-                df = df.transpose()
-                self._data["phosphoproteomics_gene"] = df
-
-            elif file_name == "6_CPTAC3_CCRCC_Phospho_abundance_phosphosite_protNorm=2_CB.tsv.gz":
-                df = pd.read_csv(file_path, sep='\t')
-
-                # Drop unlocalized sites
-                unlocalized_sites = (df["Index"].str.rsplit("_", n=1, expand=True)[1] == '0') 
-                df = df[~unlocalized_sites]
-
-                # Drop unwanted samples
-                df = df.drop(columns=nci_labels + qc_labels)
-
-                # Subtract reference intensities from numerical data columns, to get ratios
-                df = df.rename(columns={"Gene": "Name"})
-                metadata_cols = ["Index", "Name", "Peptide", "ReferenceIntensity"]
-                metadata = df[metadata_cols] # Extract these for later
-                df = df.drop(columns=metadata_cols) # Get the df to contain just the numerical data columns
-                ref_intensities = metadata["ReferenceIntensity"]
-                df = df.subtract(ref_intensities, axis="index") # Subtract reference intensities
-                df = metadata.join(df, how="outer") # Put the metadata columns back in
-                df = df.drop(columns="ReferenceIntensity") # Don't need this anymore
-
-                # Parse a few columns out of the "Index" column that we'll need for our multiindex
-                split_ids = df["Index"].str.split('_', expand=True)
-                df = df.drop(columns="Index")
-                sites = split_ids.iloc[:, -1]
-                database_ids = split_ids[0].str.cat(split_ids[1], sep='_')
-                df = df.assign(**{"Site": sites, "Database_ID": database_ids})
-
-                # Some rows have at least one localized phosphorylation site, but also have other phosphorylations that aren't localized. We'll drop those rows, if their localized sites are duplicated in another row, to avoid creating duplicates, because we only preserve information about the localized sites in a given row. However, if the localized sites aren't duplicated in another row, we'll keep the row.
-                unlocalized_to_drop = df.index[~split_ids[4].eq(split_ids[5]) & df.duplicated(["Name", "Site", "Peptide", "Database_ID"], keep=False)] # Column 4 of the split "Index" column is number of phosphorylations detected, and column 5 is number of phosphorylations localized, so if the two values aren't equal, the row has at least one unlocalized site
-                df = df.drop(index=unlocalized_to_drop)
-
-                # Give it a multiindex
-                df = df.set_index(["Name", "Site", "Peptide", "Database_ID"]) # This will create a multiindex from these columns, in this order.
-                df = df.sort_index()
-                df = df.transpose()
-                df = df.sort_index()
-                self._data["phosphoproteomics"] = df
-            
-            elif file_name == "6_CPTAC3_CCRCC_Whole_abundance_protein_pep=unique_protNorm=2_CB.tsv.gz":
-                df = pd.read_csv(file_path, sep='\t')
-                df = df.rename(columns={"Proteins": "Name", "Index": "Database_ID"})
-                df = df.set_index(["Name", "Database_ID"])
-                ref_intensities = df["ReferenceIntensity"] # Copy this out, so we can subtract the reference intensities later
-                df = df.drop(columns=["NumberPSM", "ReferenceIntensity"] + nci_labels + qc_labels)
-                df = df.subtract(ref_intensities, axis="index") # Subtract reference intensities from all the values, to get ratios
-                df = df.sort_index()
-                df = df.transpose()
-                df = df.sort_index()
-                self._data["proteomics"] = df
-            
-            elif file_name == "Clinical Table S1.xlsx":
-                df = pd.read_excel(file_path, sheet_name="ccrcc_clinical_characteristics", index_col=0) # This file has multiple sheets, but we only want the one
-                df.index.name = "Patient_ID" # The index is currently "case_id", but we call that "Patient_ID"
-                clinical_dfs["authoritative_clinical"] = df.copy()
-            
-            elif file_name == "ccrcc.somatic.consensus.gdc.umichigan.wu.112918.maf.gz":
-                df = pd.read_csv(file_path, sep='\t', dtype={"PUBMED":object}) # "PUBMED" column has mixed types, so we specify object as the dtype to prevent a warning from printing. We don't actually use the column, so that's all we need to do.
-                split_barcode = df["Tumor_Sample_Barcode"].str.split("_", n=1, expand=True) # The first part of the barcode is the patient id, which we need want to make the index
-                df["Tumor_Sample_Barcode"] = split_barcode[0]
-                df = df[["Tumor_Sample_Barcode","Hugo_Symbol","Variant_Classification","HGVSp_Short"]]
-                df = df.rename(columns={"Tumor_Sample_Barcode":"Patient_ID","Hugo_Symbol":"Gene","Variant_Classification":"Mutation","HGVSp_Short":"Location"})                
-                df = df.sort_values(by=["Patient_ID", "Gene"])
-                df = df.set_index("Patient_ID")
-                self._data["somatic_mutation"] = df
-
-            elif file_name == "ccrccMethylGeneLevelByMean.txt.gz":
-                df = pd.read_csv(file_path, sep='\t')
-                df = df.sort_index()
-                df = df.transpose()
-                df.index.name = "Patient_ID"
-                self._data["methylation"] = df
-
-            elif file_name == "cptac-metadata.xls.gz":
-                df = pd.read_csv(file_path, index_col=0)
-                df = df.drop(index=["pooled sample"] + nci_labels + qc_labels) # Drop the pooled samples in addition to other samples to exclude
-                clinical_dfs["metadata_and_keys"] = df
-            
-            elif file_name == "kirc_wgs_cnv_gene.csv.gz":
-                df = pd.read_csv(file_path)
-                df = df.rename(columns={"gene_name": "Name", "gene_id": "Database_ID"})
-                df = df.set_index(["Name", "Database_ID"])
-                df = df.sort_index()
-                df = df.transpose()
-
-                # The dataframe contains 4 rows for each sample: lr.loc_***,  lr.seg_***, mzd.loc_***, or  mzd.seg_*** where *** is the 
-                # Patient_ID. "lr" stands for log ratio, and "mzd" stands for Mean Zygosity Deviation. “lr.loc” is based on average of lr 
-                # of probes belonging to each gene. “lr.seg” is based on segmented CNV result (i.e. first performed segmentation based on 
-                # probe level data, and then use the lr of the representative segment of each gene as the gene-level lr). They used the
-                # lr.seg values in the paper, so we'll use those.
-                df = df.drop(index=df[~df.index.str.startswith("lr.seg")].index)
-
-                # Parse a Patient_ID index out of the current index
-                barcode_col = df.index.to_series()
-                split_barcode = barcode_col.str.split("_", n=1, expand=True) # The second part of the barcode is the patient id, which we want to make the index
-                df.index = pd.Index(split_barcode[1])
-                df.index.name = "Patient_ID"
-
-                df = df.sort_index()
-                self._data["CNV"] = df
-
-            elif file_name == "RNA_Normal_Tumor_185_samples.tsv.gz":
-                df = pd.read_csv(file_path, sep='\t')
-                df = df.sort_index()
-                df = df.transpose()
-
-                # There are a couple duplicate column headers, but they're full of just zeros. We'll drop them.
-                # You can do this with a one liner: df =  df.loc[:, ~df.columns.duplicated(keep=False) | (df != 0).any(axis=0)]
-                # But the one liner is about 100 times slower.
-                dups = df.loc[:, df.columns.duplicated(keep=False)] # Select all the columns with duplicated headers
-                dups = dups.loc[:, (dups != 0).any(axis=0)] # Get only the columns that aren't all zeros
-                df = df.loc[:, ~df.columns.duplicated(keep=False)] # Get rid of the duplicate columns from the original dataframe
-                df = df.join(dups, how="outer") # Sub in our un-duplicated selections
-                df = df.sort_index(axis="columns") # Get all the column names in order again
-
-                self._data["transcriptomics"] = df
-            
-            elif file_name == "S044_CPTAC_CCRCC_Discovery_Cohort_Clinical_Data_r3_Mar2019.xlsx":
-                clinical_sheets = pd.read_excel(file_path, # This file has multiple sheets, but we only need the ones specified on the next line.
-                    sheet_name=['Patient_Clinical_Attributes', 'Other_Medical_Information', 'Specimen_Attributes'],
-                    index_col=0,
-                    usecols=lambda x: x != "tumor_code") # Don't load the tumor_code column in any of them--it's just "CCRCC" for every row.
-
-                for sheet, df in clinical_sheets.items(): # Put them in the clinical_dfs dictionary for processing later
-                    df.index.name = "Patient_ID" # The indices are currently "case_id", but we call that "Patient_ID"
-                    clinical_dfs[sheet] = df.copy()
-
-            elif file_name == "Table S7.xlsx":
-                immune_groups = pd.read_excel(file_path, sheet_name="xCell Signatures", index_col=0).transpose()
-                immune_groups = immune_groups[["Samples", "Immune Group"]] # We only need these columns
-                immune_groups = immune_groups.set_index("Samples")
-
-            elif file_name == 'CCRCC_followup_9_12.xlsx' and self._version == "0.1.1":
-                df = pd.read_excel(file_path)
-
-                # Replace redundant values for "not reported" with NaN
-                nan_equivalents = ['Not Reported/ Unknown', 'Reported/ Unknown', 'Not Applicable', 'na',
-                    'unknown', 'Not Performed', 'Unknown tumor status', 'Unknown', ' Unknown', 'Unknown ',
-                    'Unknown Tumor Status', 'Not specified']
-
-                df = df.replace(nan_equivalents, np.nan)
-
-                # Replace redundanct values in "Cause of Death" column
-                disease_prog_equivalents = ['Metastatic Renal Cell Carcinoma', 'Tumor progression',
-                    'Progression of disease', 'Progression of disease ', 'Tumor', 'Disease progression',
-                    'Progressive Disease', 'Disease progression', 'disease progression ', 'main disease ']
-
-                df['Cause of Death'] = df['Cause of Death'].replace(disease_prog_equivalents, 'Disease progression')
-
-                # Rename, set, and sort by index
-                df = df.rename(columns={"Case ID": "Patient_ID"})
-                df = df.set_index("Patient_ID")
-                df = df.sort_index()
-
-                self._data["followup"] = df
-
-        print(' ' * len(loading_msg), end='\r') # Erase the loading message
+    def _parse_followup(self, file_path):
+        """Parse the followup data file."""
+        tables = {}
+
+        df = pd.read_excel(file_path)
+
+        # Replace redundant values for "not reported" with NaN
+        nan_equivalents = ['Not Reported/ Unknown', 'Reported/ Unknown', 'Not Applicable', 'na',
+            'unknown', 'Not Performed', 'Unknown tumor status', 'Unknown', ' Unknown', 'Unknown ',
+            'Unknown Tumor Status', 'Not specified']
+
+        df = df.replace(nan_equivalents, np.nan)
+
+        # Replace redundanct values in "Cause of Death" column
+        disease_prog_equivalents = ['Metastatic Renal Cell Carcinoma', 'Tumor progression',
+            'Progression of disease', 'Progression of disease ', 'Tumor', 'Disease progression',
+            'Progressive Disease', 'Disease progression', 'disease progression ', 'main disease ']
+
+        df['Cause of Death'] = df['Cause of Death'].replace(disease_prog_equivalents, 'Disease progression')
+
+        # Rename, set, and sort by index
+        df = df.rename(columns={"Case ID": "Patient_ID"})
+        df = df.set_index("Patient_ID")
+        df = df.sort_index()
+
+        tables["followup"] = df
+
+        return tables
+
+    def _format_dataframes(self):
+        """Format the ccrcc dataframes in the self._data dict, once all the data files have been parsed."""
         formatting_msg = "Formatting dataframes..."
         print(formatting_msg, end='\r')
 
+        # We have multiple clinical files, so we'll take those out of the data dict, and combine them into one clinical dataframe
+        clinical_dfs = {}
+        for name in ["authoritative_clinical", "metadata_and_keys", "Patient_Clinical_Attributes", "Other_Medical_Information", "Specimen_Attributes"]:
+            clinical_dfs[name] = self._data.pop(name)
+        immune_groups = self._data.pop("immune_groups", None) # Only versions 0.1 and later have this file
+
         # Process and combine the multiple clinical dataframes
         clinical = clinical_dfs["metadata_and_keys"] # We'll start with this dataframe, and add the others to it.
         clinical.index = clinical.index.where(~(clinical["Type"] == "Normal"), 'N' + clinical.index) # Prepend an 'N' to the patient IDs of normal samples
@@ -314,33 +392,33 @@ class Ccrcc(DataSet):
         medical_history_parsed = medical_history_parsed.sort_index()
         self._data["medical_history"] = medical_history_parsed
 
-        # Use the RNA.ID column from clinical dataframe to reindex transcriptomics dataframe with patient ids
+        # Use the RNA.ID column from clinical dataframe to reindex transcriptomics dataframe with patient ids. We don't sort it here, because finalize_all_dataframes sorts all the dataframes at the end.
         tran = self._data["transcriptomics"]
         try:
             tran_map = get_reindex_map(clinical["RNA.ID"])
-            tran_reindexed = reindex_dataframe(tran, tran_map, new_index_name="Patient_ID", keep_old=False)
+            tran_reindexed = reindex_dataframe(tran, tran_map, new_index_name="Patient_ID", keep_old=False, sort=False)
         except ReindexMapError:
             del self._data["transcriptomics"]
-            warnings.warn("Error mapping sample ids in transcriptomics dataframe. At least one RNA.ID did not have a corresponding Patient_ID mapped in the clinical dataframe. transcriptomics dataframe not loaded.", FailedReindexWarning, stacklevel=2)
+            warnings.warn("Error mapping sample ids in transcriptomics dataframe. At least one RNA.ID did not have a corresponding Patient_ID mapped in the clinical dataframe. transcriptomics dataframe not loaded.", FailedReindexWarning, stacklevel=6)
         else:
             self._data["transcriptomics"] = tran_reindexed
 
-        # Use the Specimen.Label columns from clinical dataframe to reindex the proteomics, phosphoproteomics, and phosphoproteomics_gene dataframes with patient ids
+        # Use the Specimen.Label columns from clinical dataframe to reindex the proteomics, phosphoproteomics, and phosphoproteomics_gene dataframes with patient ids. The map is built once and shared by all three.
         specimen_indexed_dfs = ["proteomics", "phosphoproteomics", "phosphoproteomics_gene"]
         try:
             specimen_label_map = get_reindex_map(clinical["Specimen.Label"])
         except ReindexMapError:
             for df_name in specimen_indexed_dfs:
                 del self._data[df_name]
-            warnings.warn(f"Error mapping sample ids in these dataframes: {' '.join(df for df in specimen_indexed_dfs)}. Specimen.Label mapping in clinical dataframe was not one-to-one. Dataframes not loaded.", FailedReindexWarning, stacklevel=2)
+            warnings.warn(f"Error mapping sample ids in these dataframes: {' '.join(df for df in specimen_indexed_dfs)}. Specimen.Label mapping in clinical dataframe was not one-to-one. Dataframes not loaded.", FailedReindexWarning, stacklevel=6)
         else:
             for df_name in specimen_indexed_dfs:
                 df = self._data[df_name]
                 try:
-                    df_reindexed = reindex_dataframe(df, specimen_label_map, new_index_name="Patient_ID", keep_old=False)
+                    df_reindexed = reindex_dataframe(df, specimen_label_map, new_index_name="Patient_ID", keep_old=False, sort=False)
                 except ReindexMapError as error:
                     del self._data[df_name]
-                    warnings.warn(f"Error mapping sample ids in {df_name} dataframe. RNA.ID {str(error)} did not have a corresponding Patient_ID mapped in the clinical dataframe. {df_name} dataframe not loaded.", FailedReindexWarning, stacklevel=2)
+                    warnings.warn(f"Error mapping sample ids in {df_name} dataframe. RNA.ID {str(error)} did not have a corresponding Patient_ID mapped in the clinical dataframe. {df_name} dataframe not loaded.", FailedReindexWarning, stacklevel=6)
                 else:
                     self._data[df_name] = df_reindexed
 
@@ -364,12 +442,12 @@ class Ccrcc(DataSet):
         methylation = methylation.drop(index=to_drop)
         self._data["methylation"] = methylation
 
-        # Get a union of all dataframes' indices, with duplicates removed
-        master_index = unionize_indices(self._data, exclude="followup")
+        # Get a union of all dataframes' indices, with duplicates removed, and where each dataframe's rows are in it
+        master_index, index_codes = unionize_indices(self._data, exclude="followup", return_codes=True)
 
         # Use the master index to reindex the clinical dataframe, so the clinical dataframe has a record of every sample in the dataset. Rows that didn't exist before (such as the rows for normal samples) are filled with NaN.
         clinical = self._data["clinical"]
-        clinical = clinical.reindex(master_index)
+        clinical = reindex_from_codes(clinical, master_index, index_codes["clinical"])
         self._data['clinical'] = clinical
 
         if self._version == "0.1.1":
@@ -380,12 +458,7 @@ class Ccrcc(DataSet):
             self._data["followup"] = followup
 
         # Edit the format of the Patient_IDs to have normal samples marked the same way as in other datasets. Currently, normal patient IDs have an "N" prepended. We're going to erase that and append a ".N"
-        self._data = reformat_normal_patient_ids(self._data, existing_identifier="N", existing_identifier_location="start")
-
-        # Call function from dataframe_tools.py to sort all tables first by sample status, and then by the index
-        self._data = sort_all_rows(self._data)
-
-        # Call function from dataframe_tools.py to standardize the names of the index and column axes
-        self._data = standardize_axes_names(self._data)
+        # Then call function from dataframe_tools.py to sort all tables first by sample status, and then by the index, and standardize the names of the index and column axes
+        self._data = finalize_all_dataframes(self._data, reformat_normal_ids=True, existing_identifier="N", existing_identifier_location="start")
 
-        print(" " * len(formatting_msg), end='\r') # Erase the formatting message
+        print(" " * len(formatting_msg), end='\r') # Erase the formatting message
\ No newline at end of file
@@ -13,14 +13,24 @@ import pandas as pd
 import numpy as np
 import os
 import warnings
-from .dataset import DataSet
+from .dataset import DataSet, FileParser
 from .dataframe_tools import *
 from .exceptions import FailedReindexWarning, ReindexMapError
 
 class Colon(DataSet):
 
-    def __init__(self, version="latest"):
-        """Load all of the colon dataframes as values in the self._data dict variable, with names as keys, and format them properly."""
+    def __init__(self, version="latest", use_cache=True, lazy=False, n_jobs=1, executor=None, dtype="float64", profile=False):
+        """Load all of the colon dataframes as values in the self._data dict variable, with names as keys, and format them properly.
+
+        Parameters:
+        version (str, optional): The version number to load, or the string "latest" to just load the latest version. Default is "latest".
+        use_cache (bool, optional): Whether to load the formatted dataframes from the on-disk cache if a valid one exists, and to save them to the cache after parsing the data files if not. Default is True.
+        lazy (bool, optional): Whether to wait to read each dataframe from the cache until it's first used, instead of reading them all when the dataset is loaded. This saves time and memory if you only use a few of the dataframes. Requires use_cache to be True. Default is False.
+        n_jobs (int, optional): The number of threads to use to parse the data files, if they aren't loaded from the cache. -1 uses one thread per CPU. Default is 1, which parses them one at a time.
+        executor (concurrent.futures.Executor, optional): An executor to parse the data files with instead, e.g. a concurrent.futures.ProcessPoolExecutor. If passed, n_jobs is ignored, and the executor is not shut down afterwards. Default is None.
+        dtype (str, optional): "float64" to keep the omics dataframes at full precision, or "float32" to store and return them as float32, and also make the repeated string columns in the clinical, experimental_design and somatic_mutation dataframes categorical. "float32" about halves the memory the dataset uses. Default is "float64".
+        profile (bool or function, optional): Whether to measure memory use while loading, in addition to the timings that are always recorded. Get the results by calling get_load_report. If a function, it is also called with the report once the dataset is loaded, e.g. to log it. Default is False.
+        """
 
         # Set some needed variables, and pass them to the parent DataSet class __init__ function
 
@@ -51,50 +61,73 @@ class Colon(DataSet):
                 "transcriptomics.gz"],
         }
 
-        super().__init__(cancer_type="colon", version=version, valid_versions=valid_versions, data_files=data_files)
+        # Map each data file to the method that parses it, and the names of the dataframes that method returns. The first parser that matches the file name and the dataset version is used.
+        file_parsers = [
+            FileParser(file_patterns=["Colon_One_Year_Clinical_Data_20160927.xls"], versions=["0.0.1"], tables=["followup"], parse=self._parse_followup),
+            FileParser(file_patterns=["Human__CPTAC_COAD__VU__SCNA__ExomeSeq__01_28_2016__BCM__Gene__BCM_CopyWriteR_GISTIC2.cct.gz"], versions=["0.0.1"], tables=["CNV"], parse=self._parse_cnv),
+            FileParser(file_patterns=["clinical.tsi.gz"], versions=None, tables=["clinical"], parse=self._parse_table),
+            FileParser(file_patterns=["miRNA.cct.gz"], versions=None, tables=["miRNA"], parse=self._parse_table),
+            FileParser(file_patterns=["mutation_binary.cbt.gz"], versions=None, tables=["mutation_binary"], parse=self._parse_table),
+            FileParser(file_patterns=["mutation.txt.gz"], versions=None, tables=["mutation"], parse=self._parse_table),
+            FileParser(file_patterns=["phosphoproteomics_normal.gz"], versions=None, tables=["phosphoproteomics_normal"], parse=self._parse_table),
+            FileParser(file_patterns=["phosphoproteomics_tumor.gz"], versions=None, tables=["phosphoproteomics_tumor"], parse=self._parse_table),
+            FileParser(file_patterns=["proteomics_normal.cct.gz"], versions=None, tables=["proteomics_normal"], parse=self._parse_table),
+            FileParser(file_patterns=["proteomics_tumor.cct.gz"], versions=None, tables=["proteomics_tumor"], parse=self._parse_table),
+            FileParser(file_patterns=["transcriptomics.gz"], versions=None, tables=["transcriptomics"], parse=self._parse_table),
+        ]
+
+        super().__init__(cancer_type="colon", version=version, valid_versions=valid_versions, data_files=data_files, file_parsers=file_parsers, use_cache=use_cache, lazy=lazy, n_jobs=n_jobs, executor=executor, dtype=dtype, profile=profile)
+
+    def _parse_followup(self, file_path):
+        """Parse the followup data file."""
+        tables = {}
+
+        df = pd.read_excel(file_path)
 
-        # Load the data into dataframes in the self._data dict
-        loading_msg = "Loading dataframes"
-        for file_path in self._data_files_paths: # Loops through files variable
+        # Replace redundant values for "not reported" with NaN
+        nan_equivalents = ['Not Reported/ Unknown', 'Reported/ Unknown', 'Not Applicable',
+            'na', 'unknown', 'Not Performed', 'Unknown tumor status']
 
-            # Print a loading message. We add a dot every time, so the user knows it's not frozen.
-            loading_msg = loading_msg + "."
-            print(loading_msg, end='\r')
+        df = df.replace(nan_equivalents, np.nan)
 
-            path_elements = file_path.split(os.sep) # Get a list of the levels of the path
-            file_name = path_elements[-1] # The last element will be the name of the file
-            file_name_split = file_name.split(".")
-            df_name = file_name_split[0] # Our dataframe name will be the first section of file name (i.e. proteomics.txt.gz becomes proteomics)
+        # Rename and set index
+        df = df.rename(columns={'PPID': 'Patient_ID'})
+        df = df.set_index("Patient_ID")
+        df = df.sort_index()
 
-            if file_name == 'Colon_One_Year_Clinical_Data_20160927.xls' and self._version == "0.0.1":
-                df = pd.read_excel(file_path)
+        tables["followup"] = df
 
-                # Replace redundant values for "not reported" with NaN
-                nan_equivalents = ['Not Reported/ Unknown', 'Reported/ Unknown', 'Not Applicable',
-                    'na', 'unknown', 'Not Performed', 'Unknown tumor status']
+        return tables
 
-                df = df.replace(nan_equivalents, np.nan)
+    def _parse_cnv(self, file_path):
+        """Parse the CNV data file."""
+        tables = {}
 
-                # Rename and set index
-                df = df.rename(columns={'PPID': 'Patient_ID'})
-                df = df.set_index("Patient_ID")
-                df = df.sort_index()
+        df = pd.read_csv(file_path, sep="\t",index_col=0)
+        df = df.sort_index()
+        df = df.transpose()
+        tables["CNV"] = df
 
-                self._data["followup"] = df
+        return tables
 
-            elif file_name == "Human__CPTAC_COAD__VU__SCNA__ExomeSeq__01_28_2016__BCM__Gene__BCM_CopyWriteR_GISTIC2.cct.gz" and self._version == "0.0.1":
-                df = pd.read_csv(file_path, sep="\t",index_col=0)
-                df = df.sort_index()
-                df = df.transpose()
-                self._data["CNV"] = df
+    def _parse_table(self, file_path):
+        """Parse a data file that doesn't need any special handling. The dataframe is named with the first section of the file name."""
+        path_elements = file_path.split(os.sep) # Get a list of the levels of the path
+        file_name = path_elements[-1] # The last element will be the name of the file
+        file_name_split = file_name.split(".")
+        df_name = file_name_split[0] # Our dataframe name will be the first section of file name (i.e. proteomics.txt.gz becomes proteomics)
 
-            else:
-                df = pd.read_csv(file_path, sep="\t",index_col=0)
-                df = df.sort_index()
-                df = df.transpose()
-                self._data[df_name] = df # Maps dataframe name to dataframe. self._data was initialized when we called the parent class __init__()
+        tables = {}
 
-        print(' ' * len(loading_msg), end='\r') # Erase the loading message
+        df = pd.read_csv(file_path, sep="\t",index_col=0)
+        df = df.sort_index()
+        df = df.transpose()
+        tables[df_name] = df # Maps dataframe name to dataframe
+
+        return tables
+
+    def _format_dataframes(self):
+        """Format the colon dataframes in the self._data dict, once all the data files have been parsed."""
         formatting_msg = "Formatting dataframes..."
         print(formatting_msg, end='\r')
 
@@ -108,7 +141,7 @@ class Colon(DataSet):
         mut = mut.rename(columns={"SampleID":"Patient_ID", "Variant_Type":"Mutation", "Protein_Change":"Location"})
         mut = mut.sort_values(by=["Patient_ID", "Gene"])
         mut = mut.set_index("Patient_ID") # We only do this after the drop_duplicates call above because drop_duplicates doesn't consider the index, but we of course want the Patient_ID to be considered when identifying duplicate rows to drop.
-        self._data["somatic_mutation"] = mut # Maps dataframe name to dataframe. self._data was initialized when we called the parent class __init__()
+        self._data["somatic_mutation"] = mut # Maps dataframe name to dataframe
         del self._data["mutation"] # Delete the old version with the old name
 
         # Rename mutation_binary dataframe to somatic_mutation_binary
@@ -157,11 +190,11 @@ class Colon(DataSet):
         del self._data["phosphoproteomics_tumor"]
         del self._data["phosphoproteomics_normal"]
 
-        # Get a union of all dataframes' indices, with duplicates removed
-        master_index = unionize_indices(self._data)
+        # Get a union of all dataframes' indices, with duplicates removed, and where each dataframe's rows are in it
+        master_index, index_codes = unionize_indices(self._data, return_codes=True)
 
         # Use the master index to reindex the clinical dataframe, so the clinical dataframe has a record of every sample in the dataset. Rows that didn't exist before (such as the rows for normal samples) are filled with NaN.
-        master_clinical = self._data['clinical'].reindex(master_index)
+        master_clinical = reindex_from_codes(self._data['clinical'], master_index, index_codes["clinical"])
 
         # Add a column called Sample_Tumor_Normal to the clinical dataframe indicating whether each sample is a tumor or normal sample. Samples with a Patient_ID ending in N are normal.
         clinical_status_col = generate_sample_status_col(master_clinical, normal_test=lambda sample: sample[-1] == 'N')
@@ -172,13 +205,8 @@ class Colon(DataSet):
 
         # Edit the format of the Patient_IDs to have normal samples marked the same way as in other datasets
         # Currently, normal patient IDs have an "N" appended. We're going to make that a ".N"
-        self._data = reformat_normal_patient_ids(self._data, existing_identifier="N", existing_identifier_location="end")
-
-        # Call function from dataframe_tools.py to sort all tables first by sample status, and then by the index
-        self._data = sort_all_rows(self._data)
-
-        # Call function from dataframe_tools.py to standardize the names of the index and column axes
-        self._data = standardize_axes_names(self._data)
+        # Then call function from dataframe_tools.py to sort all tables first by sample status, and then by the index, and standardize the names of the index and column axes
+        self._data = finalize_all_dataframes(self._data, reformat_normal_ids=True, existing_identifier="N", existing_identifier_location="end")
 
         print(" " * len(formatting_msg), end='\r') # Erase the formatting message
 
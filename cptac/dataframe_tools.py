@@ -13,26 +13,87 @@ import pandas as pd
 import numpy as np
 import warnings
 from .exceptions import CptacDevError, ReindexMapError, FailedReindexWarning
+from .load_report import timed_step
 
-def unionize_indices(dataset, exclude=[]):
-    """Return a union of all indices in a dataset, without duplicates.
+@timed_step # Recorded in the load report
+def unionize_indices(dataset, exclude=[], return_codes=False):
+    """Return a union of all indices in a dataset, without duplicates. The union is found in one hashed pass over all the indices together, instead of unioning them one at a time.
 
     Parameters:
     dataset (dict of str: pandas DataFrame): The data dictionary containing the dataset.
     exclude (str or list of str, optional): A list of dataframes to exclude when unionizing indices.
+    return_codes (bool, optional): Whether to also return, for each dataframe, the position in the union of each of its rows. Pass these to reindex_from_codes to reindex a dataframe to the union without hashing its index again. Default False.
 
     Returns:
-    pandas Index: Union of all indices in the dataset, without duplicates.
+    pandas Index: Union of all indices in the dataset, without duplicates. Sorted, unless the values can't be compared.
+    dict of str: numpy array, only if return_codes is True: For each dataframe that wasn't excluded, the position in the union of each of its rows.
     """
     if isinstance(exclude, str): # If it's a single dataframe name, make it a list so we can treat everything the same
         exclude = [exclude]
 
-    indices = [df.index for name, df in dataset.items() if name not in exclude]
-    master_index = pd.Index([])
-    for index in indices:
-        master_index = master_index.union(index)
-        master_index = master_index.drop_duplicates()
-    return master_index
+    names = [name for name in dataset.keys() if name not in exclude]
+    indices = [dataset[name].index for name in names]
+
+    # Factorize all the index values together. This gives us the unique values in the order they first appear, and for each row, the position of its value in the uniques. NaN labels get a code of -1, and aren't in the uniques.
+    all_values = np.concatenate([index.values for index in indices]) if len(indices) > 0 else np.array([], dtype=object)
+    all_codes, uniques = pd.factorize(all_values)
+
+    # Sort the unique values, like Index.union does, and update the codes to match
+    try:
+        order = np.argsort(uniques, kind="mergesort")
+    except TypeError: # The values can't be compared, so we leave them in the order they first appear
+        order = np.arange(len(uniques))
+    new_positions = np.empty(len(order), dtype=np.intp)
+    new_positions[order] = np.arange(len(order))
+    union_values = uniques[order]
+
+    # Index.union keeps NaN labels, so if there are any, we put one NaN at the end of the union, and point their codes at it. Otherwise the -1 codes would index the last row.
+    all_positions = np.full(len(all_codes), len(order), dtype=np.intp) # The position of the NaN, if there is one
+    found = all_codes >= 0
+    all_positions[found] = new_positions[all_codes[found]]
+    if not found.all():
+        union_values = np.append(union_values, np.nan)
+
+    index_names = set(index.name for index in indices)
+    master_index = pd.Index(union_values, name=index_names.pop() if len(index_names) == 1 else None) # Keep the name if they all have the same one
+
+    if not return_codes:
+        return master_index
+
+    codes = {}
+    start = 0
+    for name, index in zip(names, indices):
+        codes[name] = all_positions[start:start + len(index)]
+        start += len(index)
+    return master_index, codes
+
+def reindex_from_codes(df, master_index, row_codes):
+    """Reindex a dataframe to a master index, using the positions in the master index of the dataframe's rows, from unionize_indices with return_codes=True. Gives the same result as df.reindex(master_index), including filling rows that weren't in the dataframe with NaN, but doesn't have to hash the index again.
+
+    Parameters:
+    df (pandas DataFrame): The dataframe to reindex. Its index must not have duplicates.
+    master_index (pandas Index): The index to reindex to.
+    row_codes (numpy array of int): The position in master_index of each row of df.
+
+    Returns:
+    pandas DataFrame: The reindexed dataframe.
+    """
+    if len(row_codes) != len(df.index):
+        raise CptacDevError(f"Got {len(row_codes)} codes for a dataframe with {len(df.index)} rows.")
+    if len(row_codes) > 0 and (row_codes.min() < 0 or row_codes.max() >= len(master_index)):
+        raise CptacDevError(f"Codes must be positions in the master index, from 0 to {len(master_index) - 1}.")
+    if len(np.unique(row_codes)) != len(row_codes):
+        raise CptacDevError("Cannot reindex a dataframe with duplicate index values.")
+
+    # For each row of the master index, the position of that row in df, or -1 if it's not in df
+    indexer = np.full(len(master_index), -1, dtype=np.intp)
+    indexer[row_codes] = np.arange(len(row_codes))
+
+    # take with allow_fill fills the -1 positions with the right missing value for each column's dtype, upcasting like reindex does
+    columns = {position: pd.api.extensions.take(df.iloc[:, position].values, indexer, allow_fill=True) for position in range(df.shape[1])}
+    reindexed = pd.DataFrame(columns, index=master_index, columns=range(df.shape[1]))
+    reindexed.columns = df.columns
+    return reindexed
 
 def generate_sample_status_col(df, normal_test):
     """Create a sample status column, called Sample_Tumor_Normal, for a dataframe.
@@ -48,6 +109,47 @@ def generate_sample_status_col(df, normal_test):
     sample_status_col = pd.Series(data=sample_status_array, index=df.index.copy())
     return sample_status_col
 
+class ReindexMap:
+    """A mapping of old index values to new ones. The old values are kept in a pandas Index, which is hashed once when the map is built, so a whole index can be mapped with one call to get_indexer, instead of looking up each value separately. Build one map and use it for every dataframe that needs the same mapping.
+    """
+
+    def __init__(self, mapping):
+        """Build the map.
+
+        Parameters:
+        mapping (dict or pandas Series): A dictionary or pandas Series with the old index values as the keys or index, and the new ones as the values. The old values must be unique.
+        """
+        if isinstance(mapping, dict):
+            mapping = pd.Series(list(mapping.values()), index=list(mapping.keys()), dtype=object)
+
+        if mapping.index.has_duplicates:
+            raise ReindexMapError("Reindex map is not one to one.")
+
+        self._old_index = pd.Index(mapping.index)
+        self._new_values = pd.Index(mapping.values)
+
+    def __len__(self):
+        return len(self._old_index)
+
+    def keys(self):
+        """pandas Index: The old index values that the map has new values for."""
+        return self._old_index
+
+    def map_index(self, index):
+        """Get the new values for all the values in an index.
+
+        Parameters:
+        index (pandas Index): The index to map.
+
+        Returns:
+        pandas Index: The new values, in the same order as the values in the given index.
+        """
+        positions = self._old_index.get_indexer(index)
+        missing = positions == -1
+        if missing.any():
+            raise ReindexMapError(index[missing])
+        return self._new_values.take(positions)
+
 def get_reindex_map(series):
     """Generate a reindexing map from a series where the index is the new indices, and the values are the old indices.
 
@@ -55,57 +157,53 @@ def get_reindex_map(series):
     series (pandas Series): The series to generate the reindex map from.
 
     Returns:
-    pandas Series: The reindexing map, with the old inidicies as the index, and the new indices as the values.
+    ReindexMap: The reindexing map, from the old indices to the new indices.
     """
-    old_index_name = series.name
-    new_index_name = series.index.name
-    if new_index_name is None:
-        new_index_name = "index" # This is the default name pandas gives unnamed indices when they're made columns
-
     # Check that the mapping is one to one
     series = series.dropna()
-    if len(series) != len(series.drop_duplicates()):
+    if series.duplicated().any():
         raise ReindexMapError("Reindex map is not one to one.")
 
     # Make the index the values, and the values the index
-    df = series.reset_index()
-    df = df.set_index(old_index_name)
-    reindex_map = df[new_index_name]
-    return reindex_map
+    return ReindexMap(pd.Series(series.index, index=series.values))
 
-def reindex_dataframe(df, reindex_map, new_index_name, keep_old):
+def reindex_dataframe(df, reindex_map, new_index_name, keep_old, sort=True):
     """Reindex a dataframe based on a mapping of the old index values to new ones.
 
     Parameters:
     df (pandas DataFrame): The dataframe to reindex.
-    reindex_map (dict or pandas Series): A dictionary or pandas Series with the old index values as the keys or index, and the new ones as the values.
+    reindex_map (ReindexMap, dict, or pandas Series): A ReindexMap, or a dictionary or pandas Series with the old index values as the keys or index, and the new ones as the values. If you're reindexing several dataframes with the same mapping, pass a ReindexMap so it's only built once.
     new_index_name (str): The desired name for the new index.
     keep_old (bool): Whether to retain the old index in the dataframe as a column.
+    sort (bool, optional): Whether to sort the dataframe by the new index. Pass False if the dataframe will be sorted later anyway. Default True.
 
     Returns:
     pandas DataFrame: A copy of the given dataframe, with the new index.
     """
-    if not df.index.isin(reindex_map.keys()).all(): # This works for a dict or a pandas Series, because Series have a .keys() attribute that's an alias for the index
-        not_in = df.index[~(df.index.isin(reindex_map.keys()))]
-        raise ReindexMapError(not_in)
+    if not isinstance(reindex_map, ReindexMap):
+        reindex_map = ReindexMap(reindex_map)
 
-    new_index = df.index.map(reindex_map.get)
+    new_index = reindex_map.map_index(df.index)
 
     if keep_old:
-        df = df.reset_index() 
+        df = df.reset_index()
+    else:
+        df = df.copy(deep=False) # So we don't change the index of the dataframe we were given
     df.index = new_index
     df.index.name = new_index_name
-    df = df.sort_index()
+    if sort:
+        df = df.sort_index()
     return df
 
-def reindex_all_sample_id_to_patient_id(data_dict, reindex_map, additional_to_keep_col=[], skip=[]):
+def reindex_all_sample_id_to_patient_id(data_dict, reindex_map, additional_to_keep_col=[], skip=[], sort=True):
     """Reindex all the dataframes with Patient_IDs instead of Sample_IDs
 
     Parameters:
     data_dict (keys are str, values are pandas DataFrames): The data dictionary to reindex
-    reindex_map (dict or pandas Series): A dictionary or pandas Series with the old index values (Sample_IDs) as the keys or index, and the new ones (Patient_IDs) as the values. Must map for all existing index values in the entire dataset.
+    reindex_map (ReindexMap, dict, or pandas Series): A ReindexMap, or a dictionary or pandas Series with the old index values (Sample_IDs) as the keys or index, and the new ones (Patient_IDs) as the values. Must map for all existing index values in the entire dataset.
     additional_to_keep_col (list of str, optional): The function will already keep the old index as a column in the clinical dataframe. If you want it to do this for any other dataframes, put their names in this list.
     skip (str or list of str, optional): A list of dataframes to skip when reindexing.
+    sort (bool, optional): Whether to sort each dataframe by its new index. Pass False if the dataframes will be sorted later anyway, e.g. by finalize_all_dataframes. Default True.
 
     Returns:
     dict: The data dictionary, with all dataframes reindexed with Patient_IDs
@@ -113,6 +211,9 @@ def reindex_all_sample_id_to_patient_id(data_dict, reindex_map, additional_to_ke
     if isinstance(skip, str): # If it's a single dataframe name, make it a list so we can treat everything the same
         skip = [skip]
 
+    if not isinstance(reindex_map, ReindexMap): # Build the map once, and share it between all the dataframes
+        reindex_map = ReindexMap(reindex_map)
+
     dfs_to_delete = []
     dfs_to_keep_col = ["clinical"] + additional_to_keep_col
 
@@ -127,9 +228,9 @@ def reindex_all_sample_id_to_patient_id(data_dict, reindex_map, additional_to_ke
         keep_old = name in dfs_to_keep_col # Keep the old Patient_ID index as a column in the clinical dataframe (and any additionally specified dataframes), so we have a record of it.
         
         try:
-            df = reindex_dataframe(df, reindex_map, "Patient_ID", keep_old)
+            df = reindex_dataframe(df, reindex_map, "Patient_ID", keep_old, sort=sort)
         except ReindexMapError:
-            warnings.warn(f"Error reindexing {name} dataframe. At least one Sample_ID did not have corresponding Patient_ID mapped in clinical dataframe. {name} dataframe not loaded.", FailedReindexWarning, stacklevel=3) # stacklevel=3 ensures that the warning is registered as originating from the file that called the __init__ function, instead of from here directly, because the former is more useful information.
+            warnings.warn(f"Error reindexing {name} dataframe. At least one Sample_ID did not have corresponding Patient_ID mapped in clinical dataframe. {name} dataframe not loaded.", FailedReindexWarning, stacklevel=7) # stacklevel=7 ensures that the warning is registered as originating from the file that created the dataset object (by way of the dataset's _format_dataframes method, DataSet._parse_data_files, DataSet._load_dataframes, and the DataSet and dataset __init__ functions), instead of from here directly, because the former is more useful information.
             dfs_to_delete.append(name)
             continue
 
@@ -140,155 +241,111 @@ def reindex_all_sample_id_to_patient_id(data_dict, reindex_map, additional_to_ke
 
     return data_dict
 
-def reformat_normal_patient_ids(data_dict, existing_identifier=None, existing_identifier_location=None):
-    """Reformat the patient IDs for normal samples to be marked by an appended ".N"
+@timed_step # Recorded in the load report
+def finalize_all_dataframes(data_dict, reformat_normal_ids=False, existing_identifier=None, existing_identifier_location=None):
+    """Do the final formatting of all the dataframes in a dataset, in one pass. Optionally reformat the patient IDs for normal samples to be marked by an appended ".N". Then sort the rows of each dataframe first by sample status, with tumor samples first, and then by patient ID, and set the name of the index axes to "Patient_ID" and the name of the column axes to "Name".
+
+    Each sample's new patient ID and place in the sort order are worked out once from the clinical dataframe, and then applied to each dataframe by position, so we don't have to join the Sample_Tumor_Normal column into every dataframe to do it.
 
     Parameters:
-    data_dict (dict): The data dictionary for a dataset. All the tables must be indexed by Patient IDs.
-    existing_identifier (str, optional): A normal sample identifier that already exists on the normal samples' patient IDs, which we will remove before adding the new identifier. Default of None will cause nothing to be removed.
+    data_dict (dict): The data dictionary for a dataset. All the tables must be indexed by Patient IDs, and the clinical dataframe must have a Sample_Tumor_Normal column and unique index values.
+    reformat_normal_ids (bool, optional): Whether to append ".N" to the patient IDs of normal samples. Default False.
+    existing_identifier (str, optional): A normal sample identifier that already exists on the normal samples' patient IDs, which we will remove before adding the new identifier. Only used if reformat_normal_ids is True. Default of None will cause nothing to be removed.
     existing_identifier_location (str, optional): Either "start" or "end": Indicates whether the existing identifier is at the beginning or end of the normal samples' patient IDs, so we know which end to remove it from. Optional if nothing is passed to the existing_identifier parameter.
 
     Returns:
-    dict: The data dictionary for the dataset, with normal samples' patient IDs reformatted in the specified dataframes.
+    dict: The data dictionary for the dataset, with the dataframes reformatted and sorted. Keys are str of dataframe names, values are pandas DataFrames
     """
-
     # Check parameters
     if (existing_identifier is None and existing_identifier_location is not None) or (existing_identifier is not None and existing_identifier_location is None):
         raise CptacDevError("Parameters existing_identifier and existing_identifier_location must either both be None, or both not be None.")
+    if existing_identifier_location not in (None, "start", "end"):
+        raise CptacDevError("existing_identifier_location parameter must be either 'start' or 'end'")
 
-    sample_statuses_old_index = data_dict["clinical"].loc[:, ["Sample_Tumor_Normal"]].copy(deep=True) # We'll need this every time, and we need it with the un-reformatted index
-
-    for name in data_dict.keys(): # Loop over the keys so we can edit the values without any issues
+    # Work out the new patient IDs and the sort order for all the samples in the clinical dataframe, which has every sample in the dataset
+    clinical = data_dict["clinical"]
+    clinical_ids = clinical.index
+    clinical_statuses = clinical["Sample_Tumor_Normal"].values
+    clinical_new_ids = _get_new_patient_ids(clinical_ids.values, clinical_statuses, reformat_normal_ids, existing_identifier, existing_identifier_location)
+    clinical_ranks = np.empty(len(clinical_ids), dtype=np.int64)
+    clinical_ranks[_get_sorted_positions(clinical_statuses, clinical_new_ids)] = np.arange(len(clinical_ids)) # Each sample's place in the sorted order
 
+    for name in data_dict.keys(): # Loop over the keys so we can alter the values without any issues
         df = data_dict[name]
 
-        # Add in the tumor/normal statuses for these samples, if they aren't already in the table
-        added_sample_statuses = False # So we can keep track of whether to drop the column when we're done
-        if "Sample_Tumor_Normal" not in df.columns:
-            df = join_col_to_dataframe(df, sample_statuses_old_index)
-            added_sample_statuses = True
-
-        df.index.name = "Patient_ID" # So we can easily access it when we've made it into a column
-        df = df.reset_index() # This makes the Patient_ID index a column, so we can edit it.
-
-        if (existing_identifier is not None) and (existing_identifier_location is not None): # There's an existing normal sample identifier to remove
-            existing_length = len(existing_identifier)
-
-            if existing_identifier_location == "start":
-                df["Patient_ID"] = df["Patient_ID"].where(
-                    cond=(~((df["Sample_Tumor_Normal"] == "Normal") & (df["Patient_ID"].str[0:existing_length] == existing_identifier))),
-                    other=df["Patient_ID"].str[existing_length:]
-                )
-
-            elif existing_identifier_location == "end":
-                df["Patient_ID"] = df["Patient_ID"].where(
-                    cond=(~((df["Sample_Tumor_Normal"] == "Normal") & (df["Patient_ID"].str[-existing_length:] == existing_identifier))),
-                    other=df["Patient_ID"].str[:-existing_length] # Note that we use the negative of the existing length, since we're working with the end of the string
-                )
-
-            else:
-                raise CptacDevError("existing_identifier_location parameter must be either 'start' or 'end'")
-
-        # Append ".N" to the patient IDs of normal samples
-        df["Patient_ID"] = df["Patient_ID"].where(
-            cond=(~(df["Sample_Tumor_Normal"] == "Normal")),
-            other=df["Patient_ID"] + ".N"
-        )
-
-        # Set the index to the reformatted Patient IDs
-        df = df.set_index("Patient_ID")
-
-        # If we added the Sample_Tumor_Normal column, drop it
-        if added_sample_statuses:
-            if isinstance(df.columns, pd.core.index.MultiIndex):
-                df = df.drop(columns="Sample_Tumor_Normal", level=0) # level=0 prevents a PerformanceWarning
-            else:
-                df = df.drop(columns="Sample_Tumor_Normal")
-
-        # Put the dataframe with reformatted patient IDs back into the data dictionary
+        if "Sample_Tumor_Normal" in df.columns:
+            # The dataframe has its own sample statuses, so we use those, like for the clinical dataframe
+            statuses = df["Sample_Tumor_Normal"]
+            if isinstance(statuses, pd.DataFrame): # This would happen if the dataframe has a column multiindex
+                statuses = statuses.iloc[:, 0]
+            statuses = statuses.values
+            new_ids = _get_new_patient_ids(df.index.values, statuses, reformat_normal_ids, existing_identifier, existing_identifier_location)
+            order = _get_sorted_positions(statuses, new_ids)
+
+        else:
+            # Look up each row's sample in the clinical dataframe
+            positions = clinical_ids.get_indexer(df.index)
+            if (positions >= 0).all():
+                new_ids = clinical_new_ids[positions]
+                order = np.argsort(clinical_ranks[positions], kind="mergesort") # A stable sort, so rows for the same sample stay in the same order
+            else: # Samples that aren't in the clinical dataframe have no status, so they keep their IDs, and are sorted with the other samples without a status
+                found = positions >= 0
+                statuses = np.where(found, clinical_statuses[positions], np.nan).astype(object)
+                new_ids = np.where(found, clinical_new_ids[positions], df.index.values).astype(object)
+                order = _get_sorted_positions(statuses, new_ids)
+
+        df = df.iloc[order]
+        df.index = pd.Index(new_ids[order], name="Patient_ID")
+        df.columns.name = "Name"
         data_dict[name] = df
 
     return data_dict
 
-def join_col_to_dataframe(df, col_df):
-    """Join a sample status column into a dataframe, automatically accounting for whether the dataframe has a column multiindex or not.
+def _get_new_patient_ids(patient_ids, statuses, reformat_normal_ids, existing_identifier, existing_identifier_location):
+    """Get the reformatted patient IDs for a set of samples, for finalize_all_dataframes.
 
     Parameters:
-    df (pandas DataFrame): The dataframe to join the column into
-    col_df (pandas DataFrame): The column to join into the dataframe, as a single-column dataframe.
+    patient_ids (numpy array): The current patient IDs.
+    statuses (numpy array): The Sample_Tumor_Normal value for each sample.
+    reformat_normal_ids (bool): Whether to append ".N" to the patient IDs of normal samples. If False, the IDs are returned unchanged.
+    existing_identifier (str): A normal sample identifier to remove from the normal samples' patient IDs before adding the new one. None if there isn't one.
+    existing_identifier_location (str): "start" or "end", for which end of the patient IDs the existing identifier is on.
 
     Returns:
-    pandas DataFrame: The dataframe with the column joined in.
+    numpy array: The new patient IDs.
     """
-    col_df = col_df.copy(deep=True)
+    if not reformat_normal_ids:
+        return np.asarray(patient_ids, dtype=object)
 
-    # Make sure the columns axes all have the same name
-    df.columns.name = "Name"
-    col_df.columns.name = "Name"
+    ids = pd.Series(patient_ids, dtype=object)
+    normal = pd.Series(statuses, dtype=object).eq("Normal").values
 
-    # If df has a column multiindex, edit the col_df column index to match, so we can join them
-    if col_df.columns.names != df.columns.names:
-        col_df.columns = add_index_levels(to=col_df.columns, source=df.columns, fill="") # We fill empty levels with an empty string so that we can select the inserted column with just the first level. This is useful for boolean filters, as in the reformat_normal_patient_ids function.
+    if existing_identifier is not None: # There's an existing normal sample identifier to remove
+        existing_length = len(existing_identifier)
+        if existing_identifier_location == "start":
+            has_identifier = ids.str[0:existing_length].eq(existing_identifier).values
+            ids = ids.where(~(normal & has_identifier), other=ids.str[existing_length:])
+        else:
+            has_identifier = ids.str[-existing_length:].eq(existing_identifier).values
+            ids = ids.where(~(normal & has_identifier), other=ids.str[:-existing_length]) # Note that we use the negative of the existing length, since we're working with the end of the string
 
-    if col_df.columns.names != df.columns.names: # Just to make sure
-        raise CptacDevError(f"col_df's column axes had levels not found in the {name} dataframe's columns.")
+    # Append ".N" to the patient IDs of normal samples
+    ids = ids.where(~normal, other=ids + ".N")
+    return ids.values.astype(object)
 
-    df = df.join(col_df, how="left") # We do a left join because we only want rows that exist in our dataframe
-
-    return df
-
-def standardize_axes_names(data_dict):
-    """For all dataframes in the given dictionary, sets the name of the index axes to "Patient_ID", because that's what they all are by that point, and sets the name of the column axes to "Name".
+def _get_sorted_positions(statuses, patient_ids):
+    """Get the order to sort a set of samples in, first by sample status, with tumor samples first, and then by patient ID. Samples without a status go last. Samples with the same status and ID stay in the order they were in.
 
     Parameters:
-    data_dict (dict): The dataframe dictionary of the dataset.
+    statuses (numpy array): The Sample_Tumor_Normal value for each sample.
+    patient_ids (numpy array): The patient ID for each sample.
 
     Returns:
-    dict: The dataframe dictionary, with the dataframe axes' names standardized. Keys are str of dataframe names, values are pandas DataFrames
+    numpy array of int: The positions of the samples, in sorted order.
     """
-    for name in data_dict.keys(): # Loop over the keys so we can alter the values without any issues
-        df = data_dict[name]
-        df.index.name = "Patient_ID"
-        df.columns.name = "Name"
-        data_dict[name] = df
-
-    return data_dict
-
-def sort_all_rows(data_dict):
-    """For all dataframes in the given dictionary, sort them first by sample status, with tumor samples first, and then by the index.
-
-    Parameters:
-    data_dict (dict): The dataframe dictionary of the dataset.
-
-    Returns:
-    dict: The dataframe dictionary, with the dataframes sorted by their indices. Keys are str of dataframe names, values are pandas DataFrames
-    """
-    # Get the Sample_Tumor_Normal column as a single-column dataframe
-    sample_status_col_df = data_dict["clinical"].loc[:, ["Sample_Tumor_Normal"]].copy(deep=True) # We'll need this every time
-
-    for name in data_dict.keys(): # Loop over the keys so we can alter the values without any issues
-        df = data_dict[name]
-
-        # Add in the tumor/normal statuses for these samples, if they aren't already in the table
-        added_sample_statuses = False # So we can keep track of whether to drop the column when we're done
-        if "Sample_Tumor_Normal" not in df.columns:
-            df = join_col_to_dataframe(df, sample_status_col_df)
-            added_sample_statuses = True
-
-        # Sort first by the Sample_Tumor_Normal column, and then by the index
-        df.index.name = "Patient_ID" # To make sure we can reference it in the next line
-        df = df.sort_values(by=["Sample_Tumor_Normal", "Patient_ID"], ascending=[False, True]) # Sorts first by sample status, and in descending order, so "Tumor" samples are first
-
-        # If we added the Sample_Tumor_Normal column, drop it
-        if added_sample_statuses:
-            if isinstance(df.columns, pd.core.index.MultiIndex):
-                df = df.drop(columns="Sample_Tumor_Normal", level=0) # level=0 prevents a PerformanceWarning
-            else:
-                df = df.drop(columns="Sample_Tumor_Normal")
-
-        data_dict[name] = df
-
-    return data_dict
+    keys = pd.DataFrame({"Sample_Tumor_Normal": pd.Series(statuses, dtype=object), "Patient_ID": pd.Series(patient_ids, dtype=object)})
+    keys = keys.sort_values(by=["Sample_Tumor_Normal", "Patient_ID"], ascending=[False, True]) # Sorts first by sample status, and in descending order, so "Tumor" samples are first
+    return keys.index.values
 
 def add_index_levels(to, source, fill=np.nan):
     """Add levels to the "to" index so it has all levels in the "source" index. The possible levels are, in this order: "Name", "Site", "Peptide", "Database_ID"
@@ -317,3 +374,46 @@ def add_index_levels(to, source, fill=np.nan):
 
     new_columns = pd.MultiIndex.from_arrays(list(levels.values()), names=list(levels.keys()))
     return new_columns
+
+@timed_step # Recorded in the load report
+def compact_dataframes(data_dict, float_dtype, omics_dfs, categorical_cols):
+    """Reduce the memory used by the dataframes in the given dictionary, by casting the float columns of the omics dataframes to a smaller float dtype, and making repeated string columns categorical.
+
+    Parameters:
+    data_dict (dict): The dataframe dictionary of the dataset.
+    float_dtype (str): The dtype to cast the float columns of the omics dataframes to, e.g. "float32".
+    omics_dfs (list of str): The names of the omics dataframes. Ones that aren't in data_dict are skipped.
+    categorical_cols (dict): Keys are names of dataframes, values are lists of the columns in that dataframe to make categorical, or None to make categorical every string column with at most half as many unique values as rows. Dataframes and columns that don't exist are skipped.
+
+    Returns:
+    dict: The dataframe dictionary, with the dataframes compacted. Keys are str of dataframe names, values are pandas DataFrames
+    """
+    for name in omics_dfs:
+        if name not in data_dict.keys():
+            continue
+        df = data_dict[name]
+
+        float_cols = df.columns[df.dtypes == "float64"]
+        if len(float_cols) == len(df.columns):
+            df = df.astype(float_dtype)
+        elif len(float_cols) > 0:
+            df = df.astype({col: float_dtype for col in float_cols})
+
+        data_dict[name] = df
+
+    for name, cols in categorical_cols.items():
+        if name not in data_dict.keys():
+            continue
+        df = data_dict[name]
+
+        if cols is None:
+            cols = [col for col in df.columns if pd.api.types.is_string_dtype(df[col]) and df[col].nunique() <= len(df.index) / 2]
+        else:
+            cols = [col for col in cols if col in df.columns]
+
+        if len(cols) > 0:
+            df = df.astype({col: "category" for col in cols})
+
+        data_dict[name] = df
+
+    return data_dict
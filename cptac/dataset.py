@@ -10,12 +10,32 @@
 
 import pandas as pd
 import numpy as np
-import webbrowser
+import os
+import inspect
+import collections
+import concurrent.futures
+import fnmatch
+import importlib
+import time
+import tracemalloc
 import warnings
 from .file_download import update_index
-from .file_tools import validate_version, get_version_files_paths
-from .dataframe_tools import add_index_levels
+from .file_tools import validate_version, get_version_files_paths, get_index, hash_file, hash_cache_batch, get_cache_path, read_cache, write_cache, CachedDataDict
+from .dataframe_tools import add_index_levels, compact_dataframes
+from .bundle import read_bundle, write_bundle
+from .shared_data import SharedDataServer
+from .mutation_matrix import MutationMatrix
+from .load_report import FileRecord, TableRecord, LoadReport, get_active_report, record_step
+from . import exceptions
 from .exceptions import *
+from .version import __version__
+
+# Describes how to parse one kind of data file. Each dataset passes a list of these to DataSet.__init__, and _parse_data_file uses the first one that matches a file.
+#   file_patterns (list of str): Names of the files this parser handles. Shell-style wildcards are allowed, for files whose names include a version or date.
+#   versions (list of str): The dataset versions this parser handles. None means all versions.
+#   tables (list of str): The names of the dataframes the parse function returns.
+#   parse (function): Takes the path to the file, and returns a dict of the parsed dataframes, with names as keys.
+FileParser = collections.namedtuple("FileParser", ["file_patterns", "versions", "tables", "parse"])
 
 class DataSet:
     """
@@ -23,125 +43,166 @@ class DataSet:
     the same function calls exist for cptac.Endometrial, cptac.Colon, etc.
     """
 
-    def __init__(self, cancer_type, version, valid_versions, data_files):
-        """Initialize variables for a DataSet object.
+    def __init__(self, cancer_type, version, valid_versions, data_files, file_parsers, use_cache, lazy, n_jobs, executor, dtype, profile):
+        """Initialize variables for a DataSet object, and load the dataframes.
 
         Parameters:
         cancer_type (str): The cancer type requested for this dataset
         version (str): The version number requested for this dataset
         valid_versions (list of str): A list of all possible valid versions for this dataset
         data_files (dict, keys of str, values of list of str): A dictionary where the keys are the existing version of the dataset, and the values are lists of the data file names for that version.
+        file_parsers (list of FileParser): The parsers for the data files, in the order they should be checked.
+        use_cache (bool): Whether to load the formatted dataframes from the on-disk cache if a valid one exists, and to save them to the cache after parsing the data files if not.
+        lazy (bool): Whether to wait to read each dataframe from the cache until it's first used, instead of reading them all when the dataset is loaded. Requires use_cache to be True.
+        n_jobs (int): The number of threads to use to parse the data files. 1 parses them one at a time, and -1 uses one thread per CPU. Ignored if executor is passed.
+        executor (concurrent.futures.Executor): An executor to parse the data files with, e.g. a ProcessPoolExecutor. If None, one is created based on n_jobs.
+        dtype (str): "float64", or "float32" to store the omics dataframes as float32 and make repeated string columns in the metadata and somatic_mutation dataframes categorical, to save memory.
+        profile (bool or function): Whether to also measure memory use in the load report. If a function, it's called with the LoadReport once the dataset is loaded. The timings in the report are always recorded.
         """
+        if lazy and not use_cache:
+            raise InvalidParameterError("Lazy loading reads the dataframes from the cache, so use_cache must be True if lazy is True.")
+
+        if executor is None and (not isinstance(n_jobs, int) or isinstance(n_jobs, bool) or (n_jobs < 1 and n_jobs != -1)):
+            raise InvalidParameterError(f"n_jobs must be a positive integer, or -1 to use all CPUs. You passed {n_jobs}.")
+
+        if dtype not in ["float64", "float32"]:
+            raise InvalidParameterError(f"{dtype} is not a valid dtype. Valid dtypes are 'float64' and 'float32'.")
+
+        if not isinstance(profile, bool) and not callable(profile):
+            raise InvalidParameterError(f"profile must be True, False, or a function to call with the load report. You passed {profile}.")
+
         # Initialize the _cancer_type instance variable
         self._cancer_type = cancer_type.lower()
 
-        # Update the index, if possible. If there's no internet, that's fine.
-        try:
-            update_index(self._cancer_type)
-        except NoInternetError:
-            pass
-
-        # Validate the version
-        self._version = validate_version(version, self._cancer_type, use_context="init", valid_versions=valid_versions)
-
-        # Get the paths to the data files
-        version_data_files = data_files[self._version] # Get the data files for this version from the data files dictionary
-        self._data_files_paths = get_version_files_paths(self._cancer_type, self._version, version_data_files)
-
-        # Initialize dataframe and definitions dicts as empty for this parent class
-        self._data = {}
-        self._definitions = {}
-
-        # Assign the valid dfs lists, but make them instance variables so they're easy to override if needed
-        # These are the omics dataframes that are valid for use in the utilities functions
-        self._valid_omics_dfs = [
-            'acetylproteomics',
-            'circular_RNA',
-            'CNV',
-            'lincRNA',
-            'lipidomics',
-            'metabolomics',
-            'miRNA',
-            'phosphoproteomics',
-            'phosphoproteomics_gene',
-            'proteomics',
-            'somatic_mutation_binary',
-            'transcriptomics',
-            ]
-
-        # These are the metadata dataframes that are valid for use in the utilities functions
-        self._valid_metadata_dfs = [
-            "clinical",
-            "derived_molecular",
-            "experimental_design",
-            #"followup", # Right now there are duplicate rows, so don't include follow up tables for joins.
-            ] # We don't allow the treatment df, as in Ovarian, or medical_history df, as in Ccrcc, because they both have multiple rows for each sample.
+        # Record where the time goes while we load, so get_load_report can show it
+        self._load_report = LoadReport(self._cancer_type)
+        self._profile_memory = profile is not False
+        with self._load_report.activate():
+            # Update the index, if possible. If there's no internet, that's fine.
+            with record_step("update_index"):
+                try:
+                    update_index(self._cancer_type)
+                except NoInternetError:
+                    pass
+
+            # Validate the version
+            with record_step("validate_version"):
+                self._version = validate_version(version, self._cancer_type, use_context="init", valid_versions=valid_versions)
+
+            # Get the paths to the data files
+            version_data_files = data_files[self._version] # Get the data files for this version from the data files dictionary
+            self._data_files_paths = get_version_files_paths(self._cancer_type, self._version, version_data_files)
+
+            self._file_parsers = file_parsers
+
+            # Initialize dataframe and definitions dicts as empty for this parent class
+            self._data = {}
+            self._definitions = {}
+            self._gene_col_indices = {} # Filled by _get_gene_col_index as they're needed
+            self._mutation_matrix = None # Built by get_mutation_matrix the first time it's needed
+
+            # Assign the valid dfs lists, but make them instance variables so they're easy to override if needed
+            # These are the omics dataframes that are valid for use in the utilities functions
+            self._valid_omics_dfs = [
+                'acetylproteomics',
+                'circular_RNA',
+                'CNV',
+                'lincRNA',
+                'lipidomics',
+                'metabolomics',
+                'miRNA',
+                'phosphoproteomics',
+                'phosphoproteomics_gene',
+                'proteomics',
+                'somatic_mutation_binary',
+                'transcriptomics',
+                ]
+
+            # These are the metadata dataframes that are valid for use in the utilities functions
+            self._valid_metadata_dfs = [
+                "clinical",
+                "derived_molecular",
+                "experimental_design",
+                #"followup", # Right now there are duplicate rows, so don't include follow up tables for joins.
+                ] # We don't allow the treatment df, as in Ovarian, or medical_history df, as in Ccrcc, because they both have multiple rows for each sample.
+
+            # Load the dataframes, either from the cache or by having the child class parse the data files
+            self._use_cache = use_cache
+            self._lazy = lazy
+            self._dtype = dtype
+            self._load_dataframes(n_jobs, executor)
+
+        self._load_report.version = self._version
+        if self._profile_memory:
+            self._load_report.tables = self._get_table_records()
+        if callable(profile):
+            profile(self._load_report)
 
     # Methods to get metadata dataframes
-    def get_clinical(self):
-        """Get the clinical dataframe."""
-        return self._get_dataframe("clinical")
+    def get_clinical(self, copy=True):
+        """Get the clinical dataframe. Pass copy=False to get a view of the dataframe instead of a copy, which is faster, but shares its data with the dataset, so it must be treated as read-only."""
+        return self._get_dataframe("clinical", copy=copy)
 
-    def get_derived_molecular(self):
-        """Get the derived_molecular dataframe."""
-        return self._get_dataframe("derived_molecular")
+    def get_derived_molecular(self, copy=True):
+        """Get the derived_molecular dataframe. Pass copy=False to get a view of the dataframe instead of a copy, which is faster, but shares its data with the dataset, so it must be treated as read-only."""
+        return self._get_dataframe("derived_molecular", copy=copy)
 
-    def get_experimental_design(self):
-        """Get the experimental_design dataframe."""
-        return self._get_dataframe("experimental_design")
+    def get_experimental_design(self, copy=True):
+        """Get the experimental_design dataframe. Pass copy=False to get a view of the dataframe instead of a copy, which is faster, but shares its data with the dataset, so it must be treated as read-only."""
+        return self._get_dataframe("experimental_design", copy=copy)
 
-    def get_medical_history(self):
-        """Get the medical_history dataframe."""
-        return self._get_dataframe("medical_history")
+    def get_medical_history(self, copy=True):
+        """Get the medical_history dataframe. Pass copy=False to get a view of the dataframe instead of a copy, which is faster, but shares its data with the dataset, so it must be treated as read-only."""
+        return self._get_dataframe("medical_history", copy=copy)
 
-    def get_treatment(self):
-        """Get the treatment dataframe."""
-        return self._get_dataframe("treatment")
+    def get_treatment(self, copy=True):
+        """Get the treatment dataframe. Pass copy=False to get a view of the dataframe instead of a copy, which is faster, but shares its data with the dataset, so it must be treated as read-only."""
+        return self._get_dataframe("treatment", copy=copy)
 
-    def get_followup(self):
-        """Get the followup dataframe."""
-        return self._get_dataframe("followup")
+    def get_followup(self, copy=True):
+        """Get the followup dataframe. Pass copy=False to get a view of the dataframe instead of a copy, which is faster, but shares its data with the dataset, so it must be treated as read-only."""
+        return self._get_dataframe("followup", copy=copy)
 
     # Methods to get omics dataframes
-    def get_acetylproteomics(self):
-        """Get the acetylproteomics dataframe."""
-        return self._get_dataframe("acetylproteomics")
+    def get_acetylproteomics(self, copy=True):
+        """Get the acetylproteomics dataframe. Pass copy=False to get a view of the dataframe instead of a copy, which is faster, but shares its data with the dataset, so it must be treated as read-only."""
+        return self._get_dataframe("acetylproteomics", copy=copy)
 
-    def get_circular_RNA(self):
-        """Get the circular_RNA dataframe."""
-        return self._get_dataframe("circular_RNA")
+    def get_circular_RNA(self, copy=True):
+        """Get the circular_RNA dataframe. Pass copy=False to get a view of the dataframe instead of a copy, which is faster, but shares its data with the dataset, so it must be treated as read-only."""
+        return self._get_dataframe("circular_RNA", copy=copy)
 
-    def get_CNV(self):
-        """Get the CNV dataframe."""
-        return self._get_dataframe("CNV")
+    def get_CNV(self, copy=True):
+        """Get the CNV dataframe. Pass copy=False to get a view of the dataframe instead of a copy, which is faster, but shares its data with the dataset, so it must be treated as read-only."""
+        return self._get_dataframe("CNV", copy=copy)
 
-    def get_lincRNA(self):
-        """Get the lincRNA dataframe."""
-        return self._get_dataframe("lincRNA")
+    def get_lincRNA(self, copy=True):
+        """Get the lincRNA dataframe. Pass copy=False to get a view of the dataframe instead of a copy, which is faster, but shares its data with the dataset, so it must be treated as read-only."""
+        return self._get_dataframe("lincRNA", copy=copy)
 
-    def get_lipidomics(self):
-        """Get the lipidomics dataframe."""
-        return self._get_dataframe("lipidomics")
+    def get_lipidomics(self, copy=True):
+        """Get the lipidomics dataframe. Pass copy=False to get a view of the dataframe instead of a copy, which is faster, but shares its data with the dataset, so it must be treated as read-only."""
+        return self._get_dataframe("lipidomics", copy=copy)
 
-    def get_metabolomics(self):
-        """Get the metabolomics dataframe."""
-        return self._get_dataframe("metabolomics")
+    def get_metabolomics(self, copy=True):
+        """Get the metabolomics dataframe. Pass copy=False to get a view of the dataframe instead of a copy, which is faster, but shares its data with the dataset, so it must be treated as read-only."""
+        return self._get_dataframe("metabolomics", copy=copy)
 
-    def get_methylation(self):
-        """Get the methylation dataframe."""
-        return self._get_dataframe("methylation")
+    def get_methylation(self, copy=True):
+        """Get the methylation dataframe. Pass copy=False to get a view of the dataframe instead of a copy, which is faster, but shares its data with the dataset, so it must be treated as read-only."""
+        return self._get_dataframe("methylation", copy=copy)
 
-    def get_miRNA(self):
-        """Get the miRNA dataframe."""
-        return self._get_dataframe("miRNA")
+    def get_miRNA(self, copy=True):
+        """Get the miRNA dataframe. Pass copy=False to get a view of the dataframe instead of a copy, which is faster, but shares its data with the dataset, so it must be treated as read-only."""
+        return self._get_dataframe("miRNA", copy=copy)
 
-    def get_phosphoproteomics(self):
-        """Get the phosphoproteomics dataframe."""
-        return self._get_dataframe("phosphoproteomics")
+    def get_phosphoproteomics(self, copy=True):
+        """Get the phosphoproteomics dataframe. Pass copy=False to get a view of the dataframe instead of a copy, which is faster, but shares its data with the dataset, so it must be treated as read-only."""
+        return self._get_dataframe("phosphoproteomics", copy=copy)
 
-    def get_phosphoproteomics_gene(self):
-        """Get the phosphoproteomics_gene dataframe. The gene level phosphorylation measurement is an aggregate metric which potentially averages together individual measurements of different sites. Use get_phosphoproteomics() to view the data for individual sites."""
-        return self._get_dataframe("phosphoproteomics_gene")
+    def get_phosphoproteomics_gene(self, copy=True):
+        """Get the phosphoproteomics_gene dataframe. The gene level phosphorylation measurement is an aggregate metric which potentially averages together individual measurements of different sites. Use get_phosphoproteomics() to view the data for individual sites. Pass copy=False to get a view of the dataframe instead of a copy, which is faster, but shares its data with the dataset, so it must be treated as read-only."""
+        return self._get_dataframe("phosphoproteomics_gene", copy=copy)
 
     def get_phosphosites(self, genes):
         """Returns dataframe with all phosphosites of specified gene or list of genes.
@@ -154,26 +215,36 @@ class DataSet:
         """
         return self._get_omics_cols("phosphoproteomics", genes)
 
-    def get_proteomics(self):
-        """Get the proteomics dataframe."""
-        return self._get_dataframe("proteomics")
+    def get_proteomics(self, copy=True):
+        """Get the proteomics dataframe. Pass copy=False to get a view of the dataframe instead of a copy, which is faster, but shares its data with the dataset, so it must be treated as read-only."""
+        return self._get_dataframe("proteomics", copy=copy)
 
-    def get_transcriptomics(self):
-        """Get the transcriptomics dataframe."""
-        return self._get_dataframe("transcriptomics")
+    def get_transcriptomics(self, copy=True):
+        """Get the transcriptomics dataframe. Pass copy=False to get a view of the dataframe instead of a copy, which is faster, but shares its data with the dataset, so it must be treated as read-only."""
+        return self._get_dataframe("transcriptomics", copy=copy)
 
     # Methods to get mutations dataframes
-    def get_gene_fusion(self):
-        """Get the gene_fusion dataframe."""
-        return self._get_dataframe("gene_fusion")
+    def get_gene_fusion(self, copy=True):
+        """Get the gene_fusion dataframe. Pass copy=False to get a view of the dataframe instead of a copy, which is faster, but shares its data with the dataset, so it must be treated as read-only."""
+        return self._get_dataframe("gene_fusion", copy=copy)
+
+    def get_somatic_mutation(self, copy=True):
+        """Get the somatic_mutation dataframe. Pass copy=False to get a view of the dataframe instead of a copy, which is faster, but shares its data with the dataset, so it must be treated as read-only."""
+        return self._get_dataframe("somatic_mutation", copy=copy)
+
+    def get_somatic_mutation_binary(self, copy=True):
+        """Get the somatic_mutation_binary dataframe, which has a binary value indicating, for each location on each gene, whether there was a mutation in that gene at that location, for each sample. Pass copy=False to get a view of the dataframe instead of a copy, which is faster, but shares its data with the dataset, so it must be treated as read-only."""
+        return self._get_dataframe("somatic_mutation_binary", copy=copy)
 
-    def get_somatic_mutation(self):
-        """Get the somatic_mutation dataframe."""
-        return self._get_dataframe("somatic_mutation")
+    def get_mutation_matrix(self):
+        """Get a MutationMatrix for the somatic_mutation dataframe. It's an integer coded index of the mutations, grouped by gene, so looking up the mutations for a gene, or counting how many samples have mutations in each gene, doesn't have to scan the whole dataframe. It's built the first time it's needed.
 
-    def get_somatic_mutation_binary(self):
-        """Get the somatic_mutation_binary dataframe, which has a binary value indicating, for each location on each gene, whether there was a mutation in that gene at that location, for each sample."""
-        return self._get_dataframe("somatic_mutation_binary")
+        Returns:
+        MutationMatrix: The index of the somatic_mutation dataframe.
+        """
+        if self._mutation_matrix is None:
+            self._mutation_matrix = MutationMatrix(self.get_somatic_mutation(copy=False))
+        return self._mutation_matrix
 
     # Help methods
     def define(self, term):
@@ -199,6 +270,53 @@ class DataSet:
         """Return the dataset version of this instance, as a string."""
         return self._version
 
+    def get_load_report(self):
+        """Get a report of how long each part of loading the dataset took, e.g. parsing each data file and each formatting step, along with how many bytes were read. If the dataset was loaded with profile=True, it also has the peak memory used parsing each file, and the memory each dataframe takes up. Print it for a summary.
+
+        Returns:
+        LoadReport: The report.
+        """
+        return self._load_report
+
+    def export_bundle(self, path):
+        """Save all of the dataset's dataframes to a single bundle file, which from_bundle can load almost instantly. The omics dataframes are laid out in the file so that they can be memory mapped instead of read, so processes that load the same bundle share one copy of them in memory.
+
+        Parameters:
+        path (str): The path to save the bundle to. If a file already exists there, it's replaced.
+
+        Returns: None
+        """
+        data, info = self._get_contents()
+        write_bundle(path, data, info)
+
+    @classmethod
+    def from_bundle(cls, path):
+        """Load a dataset from a bundle file saved by export_bundle. The data files, the index, and the cache aren't used at all.
+
+        Parameters:
+        path (str): The path to the bundle file.
+
+        Returns:
+        DataSet: The dataset, e.g. a cptac.Endometrial object for a bundle exported from one. Its numeric dataframes are memory mapped from the bundle file, so the file must not be deleted or replaced while it's in use.
+        """
+        load_report = LoadReport(None)
+        with load_report.activate():
+            with record_step("read_bundle"):
+                data, info = read_bundle(path)
+
+        dataset = DataSet._from_contents(data, info, load_report)
+        if not isinstance(dataset, cls):
+            raise InvalidParameterError(f"{path} is a bundle of the {info['cancer_type']} dataset, so it can't be loaded with {cls.__name__}.from_bundle. Please use {dataset.__class__.__name__}.from_bundle instead.")
+        return dataset
+
+    def share(self):
+        """Copy the dataset's dataframes into shared memory, so that worker processes, e.g. in a concurrent.futures.ProcessPoolExecutor, can use them without loading the dataset again or having the whole dataset pickled and sent to them. Requires Python 3.8 or later.
+
+        Returns:
+        SharedDataServer: Owns the shared memory. Send its handle attribute to the worker processes. The handle is small to pickle, and has all of the dataset's methods, e.g. get_proteomics and join_omics_to_omics, which use the dataframes in shared memory without copying them. Close the server, or use it in a with statement, to free the shared memory once the workers are done with it.
+        """
+        return SharedDataServer(self)
+
     def how_to_cite(self):
         """Print instructions for citing the data."""
         print('Please include the following statement in publications using data accessed through this module:\n"Data used in this publication were generated by the Clinical Proteomic Tumor Analysis Consortium (NCI/NIH, <https://proteomics.cancer.gov/programs/cptac/>). Data were accessed through the Python module cptac, available at <https://pypi.org/project/cptac/>."')
@@ -207,8 +325,11 @@ class DataSet:
         """Print list of loaded dataframes and dimensions."""
         print("Below are the dataframes contained in this dataset:")
         for name in sorted(self._data.keys(), key=str.lower):
-            df = self._data[name]
-            print("\t{}\n\t\tDimensions: {}".format(name, df.shape))
+            if isinstance(self._data, CachedDataDict):
+                shape = self._data.get_shape(name) # Don't read the dataframe from the cache just to print its dimensions
+            else:
+                shape = self._data[name].shape
+            print("\t{}\n\t\tDimensions: {}".format(name, shape))
 
     def list_definitions(self):
         """Print all terms defined in the dataset's list of definitions."""
@@ -229,6 +350,7 @@ class DataSet:
         url = "https://www.google.com/search?q=" + term
         message = f"Searching for {term} in web browser..."
         print(message, end='\r')
+        import webbrowser # Only imported when needed, to keep importing cptac fast
         webbrowser.open(url)
         print(" " * len(message), end='\r') # Erase the message
 
@@ -293,133 +415,117 @@ class DataSet:
         return df
 
     def get_genotype_all_vars(self, mutations_genes, mutations_filter=None, show_location=True, mutation_hotspot=None):
-        """Return a dataframe that has the mutation type and wheather or not it is a multiple mutation
+        """Return a dataframe that has the mutation type and wheather or not it is a multiple mutation, combining the somatic mutations with the deletions and amplifications from the CNV data. All the genes are done at once.
+
         Parameters:
         mutation_genes (str, or list or array-like of str): The gene(s) to get mutation data for.
         mutations_filter (list, optional):  List of mutations to prioritize when filtering out multiple mutations, in order of priority.
         show_location (bool, optional): Whether to include the Location column from the mutation dataframe. Defaults to True.
         mutation_hotspot (optional): a list of hotspots
-        """
 
+        Returns:
+        pandas DataFrame: If mutations_genes is a str, the Mutation, Location and Mutation_Status for that gene, with one row per sample, and the mutation and location each in a one item list, as this function always has. If it's a list or array-like, a tidy table of the same columns, with scalar values, and a row for each sample and gene, with a (Patient_ID, Gene) index.
+        """
         #If they don't give us a filter, this is the default.
         if mutations_filter == None:
             mutations_filter = ["Deletion", 'Frame_Shift_Del', 'Frame_Shift_Ins', 'Nonsense_Mutation', 'Missense_Mutation_hotspot',
     	                           'Missense_Mutation', 'Amplification', 'In_Frame_Del', 'In_Frame_Ins', 'Wildtype']
 
+        # Process genes parameter
+        if isinstance(mutations_genes, str): # If it's a single gene, make it a list so we can treat everything the same
+            genes = [mutations_genes]
+        elif isinstance(mutations_genes, (list, pd.core.series.Series, pd.core.indexes.base.Index)): # If it's already a list or array-like, we're all good
+            genes = list(pd.Series(mutations_genes).drop_duplicates())
+        else: # If it's neither of those, they done messed up. Tell 'em.
+            raise InvalidParameterError("Genes parameter {} is of invalid type {}. Valid types: str, or list or array-like of str.".format(mutations_genes, type(mutations_genes)))
 
-        #combine the cnv and mutations dataframe
-
-
-        combined = self.join_omics_to_mutations(omics_df_name="CNV", mutations_genes=mutations_genes, omics_genes=mutations_genes)
+        somatic_mutation = self.get_somatic_mutation(copy=False)
+        cnv = self.get_CNV(copy=False)
+        sample_status_map = self._get_sample_status_map()
 
-        #drop the database index from ccrcc
-        if self.get_cancer_type() == "ccrcc":
-             cc = self.get_CNV()
-             drop = ['Database_ID']
-             combined = self.reduce_multiindex(df=combined, levels_to_drop=drop)
+        # Get the mutations for all the genes, one row per mutation
+        selected = somatic_mutation.iloc[self.get_mutation_matrix().get_rows(genes)]
+        mutations = pd.DataFrame({
+            "Patient_ID": selected.index.values,
+            "Gene": selected["Gene"].astype(object).values,
+            "Mutation": selected["Mutation"].astype(object).values,
+            "Location": selected["Location"].astype(object).values,
+        })
+        found_genes = set(mutations["Gene"].unique())
+        for gene in genes:
+            if gene not in found_genes: # If the gene doesn't match any genes in the dataframe, tell them
+                raise InvalidParameterError("{} gene not found in somatic_mutation data.".format(gene))
 
         #If there are hotspot mutations, append 'hotspot' to the mutation type so that it's prioritized correctly
-        def mark_hotspot_locations(row):
-            #iterate through each location in the current row
-            mutations = []
-            for location in row[mutations_genes+'_Location']:
-                if location in mutation_hotspot: #if it's a hotspot mutation
-                    #get the position of the location
-                    position = row[mutations_genes+'_Location'].index(location)
-                    #use that to change the correct mutation
-                    mutations.append(row[mutations_genes+"_Mutation"][position] + "_hotspot")
-                else:
-                    # get the position of the location
-                    position = row[mutations_genes+'_Location'].index(location)
-                    mutations.append(row[mutations_genes+"_Mutation"][position])
-            return mutations
-
         if mutation_hotspot is not None:
-            combined['hotspot'] = combined.apply(mark_hotspot_locations, axis=1)
-            combined[mutations_genes+"_Mutation"] = combined['hotspot']
-            combined = combined.drop(columns='hotspot')
-
-        # Based on cnv make a new column with mutation type that includes deletions and amplifications
-        def add_del_and_amp(row):
-            if row[mutations_genes+"_CNV"] <= -.2:
-                mutations = row[mutations_genes+"_Mutation"] + ['Deletion']
-                locations = row[mutations_genes+'_Location']+['Deletion']
-
-            elif row[mutations_genes+"_CNV"] >= .2:
-                mutations = row[mutations_genes+"_Mutation"] + ['Amplification']
-                locations = row[mutations_genes+'_Location']+['Amplification']
-            else:
-                mutations = row[mutations_genes+"_Mutation"]
-                locations = row[mutations_genes+"_Location"]
-
-            return mutations, locations
-
+            is_hotspot = mutations["Location"].isin(mutation_hotspot)
+            mutations["Mutation"] = mutations["Mutation"].where(~is_hotspot, mutations["Mutation"] + "_hotspot")
+
+        # Samples and genes without mutations are Wildtype_Tumor or Wildtype_Normal, if we know the sample's status
+        samples = somatic_mutation.index.union(cnv.index).drop_duplicates()
+        all_pairs = pd.MultiIndex.from_product([samples, genes], names=["Patient_ID", "Gene"])
+        mutated_pairs = pd.MultiIndex.from_arrays([mutations["Patient_ID"], mutations["Gene"]], names=["Patient_ID", "Gene"])
+        wildtype_pairs = all_pairs[~all_pairs.isin(mutated_pairs)]
+        wildtype_statuses = sample_status_map.reindex(wildtype_pairs.get_level_values("Patient_ID")).values
+        wildtypes = pd.DataFrame({
+            "Patient_ID": wildtype_pairs.get_level_values("Patient_ID").values,
+            "Gene": wildtype_pairs.get_level_values("Gene").values,
+            "Mutation": ("Wildtype_" + pd.Series(wildtype_statuses, dtype=object)).values,
+            "Location": "No_mutation",
+        })
+        wildtypes = wildtypes[pd.notnull(wildtypes["Mutation"])]
+
+        # Based on cnv add a deletion or amplification to the mutations. We use the first CNV column for each gene.
+        cnv_gene_col_index = self._get_gene_col_index("CNV", cnv)
+        cnv_genes = [gene for gene in genes if gene in cnv_gene_col_index]
+        cnv_selected = cnv.iloc[:, [cnv_gene_col_index[gene][0] for gene in cnv_genes]]
+        cnv_selected.columns = pd.Index(cnv_genes, name="Gene")
+        cnv_values = cnv_selected.stack()
+        cnv_values.index.names = ["Patient_ID", "Gene"]
+        cnv_events = pd.Series(np.where(cnv_values <= -.2, "Deletion", np.where(cnv_values >= .2, "Amplification", "")), index=cnv_values.index)
+        cnv_events = cnv_events[(cnv_events != "") & (cnv_events.index.isin(mutated_pairs) | cnv_events.index.isin(wildtype_pairs[pd.notnull(wildtype_statuses)]))]
+        cnv_events = pd.DataFrame({
+            "Patient_ID": cnv_events.index.get_level_values("Patient_ID").values,
+            "Gene": cnv_events.index.get_level_values("Gene").values,
+            "Mutation": cnv_events.values,
+            "Location": cnv_events.values,
+        })
+
+        # The CNV events go at the end of each sample's list of mutations, like they always have
+        combined = pd.concat([mutations, wildtypes, cnv_events], ignore_index=True, sort=False)
+        combined["order"] = np.arange(len(combined.index))
+
+        #now that we have the deletion and amplifications, we need to prioritize the correct mutations. Filter values come first, then truncations, then everything else, and ties go to the earliest mutation in the list.
+        truncations, missenses, noncodings = self._get_mutation_classes()
+        filter_codes = {}
+        for i, filter_val in enumerate(mutations_filter):
+            filter_codes.setdefault(filter_val, i)
+        truncation_codes = {mutation: len(mutations_filter) for mutation in truncations}
+        combined["code"] = combined["Mutation"].map(filter_codes).fillna(combined["Mutation"].map(truncation_codes)).fillna(len(mutations_filter) + 1)
+
+        grouped = combined.groupby(["Patient_ID", "Gene"], sort=False)
+        num_mutations = grouped["order"].transform("size")
+        has_wildtype = combined["Mutation"].isin(["Wildtype_Tumor", "Wildtype_Normal"]).groupby([combined["Patient_ID"], combined["Gene"]]).transform("any")
+
+        #get a sample_status column that says if the gene has multiple mutations (including dletion and amplification). One of the two mutations might be a wildtype.
+        combined["Mutation_Status"] = np.where(
+            num_mutations > 1,
+            np.where((num_mutations == 2) & has_wildtype, "Single_mutation", "Multiple_mutation"),
+            np.where(has_wildtype, combined["Mutation"], "Single_mutation"))
+
+        chosen = combined.sort_values(by=["code", "order"], kind="mergesort").drop_duplicates(subset=["Patient_ID", "Gene"], keep="first")
+        df = chosen.set_index(["Patient_ID", "Gene"])[["Mutation", "Location", "Mutation_Status"]]
+        df = df.reindex(all_pairs).astype(object)
+        df.columns.name = "Name"
+
+        if isinstance(mutations_genes, str):
+            df = df.xs(mutations_genes, level="Gene")
+            for col in ["Mutation", "Location"]:
+                df[col] = [[value] if pd.notnull(value) else value for value in df[col]]
 
-        combined['mutations'], combined['locations'] = zip(*combined.apply(add_del_and_amp, axis=1))
-
-
-        #now that we have the deletion and amplifications, we need to prioritize the correct mutations.
-        def sort(row):
-            sortedcol = []
-            location = []
-            chosen_indices = []
-            sample_mutations_list = row['mutations']
-            sample_locations_list = row['locations']
-            if len(sample_mutations_list) == 1: #if there's only one mutation in the list
-                sortedcol.append(sample_mutations_list[0])
-                location.append(sample_locations_list[0])
-
-            else:
-                for filter_val in mutations_filter: # This will start at the beginning of the filter list, thus filters earlier in the list are prioritized, like we want
-                    if filter_val in sample_mutations_list:
-                        chosen_indices = [index for index, value in enumerate(sample_mutations_list) if value == filter_val]
-                    if len(chosen_indices) > 0: # We found at least one mutation from the filter to prioritize, so we don't need to worry about later values in the filter priority list
-                        break
-                if len(chosen_indices) == 0: # None of the mutations for the sample were in the filter
-                    for mutation in sample_mutations_list:
-                        if mutation in truncations:
-                            chosen_indices += [index for index, value in enumerate(sample_mutations_list) if value == mutation]
-
-                soonest_mutation = sample_mutations_list[chosen_indices[0]]
-                soonest_location = sample_locations_list[chosen_indices[0]]
-                chosen_indices.clear()
-                sortedcol.append(soonest_mutation)
-                location.append(soonest_location)
-
-            return pd.Series([sortedcol, location],index=['mutations', 'locations'])
-
-        df = combined.apply(sort, axis=1)
-        combined['Mutation'] = df['mutations']
-        combined['Location'] = df['locations']
-
-        #get a sample_status column that says if the gene has multiple mutations (including dletion and amplification)
-        def sample_status(row):
-            if len(row['mutations']) > 1: #if there's more than one mutation
-                if len(row['mutations']) == 2 and "Wildtype_Tumor" in row['mutations']: #one of the mutations might be a "wildtype tumor"
-                    status ="Single_mutation"
-
-                elif len(row['mutations']) == 2 and "Wildtype_Normal" in row['mutations']:
-                    status ="Single_mutation"
-
-                else:
-                    status = "Multiple_mutation"
-            else:
-                if row["mutations"] == ["Wildtype_Normal"]:
-                    status = "Wildtype_Normal"
-                elif row['mutations'] == ['Wildtype_Tumor']:
-                    status = "Wildtype_Tumor"
-                else:
-                    status = "Single_mutation"
-
-            return status
-        combined['Mutation_Status'] = combined.apply(sample_status, axis=1)
-
-        #drop all the unnecessary Columns
-        df = combined.drop(columns=[mutations_genes+"_CNV", mutations_genes+"_Mutation", mutations_genes+"_Location", mutations_genes+"_Mutation_Status", 'Sample_Status', 'mutations','locations'])
         if show_location == False: df = df.drop(columns="Location") #if they don't want us to show the location, drop it
         return df
 
-
     # Join functions
     def join_omics_to_omics(self, df1_name, df2_name, genes1=None, genes2=None):
         """Take specified column(s) from one omics dataframe, and join to specified columns(s) from another omics dataframe. Intersection (inner join) of indices is used.
@@ -553,26 +659,319 @@ class DataSet:
         return joined
 
     # "Private" methods
-    def _get_dataframe(self, name):
+    def _parse_data_files(self, n_jobs, executor):
+        """Parse the data files into dataframes in the self._data dict, with names as keys, and format them properly. Each file is parsed separately by the child class's _parse_data_file method, so if we were given an executor or n_jobs, we parse them in parallel. Then the child class's _format_dataframes method does the formatting that needs all the dataframes at once.
+
+        Parameters:
+        n_jobs (int): The number of threads to use to parse the data files. 1 parses them one at a time, and -1 uses one thread per CPU.
+        executor (concurrent.futures.Executor): An executor to parse the data files with. Overrides n_jobs if not None. We don't shut it down, since the caller owns it.
+
+        Returns: None
+        """
+        # We pass the executor around instead of saving it as an instance variable, because a process pool has to pickle the dataset object to call _parse_data_file, and executors can't be pickled
+        own_executor = False
+        if executor is None and n_jobs != 1:
+            max_workers = os.cpu_count() if n_jobs == -1 else n_jobs
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+            own_executor = True
+
+        loading_msg = "Loading dataframes"
+        try:
+            if executor is None:
+                # We can only tell how much memory each file used if they're parsed one at a time, and only if nobody else is already using tracemalloc
+                measure_memory = self._profile_memory and not tracemalloc.is_tracing()
+                results = (self._parse_data_file_timed(file_path, measure_memory) for file_path in self._data_files_paths) # The generator is lazy, so the files are still parsed one at a time as we loop below
+            else:
+                futures = [executor.submit(self._parse_data_file_timed, file_path, False) for file_path in self._data_files_paths]
+                results = (future.result() for future in futures) # Collect them in the same order as the files, so the order of the dataframes doesn't depend on which file finishes first
+
+            report = get_active_report()
+            for tables, file_record in results:
+                # Print a loading message. We add a dot every time, so the user knows it's not frozen.
+                loading_msg = loading_msg + "."
+                print(loading_msg, end='\r')
+
+                self._data.update(tables)
+                if report is not None:
+                    report.files.append(file_record)
+
+        finally:
+            if own_executor:
+                executor.shutdown()
+
+        print(' ' * len(loading_msg), end='\r') # Erase the loading message
+
+        with record_step("format_dataframes"):
+            self._format_dataframes()
+
+        if self._dtype != "float64":
+            categorical_cols = {
+                "clinical": None, # None means all string columns with repeated values
+                "experimental_design": None,
+                "somatic_mutation": ["Gene", "Mutation"],
+            }
+            self._data = compact_dataframes(self._data, self._dtype, self._valid_omics_dfs + ["methylation"], categorical_cols)
+
+    def _parse_data_file(self, file_path):
+        """Parse one data file into dataframes, using the parser for it from the dataset's file_parsers list. This is called by _parse_data_files, possibly in a worker thread or process, so the parser must not edit self._data; instead, it returns the dataframes it parsed.
+
+        Parameters:
+        file_path (str): The path to the data file.
+
+        Returns:
+        dict: The dataframes parsed from the file, with names as keys. Empty if there's no parser for the file.
+        """
+        file_name = file_path.split(os.sep)[-1]
+        parser = self._get_file_parser(file_name)
+        if parser is None:
+            return {}
+
+        tables = parser.parse(file_path)
+
+        undeclared = [name for name in tables.keys() if name not in parser.tables]
+        if len(undeclared) > 0:
+            raise CptacDevError(f"The parser for {file_name} in the {self.get_cancer_type()} dataset returned dataframes not listed in its tables: {', '.join(undeclared)}")
+
+        return tables
+
+    def _parse_data_file_timed(self, file_path, measure_memory):
+        """Parse one data file with _parse_data_file, and record how long it took for the load report. Like _parse_data_file, this may be called in a worker thread or process.
+
+        Parameters:
+        file_path (str): The path to the data file.
+        measure_memory (bool): Whether to measure the peak memory allocated while parsing the file, using tracemalloc. Only accurate if no other files are being parsed at the same time.
+
+        Returns:
+        dict: The dataframes parsed from the file, with names as keys.
+        FileRecord: The file's record for the load report.
+        """
+        if measure_memory:
+            tracemalloc.start()
+
+        start = time.perf_counter()
+        try:
+            tables = self._parse_data_file(file_path)
+            seconds = time.perf_counter() - start
+            peak_memory = tracemalloc.get_traced_memory()[1] if measure_memory else None
+        finally:
+            if measure_memory:
+                tracemalloc.stop()
+
+        file_record = FileRecord(
+            file_name=file_path.split(os.sep)[-1],
+            tables=list(tables.keys()),
+            seconds=seconds,
+            bytes_read=os.path.getsize(file_path),
+            peak_memory=peak_memory)
+        return tables, file_record
+
+    def _get_table_records(self):
+        """Measure how much memory each dataframe takes up, for the load report. If the dataset was loaded lazily, we skip the dataframes that haven't been read from the cache yet, so we don't read them just to measure them.
+
+        Returns:
+        list of TableRecord: The records for the dataframes.
+        """
+        table_records = []
+        for name in self._data.keys():
+            if isinstance(self._data, CachedDataDict) and not self._data.is_loaded(name):
+                continue
+            df = self._data[name]
+            table_records.append(TableRecord(name=name, shape=df.shape, memory=int(df.memory_usage(deep=True).sum())))
+        return table_records
+
+    def _get_file_parser(self, file_name):
+        """Find the parser for a data file in the dataset's file_parsers list.
+
+        Parameters:
+        file_name (str): The name of the data file.
+
+        Returns:
+        FileParser: The first parser whose file patterns match the file name, and whose versions include this dataset's version. None if there isn't one.
+        """
+        for parser in self._file_parsers:
+            if parser.versions is not None and self._version not in parser.versions:
+                continue
+            for pattern in parser.file_patterns:
+                if fnmatch.fnmatchcase(file_name, pattern):
+                    return parser
+        return None
+
+    def _format_dataframes(self):
+        """Format the dataframes in the self._data dict, once all the data files have been parsed. Each child class must override this."""
+        raise CptacDevError(f"{self.__class__.__name__} does not override DataSet._format_dataframes.")
+
+    def _load_dataframes(self, n_jobs, executor):
+        """Fill the self._data and self._definitions dicts. If there's a valid cache of the formatted dataframes for this version of the dataset, load them from there. Otherwise, parse the data files, and save the formatted dataframes to the cache so the next load is faster.
+
+        In lazy mode, self._data is a CachedDataDict that reads each dataframe from the cache the first time it's used. If the cache wasn't valid, we still have to parse all the data files, since formatting some dataframes (e.g. the clinical dataframe's master index) needs data from the others. But once they're saved to the cache, we drop them from memory and only read back the ones that are used.
+
+        Parameters:
+        n_jobs (int): The number of threads to use to parse the data files, if we have to parse them.
+        executor (concurrent.futures.Executor): An executor to parse the data files with, if we have to parse them. Overrides n_jobs if not None.
+
+        Returns: None
+        """
+        if self._use_cache:
+            cache_path = get_cache_path(self._cancer_type, self._version, self._dtype)
+            cache_key = self._get_cache_key()
+
+            with record_step("read_cache"):
+                data, definitions, parse_warnings = read_cache(cache_path, cache_key, lazy=self._lazy)
+            if data is not None:
+                self._data = data
+                self._definitions = definitions
+                report = get_active_report()
+                if report is not None:
+                    report.from_cache = True
+
+                # Issue the warnings that parsing the data files issued when the cache was saved, e.g. FailedReindexWarnings, since the dataframes they're about are still missing or changed
+                for category_name, message in parse_warnings:
+                    category = getattr(exceptions, category_name, None)
+                    if isinstance(category, type) and issubclass(category, CptacWarning):
+                        warnings.warn(message, category, stacklevel=4)
+                return
+
+        with record_step("parse_data_files"):
+            with warnings.catch_warnings(record=True) as caught_warnings:
+                warnings.simplefilter("always") # Record every warning, so none are left out of the cache because they were already shown once
+                self._parse_data_files(n_jobs, executor)
+
+        # Issue the recorded warnings for real, so the user's warning filters apply to them as usual
+        for warning in caught_warnings:
+            warnings.warn_explicit(warning.message, warning.category, warning.filename, warning.lineno, source=warning.source)
+
+        if self._use_cache:
+            parse_warnings = [[warning.category.__name__, str(warning.message)] for warning in caught_warnings if issubclass(warning.category, CptacWarning)] # Just ours, since they're about the data, and will apply on every load from the cache
+            with record_step("write_cache"):
+                write_cache(cache_path, cache_key, self._data, self._definitions, parse_warnings)
+
+            if self._lazy:
+                data, definitions, parse_warnings = read_cache(cache_path, cache_key, lazy=True)
+                if data is not None: # If writing the cache failed, we just keep all the dataframes in memory
+                    self._data = data
+
+    def _get_cache_key(self):
+        """Construct the key for the cache of this dataset's formatted dataframes. It changes whenever the data files, the package version, or the code that parses and formats the data files change, so an old cache will be ignored and rebuilt.
+
+        Returns:
+        dict: The cache key.
+        """
+        version_index = get_index(self._cancer_type)[self._version]
+
+        # We use the hashes from the index, so that we don't have to hash every data file each time we load the dataset. We also use the size and modification time of each file, so we'll still notice if a file is replaced.
+        files = {}
+        for file_path in self._data_files_paths:
+            file_name = file_path.split(os.sep)[-1]
+            file_stat = os.stat(file_path)
+            file_index = version_index.get(file_name)
+            files[file_name] = {
+                "hash": file_index.hash if file_index is not None else None,
+                "size": file_stat.st_size,
+                "mtime_ns": file_stat.st_mtime_ns,
+            }
+
+        # Hash the source files for all the code that parses and formats the data files: the child class's module, this module, and the modules the parse and format functions call into, i.e. dataframe_tools.py, and file_tools.py for read_gct
+        path_here = os.path.abspath(os.path.dirname(__file__))
+        loader_paths = [
+            inspect.getfile(self.__class__),
+            os.path.join(path_here, "dataset.py"),
+            os.path.join(path_here, "dataframe_tools.py"),
+            os.path.join(path_here, "file_tools.py"),
+        ]
+        with hash_cache_batch():
+            loader_hashes = [hash_file(path) for path in loader_paths]
+
+        cache_key = {
+            "cancer_type": self._cancer_type,
+            "data_version": self._version,
+            "package_version": __version__,
+            "pandas_version": pd.__version__, # Pickled dataframes aren't guaranteed to load in other pandas versions
+            "dtype": self._dtype,
+            "files": files,
+            "loader_hashes": loader_hashes,
+        }
+        return cache_key
+
+    def _get_contents(self):
+        """Get everything needed to recreate this dataset object with _from_contents, for saving it in a bundle or in shared memory.
+
+        Returns:
+        dict: The dataframes, with names as keys. Any that were lazily loaded and haven't been used yet are read from the cache.
+        dict: The dataset's class and other instance variables.
+        """
+        data = {name: self._data[name] for name in self._data.keys()}
+        info = {
+            "class": (self.__class__.__module__, self.__class__.__name__),
+            "cancer_type": self._cancer_type,
+            "version": self._version,
+            "dtype": self._dtype,
+            "definitions": self._definitions,
+            "valid_omics_dfs": self._valid_omics_dfs,
+            "valid_metadata_dfs": self._valid_metadata_dfs,
+        }
+        return data, info
+
+    @staticmethod
+    def _from_contents(data, info, load_report):
+        """Recreate a dataset object from the output of _get_contents, without calling __init__, since there's nothing to parse or format.
+
+        Parameters:
+        data (dict): The dataframes, with names as keys.
+        info (dict): The dataset's class and other instance variables.
+        load_report (LoadReport): The report of how the dataframes were loaded.
+
+        Returns:
+        DataSet: The dataset, as an object of the class it was saved from.
+        """
+        module_name, class_name = info["class"]
+        dataset_class = getattr(importlib.import_module(module_name), class_name)
+
+        # We fill in the same instance variables as __init__
+        dataset = dataset_class.__new__(dataset_class)
+        dataset._cancer_type = info["cancer_type"]
+        dataset._version = info["version"]
+        dataset._dtype = info["dtype"]
+        dataset._data_files_paths = []
+        dataset._file_parsers = []
+        dataset._data = data
+        dataset._definitions = info["definitions"]
+        dataset._gene_col_indices = {}
+        dataset._mutation_matrix = None
+        dataset._valid_omics_dfs = info["valid_omics_dfs"]
+        dataset._valid_metadata_dfs = info["valid_metadata_dfs"]
+        dataset._use_cache = False
+        dataset._lazy = False
+        dataset._profile_memory = False
+
+        load_report.cancer_type = dataset._cancer_type
+        load_report.version = dataset._version
+        dataset._load_report = load_report
+        return dataset
+
+    def _get_dataframe(self, name, copy=True):
         """Check if a dataframe with the given name exists, and return a copy of it if it does.
 
         Parameters:
         name (str): The name of the dataframe to get.
+        copy (bool, optional): Whether to return a deep copy of the dataframe. If False, return a shallow copy instead, which shares its data with the master dataframe, so it's much faster to get. It must be treated as read-only, since editing its values in place would change the master. Its index and column labels can still be replaced without affecting the master. Default is True.
 
         Returns:
         pandas DataFrame: A copy of the desired dataframe, if it exists in this dataset.
         """
         if name in self._data.keys():
             df = self._data[name]
-            return_df = df.copy(deep=True) # We copy it, with deep=True, so edits on their copy don't affect the master for this instance
+            if copy:
+                return_df = df.copy(deep=True) # We copy it, with deep=True, so edits on their copy don't affect the master for this instance
+            else:
+                return_df = df.copy(deep=False) # A new dataframe object with the same data, so setting its axes doesn't change the master
             return return_df
         else:
             raise DataframeNotIncludedError(f"{name} dataframe not included in the {self.get_cancer_type()} dataset.")
 
     def _get_sample_status_map(self):
         """Get a pandas Series from the clinical dataframe, with sample ids as the index, and each sample's status (tumor or normal) as the values."""
-        clinical = self.get_clinical()
-        status_map = clinical["Sample_Tumor_Normal"]
+        clinical = self.get_clinical(copy=False)
+        status_map = clinical["Sample_Tumor_Normal"].astype(object) # It's categorical if the dataset was loaded with dtype="float32", but the mutation joins need plain strings
         status_map.name = "Sample_Status"
         return status_map
 
@@ -643,13 +1042,13 @@ class DataSet:
         genes (str, or list or array-like of str): Gene(s) to use to select columns from omics_df. str if one gene, list or array-like if multiple. Passing None will select the entire omics dataframe.
 
         Returns:
-        pandas DataFrame: The selected columns from the dataframe.
+        pandas DataFrame: The selected columns from the dataframe. If genes is None, this shares its data with the master dataframe, so it must not be modified, just joined.
         """
         # Check that they passed a valid omics df
         self._check_df_valid(omics_df_name, "omics")
 
-        # Get our omics df, using _get_dataframe to catch invalid requests
-        omics_df = self._get_dataframe(omics_df_name)
+        # Get our omics df, using _get_dataframe to catch invalid requests. We don't need a deep copy, since we only change its column labels, and selecting columns makes a new dataframe anyway.
+        omics_df = self._get_dataframe(omics_df_name, copy=False)
 
         # Process genes parameter
         if isinstance(genes, str): # If it's a single gene, make it a list so we can treat everything the same
@@ -668,20 +1067,24 @@ class DataSet:
 
         genes = pd.Index(genes, name="Name")
 
-        if isinstance(omics_df.columns, pd.core.index.MultiIndex):
-            contained = genes.intersection(omics_df.columns.get_level_values("Name")).drop_duplicates() # Get the genes that actually exist in the dataframe's columns
-            mi_contained = omics_df.columns[omics_df.columns.get_level_values("Name").isin(genes)]
+        # Look up the columns for each gene in the gene to column positions index, so we don't have to search the whole column index
+        gene_col_index = self._get_gene_col_index(omics_df_name, omics_df)
+        contained = pd.Index([gene for gene in genes if gene in gene_col_index], name="Name").drop_duplicates() # Get the genes that actually exist in the dataframe's columns
+        not_contained = genes.difference(contained).drop_duplicates() # So we can warn the user later
+
+        if len(contained) > 0:
+            positions = np.sort(np.concatenate([gene_col_index[gene] for gene in contained])) # Sort them so the columns stay in their original order
+        else:
+            positions = np.array([], dtype=int)
+        selected = omics_df.iloc[:, positions]
 
-            not_contained = genes.difference(contained).drop_duplicates() # So we can warn the user later
+        if isinstance(omics_df.columns, pd.core.index.MultiIndex):
+            mi_contained = selected.columns
             arrays = [not_contained] + [[np.nan] for i in range(omics_df.columns.nlevels - 1)]
             mi_not_contained = pd.MultiIndex.from_product(arrays, names=omics_df.columns.names)
 
             genes = mi_contained.union(mi_not_contained) # To use for reindexing the dataframe
-        else:
-            contained = genes.intersection(omics_df.columns).drop_duplicates() # Get the genes that actually exist in the dataframe's columns
-            not_contained = genes.difference(contained).drop_duplicates() # So we can warn the user later
 
-        selected = omics_df[contained]
         selected = selected.reindex(columns=genes) # This will add the columns not included in the dataframe, and fill them with NaN.
 
         # Warn the user about columns filled with NaN
@@ -695,6 +1098,27 @@ class DataSet:
             selected = selected.add_suffix('_' + omics_df_name)
         return selected
 
+    def _get_gene_col_index(self, omics_df_name, omics_df):
+        """Get the index from gene names to column positions for an omics dataframe. It's built the first time it's needed, and then reused, since the dataframes don't change after they're loaded.
+
+        Parameters:
+        omics_df_name (str): The name of the omics dataframe.
+        omics_df (pandas DataFrame): The omics dataframe, in case the index needs to be built.
+
+        Returns:
+        dict: Keys are the gene names in the dataframe's columns (the Name level, if the columns are a multiindex), and values are numpy arrays of the positions of the columns for that gene.
+        """
+        if omics_df_name not in self._gene_col_indices.keys():
+            if isinstance(omics_df.columns, pd.MultiIndex):
+                names = omics_df.columns.get_level_values("Name")
+            else:
+                names = omics_df.columns
+
+            positions = pd.Series(np.arange(len(names)))
+            self._gene_col_indices[omics_df_name] = positions.groupby(names.values).indices # Columns without a gene name are left out, since they can't be selected by gene
+
+        return self._gene_col_indices[omics_df_name]
+
     def _get_metadata_cols(self, df_name, cols):
         """Select a single column or several columns from a metadata dataframe.
 
@@ -703,13 +1127,13 @@ class DataSet:
         cols (str, or list or array-like of str): The column(s) to select from the dataframe. str if single, list or array-like of str if multiple. Passing None will select the entire dataframe.
 
         Returns:
-        pandas DataFrame: The specified columns from the given dataframe.
+        pandas DataFrame: The specified columns from the given dataframe. If cols is None, this shares its data with the master dataframe, so it must not be modified, just joined.
         """
         # Check that they passed a valid metadata df
         self._check_df_valid(df_name, "metadata")
 
-        # Get our dataframe, using _get_dataframe to catch invalid requests
-        df = self._get_dataframe(df_name)
+        # Get our dataframe, using _get_dataframe to catch invalid requests. We don't need a deep copy, since we don't modify it, and selecting columns makes a new dataframe anyway.
+        df = self._get_dataframe(df_name, copy=False)
 
         # Process genes parameter
         if isinstance(cols, str): # If it's a single column, make it a list so we can treat everything the same
@@ -741,7 +1165,7 @@ class DataSet:
         Returns:
         pandas DataFrame: The mutations in each patient for the specified gene(s).
         """
-        somatic_mutation = self.get_somatic_mutation()
+        somatic_mutation = self.get_somatic_mutation(copy=False)
 
         # Process genes parameter
         if isinstance(genes, str): # If it's a single gene, make it a list so we can treat everything the same
@@ -764,67 +1188,51 @@ class DataSet:
                 if (filter_val not in somatic_mutation[mutation_col].values) and (filter_val not in somatic_mutation[location_col].values):
                     raise InvalidParameterError(f"Filter value {filter_val} does not exist in the mutations dataframe for this dataset. Check for typos and existence. Merge aborted.")
 
-        # Create an empty dataframe, which we'll fill with the columns we select using our genes, and then return.
-        df = pd.DataFrame(index=somatic_mutation.index.copy().drop_duplicates())
         genes = pd.Series(genes).drop_duplicates()
+        all_samples = somatic_mutation.index.drop_duplicates().sort_values() # Every sample with mutation data gets a row, even if it has no mutations in these genes
+        if len(genes) == 0:
+            return pd.DataFrame(index=all_samples, columns=pd.Index([], name="Name"))
+
+        # Select the mutations for all the genes at once, using the mutation matrix so we don't have to scan the whole dataframe. We group by the gene names as plain strings, since if the Gene column is categorical, groupby would make a group for every gene in the dataframe.
+        selected = somatic_mutation.iloc[self.get_mutation_matrix().get_rows(genes)]
+        selected_genes = selected[gene_col].astype(object)
+
+        # Check that each gene is in the dataframe, and whether all filter values exist for each particular gene. If a filter value doesn't exist for a gene, that's fine, we just want to warn the user.
+        found_genes = set(selected_genes.unique())
+        if mutations_filter is not None:
+            genes_mutations = dict(list(selected.groupby(selected_genes.values, sort=False)))
+
         for gene in genes:
-            gene_mutations = somatic_mutation[somatic_mutation[gene_col] == gene] # Get all the mutations for that gene
-            if len(gene_mutations) == 0: # If the gene doesn't match any genes in the dataframe, tell them
+            if gene not in found_genes: # If the gene doesn't match any genes in the dataframe, tell them
                 raise InvalidParameterError("{} gene not found in somatic_mutation data.".format(gene))
-            gene_mutations = gene_mutations.drop(columns=[gene_col]) # Gene column is same for every sample, so we don't need it anymore.
 
-            # Check whether all filter values exist for this particular gene. If not, that's fine, we just want to warn the user.
             if mutations_filter is not None:
+                gene_mutations = genes_mutations[gene]
                 for filter_val in mutations_filter:
                     if (filter_val not in gene_mutations[mutation_col].values) and (filter_val not in gene_mutations[location_col].values):
                         warnings.warn(f"Filter value {filter_val} does not exist in the mutations data for the {gene} gene, though it exists for other genes.", ParameterWarning, stacklevel=3)
 
-            # Create another empty dataframe, which we'll fill with the mutation and location data for this gene, as lists
-            prep_index = gene_mutations.index.copy().drop_duplicates()
-            prep_columns = gene_mutations.columns.copy()
-            mutation_status_idx = pd.Index([mutation_status_col]) # Prep mutation_status_col to be joined
-            prep_cols_with_mut_status = prep_columns.append(mutation_status_idx) # Add a mutation_status column, which will indicate if there are 1 or multiple mutations
-            mutation_lists = pd.DataFrame(index=prep_index, columns=prep_cols_with_mut_status)
-
-            # Get the mutation(s), mutation status, and location information for this gene and sample
-            # Yes, I know I'm doing that horrible thing, using nested for loops to work with dataframes. However, I tried refactoring it to use DataFrame.groupby and DataFrame.apply, and both actually made it slower. Go figure.
-            for sample in mutation_lists.index:
-                sample_data = gene_mutations.loc[sample] # Get slice of dataframe for the sample
-                sample_mutations = sample_data[mutation_col] # Get mutation(s)
-                sample_locations = sample_data[location_col] # Get location(s)
-
-                # Make the mutations a list (even if there's only one)
-                if isinstance(sample_mutations, pd.core.series.Series):
-                    sample_mutations_list = sample_mutations.tolist()
-                else:
-                    sample_mutations_list = [sample_mutations]
-
-                # Make the locations a list (even if there's only one)
-                if isinstance(sample_locations, pd.core.series.Series):
-                    sample_locations_list = sample_locations.tolist()
-                else:
-                    sample_locations_list = [sample_locations]
-
-                # Figure out what our mutation status is (either single_mutation or multiple_mutation)
-                if len(sample_mutations_list) > 1:
-                    sample_mutation_status = "Multiple_mutation"
-                else:
-                    sample_mutation_status = "Single_mutation"
-
-                if mutations_filter is not None: # Filter multiple mutations down to just one
-                    chosen_mutation, chosen_location = self._filter_multiple_mutations(mutations_filter, sample_mutations_list, sample_locations_list)
-                    mutation_lists.at[sample, mutation_col] = chosen_mutation
-                    mutation_lists.at[sample, location_col] = chosen_location
-                else: # Include all the mutations!
-                    mutation_lists.at[sample, mutation_col] = sample_mutations_list
-                    mutation_lists.at[sample, location_col] = sample_locations_list
-
-                # Also add the mutations status column
-                mutation_lists.at[sample, mutation_status_col] = sample_mutation_status
-
-            mutation_lists = mutation_lists.add_prefix(gene + '_') # Add the gene name to end beginning of each column header, to preserve info when we join dataframes.
-            df = df.join(mutation_lists, how='outer') # Append the columns to our dataframe we'll return.
-            df.columns.name = "Name"
+        # Collect the mutations and locations for each gene and sample into lists, in one pass over the selected mutations
+        grouped = selected[[mutation_col, location_col]].astype(object).groupby([selected_genes.values, selected.index.values], sort=False)
+        mutation_lists = grouped.agg(list)
+        num_mutations = grouped.size()
+
+        # Figure out what our mutation status is (either single_mutation or multiple_mutation)
+        mutation_lists[mutation_status_col] = np.where(num_mutations.values > 1, "Multiple_mutation", "Single_mutation").astype(object)
+
+        if mutations_filter is not None: # Filter multiple mutations down to just one
+            filtered = self._filter_multiple_mutations(mutations_filter, selected, [selected_genes.values, selected.index.values])
+            filtered = filtered.reindex(mutation_lists.index)
+            mutation_lists[mutation_col] = filtered[mutation_col].values
+            mutation_lists[location_col] = filtered[location_col].values
+
+        # Make one column for each gene and type of data. Any other columns in the somatic_mutation dataframe are included, but left empty, as they always have been.
+        df = mutation_lists.unstack(level=0)
+        prep_columns = somatic_mutation.columns.drop(gene_col).append(pd.Index([mutation_status_col]))
+        ordered_columns = pd.MultiIndex.from_tuples([(col, gene) for gene in genes for col in prep_columns])
+        df = df.reindex(index=all_samples, columns=ordered_columns).astype(object)
+        df.columns = pd.Index([gene + '_' + col for col, gene in ordered_columns], name="Name") # Add the gene name to end beginning of each column header, to preserve info when we join dataframes.
+        df.index.name = somatic_mutation.index.name
 
         return df
 
@@ -857,74 +1265,73 @@ class DataSet:
         joined = joined.join(sample_status_map, how="left")
         joined.columns.name = "Name" # This attribute gets lost in the join above
 
-        # If there's no mutations filter, then based on the dtypes in the dataframe, set our fill values so that .loc will insert the value as a single item in a list, instead of unpacking the list.
-        if mutations_were_filtered:
-            wildtype_normal_fill = "Wildtype_Normal"
-            wildtype_tumor_fill = "Wildtype_Tumor"
-            no_mutation_fill = "No_mutation"
-        elif (joined.dtypes == "object").all(): # If all columns in "joined" have a dtype of "object"
-            wildtype_normal_fill = [["Wildtype_Normal"]]
-            wildtype_tumor_fill = [["Wildtype_Tumor"]]
-            no_mutation_fill = [["No_mutation"]]
-        else:
-            wildtype_normal_fill = [[["Wildtype_Normal"]]]
-            wildtype_tumor_fill = [[["Wildtype_Tumor"]]]
-            no_mutation_fill = [[["No_mutation"]]]
+        # Get the masks for normal and tumor samples once, and the positions of all the columns we'll fill, so we can fill each type of column as one block
+        sample_status = joined[sample_status_map.name]
+        normal = (sample_status == "Normal").values
+        tumor = (sample_status == "Tumor").values
+        has_status = sample_status.notnull().values
+
+        col_names = joined.columns.get_level_values("Name")
+        mutation_positions = np.flatnonzero(col_names.str.endswith("_Mutation"))
+        location_positions = np.flatnonzero(col_names.str.endswith("_Location"))
+        mutation_status_positions = np.flatnonzero(col_names.str.endswith("_Mutation_Status"))
+
+        # If there's no mutations filter, the mutation and location cells hold lists, so we fill them with lists too
+        fill_lists = not mutations_were_filtered
+
+        def fill(block, mask, value, as_list):
+            """Fill the cells of a 2D object array where the mask is True with the value, or with a separate one item list of the value for each cell if as_list is True."""
+            if as_list:
+                fills = np.empty(mask.sum(), dtype=object)
+                for i in range(len(fills)):
+                    fills[i] = [value]
+                block[mask] = fills
+            else:
+                block[mask] = value
 
         # Fill in Wildtype_Normal or Wildtype_Tumor for NaN values (i.e., no mutation data for that sample) in joined dataframe mutation columns
-        mutation_regex = r'^.*_Mutation$' # Construct regex to find all mutation columns
-        mutation_cols = joined.columns[joined.columns.get_level_values("Name").str.match(mutation_regex)] # Get a list of all mutation columns
+        mutation_block = joined.iloc[:, mutation_positions].values.astype(object)
+        mutation_nulls = pd.isnull(mutation_block)
 
         fill_log = [] # We're going to keep track of value filling, and let the user know we did it.
-        for mutation_col in mutation_cols:
-
-            # Log how many values we're going to fill for this gene
-            num_filled = (((sample_status_map == "Normal") | (sample_status_map == "Tumor")) & (pd.isnull(joined[mutation_col]))).sum() # See how many values we'll fill by using sum to get number of "True" in array
+        nums_filled = (mutation_nulls & (normal | tumor)[:, np.newaxis]).sum(axis=0) # See how many values we'll fill for each gene by using sum to get number of "True" in each column
+        for mutation_col_name, num_filled in zip(col_names[mutation_positions], nums_filled):
             if num_filled > 0:
-                if isinstance(mutation_col, tuple):
-                    gene = mutation_col[0].rsplit("_", maxsplit=1)[0]
-                else:
-                    gene = mutation_col.rsplit("_", maxsplit=1)[0]
+                gene = mutation_col_name.rsplit("_", maxsplit=1)[0]
                 fill_log.append(f"{num_filled} samples for the {gene} gene")
 
-            # Impute values
-            joined.loc[(sample_status_map == "Normal") & (pd.isnull(joined[mutation_col])), mutation_col] = wildtype_normal_fill # Change all NaN mutation values for Normal samples to Wildtype_Normal.
-            joined.loc[(sample_status_map == "Tumor") & (pd.isnull(joined[mutation_col])), mutation_col] = wildtype_tumor_fill # Change all NaN mutation values for Tumor samples to Wildtype_Tumor
+        fill(mutation_block, mutation_nulls & normal[:, np.newaxis], "Wildtype_Normal", fill_lists) # Change all NaN mutation values for Normal samples to Wildtype_Normal.
+        fill(mutation_block, mutation_nulls & tumor[:, np.newaxis], "Wildtype_Tumor", fill_lists) # Change all NaN mutation values for Tumor samples to Wildtype_Tumor
+        joined.iloc[:, mutation_positions] = mutation_block
 
         if len(fill_log) > 0:
             warnings.warn(f"In joining the somatic_mutation table, no mutations were found for the following samples, so they were filled with Wildtype_Tumor or Wildtype_Normal: {', '.join(fill_log)}", FilledMutationDataWarning, stacklevel=3)
 
-        # Depending on show_location, either fill NaN values in the joined dataframe location columns with "No_mutation", or just drop the location columns altogether
-        location_regex = r'^.*_Location$' # Construct regex to find all location columns
-        location_cols = joined.columns[joined.columns.get_level_values("Name").str.match(location_regex)] # Get a list of all location columns
-        for location_col in location_cols:
-            if show_location: # If we're including the location column, fill NaN with "No_mutation", since that's what it means, so things are clearer to the user.
-                joined.loc[(pd.isnull(joined[location_col])) & (pd.notnull(sample_status_map)), location_col] = no_mutation_fill # Make sure Sample Status is not NaN, though--if it is, we have no mutation data at all for that sample, so we can't say "No_mutation". It must have been a sample that was in the other dataframe, but not the mutations.
-            else:
-                joined = joined.drop(columns=[location_col]) # Drop the location column, if the caller wanted us to.
-
         # Fill NaN values in Mutation_Status column with either Wildtype_Tumor or Wildtype_Normal
-        mutation_status_regex = r"^.*_Mutation_Status$" # Construct a regex to find all Mutation_Status columns
-        mutation_status_cols = joined.columns[joined.columns.get_level_values("Name").str.match(mutation_status_regex)] # Get a list of all Mutation_Status columns
-        for mutation_status_col in mutation_status_cols:
-            joined.loc[(sample_status_map == "Normal") & (pd.isnull(joined[mutation_status_col])), mutation_status_col] = "Wildtype_Normal" # Change all NaN mutation status values for Normal samples to Wildtype_Normal
-            joined.loc[(sample_status_map == "Tumor") & (pd.isnull(joined[mutation_status_col])), mutation_status_col] = "Wildtype_Tumor" # Change all NaN mutation status values for Tumor samples to Wildtype_Tumor
+        mutation_status_block = joined.iloc[:, mutation_status_positions].values.astype(object)
+        mutation_status_nulls = pd.isnull(mutation_status_block)
+        fill(mutation_status_block, mutation_status_nulls & normal[:, np.newaxis], "Wildtype_Normal", False) # Change all NaN mutation status values for Normal samples to Wildtype_Normal
+        fill(mutation_status_block, mutation_status_nulls & tumor[:, np.newaxis], "Wildtype_Tumor", False) # Change all NaN mutation status values for Tumor samples to Wildtype_Tumor
+        joined.iloc[:, mutation_status_positions] = mutation_status_block
 
-        return joined
+        # Depending on show_location, either fill NaN values in the joined dataframe location columns with "No_mutation", or just drop the location columns altogether
+        if show_location: # If we're including the location column, fill NaN with "No_mutation", since that's what it means, so things are clearer to the user.
+            location_block = joined.iloc[:, location_positions].values.astype(object)
+            fill(location_block, pd.isnull(location_block) & has_status[:, np.newaxis], "No_mutation", fill_lists) # Make sure Sample Status is not NaN, though--if it is, we have no mutation data at all for that sample, so we can't say "No_mutation". It must have been a sample that was in the other dataframe, but not the mutations.
+            joined.iloc[:, location_positions] = location_block
+        else:
+            joined = joined.drop(columns=joined.columns[location_positions]) # Drop the location columns, if the caller wanted us to.
 
-    def _filter_multiple_mutations(self, mutations_filter, sample_mutations_list, sample_locations_list):
-        """Based on a mutations filter, choose one mutation and its location from two lists of mutations and locations.
+        return joined
 
-        Parameters:
-        mutations_filter (list of str): A list of mutations to prioritize, in order of priority. Passing an empty list will cause truncations to be chosen over missense, and mutations earlier in the sequence over later ones.
-        sample_mutations_list (list of str): The mutations to filter.
-        sample_locations_list (list of str): The locations to filter, in the same order as the mutations.
+    def _get_mutation_classes(self):
+        """Get the mutation types that are truncations, missenses, and noncodings, in this dataset's vocabulary, for prioritizing mutations.
 
         Returns:
-        str: The chosen mutation
-        str: The chosen location
+        list of str: The truncation mutation types.
+        list of str: The missense mutation types.
+        list of str: The noncoding mutation types. Only gbm has these; for other datasets it's empty.
         """
-        # Based on the cancer type, define which mutation types are truncations, for sorting later
         if self._cancer_type == 'colon':
             truncations = ['frameshift deletion', 'frameshift insertion', 'frameshift substitution', 'stopgain', 'stoploss']
             missenses = ['nonframeshift deletion', 'nonframeshift insertion', 'nonframeshift substitution', 'nonsynonymous SNV']
@@ -937,77 +1344,73 @@ class DataSet:
 
         if self._cancer_type == "gbm":
             noncodings = ["Intron", "RNA", "3'Flank", "Splice_Region", "5'UTR", "5'Flank", "3'UTR"]
+        else:
+            noncodings = []
 
-        # Filter the mutations!!
-        chosen_indices = []
-        for filter_val in mutations_filter: # This will start at the beginning of the filter list, thus filters earlier in the list are prioritized, like we want
-            if filter_val in sample_mutations_list:
-                chosen_indices = [index for index, value in enumerate(sample_mutations_list) if value == filter_val]
-            elif filter_val in sample_locations_list: # The mutations filter can also filter by location
-                chosen_indices = [index for index, value in enumerate(sample_locations_list) if value == filter_val]
-            if len(chosen_indices) > 0: # We found at least one mutation from the filter to prioritize, so we don't need to worry about later values in the filter priority list
-                break
-
-        if len(chosen_indices) == 0: # None of the mutations for the sample were in the filter, so we're going to have to use our default hierarchy
-            for mutation in sample_mutations_list:
-                if mutation in truncations:
-                    chosen_indices += [index for index, value in enumerate(sample_mutations_list) if value == mutation]
-
-        if len(chosen_indices) == 0: # None of them were in the filter, nor were truncations, so we'll grab all the missenses
-            for mutation in sample_mutations_list:
-                if mutation in missenses:
-                    chosen_indices += [index for index, value in enumerate(sample_mutations_list) if value == mutation]
-
-        if self._cancer_type == "gbm" and len(chosen_indices) == 0: # None of them were in the filter, nor were truncations, nor missenses, so we'll grab all the noncodings
-            for mutation in sample_mutations_list:
-                if mutation in noncodings:
-                    chosen_indices += [index for index, value in enumerate(sample_mutations_list) if value == mutation]
-
-        if len(chosen_indices) == 0: # There were no truncations or missenses, so they should all be Silent mutations
-            for mutation in sample_mutations_list:
-                if mutation not in ["Silent", "synonymous SNV"]:
-                    warnings.warn(f"Unknown mutation type {mutation}. Assigned lowest priority in filtering.", ParameterWarning, stacklevel=4)
-            chosen_indices = range(len(sample_mutations_list)) # We'll sort them all by location
-
-        # If there are multiple mutations in chosen_indices, the following code will pick the one soonest in the peptide sequence.
-        soonest_mutation = sample_mutations_list[chosen_indices[0]]
-        soonest_location = sample_locations_list[chosen_indices[0]]
-        for index in chosen_indices:
-            mutation = sample_mutations_list[index]
-            location = sample_locations_list[index]
-
-            if pd.isnull(location): # Some of the mutations have no location. We'll de-prioritize those.
-                continue
-            if pd.isnull(soonest_location): # This would happen if our initial value for soonest_location was NaN. If we got here, then the one we're testing isn't null, and we'll automatically prefer it
-                soonest_location = location
-                soonest_mutation = mutation
-                continue
+        return truncations, missenses, noncodings
 
-            num_location = self._parse_mutation_location(location) # Here, we're parsing the numerical position out of the location strings, for comparisons
-            num_soonest_location = self._parse_mutation_location(soonest_location)
-            if num_location < num_soonest_location:
-                soonest_location = location
-                soonest_mutation = mutation
-        return soonest_mutation, soonest_location
+    def _filter_multiple_mutations(self, mutations_filter, mutations, group_keys):
+        """Based on a mutations filter, choose one mutation and its location for each group of mutations (e.g. each gene in each sample), for all the groups at once.
 
-    def _parse_mutation_location(self, location):
-        """Parse the number out of the location for a mutation.
+        Each mutation gets a priority code. Mutations matching a filter value come first, in the order of the filter. Then come truncations, then missenses, then (for gbm) noncodings, then everything else. In each group, we take the mutations with the best priority, and choose the one soonest in the peptide sequence.
 
         Parameters:
-        location (str): The location to parse.
+        mutations_filter (list of str): A list of mutations to prioritize, in order of priority. Passing an empty list will cause truncations to be chosen over missense, and mutations earlier in the sequence over later ones.
+        mutations (pandas DataFrame): The mutations to filter, with Mutation and Location columns.
+        group_keys (list of array-like): Arrays the same length as mutations that define the groups, e.g. the gene and the sample for each mutation.
 
         Returns:
-        int: The numerical part of the location.
-        """
-        if pd.isnull(location):
-            return location
-        num = ""
-        found_digits = False
-        for char in location:
-            if char.isdigit():
-                num = num + char
-                found_digits = True
-            else:
-                if found_digits: # We only want the first block of numbers
-                    return int(num)
-        return int(num) # We get here if the location ended with a digit
+        pandas DataFrame: The chosen Mutation and Location for each group, indexed by the group keys.
+        """
+        mutation_col = "Mutation"
+        location_col = "Location"
+
+        truncations, missenses, noncodings = self._get_mutation_classes()
+
+        # Precompute the priority codes. For each filter value, matching it as a mutation type beats matching it as a location, like the filter always has.
+        num_filter_codes = 2 * len(mutations_filter)
+        mutation_filter_codes = {}
+        location_filter_codes = {}
+        for i, filter_val in enumerate(mutations_filter):
+            mutation_filter_codes.setdefault(filter_val, 2 * i)
+            location_filter_codes.setdefault(filter_val, 2 * i + 1)
+
+        class_codes = {}
+        for code, mutation_class in enumerate([truncations, missenses, noncodings]):
+            for mutation in mutation_class:
+                class_codes.setdefault(mutation, num_filter_codes + code)
+        unknown_code = num_filter_codes + 3 # Silent, and any mutation types we don't know
+
+        work = pd.DataFrame({
+            "group": mutations.groupby(group_keys, sort=False).ngroup().values,
+            "mutation": mutations[mutation_col].astype(object).values,
+            "location": mutations[location_col].astype(object).values,
+        })
+        work["row"] = np.arange(len(work.index))
+
+        filter_codes = pd.concat([work["mutation"].map(mutation_filter_codes), work["location"].map(location_filter_codes)], axis=1).min(axis=1)
+        work["code"] = filter_codes.fillna(work["mutation"].map(class_codes)).fillna(unknown_code)
+        chosen = work[work["code"] == work.groupby("group")["code"].transform("min")].copy() # The mutations with the best priority in each group
+
+        # If none of the mutations in a group were in the filter, nor were truncations, missenses or noncodings, they should all be Silent mutations
+        unknown = chosen.loc[(chosen["code"] == unknown_code) & ~chosen["mutation"].isin(["Silent", "synonymous SNV"]), "mutation"]
+        for mutation in unknown.drop_duplicates():
+            warnings.warn(f"Unknown mutation type {mutation}. Assigned lowest priority in filtering.", ParameterWarning, stacklevel=4)
+
+        # To break ties between mutations at the same location, mutations chosen by class keep the order of the first mutation of each type in the group, and others keep their original order
+        first_of_type = work.groupby(["group", work["mutation"].fillna("")])["row"].transform("min")
+        by_class = (chosen["code"] >= num_filter_codes) & (chosen["code"] < unknown_code)
+        chosen["order"] = first_of_type.loc[chosen.index].where(by_class, chosen["row"])
+
+        # Pick the mutation soonest in the peptide sequence, by the first block of digits in its location. Some of the mutations have no location. We'll de-prioritize those.
+        locations = chosen["location"].where(chosen["location"].notnull(), "").astype(str)
+        chosen["position"] = locations.str.extract(r"(\d+)", expand=False).astype(float)
+        chosen["no_location"] = chosen["location"].isnull()
+        chosen["no_position"] = chosen["position"].isnull()
+        chosen = chosen.sort_values(by=["group", "no_location", "no_position", "position", "order"], kind="mergesort")
+        chosen = chosen.drop_duplicates(subset="group", keep="first")
+
+        chosen_rows = chosen["row"].values
+        index = pd.MultiIndex.from_arrays([np.asarray(key)[chosen_rows] for key in group_keys])
+        filtered = pd.DataFrame({mutation_col: chosen["mutation"].values, location_col: chosen["location"].values}, index=index)
+        return filtered
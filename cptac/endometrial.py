@@ -13,14 +13,24 @@ import pandas as pd
 import numpy as np
 import os
 import warnings
-from .dataset import DataSet
+from .dataset import DataSet, FileParser
 from .dataframe_tools import *
 from .exceptions import FailedReindexWarning, ReindexMapError
 
 class Endometrial(DataSet):
 
-    def __init__(self, version="latest"):
-        """Load all of the endometrial dataframes as values in the self._data dict variable, with names as keys, and format them properly."""
+    def __init__(self, version="latest", use_cache=True, lazy=False, n_jobs=1, executor=None, dtype="float64", profile=False):
+        """Load all of the endometrial dataframes as values in the self._data dict variable, with names as keys, and format them properly.
+
+        Parameters:
+        version (str, optional): The version number to load, or the string "latest" to just load the latest version. Default is "latest".
+        use_cache (bool, optional): Whether to load the formatted dataframes from the on-disk cache if a valid one exists, and to save them to the cache after parsing the data files if not. Default is True.
+        lazy (bool, optional): Whether to wait to read each dataframe from the cache until it's first used, instead of reading them all when the dataset is loaded. This saves time and memory if you only use a few of the dataframes. Requires use_cache to be True. Default is False.
+        n_jobs (int, optional): The number of threads to use to parse the data files, if they aren't loaded from the cache. -1 uses one thread per CPU. Default is 1, which parses them one at a time.
+        executor (concurrent.futures.Executor, optional): An executor to parse the data files with instead, e.g. a concurrent.futures.ProcessPoolExecutor. If passed, n_jobs is ignored, and the executor is not shut down afterwards. Default is None.
+        dtype (str, optional): "float64" to keep the omics dataframes at full precision, or "float32" to store and return them as float32, and also make the repeated string columns in the clinical, experimental_design and somatic_mutation dataframes categorical. "float32" about halves the memory the dataset uses. Default is "float64".
+        profile (bool or function, optional): Whether to measure memory use while loading, in addition to the timings that are always recorded. Get the results by calling get_load_report. If a function, it is also called with the report once the dataset is loaded, e.g. to log it. Default is False.
+        """
 
         # Set some needed variables, and pass them to the parent DataSet class __init__ function
 
@@ -55,81 +65,133 @@ class Endometrial(DataSet):
                 "UCEC_followup_9_12.xlsx"],
         }
 
-        super().__init__(cancer_type="endometrial", version=version, valid_versions=valid_versions, data_files=data_files)
-
-        # Load the data files into dataframes in the self._data dict
-        loading_msg = "Loading dataframes"
-        for file_path in self._data_files_paths: 
-
-            # Print a loading message. We add a dot every time, so the user knows it's not frozen.
-            loading_msg = loading_msg + "."
-            print(loading_msg, end='\r')
-
-            path_elements = file_path.split(os.sep) # Get a list of the levels of the path
-            file_name = path_elements[-1] # The last element will be the name of the file
-            df_name = file_name.split(".")[0] # Dataframe name will be the first section of file name; i.e. proteomics.txt.gz becomes proteomics
-
-            # Load the file, based on what it is
-            if file_name == "clinical.txt":
-                # Fix for reading error on clinical.txt:
-                with open(file_path, "r", errors="ignore") as clinical_file:
-                    df = pd.read_csv(clinical_file, sep="\t", index_col=0)
-                df = df.sort_index()
-                self._data[df_name] = df # Maps dataframe name to dataframe
-
-            elif file_name == "definitions.txt":
-                with open(file_path, "r") as definitions_file:
-                    for line in definitions_file.readlines():
-                        line = line.strip()
-                        line = line.split("\t")
-                        term = line[0]
-                        definition = line[1]
-                        self._definitions[term] = definition
-
-            elif file_name == "somatic.maf.gz":
-                df = pd.read_csv(file_path, sep = "\t")
-                split_barcode = df["Tumor_Sample_Barcode"].str.split("_", n=1, expand=True) # The first part of the barcode is the patient id, which we need want to make the index
-                df["Tumor_Sample_Barcode"] = split_barcode[0]
-                df = df[["Tumor_Sample_Barcode","Hugo_Symbol","Variant_Classification","HGVSp_Short"]]
-                df = df.rename({"Tumor_Sample_Barcode":"Patient_ID","Hugo_Symbol":"Gene","Variant_Classification":"Mutation","HGVSp_Short":"Location"}, axis='columns')
-                df = df.sort_values(by=["Patient_ID", "Gene"])
-                df = df.set_index("Patient_ID")
-                self._data["somatic_mutation"] = df # Maps dataframe name to dataframe
-
-            elif file_name == "acetylproteomics.cct.gz" or file_name == "phosphoproteomics_site.cct.gz":
-                df = pd.read_csv(file_path, sep = "\t", index_col=0)
-                df.index = df.index.str.rsplit('-', n=1, expand=True) # Separate the index into a multiindex where the 1st level is the gene, and 2nd is the site
-                df.index = df.index.set_names(["Name", "Site"]) # Properly name the levels
-                df = df.sort_index()
-                df = df.transpose()
-                self._data[df_name] = df # Maps dataframe name to dataframe
-
-            elif file_name == 'UCEC_followup_9_12.xlsx' and self._version == "2.1.1":
-                df = pd.read_excel(file_path)
-
-                # Replace redundant values for 'not reported' with NaN
-                nan_equivalents = ['Not Reported/ Unknown', 'Reported/ Unknown', 'Not Applicable', 'na', 'unknown',
-                    'Not Performed', 'Unknown tumor status', 'Unknown', 'Unknown Tumor Status', 'Not specified']
-                    
-                df = df.replace(nan_equivalents, np.nan)
-
-                # Rename, set, and sort index
-                df = df.rename(columns={'Case ID': 'Patient_ID'})
-                df = df.set_index("Patient_ID")
-                df = df.sort_index()
-
-                self._data["followup"] = df
-
-            else:
-                df = pd.read_csv(file_path, sep="\t", index_col=0)
-                df = df.transpose()
-                df = df.sort_index()
-                self._data[df_name] = df # Maps dataframe name to dataframe
-
-        print(' ' * len(loading_msg), end='\r') # Erase the loading message
+        # Map each data file to the method that parses it, and the names of the dataframes that method returns. The first parser that matches the file name and the dataset version is used.
+        file_parsers = [
+            FileParser(file_patterns=["clinical.txt"], versions=None, tables=["clinical"], parse=self._parse_clinical),
+            FileParser(file_patterns=["definitions.txt"], versions=None, tables=["definitions"], parse=self._parse_definitions),
+            FileParser(file_patterns=["somatic.maf.gz"], versions=None, tables=["somatic_mutation"], parse=self._parse_somatic_mutation),
+            FileParser(file_patterns=["acetylproteomics.cct.gz"], versions=None, tables=["acetylproteomics"], parse=self._parse_site_level),
+            FileParser(file_patterns=["phosphoproteomics_site.cct.gz"], versions=None, tables=["phosphoproteomics_site"], parse=self._parse_site_level),
+            FileParser(file_patterns=["UCEC_followup_9_12.xlsx"], versions=["2.1.1"], tables=["followup"], parse=self._parse_followup),
+            FileParser(file_patterns=["CNA.cct.gz"], versions=None, tables=["CNA"], parse=self._parse_table),
+            FileParser(file_patterns=["miRNA.cct.gz"], versions=None, tables=["miRNA"], parse=self._parse_table),
+            FileParser(file_patterns=["phosphoproteomics_gene.cct.gz"], versions=None, tables=["phosphoproteomics_gene"], parse=self._parse_table),
+            FileParser(file_patterns=["proteomics.cct.gz"], versions=None, tables=["proteomics"], parse=self._parse_table),
+            FileParser(file_patterns=["somatic_binary.cbt.gz"], versions=None, tables=["somatic_binary"], parse=self._parse_table),
+            FileParser(file_patterns=["transcriptomics_circular.cct.gz"], versions=None, tables=["transcriptomics_circular"], parse=self._parse_table),
+            FileParser(file_patterns=["transcriptomics_linear.cct.gz"], versions=None, tables=["transcriptomics_linear"], parse=self._parse_table),
+        ]
+
+        super().__init__(cancer_type="endometrial", version=version, valid_versions=valid_versions, data_files=data_files, file_parsers=file_parsers, use_cache=use_cache, lazy=lazy, n_jobs=n_jobs, executor=executor, dtype=dtype, profile=profile)
+
+    def _parse_clinical(self, file_path):
+        """Parse the clinical data file."""
+        path_elements = file_path.split(os.sep) # Get a list of the levels of the path
+        file_name = path_elements[-1] # The last element will be the name of the file
+        df_name = file_name.split(".")[0] # Dataframe name will be the first section of file name; i.e. proteomics.txt.gz becomes proteomics
+
+        tables = {}
+
+        # Fix for reading error on clinical.txt:
+        with open(file_path, "r", errors="ignore") as clinical_file:
+            df = pd.read_csv(clinical_file, sep="\t", index_col=0)
+        df = df.sort_index()
+        tables[df_name] = df # Maps dataframe name to dataframe
+
+        return tables
+
+    def _parse_definitions(self, file_path):
+        """Parse the definitions data file."""
+        tables = {}
+
+        definitions = {}
+        with open(file_path, "r") as definitions_file:
+            for line in definitions_file.readlines():
+                line = line.strip()
+                line = line.split("\t")
+                term = line[0]
+                definition = line[1]
+                definitions[term] = definition
+        tables["definitions"] = definitions # We'll move this into self._definitions when we format the dataframes
+
+        return tables
+
+    def _parse_somatic_mutation(self, file_path):
+        """Parse the somatic mutation data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep = "\t")
+        split_barcode = df["Tumor_Sample_Barcode"].str.split("_", n=1, expand=True) # The first part of the barcode is the patient id, which we need want to make the index
+        df["Tumor_Sample_Barcode"] = split_barcode[0]
+        df = df[["Tumor_Sample_Barcode","Hugo_Symbol","Variant_Classification","HGVSp_Short"]]
+        df = df.rename({"Tumor_Sample_Barcode":"Patient_ID","Hugo_Symbol":"Gene","Variant_Classification":"Mutation","HGVSp_Short":"Location"}, axis='columns')
+        df = df.sort_values(by=["Patient_ID", "Gene"])
+        df = df.set_index("Patient_ID")
+        tables["somatic_mutation"] = df # Maps dataframe name to dataframe
+
+        return tables
+
+    def _parse_site_level(self, file_path):
+        """Parse the site level data file."""
+        path_elements = file_path.split(os.sep) # Get a list of the levels of the path
+        file_name = path_elements[-1] # The last element will be the name of the file
+        df_name = file_name.split(".")[0] # Dataframe name will be the first section of file name; i.e. proteomics.txt.gz becomes proteomics
+
+        tables = {}
+
+        df = pd.read_csv(file_path, sep = "\t", index_col=0)
+        df.index = df.index.str.rsplit('-', n=1, expand=True) # Separate the index into a multiindex where the 1st level is the gene, and 2nd is the site
+        df.index = df.index.set_names(["Name", "Site"]) # Properly name the levels
+        df = df.sort_index()
+        df = df.transpose()
+        tables[df_name] = df # Maps dataframe name to dataframe
+
+        return tables
+
+    def _parse_followup(self, file_path):
+        """Parse the followup data file."""
+        tables = {}
+
+        df = pd.read_excel(file_path)
+
+        # Replace redundant values for 'not reported' with NaN
+        nan_equivalents = ['Not Reported/ Unknown', 'Reported/ Unknown', 'Not Applicable', 'na', 'unknown',
+            'Not Performed', 'Unknown tumor status', 'Unknown', 'Unknown Tumor Status', 'Not specified']
+
+        df = df.replace(nan_equivalents, np.nan)
+
+        # Rename, set, and sort index
+        df = df.rename(columns={'Case ID': 'Patient_ID'})
+        df = df.set_index("Patient_ID")
+        df = df.sort_index()
+
+        tables["followup"] = df
+
+        return tables
+
+    def _parse_table(self, file_path):
+        """Parse a data file that doesn't need any special handling. The dataframe is named with the first section of the file name."""
+        path_elements = file_path.split(os.sep) # Get a list of the levels of the path
+        file_name = path_elements[-1] # The last element will be the name of the file
+        df_name = file_name.split(".")[0] # Dataframe name will be the first section of file name; i.e. proteomics.txt.gz becomes proteomics
+
+        tables = {}
+
+        df = pd.read_csv(file_path, sep="\t", index_col=0)
+        df = df.transpose()
+        df = df.sort_index()
+        tables[df_name] = df # Maps dataframe name to dataframe
+
+        return tables
+
+    def _format_dataframes(self):
+        """Format the endometrial dataframes in the self._data dict, once all the data files have been parsed."""
         formatting_msg = "Formatting dataframes..."
         print(formatting_msg, end='\r')
 
+        # The definitions file was parsed along with the data files, but isn't a dataframe, so we'll take it out of the data dict
+        self._definitions = self._data.pop("definitions")
+
         # Separate out clinical, derived_molecular, and experimental_design dataframes
         all_clinical = self._data["clinical"]
         clinical = all_clinical[[
@@ -202,21 +264,22 @@ class Endometrial(DataSet):
 
         # Call a function from dataframe_tools.py to reindex all the dataframes with sample IDs instead of patient IDs
         # Skip the followup and somatic_mutation dataframes because they're already indexed with Patient_IDs
+        # Don't sort the dataframes yet, because finalize_all_dataframes sorts them all at the end
         sample_id_to_patient_id_map = self._data["clinical"]["Patient_ID"]
-        self._data = reindex_all_sample_id_to_patient_id(self._data, sample_id_to_patient_id_map, skip=["followup", "somatic_mutation"])
+        self._data = reindex_all_sample_id_to_patient_id(self._data, sample_id_to_patient_id_map, skip=["followup", "somatic_mutation"], sort=False)
 
         # We no longer need the Patient_ID column in the clinical dataframe, because it's in the index. So we'll remove it.
         clinical = self._data["clinical"]
         clinical = clinical.drop(columns="Patient_ID")
         self._data["clinical"] = clinical
 
-        # Get a union of all dataframes' indices, with duplicates removed
+        # Get a union of all dataframes' indices, with duplicates removed, and where each dataframe's rows are in it
         # Exclude the followup dataframe because it has samples from a different cohort that aren't included anywhere else in the dataset
-        master_index = unionize_indices(self._data, exclude="followup")
+        master_index, index_codes = unionize_indices(self._data, exclude="followup", return_codes=True)
 
         # Use the master index to reindex the clinical dataframe, so the clinical dataframe has a record of every sample in the dataset.
         clinical = self._data["clinical"]
-        clinical = clinical.reindex(master_index)
+        clinical = reindex_from_codes(clinical, master_index, index_codes["clinical"])
         self._data['clinical'] = clinical
 
         if self._version == "2.1.1":
@@ -226,10 +289,7 @@ class Endometrial(DataSet):
             followup = followup.drop(index=followup.index[~followup.index.isin(clinical.index)])
             self._data["followup"] = followup
 
-        # Call function from dataframe_tools.py to sort all tables first by sample status, and then by the index
-        self._data = sort_all_rows(self._data)
-
-        # Call function from dataframe_tools.py to standardize the names of the index and column axes
-        self._data = standardize_axes_names(self._data)
+        # Call function from dataframe_tools.py to sort all tables first by sample status, and then by the index, and standardize the names of the index and column axes
+        self._data = finalize_all_dataframes(self._data)
 
-        print(" " * len(formatting_msg), end='\r') # Erase the formatting message
+        print(" " * len(formatting_msg), end='\r') # Erase the formatting message
\ No newline at end of file
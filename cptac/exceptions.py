@@ -111,6 +111,10 @@ class DownloadingNewLatestWarning(CptacWarning):
     """Downloading a new latest data version. If they want to use an old version, they'll have to manually specify it."""
     pass
 
+class FailedCacheWriteWarning(CptacWarning):
+    """We couldn't save the formatted dataframes to the cache, so the data files will be parsed again next time the dataset is loaded."""
+    pass
+
 # Developer-directed exceptions
 class CptacDevError(Exception):
     """For exceptions that are probably the developer's fault."""
@@ -9,30 +9,153 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import concurrent.futures
 import os
-import requests
+import hashlib
+import json
+import tempfile
+import time
 import getpass
-import bs4
 from .file_tools import *
-from .exceptions import NoInternetError
+from .exceptions import InvalidParameterError, NoInternetError
 
-def download(dataset, version="latest", redownload=False):
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024 # Bytes to read from each response at a time, so we never hold a whole file in memory
+
+OFFLINE_ENV_VAR = "CPTAC_OFFLINE" # Set to 1, true, yes, or on to keep cptac from making any network requests
+CHECK_TTL_ENV_VAR = "CPTAC_CHECK_TTL" # How many seconds the results of the package version and index checks stay fresh
+DEFAULT_CHECK_TTL = 24 * 60 * 60
+CHECKS_FILE = "last_checks.json" # Where we record the results of those checks, in the package directory
+
+_offline = None # Set by set_offline. None means we go by the environment variable.
+_check_ttl = None # Set by set_check_ttl. None means we go by the environment variable.
+
+def set_offline(offline=True):
+    """Turn offline mode on or off. In offline mode, cptac never makes network requests: importing it and loading datasets use only the local files, and downloads raise a NoInternetError. Overrides the CPTAC_OFFLINE environment variable.
+
+    Parameters:
+    offline (bool or None, optional): Whether to work offline. None goes back to following the CPTAC_OFFLINE environment variable. Default True.
+    """
+    global _offline
+    if offline is not None and not isinstance(offline, bool):
+        raise InvalidParameterError(f"offline must be True, False, or None. You passed {offline}.")
+    _offline = offline
+
+def is_offline():
+    """Check whether offline mode is on, either from set_offline or the CPTAC_OFFLINE environment variable.
+
+    Returns:
+    bool: Whether cptac is in offline mode.
+    """
+    if _offline is not None:
+        return _offline
+    return os.environ.get(OFFLINE_ENV_VAR, "").strip().lower() in ("1", "true", "yes", "on")
+
+def set_check_ttl(seconds):
+    """Set how long the results of the package version and index checks are trusted before we check the server again. Overrides the CPTAC_CHECK_TTL environment variable.
+
+    Parameters:
+    seconds (int or float or None): The number of seconds. 0 checks every time. None goes back to following the CPTAC_CHECK_TTL environment variable, or the default of one day if it isn't set.
+    """
+    global _check_ttl
+    if seconds is not None and (isinstance(seconds, bool) or not isinstance(seconds, (int, float)) or seconds < 0):
+        raise InvalidParameterError(f"seconds must be a non-negative number, or None. You passed {seconds}.")
+    _check_ttl = seconds
+
+def get_check_ttl():
+    """Get how long the results of the package version and index checks are trusted, in seconds.
+
+    Returns:
+    float: The number of seconds.
+    """
+    if _check_ttl is not None:
+        return _check_ttl
+    try:
+        return float(os.environ[CHECK_TTL_ENV_VAR])
+    except (KeyError, ValueError): # Not set, or not a number
+        return DEFAULT_CHECK_TTL
+
+def get_recent_check(name):
+    """Get the result of a check against the server, if it was recorded recently enough to still be trusted.
+
+    Parameters:
+    name (str): The name the check was recorded under.
+
+    Returns:
+    str: The recorded result, or None if there isn't one or it's too old.
+    """
+    checks = _read_checks()
+    check = checks.get(name)
+    if not isinstance(check, dict):
+        return None
+    if time.time() - check.get("time", 0) >= get_check_ttl():
+        return None
+    return check.get("value")
+
+def record_check(name, value):
+    """Record the result of a check against the server, with the current time, so we can skip the check for a while.
+
+    Parameters:
+    name (str): The name to record the check under.
+    value (str): The result of the check.
+    """
+    checks = _read_checks()
+    checks[name] = {"time": time.time(), "value": value}
+
+    # Write to a temporary file and rename it, so other processes never read a half written file
+    path_here = os.path.abspath(os.path.dirname(__file__))
+    try:
+        temp_fd, temp_path = tempfile.mkstemp(prefix=f".{CHECKS_FILE}.", dir=path_here)
+        with os.fdopen(temp_fd, 'w') as temp_file:
+            json.dump(checks, temp_file)
+        os.replace(temp_path, os.path.join(path_here, CHECKS_FILE))
+    except OSError: # E.g. the package directory isn't writable. Then we'll just check again next time.
+        pass
+
+def _read_checks():
+    """Read the recorded checks from disk.
+
+    Returns:
+    dict: The recorded checks, mapping names to dicts with the time and value of the check.
+    """
+    checks_path = os.path.join(os.path.abspath(os.path.dirname(__file__)), CHECKS_FILE)
+    try:
+        with open(checks_path, 'r') as checks_file:
+            checks = json.load(checks_file)
+    except (OSError, ValueError): # No checks recorded yet, or the file is corrupted
+        return {}
+    return checks if isinstance(checks, dict) else {}
+
+def _check_online():
+    """Raise a NoInternetError if we're in offline mode. Called before every network request."""
+    if is_offline():
+        raise NoInternetError(f"cptac is in offline mode, so it can't connect to the internet. To go online, call cptac.set_offline(False), or unset the {OFFLINE_ENV_VAR} environment variable.")
+
+@hash_cache_batch() # Save the hashes of all the files we check or download at once, at the end
+def download(dataset, version="latest", redownload=False, n_jobs=4):
     """Download data files for the specified datasets. Defaults to downloading latest version on server.
 
     Parameters:
     dataset (str): The name of the dataset to download data for
     version (str, optional): Which version of the data files to download. Defaults to latest on server.
     redownload (bool, optional): Whether to redownload the data files, even if that version of the data is already downloaded. Default False.
+    n_jobs (int, optional): How many files to download at once. 1 downloads them one at a time, and -1 downloads all of them at once. Default 4.
 
     Returns:
     bool: Indicates whether download was successful.
     """
+    if not isinstance(n_jobs, int) or isinstance(n_jobs, bool) or (n_jobs < 1 and n_jobs != -1):
+        raise InvalidParameterError(f"n_jobs must be a positive integer, or -1 to download all files at once. You passed {n_jobs}.")
+
+    # requests is slow to import, and we don't need it unless we're actually making requests, so we import it in the functions that do
+    import requests
+    import requests.adapters
+
     # Get our dataset path
     dataset = dataset.lower()
     dataset_path = get_dataset_path(dataset)
 
-    # Update the index
-    update_index(dataset)
+    # Update the index. We always check the server here, even if we checked recently, since they're asking for a download.
+    update_index(dataset, force=True)
 
     # Load the index
     index = get_index(dataset)
@@ -54,8 +177,7 @@ def download(dataset, version="latest", redownload=False):
                 # Compare the server and local hashes, to make sure there was no data corruption
                 file_path = os.path.join(version_path, data_file)
                 if os.path.isfile(file_path):
-                    file_index = version_index.get(data_file)
-                    server_hash = file_index.get("hash")
+                    server_hash = version_index[data_file].hash
                     local_hash = hash_file(file_path) 
                     if local_hash == server_hash:
                         continue
@@ -73,37 +195,59 @@ def download(dataset, version="latest", redownload=False):
         "lscc",
         ]
     password = None
+    if dataset in password_protected_datasets:
+        password = getpass.getpass(prompt='Password: ') # We manually specify the prompt parameter so it shows up in Jupyter Notebooks
+        print("\033[F", end='\r') # Use an ANSI escape sequence to move cursor back up to the beginning of the last line, so in the next line we can clear the password prompt
+        print("\033[K", end='\r') # Use an ANSI escape sequence to print a blank line, to clear the password prompt
 
     total_files = len(files_to_download)
-    for data_file in files_to_download:
-
-        if (dataset in password_protected_datasets) and (password is None):
-            password = getpass.getpass(prompt='Password: ') # We manually specify the prompt parameter so it shows up in Jupyter Notebooks
-            print("\033[F", end='\r') # Use an ANSI escape sequence to move cursor back up to the beginning of the last line, so in the next line we can clear the password prompt
-            print("\033[K", end='\r') # Use an ANSI escape sequence to print a blank line, to clear the password prompt
-
-        file_index = version_index.get(data_file)
-        server_hash = file_index.get("hash")
-        file_url = file_index.get("url")
-
-        file_path = os.path.join(version_path, data_file)
-        file_number = files_to_download.index(data_file) + 1
+    max_workers = total_files if n_jobs == -1 else min(n_jobs, total_files)
+
+    # All the downloads share one session, so they reuse its pooled connections instead of opening a new one for each file
+    with requests.Session() as session:
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while len(files_to_download) > 0:
+                futures = {}
+                for data_file in files_to_download:
+                    server_hash, file_url = version_index[data_file]
+                    file_path = os.path.join(version_path, data_file)
+
+                    future = executor.submit(download_file, file_url, file_path, server_hash, password=password, session=session, verbose=False)
+                    futures[future] = data_file
+
+                # Print how many files are done as they finish, since the workers can't each print their own message over the others
+                wrong_password_files = []
+                download_msg = f"Downloading data files (0/{len(futures)})..."
+                print(download_msg, end='\r')
+                for file_number, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+                    download_msg = f"Downloading data files ({file_number}/{len(futures)})..."
+                    print(download_msg, end='\r')
+
+                    downloaded_path = future.result() # Re-raises any exception from the download, e.g. a NoInternetError
+                    if downloaded_path == "wrong_password":
+                        wrong_password_files.append(futures[future])
+                print(" " * len(download_msg), end='\r') # Erase the downloading message
+
+                # If the password was wrong, none of the files downloaded, so ask again and retry them
+                files_to_download = [data_file for data_file in files_to_download if data_file in wrong_password_files]
+                if len(files_to_download) > 0:
+                    password = getpass.getpass(prompt="Wrong password. Try again: ")
+                    print("\033[F", end='\r') # Use an ANSI escape sequence to move cursor back up to the beginning of the last line, so in the next line we can clear the password prompt
+                    print("\033[K", end='\r') # Use an ANSI escape sequence to print a blank line, to clear the password prompt
 
-        downloaded_path = download_file(file_url, file_path, server_hash, password=password, file_message="data files", file_number=file_number, total_files=total_files)
-
-        while downloaded_path == "wrong_password":
-            password = getpass.getpass(prompt="Wrong password. Try again: ")
-            print("\033[F", end='\r') # Use an ANSI escape sequence to move cursor back up to the beginning of the last line, so in the next line we can clear the password prompt
-            print("\033[K", end='\r') # Use an ANSI escape sequence to print a blank line, to clear the password prompt
-
-            downloaded_path = download_file(file_url, file_path, server_hash, password=password, file_message="data files", file_number=file_number, total_files=total_files)
     return True
 
-def update_index(dataset):
-    """Check if the index of the given dataset is up to date with server version, and update it if needed.
+@hash_cache_batch() # Save the hashes of all the files we check or download at once, at the end
+def update_index(dataset, force=False):
+    """Check if the index of the given dataset is up to date with server version, and update it if needed. If we checked the server recently (see set_check_ttl), and the index hasn't changed since, we trust that check and don't make any network requests.
 
     Parameters:
     dataset (str): The name of the dataset to check the index of.
+    force (bool, optional): Whether to check the server even if we checked recently. Default False.
 
     Returns:
     bool: Indicates if we were able to check the index and update if needed (i.e. we had internet)
@@ -120,7 +264,16 @@ def update_index(dataset):
     index_urls_path = os.path.join(dataset_path, index_urls_file)
     urls_dict = parse_tsv_dict(index_urls_path)
     index_hash_url = urls_dict.get(index_hash_file)
+    index_path = os.path.join(dataset_path, index_file)
+    recent_check_name = f"{dataset}_index_hash"
 
+    # See if we recently checked what the index hash should be. Since hash_file caches hashes, this doesn't read the index file.
+    if not force:
+        recent_server_hash = get_recent_check(recent_check_name)
+        if recent_server_hash is not None and os.path.isfile(index_path) and hash_file(index_path) == recent_server_hash:
+            return True
+
+    _check_online() # Before we print the checking message
     checking_msg = "Checking that index is up-to-date..."
     print(checking_msg, end='\r')
     try:
@@ -128,7 +281,7 @@ def update_index(dataset):
     finally:
         print(" " * len(checking_msg), end='\r') # Erase the checking message, even if there was an internet error
 
-    index_path = os.path.join(dataset_path, index_file)
+    record_check(recent_check_name, server_index_hash)
 
     if os.path.isfile(index_path):
         local_index_hash = hash_file(index_path)
@@ -137,6 +290,7 @@ def update_index(dataset):
 
     index_url = urls_dict.get(index_file)
     download_file(index_url, index_path, server_index_hash, file_message="index")
+    clear_index_cache(dataset) # So we don't keep using the old index
 
     if os.path.isfile(index_path):
         local_index_hash = hash_file(index_path)
@@ -154,6 +308,8 @@ def download_text(url):
     Returns:
     str: The downloaded text.
     """
+    _check_online()
+    import requests # Only imported when needed, to keep importing cptac fast
     try:
         response = requests.get(url, allow_redirects=True)
         response.raise_for_status() # Raises a requests HTTPError if the response code was unsuccessful
@@ -163,8 +319,8 @@ def download_text(url):
     text = response.text.strip()
     return text
 
-def download_file(url, path, server_hash, password=None, file_message=None, file_number=None, total_files=None): 
-    """Download a file from a given url to the specified location.
+def download_file(url, path, server_hash, password=None, file_message=None, file_number=None, total_files=None, session=None, verbose=True): 
+    """Download a file from a given url to the specified location. The file is streamed in chunks to a .part file in the same directory, and only moved to the path once its hash matches, so an interrupted or corrupted download never replaces a good file. If a download is interrupted, the .part file is kept, and the next download of the file picks up where it left off.
 
     Parameters:
     url (str): The direct download url for the file.
@@ -174,9 +330,11 @@ def download_file(url, path, server_hash, password=None, file_message=None, file
     file_message (str, optional): Identifing message about the file, to be printed while it's downloading. Default None will cause the full file name to be printed.
     file_number (int, optional): Which file this is in a batch of files, if you want to print a "File 1/15", "File 2/15", etc. sort of message. Must also pass total_files parameter.
     total_files (int, optional): The total number of files in the download batch, if you're printing that. Must also pass file_number parameter.
+    session (requests.Session, optional): A session to make the requests with, so several downloads can share its pooled connections. Default None makes a new session for this download.
+    verbose (bool, optional): Whether to print the downloading message. Pass False when downloading several files at once, so their messages don't print over each other. Default True.
 
     Returns:
-    str: The path the file was downloaded to.
+    str: The path the file was downloaded to, or "wrong_password" if we got the password page instead of the file.
     """
     # We provide the option of displaying a message indicating which file this is in a batch of files we're currently downloading
     batch_status = ''
@@ -187,40 +345,179 @@ def download_file(url, path, server_hash, password=None, file_message=None, file
         file_message = path.split(os.sep)[-1]
 
     download_msg = f"Downloading {file_message}{batch_status}..."
-    print(download_msg, end='\r')
+    if verbose:
+        print(download_msg, end='\r')
+
+    _check_online()
+    import requests # Only imported when needed, to keep importing cptac fast
+
+    own_session = session is None
+    if own_session:
+        session = requests.Session()
+
+    try:
+        for i in range(2):
+            try:
+                result = _stream_file(session, url, path, server_hash, password)
+            except NoInternetError:
+                if i == 1:
+                    raise
+                continue # The partial file is kept, so the second try resumes where the first one stopped
+
+            if result is not None:
+                if verbose:
+                    print(" " * len(download_msg), end='\r') # Erase the downloading message
+                return result
+
+        raise NoInternetError(f"The downloaded {file_message} didn't match its expected hash on either try, so it may have been corrupted in transit. Check your internet connection and try again.")
+    finally:
+        if own_session:
+            session.close()
 
-    for i in range(2):
+def _stream_file(session, url, path, server_hash, password):
+    """Make one attempt at downloading a file, streaming it in chunks to a .part file while hashing it, and moving it to the path if the hash matches. If there's already a .part file from an interrupted download of the same file, we ask the server for just the rest of the file with a Range header. If the server ignores the range and sends the whole file, we start over.
+
+    Parameters:
+    session (requests.Session): The session to make the requests with.
+    url (str): The direct download url for the file.
+    path (str): The path to save the file to.
+    server_hash (str): The md5 hash the file should have.
+    password (str): If the file is password protected, the password for it. None otherwise.
+
+    Returns:
+    str: The path the file was downloaded to, or "wrong_password" if we got the password page instead of the file, or None if the hash didn't match.
+    """
+    part_path = f"{path}.part"
+    sidecar_path = f"{part_path}.json"
+    hasher, bytes_received = _load_partial_download(part_path, sidecar_path, server_hash)
+    resume_from = bytes_received
+
+    headers = {}
+    if resume_from > 0:
+        headers["Range"] = f"bytes={resume_from}-"
+
+    import requests # Only imported when needed, to keep importing cptac fast
+
+    head = b"" # The start of the file, to check whether we got the password page instead
+    try:
+        if password is None:
+            response = session.get(url, allow_redirects=True, stream=True, headers=headers)
+        else: # The file is password protected
+            import bs4 # Only needed for password protected files
+            with requests.Session() as password_session: # Use a separate session object to save this file's cookies, since the shared one may be used by other downloads at the same time
+                # Construct the urls for our GET and POST requests
+                get_url = url
+                post_url = get_url.replace("https://byu.box.com/shared", "https://byu.app.box.com/public")
+
+                # Send initial GET request and parse the request token out of the response
+                get_response = password_session.get(get_url) 
+                soup = bs4.BeautifulSoup(get_response.text, "html.parser")
+                token_tag = soup.find(id="request_token")
+                token = token_tag.get("value")
+
+                # Send a POST request, with the password and token, to get the data
+                payload = {
+                    'password': password,
+                    'request_token': token}
+                response = password_session.post(post_url, data=payload, stream=True, headers=headers)
+
+        with response:
+            if resume_from > 0 and response.status_code == 416: # Range Not Satisfiable, which means our .part file already has the whole file
+                pass
+            else:
+                response.raise_for_status() # Raises a requests.HTTPError if the response code was unsuccessful
+
+                content_range = response.headers.get("Content-Range", "")
+                if resume_from > 0 and not (response.status_code == 206 and content_range.startswith(f"bytes {resume_from}-")):
+                    # The server ignored our range and is sending the whole file, so we start over
+                    hasher = hashlib.md5()
+                    bytes_received = 0
+                    resume_from = 0
+
+                with open(part_path, 'ab' if resume_from > 0 else 'wb') as dest:
+                    try:
+                        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                            if resume_from == 0 and len(head) < 64:
+                                head += chunk[:64]
+                            dest.write(chunk)
+                            hasher.update(chunk)
+                            bytes_received += len(chunk)
+                    finally:
+                        # Record how much we got, even if the download was interrupted, so the next try can resume from there
+                        dest.flush()
+                        _write_partial_sidecar(sidecar_path, server_hash, bytes_received)
+
+    except requests.RequestException: # Parent class for all exceptions in the requests module
+        raise NoInternetError("Insufficient internet. Check your internet connection.") from None
+
+    if hasher.hexdigest() == server_hash: # Only replace the old file if the new one downloaded successfully.
+        os.replace(part_path, path)
+        os.remove(sidecar_path)
+        record_file_hash(path, server_hash) # So we don't have to hash the file again the next time we check it
+        return path
+
+    # The data we got is bad, so get rid of it, so the next try starts over
+    _remove_partial_download(part_path, sidecar_path)
+
+    if head.strip().startswith(b"<!DOCTYPE html>"): # The password was wrong, so we just got a webpage
+        return "wrong_password"
+    return None
+
+def _load_partial_download(part_path, sidecar_path, server_hash):
+    """Check for a .part file left by an interrupted download, and if it's for the same version of the file, hash what we have so far, so we can resume the download.
+
+    Parameters:
+    part_path (str): The path to the .part file.
+    sidecar_path (str): The path to the sidecar file that records the hash the full file should have, and how many bytes of it the .part file has.
+    server_hash (str): The hash the file we're downloading should have.
+
+    Returns:
+    hashlib md5 object: The hash of the bytes we already have, to continue updating with the rest of the file.
+    int: How many bytes we already have. 0 if there was no usable .part file.
+    """
+    hasher = hashlib.md5()
+    try:
+        with open(sidecar_path) as sidecar:
+            state = json.load(sidecar)
+        bytes_received = int(state["bytes_received"])
+        if state["hash"] != server_hash or os.path.getsize(part_path) < bytes_received: # It's from a different version of the file, or we lost some of the data
+            raise ValueError()
+    except (OSError, ValueError, KeyError, TypeError): # No .part file, or we can't trust it
+        _remove_partial_download(part_path, sidecar_path)
+        return hasher, 0
+
+    with open(part_path, 'r+b') as part:
+        part.truncate(bytes_received) # Drop anything written after the sidecar was last updated
+        while True:
+            chunk = part.read(DOWNLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+
+    return hasher, bytes_received
+
+def _write_partial_sidecar(sidecar_path, server_hash, bytes_received):
+    """Record the hash the full file should have, and how many bytes of it we've written to the .part file. We write to a temporary file and rename it, so the sidecar is never half written.
+
+    Parameters:
+    sidecar_path (str): The path to the sidecar file.
+    server_hash (str): The hash the full file should have.
+    bytes_received (int): How many bytes of the file are in the .part file.
+    """
+    temp_path = f"{sidecar_path}.tmp"
+    with open(temp_path, 'w') as temp:
+        json.dump({"hash": server_hash, "bytes_received": bytes_received}, temp)
+    os.replace(temp_path, sidecar_path)
+
+def _remove_partial_download(part_path, sidecar_path):
+    """Delete the .part file and sidecar for a download, if they exist.
+
+    Parameters:
+    part_path (str): The path to the .part file.
+    sidecar_path (str): The path to the sidecar file.
+    """
+    for file_path in (part_path, sidecar_path):
         try:
-            if password is None:
-                response = requests.get(url, allow_redirects=True)
-            else: # The file is password protected
-                with requests.Session() as session: # Use a session object to save cookies
-                    # Construct the urls for our GET and POST requests
-                    get_url = url
-                    post_url = get_url.replace("https://byu.box.com/shared", "https://byu.app.box.com/public")
-
-                    # Send initial GET request and parse the request token out of the response
-                    get_response = session.get(get_url) 
-                    soup = bs4.BeautifulSoup(get_response.text, "html.parser")
-                    token_tag = soup.find(id="request_token")
-                    token = token_tag.get("value")
-
-                    # Send a POST request, with the password and token, to get the data
-                    payload = {
-                        'password': password,
-                        'request_token': token}
-                    response = session.post(post_url, data=payload)
-
-            response.raise_for_status() # Raises a requests.HTTPError if the response code was unsuccessful
-        except requests.RequestException: # Parent class for all exceptions in the requests module
-            raise NoInternetError("Insufficient internet. Check your internet connection.") from None
-            
-        local_hash = hash_bytes(response.content)
-        if local_hash == server_hash: # Only replace the old file if the new one downloaded successfully.
-            with open(path, 'wb') as dest:
-                dest.write(response.content)
-            print(" " * len(download_msg), end='\r') # Erase the downloading message
-            return path
-        elif response.text.strip().startswith("<!DOCTYPE html>"): # The password was wrong, so we just got a webpage
-            print(" " * len(download_msg), end='\r') # Erase the downloading message
-            return "wrong_password"
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
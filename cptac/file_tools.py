@@ -9,13 +9,41 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import collections
+import collections.abc
+import contextlib
+import gzip
 import hashlib
 import os
 import glob
+import json
+import pickle
+import tempfile
+import threading
+import types
 import warnings
 import packaging.version
+import pandas as pd
 from .exceptions import *
 
+try:
+    import fcntl # Only on Unix
+except ImportError:
+    fcntl = None
+
+HASH_CHUNK_SIZE = 1024 * 1024 # Bytes to read at a time when hashing a file, so we never hold a whole file in memory
+HASH_CACHE_FILE = "hash_cache.json" # Persistent cache of file hashes, in the package directory next to the dataset directories
+
+_hash_cache = None # The hash cache, loaded from HASH_CACHE_FILE the first time we need it. Maps absolute paths to [size, mtime_ns, inode, hash]
+_hash_cache_lock = threading.Lock() # Downloads run in threads, and each records the hash of the file it downloaded
+_hash_cache_pending = {} # Hashes added since the cache was last written to disk, with the same format as _hash_cache
+_hash_cache_batch_depth = 0 # How many hash_cache_batch blocks we're in. New hashes are only written to disk when this is 0.
+
+IndexEntry = collections.namedtuple("IndexEntry", ["hash", "url"]) # One data file's entry in a dataset index
+
+_dataset_paths = {} # Maps dataset names to the paths of their directories, once we've checked that they exist
+_index_cache = {} # Maps dataset names to (index file stat key, parsed index), so we only parse an index file again if it changed
+
 def get_dataset_path(dataset):
     """Get the path to the main directory for a dataset.
 
@@ -25,10 +53,15 @@ def get_dataset_path(dataset):
     Returns:
     str: The path to the main directory of the specified dataset.
     """
+    dataset_path = _dataset_paths.get(dataset)
+    if dataset_path is not None: # The dataset directories ship with the package, so once we've found one, it's there to stay
+        return dataset_path
+
     path_here = os.path.abspath(os.path.dirname(__file__))
     dataset_dir = f"data_{dataset}"
     dataset_path = os.path.join(path_here, dataset_dir)
     if os.path.isdir(dataset_path):
+        _dataset_paths[dataset] = dataset_path
         return dataset_path
     else:
         raise InvalidParameterError(f"{dataset} is not a valid dataset.")
@@ -128,27 +161,35 @@ def get_latest_installed(dataset_path):
     return latest_installed
 
 def get_index(dataset):
-    """Get the index for a dataset, as a nested dictionary
+    """Get the index for a dataset, as a nested mapping. The parsed index is cached, and only parsed again if the index file changes, so it's cheap to call this repeatedly.
 
     Parameters:
     dataset(str): The name of dataset you want the index of.
 
     Returns:
-    dict: The index, as a nested dictionary.
+    mapping: The index. Maps version numbers to mappings of data file names to IndexEntry namedtuples, which have hash and url fields. It's shared between callers, so it's read-only.
     """
     dataset_path = get_dataset_path(dataset)
     index_file = "index.txt"
     index_path = os.path.join(dataset_path, index_file)
 
     # Check that the index is installed
-    if not os.path.isfile(index_path):
+    try:
+        index_stat = os.stat(index_path)
+    except FileNotFoundError:
         dataset_version_pattern = f"{dataset}_v*" # If not, check whether we've installed any version directories, to know what type of error to raise
         dataset_version_search = os.path.join(dataset_path, dataset_version_pattern)
         version_dirs = glob.glob(dataset_version_search)
         if len(version_dirs) > 0:  
-            raise MissingFileError(f"Missing file '{index_file}'. Run \"cptac.download(dataset='{dataset}')\" to download it.")
+            raise MissingFileError(f"Missing file '{index_file}'. Run \"cptac.download(dataset='{dataset}')\" to download it.") from None
         else:
-            raise DatasetNotInstalledError(f"{dataset} dataset is not installed. To install, run \"cptac.download(dataset='{dataset}')\".")
+            raise DatasetNotInstalledError(f"{dataset} dataset is not installed. To install, run \"cptac.download(dataset='{dataset}')\".") from None
+
+    # If the index file hasn't changed since we last parsed it, use what we parsed then
+    stat_key = (index_stat.st_size, index_stat.st_mtime_ns, index_stat.st_ino)
+    cached = _index_cache.get(dataset)
+    if cached is not None and cached[0] == stat_key:
+        return cached[1]
 
     with open(index_path, 'r') as index_file:
         index_lines = index_file.readlines()
@@ -165,11 +206,24 @@ def get_index(dataset):
             file_name = line_list[0]
             file_hash = line_list[1]
             file_url = line_list[2]
-            index[version][file_name] = {}
-            index[version][file_name]["hash"] = file_hash
-            index[version][file_name]["url"] = file_url
+            index[version][file_name] = IndexEntry(hash=file_hash, url=file_url)
+
+    # Wrap the dicts in read-only views, since every caller gets the same index
+    index = types.MappingProxyType({version: types.MappingProxyType(version_index) for version, version_index in index.items()})
+    _index_cache[dataset] = (stat_key, index)
     return index
 
+def clear_index_cache(dataset=None):
+    """Forget the parsed index for a dataset, so the next get_index call parses the index file again. Call this after writing a new index file.
+
+    Parameters:
+    dataset (str, optional): The dataset to forget the index of. Default of None forgets all of them.
+    """
+    if dataset is None:
+        _index_cache.clear()
+    else:
+        _index_cache.pop(dataset, None)
+
 def parse_tsv_dict(path):
     """Read in a dictionary from the given two column tsv file.
 
@@ -194,19 +248,183 @@ def parse_tsv_dict(path):
 
     return data_dict
 
-def hash_file(path):
-    """Return the md5 hash for the file at the given path.
+def read_gct(path, index_col=None, dtype="float64"):
+    """Read in a GCT file (version 1.2 or 1.3), parsing the data matrix directly as the given dtype.
+
+    The column metadata rows of a version 1.3 file are skipped, so they never get mixed into the data columns.
+
+    Parameters:
+    path (str): The path to the GCT file. May be gzipped, if the name ends in ".gz".
+    index_col (int or str, optional): The column to use as the index, as for pandas.read_csv. Default of None gives a default integer index.
+    dtype (str or numpy.dtype, optional): The dtype to parse the data matrix columns as. Default "float64". The row metadata columns are always parsed as strings.
+
+    Returns:
+    pandas.DataFrame: The file's row metadata columns, followed by its data matrix columns.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as gct_file:
+        gct_version = gct_file.readline().strip()
+        dimensions = gct_file.readline().strip().split("\t")
+        header = gct_file.readline().rstrip("\r\n").split("\t")
+
+    if gct_version == "#1.2":
+        num_row_meta = 1 # Just the Description column
+        num_col_meta = 0
+    elif gct_version == "#1.3":
+        num_row_meta = int(dimensions[2])
+        num_col_meta = int(dimensions[3])
+    else:
+        raise FileError(f"The file {path} has unsupported GCT version '{gct_version}'. Only versions 1.2 and 1.3 are supported.")
+
+    # Rename duplicate column headers the same way pandas.read_csv would (e.g. "id", "id.1"), so the column names match what we'd get reading the file without a header
+    counts = collections.defaultdict(int)
+    names = []
+    for name in header:
+        count = counts[name]
+        while count > 0:
+            counts[name] = count + 1
+            name = f"{name}.{count}"
+            count = counts[name]
+        names.append(name)
+        counts[name] = count + 1
+
+    num_meta_cols = 1 + num_row_meta # The id column, plus the row metadata columns
+    dtypes = {name: (object if i < num_meta_cols else dtype) for i, name in enumerate(names)}
+
+    df = pd.read_csv(path, sep="\t", header=None, names=names, skiprows=3 + num_col_meta, index_col=index_col, dtype=dtypes, float_precision="high")
+    return df
+
+def hash_file(path, use_cache=True):
+    """Return the md5 hash for the file at the given path. The file is read in chunks, so it is never all in memory at once. Hashes are cached on disk, keyed by the file's path, size, modification time, and inode, so a file that hasn't changed isn't hashed again.
 
     Parameters:
     path (str): The absolute path to the file to hash.
+    use_cache (bool, optional): Whether to use the cached hash for the file, if it hasn't changed since it was hashed. If False, the file is hashed again, and the cache is updated. Default True.
 
     Returns:
     str: The hash for the file.
     """
+    path = os.path.abspath(path)
+    file_stat = os.stat(path)
+    stat_key = [file_stat.st_size, file_stat.st_mtime_ns, file_stat.st_ino]
+
+    if use_cache:
+        with _hash_cache_lock:
+            cached = _load_hash_cache().get(path)
+        if cached is not None and cached[:3] == stat_key:
+            return cached[3]
+
+    hasher = hashlib.md5()
     with open(path, 'rb') as file_obj:
-        hash = hash_bytes(file_obj.read())
+        while True:
+            chunk = file_obj.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    hash = hasher.hexdigest()
+
+    _save_hash(path, stat_key, hash)
     return hash
 
+def record_file_hash(path, hash):
+    """Add the hash for a file to the hash cache, when we already know it, e.g. because we hashed the file as we downloaded it.
+
+    Parameters:
+    path (str): The path to the file.
+    hash (str): The md5 hash of the file's current contents.
+    """
+    path = os.path.abspath(path)
+    file_stat = os.stat(path)
+    _save_hash(path, [file_stat.st_size, file_stat.st_mtime_ns, file_stat.st_ino], hash)
+
+def _load_hash_cache():
+    """Get the hash cache, reading it from disk if we haven't yet. Must be called with _hash_cache_lock held.
+
+    Returns:
+    dict: The hash cache, mapping absolute paths to [size, mtime_ns, inode, hash].
+    """
+    global _hash_cache
+    if _hash_cache is None:
+        cache_path = os.path.join(os.path.abspath(os.path.dirname(__file__)), HASH_CACHE_FILE)
+        try:
+            with open(cache_path, 'r') as cache_file:
+                _hash_cache = json.load(cache_file)
+            if not isinstance(_hash_cache, dict):
+                _hash_cache = {}
+        except (OSError, ValueError): # There's no cache yet, or it's corrupted, so we start a new one
+            _hash_cache = {}
+    return _hash_cache
+
+def _save_hash(path, stat_key, hash):
+    """Add a file's hash to the hash cache, and write the cache to disk, unless we're in a hash_cache_batch block, in which case it's written at the end of the block.
+
+    Parameters:
+    path (str): The absolute path to the file.
+    stat_key (list of int): The file's size, mtime_ns, and inode when it was hashed.
+    hash (str): The file's hash.
+    """
+    with _hash_cache_lock:
+        entry = stat_key + [hash]
+        _load_hash_cache()[path] = entry
+        _hash_cache_pending[path] = entry
+        if _hash_cache_batch_depth == 0:
+            _write_hash_cache()
+
+@contextlib.contextmanager
+def hash_cache_batch():
+    """Collect the hashes added to the hash cache in the body of a with block, and write them to disk all at once at the end of it, instead of rewriting the whole cache file for each one. Blocks can be nested, in which case the hashes are written at the end of the outermost one. Can also be used as a decorator."""
+    global _hash_cache_batch_depth
+    with _hash_cache_lock:
+        _hash_cache_batch_depth += 1
+    try:
+        yield
+    finally:
+        with _hash_cache_lock:
+            _hash_cache_batch_depth -= 1
+            if _hash_cache_batch_depth == 0:
+                _write_hash_cache()
+
+def _write_hash_cache():
+    """Write the pending hashes to the hash cache file. We merge them into what's on disk now, rather than writing our whole cache over it, so we don't drop hashes another process saved since we read it. Must be called with _hash_cache_lock held.
+
+    Returns: None
+    """
+    if len(_hash_cache_pending) == 0:
+        return
+
+    cache_dir = os.path.abspath(os.path.dirname(__file__))
+    cache_path = os.path.join(cache_dir, HASH_CACHE_FILE)
+    try:
+        with open(f"{cache_path}.lock", 'w') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX) # Keep other processes from writing the cache between when we read it and when we replace it. Released when the file is closed.
+
+            try:
+                with open(cache_path, 'r') as cache_file:
+                    hash_cache = json.load(cache_file)
+                if not isinstance(hash_cache, dict):
+                    hash_cache = {}
+            except (OSError, ValueError): # There's no cache yet, or it's corrupted, so we start a new one
+                hash_cache = {}
+            hash_cache.update(_hash_cache_pending)
+
+            # Write to a temporary file and rename it, so other processes never read a half written cache
+            temp_fd, temp_path = tempfile.mkstemp(prefix=f".{HASH_CACHE_FILE}.", dir=cache_dir)
+            try:
+                with os.fdopen(temp_fd, 'w') as temp_file:
+                    json.dump(hash_cache, temp_file)
+                os.replace(temp_path, cache_path)
+            except BaseException:
+                if os.path.isfile(temp_path):
+                    os.remove(temp_path)
+                raise
+
+        _load_hash_cache().update(hash_cache) # Pick up the hashes other processes saved, too
+    except OSError: # E.g. the package directory isn't writable. The cache is just an optimization, so we carry on without saving it.
+        pass
+    finally:
+        _hash_cache_pending.clear()
+
 def hash_bytes(bytes):
     """Hash the given bytes.
 
@@ -220,3 +438,176 @@ def hash_bytes(bytes):
     hasher.update(bytes)
     hash = hasher.hexdigest()
     return hash
+
+def get_cache_path(dataset, version, dtype="float64"):
+    """Get the path to the directory where the formatted dataframes for a version of a dataset are cached.
+
+    Parameters:
+    dataset (str): The name of the dataset to get the cache path for.
+    version (str): The version number of the dataset. This function will not parse "latest"; version should have been already validated.
+    dtype (str, optional): The dtype the dataset was loaded with. Datasets loaded with a dtype other than the default "float64" get a separate cache, so switching between them doesn't invalidate the other's cache.
+
+    Returns:
+    str: The path to the cache directory. It is inside the directory for that version of the dataset, and may not exist yet.
+    """
+    dataset_path = get_dataset_path(dataset)
+    version_path = os.path.join(dataset_path, f"{dataset}_v{version}")
+    cache_dir = "cache" if dtype == "float64" else f"cache_{dtype}"
+    cache_path = os.path.join(version_path, cache_dir)
+    return cache_path
+
+def read_cache(cache_path, cache_key, lazy=False):
+    """Load the cached dataframes and definitions for a dataset, if the cache exists and was created with the given key.
+
+    Parameters:
+    cache_path (str): The path to the cache directory.
+    cache_key (dict): The key the cache must have been saved with for it to be valid. Must be JSON serializable.
+    lazy (bool, optional): If True, don't read any of the dataframes yet, and instead return a CachedDataDict that reads each one the first time it's accessed. Default is False.
+
+    Returns:
+    dict or CachedDataDict: The cached dataframes, with names as keys. None if there was no valid cache.
+    dict: The cached definitions. None if there was no valid cache.
+    list of list of str: The category name and message of each warning issued while parsing the data files, when the cache was saved. None if there was no valid cache.
+    """
+    manifest_path = os.path.join(cache_path, "manifest.json")
+    if not os.path.isfile(manifest_path):
+        return None, None, None
+
+    try:
+        with open(manifest_path, 'r') as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError): # ValueError covers a corrupted manifest file
+        return None, None, None
+
+    if manifest.get("key") != cache_key: # Something the dataframes depend on has changed since the cache was saved, so it's stale
+        return None, None, None
+
+    if lazy:
+        for name in manifest["tables"]:
+            if not os.path.isfile(os.path.join(cache_path, f"{name}.pkl")):
+                return None, None, None
+        data = CachedDataDict(cache_path, manifest["tables"], manifest.get("shapes", {}))
+        return data, manifest["definitions"], manifest.get("warnings", [])
+
+    data = {}
+    for name in manifest["tables"]:
+        table_path = os.path.join(cache_path, f"{name}.pkl")
+        try:
+            data[name] = pd.read_pickle(table_path)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError): # A missing, truncated, or otherwise unreadable table file invalidates the whole cache
+            return None, None, None
+
+    return data, manifest["definitions"], manifest.get("warnings", [])
+
+class CachedDataDict(collections.abc.Mapping):
+    """A read-only dict of a dataset's dataframes that reads each dataframe from the cache the first time it's accessed, and keeps it in memory after that. Used for lazy loading, so that we only read the dataframes that are actually used."""
+
+    def __init__(self, cache_path, tables, shapes):
+        """Initialize the dict. No dataframes are read until they're accessed.
+
+        Parameters:
+        cache_path (str): The path to the cache directory.
+        tables (list of str): The names of the dataframes in the cache.
+        shapes (dict): The dimensions of each dataframe, with names as keys, as saved in the cache manifest.
+        """
+        self._cache_path = cache_path
+        self._tables = list(tables)
+        self._shapes = shapes
+        self._loaded = {}
+
+    def __getitem__(self, name):
+        if name not in self._tables:
+            raise KeyError(name)
+        if name not in self._loaded:
+            table_path = os.path.join(self._cache_path, f"{name}.pkl")
+            self._loaded[name] = pd.read_pickle(table_path)
+        return self._loaded[name]
+
+    def __iter__(self):
+        return iter(self._tables)
+
+    def __len__(self):
+        return len(self._tables)
+
+    def __contains__(self, name):
+        return name in self._tables
+
+    def is_loaded(self, name):
+        """Check whether a dataframe has been read from the cache yet.
+
+        Parameters:
+        name (str): The name of the dataframe.
+
+        Returns:
+        bool: Whether it's in memory.
+        """
+        return name in self._loaded
+
+    def get_shape(self, name):
+        """Get the dimensions of a dataframe, without reading it if it hasn't been read yet.
+
+        Parameters:
+        name (str): The name of the dataframe.
+
+        Returns:
+        tuple of int: The dimensions of the dataframe.
+        """
+        if name in self._loaded or name not in self._shapes:
+            return self[name].shape
+        return tuple(self._shapes[name])
+
+def write_cache(cache_path, cache_key, data, definitions, parse_warnings=None):
+    """Save a dataset's formatted dataframes and definitions to the cache. Each dataframe is pickled to its own file, and a manifest file records the key and the table names. If we can't write to the cache directory, we issue a warning and move on.
+
+    Parameters:
+    cache_path (str): The path to the cache directory.
+    cache_key (dict): The key to save the cache with. Must be JSON serializable.
+    data (dict): The formatted dataframes, with names as keys.
+    definitions (dict): The definitions for the dataset.
+    parse_warnings (list of list of str, optional): The category name and message of each warning issued while parsing the data files, to issue again whenever the cache is loaded. Default None means there were none.
+
+    Returns: None
+    """
+    manifest_path = os.path.join(cache_path, "manifest.json")
+    manifest = {
+        "key": cache_key,
+        "tables": sorted(data.keys()),
+        "shapes": {name: list(df.shape) for name, df in data.items()}, # So we can list the dataframes' dimensions without reading them all
+        "definitions": definitions,
+        "warnings": parse_warnings if parse_warnings is not None else [],
+    }
+
+    try:
+        os.makedirs(cache_path, exist_ok=True)
+
+        # Delete the old manifest before we touch any table files, so the cache won't be read while it's only partially written
+        if os.path.isfile(manifest_path):
+            os.remove(manifest_path)
+
+        # Each file is written to a temporary file and then renamed, so that another process loading the dataset at the same time never sees a half-written file
+        for name, df in data.items():
+            temp_fd, temp_path = tempfile.mkstemp(dir=cache_path, suffix=".tmp")
+            try:
+                os.close(temp_fd)
+                df.to_pickle(temp_path, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temp_path, os.path.join(cache_path, f"{name}.pkl"))
+            finally:
+                if os.path.isfile(temp_path): # Writing it failed, so it was never renamed
+                    os.remove(temp_path)
+
+        # Get rid of any table files left over from an older cache that had different tables
+        for file_name in os.listdir(cache_path):
+            if file_name.endswith(".pkl") and file_name[:-len(".pkl")] not in data.keys():
+                os.remove(os.path.join(cache_path, file_name))
+
+        temp_fd, temp_path = tempfile.mkstemp(dir=cache_path, suffix=".tmp")
+        try:
+            with os.fdopen(temp_fd, 'w') as manifest_file:
+                json.dump(manifest, manifest_file)
+            os.replace(temp_path, manifest_path)
+        finally:
+            if os.path.isfile(temp_path):
+                os.remove(temp_path)
+
+    except OSError as error:
+        warnings.warn(f"Could not save the formatted dataframes to the cache at {cache_path} ({error}), so the data files will be parsed again next time the dataset is loaded.", FailedCacheWriteWarning, stacklevel=5)
@@ -11,17 +11,26 @@
 
 import pandas as pd
 import numpy as np
-import os
 import warnings
 import datetime
-from .dataset import DataSet
+from .dataset import DataSet, FileParser
 from .dataframe_tools import *
 from .exceptions import FailedReindexWarning, PublicationEmbargoWarning, ReindexMapError
 
 class Gbm(DataSet):
 
-    def __init__(self, version="latest"):
-        """Load all of the gbm dataframes as values in the self._data dict variable, with names as keys, and format them properly."""
+    def __init__(self, version="latest", use_cache=True, lazy=False, n_jobs=1, executor=None, dtype="float64", profile=False):
+        """Load all of the gbm dataframes as values in the self._data dict variable, with names as keys, and format them properly.
+
+        Parameters:
+        version (str, optional): The version number to load, or the string "latest" to just load the latest version. Default is "latest".
+        use_cache (bool, optional): Whether to load the formatted dataframes from the on-disk cache if a valid one exists, and to save them to the cache after parsing the data files if not. Default is True.
+        lazy (bool, optional): Whether to wait to read each dataframe from the cache until it's first used, instead of reading them all when the dataset is loaded. This saves time and memory if you only use a few of the dataframes. Requires use_cache to be True. Default is False.
+        n_jobs (int, optional): The number of threads to use to parse the data files, if they aren't loaded from the cache. -1 uses one thread per CPU. Default is 1, which parses them one at a time.
+        executor (concurrent.futures.Executor, optional): An executor to parse the data files with instead, e.g. a concurrent.futures.ProcessPoolExecutor. If passed, n_jobs is ignored, and the executor is not shut down afterwards. Default is None.
+        dtype (str, optional): "float64" to keep the omics dataframes at full precision, or "float32" to store and return them as float32, and also make the repeated string columns in the clinical, experimental_design and somatic_mutation dataframes categorical. "float32" about halves the memory the dataset uses. Default is "float64".
+        profile (bool or function, optional): Whether to measure memory use while loading, in addition to the timings that are always recorded. Get the results by calling get_load_report. If a function, it is also called with the report once the dataset is loaded, e.g. to log it. Default is False.
+        """
 
         # Set some needed variables, and pass them to the parent DataSet class __init__ function
 
@@ -89,160 +98,255 @@ class Gbm(DataSet):
                 "wgs_somatic_cnv_per_gene.v3.0.20191121.tsv.gz"],
         }
 
-        super().__init__(cancer_type="gbm", version=version, valid_versions=valid_versions, data_files=data_files)
-
-        # Load the data into dataframes in the self._data dict
-        loading_msg = "Loading dataframes"
-        for file_path in self._data_files_paths: # Loops through files variable
-
-            # Print a loading message. We add a dot every time, so the user knows it's not frozen.
-            loading_msg = loading_msg + "."
-            print(loading_msg, end='\r')
-
-            path_elements = file_path.split(os.sep) # Get a list of the levels of the path
-            file_name = path_elements[-1] # The last element will be the name of the file
-            df_name = file_name.split(".")[0] # Our dataframe name will be the first section of file name, so we don't include the version
-
-            if df_name in ("acetylome_pnnl_d6", "acetylome_mssm_per_gene_clean"):
-                df = pd.read_csv(file_path, sep='\t')
-                split_genes = df["site"].str.rsplit("-", n=1,expand=True)  # Split the genes from the sites, splitting from the right since some genes have hyphens in their names, but the genes and sites are also separated by hyphens
-                df = df.drop(columns="site")
-                df = df.assign(Site=split_genes[1])
-                df["Site"] = df["Site"].str.replace(r"k", r"")  # Get rid of all lowercase k delimeters in the sites
-
-                # Create the multiindex
-                df = df.rename(columns={
-                        "gene": "Name",
-                        "peptide": "Peptide",
-                        "refseq_id": "Database_ID",
-                    })
-                df = df.set_index(["Name", "Site", "Peptide", "Database_ID"])  # Turn these columns into a multiindex
-                df = df.sort_index()
-
-                df = df.transpose()
-                self._data["acetylproteomics"] = df
-
-            elif df_name == "clinical_data_core":
-                df = pd.read_csv(file_path, sep='\t', index_col=0)
-                self._data["clinical"] = df
-
-            elif file_name == "gbm_all_subtype_collections.2020-01-13.tsv.gz":
-                df = pd.read_csv(file_path, sep='\t', index_col=0)
-                df = df.drop(columns="sample_type")
-                self._data["derived_molecular"] = df
-
-            elif df_name == "metabolome_pnnl":
-                df = pd.read_csv(file_path, sep='\t', index_col=0)
-                df = df.transpose()
-                self._data["metabolomics"] = df
-
-            elif df_name == "metabolome_sample_info":
-                df = pd.read_csv(file_path, sep='\t', index_col=0)
-                df.index.name = "Patient_ID"
-                self._data["sample_info"] = df
-
-            elif df_name == "mirnaseq_mirna_mature_tpm":
-                df = pd.read_csv(file_path, sep='\t')
-                df = df.rename(columns={"name": "Name", "unique_id": "Database_ID"})
-                df = df.set_index(["Name", "Database_ID"]) # We use a multiindex with database IDs, not just names, to avoid duplicate column headers
-                df = df.drop(columns=["chromosome", "start", "end", "strand", "mirna_type", "mirbase_id", "precursor_id"])
-                df = df.sort_index()
-                df = df.transpose()
-                self._data["miRNA"] = df
-
-            elif df_name == "negative_lipidome_pnnl":
-                df = pd.read_csv(file_path, sep='\t', index_col=0)
-                df = df.transpose()
-                df = df.add_suffix("_negative")
-                self._data["lipidomics_negative"] = df
-
-            elif df_name in ("phosphoproteome_pnnl_d6", "phosphoproteome_mssm_per_gene_clean"):
-                df = pd.read_csv(file_path, sep='\t')
-
-                # Create our multiindex
-                split_genes = df["site"].str.rsplit("-", n=1, expand=True) # Split the genes from the sites, splitting from the right since some genes have hyphens in their names, but the genes and sites are also separated by hyphens
-                df = df.drop(columns="site")
-                df = df.assign(Site=split_genes[1])
-                df["Site"] = df["Site"].str.replace(r"[sty]", r"") # Get rid of all lowercase s, t, and y delimeters in the sites
-
-                if self._version == "1.0":
-                    df = df.rename(columns={"gene": "Name", "peptide": "Peptide"})
-                    df = df.set_index(["Name", "Site", "Peptide"]) # Turn these columns into a multiindex
-
-                elif self._version in ("2.0", "2.1", "3.0"):
-                    df = df.rename(columns={
-                            "gene": "Name",
-                            "peptide": "Peptide",
-                            "refseq_id": "Database_ID",
-                        })
-                    df = df.set_index(["Name", "Site", "Peptide", "Database_ID"]) # Turn these columns into a multiindex
-
-                df = df.sort_index()
-                df = df.transpose()
-                self._data["phosphoproteomics"] = df
-
-            elif df_name == "positive_lipidome_pnnl":
-                df = pd.read_csv(file_path, sep='\t', index_col=0)
-                df = df.transpose()
-                df = df.add_suffix("_positive")
-                self._data["lipidomics_positive"] = df
-
-            elif df_name in ("proteome_pnnl_per_gene_d4", "proteome_mssm_per_gene_clean"):
-                df = pd.read_csv(file_path, sep='\t', index_col=0)
-
-                if self._version in ("2.0", "2.1", "3.0"):
-                    df = df.drop(columns="refseq_id") # We don't need this database ID, because the gene name index is already unique
-
-                df = df.sort_index()
-                df = df.transpose()
-                self._data["proteomics"] = df
-
-            elif df_name == "proteome_tmt_design":
-                df = pd.read_csv(file_path, sep='\t', index_col=0)
-                df.index.name = "Patient_ID"
-                self._data["experimental_design"] = df
-
-            elif df_name == "rnaseq_bcm_circular_rna_expression_rsem_uq":
-                df = pd.read_csv(file_path, sep='\t')
-                df["circRNA_id"] = df["circRNA_id"].str.split('_', n=1, expand=True)[1] # Drop the "circ_" prefix on all the keys
-                df = df.set_index("circRNA_id")
-                df = df.drop(columns=["gene_id", "gene_name", "gene_type", "alias"])
-                df = df.transpose()
-                self._data["circular_RNA"] = df
-
-            elif df_name == "rnaseq_gene_fusion":
-                df = pd.read_csv(file_path, sep='\t', index_col=0)
-                self._data["gene_fusion"] = df
-
-            elif df_name in ("rnaseq_gdc_fpkm_uq", "rnaseq_washu_fpkm_uq"):
-                df = pd.read_csv(file_path, sep='\t')
-                df = df.rename(columns={"gene_name": "Name", "gene_id": "Database_ID"})
-                df = df.set_index(["Name", "Database_ID"]) # We use a multiindex with Ensembl IDs, not just gene names, to avoid duplicate column headers
-                df = df.drop(columns=["gene_type", "gene_status", "havana_gene", "full_length", "exon_length", "exon_num"])
-                df = df.sort_index()
-                df = df.transpose()
-                df = df.sort_index()
-                self._data["transcriptomics"] = df
-
-            elif df_name == "tindaisy_all_cases_filtered":
-                df = pd.read_csv(file_path, sep='\t')
-                split_barcode = df["Tumor_Sample_Barcode"].str.split("_", n = 1, expand = True) # The first part of the barcode is the patient id, which we need want to make the index
-                df["Tumor_Sample_Barcode"] = split_barcode[0]
-                df = df[["Tumor_Sample_Barcode","Hugo_Symbol","Variant_Classification","HGVSp_Short"]]
-                df = df.rename({"Tumor_Sample_Barcode":"Patient_ID","Hugo_Symbol":"Gene","Variant_Classification":"Mutation","HGVSp_Short":"Location"}, axis='columns')
-                df = df.sort_values(by=["Patient_ID", "Gene"])
-                df = df.set_index("Patient_ID")
-                self._data["somatic_mutation"] = df
-
-            elif df_name == "wgs_somatic_cnv_per_gene":
-                df = pd.read_csv(file_path, sep='\t', index_col=0)
-                df = df.drop(columns=["gene_id", "gene_id_version", "original_symbol"])
-                df = df.sort_index()
-                df = df.transpose()
-                df = df.sort_index()
-                self._data["CNV"] = df
-
-        print(' ' * len(loading_msg), end='\r') # Erase the loading message
+        # Map each data file to the method that parses it, and the names of the dataframes that method returns. The first parser that matches the file name and the dataset version is used.
+        file_parsers = [
+            FileParser(file_patterns=["acetylome_pnnl_d6.*", "acetylome_mssm_per_gene_clean.*"], versions=None, tables=["acetylproteomics"], parse=self._parse_acetylproteomics),
+            FileParser(file_patterns=["clinical_data_core.*"], versions=None, tables=["clinical"], parse=self._parse_clinical),
+            FileParser(file_patterns=["gbm_all_subtype_collections.2020-01-13.tsv.gz"], versions=None, tables=["derived_molecular"], parse=self._parse_derived_molecular),
+            FileParser(file_patterns=["metabolome_pnnl.*"], versions=None, tables=["metabolomics"], parse=self._parse_metabolomics),
+            FileParser(file_patterns=["metabolome_sample_info.*"], versions=None, tables=["sample_info"], parse=self._parse_sample_info),
+            FileParser(file_patterns=["mirnaseq_mirna_mature_tpm.*"], versions=None, tables=["miRNA"], parse=self._parse_mirna),
+            FileParser(file_patterns=["negative_lipidome_pnnl.*"], versions=None, tables=["lipidomics_negative"], parse=self._parse_lipidomics_negative),
+            FileParser(file_patterns=["phosphoproteome_pnnl_d6.*", "phosphoproteome_mssm_per_gene_clean.*"], versions=None, tables=["phosphoproteomics"], parse=self._parse_phosphoproteomics),
+            FileParser(file_patterns=["positive_lipidome_pnnl.*"], versions=None, tables=["lipidomics_positive"], parse=self._parse_lipidomics_positive),
+            FileParser(file_patterns=["proteome_pnnl_per_gene_d4.*", "proteome_mssm_per_gene_clean.*"], versions=None, tables=["proteomics"], parse=self._parse_proteomics),
+            FileParser(file_patterns=["proteome_tmt_design.*"], versions=None, tables=["experimental_design"], parse=self._parse_experimental_design),
+            FileParser(file_patterns=["rnaseq_bcm_circular_rna_expression_rsem_uq.*"], versions=None, tables=["circular_RNA"], parse=self._parse_circular_rna),
+            FileParser(file_patterns=["rnaseq_gene_fusion.*"], versions=None, tables=["gene_fusion"], parse=self._parse_gene_fusion),
+            FileParser(file_patterns=["rnaseq_gdc_fpkm_uq.*", "rnaseq_washu_fpkm_uq.*"], versions=None, tables=["transcriptomics"], parse=self._parse_transcriptomics),
+            FileParser(file_patterns=["tindaisy_all_cases_filtered.*"], versions=None, tables=["somatic_mutation"], parse=self._parse_somatic_mutation),
+            FileParser(file_patterns=["wgs_somatic_cnv_per_gene.*"], versions=None, tables=["CNV"], parse=self._parse_cnv),
+        ]
+
+        super().__init__(cancer_type="gbm", version=version, valid_versions=valid_versions, data_files=data_files, file_parsers=file_parsers, use_cache=use_cache, lazy=lazy, n_jobs=n_jobs, executor=executor, dtype=dtype, profile=profile)
+
+        # Print data embargo warning, if the date hasn't passed yet.
+        today = datetime.date.today()
+        embargo_date = datetime.date(year=2021, month=3, day=1)
+        if today < embargo_date:
+            warnings.warn("The GBM dataset is under publication embargo until March 01, 2021. CPTAC is a community resource project and data are made available rapidly after generation for community research use. The embargo allows exploring and utilizing the data, but analysis may not be published until after the embargo date. Please see https://proteomics.cancer.gov/data-portal/about/data-use-agreement or enter cptac.embargo() to open the webpage for more details.", PublicationEmbargoWarning, stacklevel=2)
+
+    def _parse_acetylproteomics(self, file_path):
+        """Parse the acetylproteomics data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t')
+        split_genes = df["site"].str.rsplit("-", n=1,expand=True)  # Split the genes from the sites, splitting from the right since some genes have hyphens in their names, but the genes and sites are also separated by hyphens
+        df = df.drop(columns="site")
+        df = df.assign(Site=split_genes[1])
+        df["Site"] = df["Site"].str.replace(r"k", r"")  # Get rid of all lowercase k delimeters in the sites
+
+        # Create the multiindex
+        df = df.rename(columns={
+                "gene": "Name",
+                "peptide": "Peptide",
+                "refseq_id": "Database_ID",
+            })
+        df = df.set_index(["Name", "Site", "Peptide", "Database_ID"])  # Turn these columns into a multiindex
+        df = df.sort_index()
+
+        df = df.transpose()
+        tables["acetylproteomics"] = df
+
+        return tables
+
+    def _parse_clinical(self, file_path):
+        """Parse the clinical data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t', index_col=0)
+        tables["clinical"] = df
+
+        return tables
+
+    def _parse_derived_molecular(self, file_path):
+        """Parse the derived molecular data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t', index_col=0)
+        df = df.drop(columns="sample_type")
+        tables["derived_molecular"] = df
+
+        return tables
+
+    def _parse_metabolomics(self, file_path):
+        """Parse the metabolomics data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t', index_col=0)
+        df = df.transpose()
+        tables["metabolomics"] = df
+
+        return tables
+
+    def _parse_sample_info(self, file_path):
+        """Parse the metabolomics sample info data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t', index_col=0)
+        df.index.name = "Patient_ID"
+        tables["sample_info"] = df
+
+        return tables
+
+    def _parse_mirna(self, file_path):
+        """Parse the miRNA data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t')
+        df = df.rename(columns={"name": "Name", "unique_id": "Database_ID"})
+        df = df.set_index(["Name", "Database_ID"]) # We use a multiindex with database IDs, not just names, to avoid duplicate column headers
+        df = df.drop(columns=["chromosome", "start", "end", "strand", "mirna_type", "mirbase_id", "precursor_id"])
+        df = df.sort_index()
+        df = df.transpose()
+        tables["miRNA"] = df
+
+        return tables
+
+    def _parse_lipidomics_negative(self, file_path):
+        """Parse the negative lipidomics data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t', index_col=0)
+        df = df.transpose()
+        df = df.add_suffix("_negative")
+        tables["lipidomics_negative"] = df
+
+        return tables
+
+    def _parse_phosphoproteomics(self, file_path):
+        """Parse the phosphoproteomics data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t')
+
+        # Create our multiindex
+        split_genes = df["site"].str.rsplit("-", n=1, expand=True) # Split the genes from the sites, splitting from the right since some genes have hyphens in their names, but the genes and sites are also separated by hyphens
+        df = df.drop(columns="site")
+        df = df.assign(Site=split_genes[1])
+        df["Site"] = df["Site"].str.replace(r"[sty]", r"") # Get rid of all lowercase s, t, and y delimeters in the sites
+
+        if self._version == "1.0":
+            df = df.rename(columns={"gene": "Name", "peptide": "Peptide"})
+            df = df.set_index(["Name", "Site", "Peptide"]) # Turn these columns into a multiindex
+
+        elif self._version in ("2.0", "2.1", "3.0"):
+            df = df.rename(columns={
+                    "gene": "Name",
+                    "peptide": "Peptide",
+                    "refseq_id": "Database_ID",
+                })
+            df = df.set_index(["Name", "Site", "Peptide", "Database_ID"]) # Turn these columns into a multiindex
+
+        df = df.sort_index()
+        df = df.transpose()
+        tables["phosphoproteomics"] = df
+
+        return tables
+
+    def _parse_lipidomics_positive(self, file_path):
+        """Parse the positive lipidomics data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t', index_col=0)
+        df = df.transpose()
+        df = df.add_suffix("_positive")
+        tables["lipidomics_positive"] = df
+
+        return tables
+
+    def _parse_proteomics(self, file_path):
+        """Parse the proteomics data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t', index_col=0)
+
+        if self._version in ("2.0", "2.1", "3.0"):
+            df = df.drop(columns="refseq_id") # We don't need this database ID, because the gene name index is already unique
+
+        df = df.sort_index()
+        df = df.transpose()
+        tables["proteomics"] = df
+
+        return tables
+
+    def _parse_experimental_design(self, file_path):
+        """Parse the experimental design data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t', index_col=0)
+        df.index.name = "Patient_ID"
+        tables["experimental_design"] = df
+
+        return tables
+
+    def _parse_circular_rna(self, file_path):
+        """Parse the circular RNA data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t')
+        df["circRNA_id"] = df["circRNA_id"].str.split('_', n=1, expand=True)[1] # Drop the "circ_" prefix on all the keys
+        df = df.set_index("circRNA_id")
+        df = df.drop(columns=["gene_id", "gene_name", "gene_type", "alias"])
+        df = df.transpose()
+        tables["circular_RNA"] = df
+
+        return tables
+
+    def _parse_gene_fusion(self, file_path):
+        """Parse the gene fusion data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t', index_col=0)
+        tables["gene_fusion"] = df
+
+        return tables
+
+    def _parse_transcriptomics(self, file_path):
+        """Parse the transcriptomics data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t')
+        df = df.rename(columns={"gene_name": "Name", "gene_id": "Database_ID"})
+        df = df.set_index(["Name", "Database_ID"]) # We use a multiindex with Ensembl IDs, not just gene names, to avoid duplicate column headers
+        df = df.drop(columns=["gene_type", "gene_status", "havana_gene", "full_length", "exon_length", "exon_num"])
+        df = df.sort_index()
+        df = df.transpose()
+        df = df.sort_index()
+        tables["transcriptomics"] = df
+
+        return tables
+
+    def _parse_somatic_mutation(self, file_path):
+        """Parse the somatic mutation data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t')
+        split_barcode = df["Tumor_Sample_Barcode"].str.split("_", n = 1, expand = True) # The first part of the barcode is the patient id, which we need want to make the index
+        df["Tumor_Sample_Barcode"] = split_barcode[0]
+        df = df[["Tumor_Sample_Barcode","Hugo_Symbol","Variant_Classification","HGVSp_Short"]]
+        df = df.rename({"Tumor_Sample_Barcode":"Patient_ID","Hugo_Symbol":"Gene","Variant_Classification":"Mutation","HGVSp_Short":"Location"}, axis='columns')
+        df = df.sort_values(by=["Patient_ID", "Gene"])
+        df = df.set_index("Patient_ID")
+        tables["somatic_mutation"] = df
+
+        return tables
+
+    def _parse_cnv(self, file_path):
+        """Parse the CNV data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t', index_col=0)
+        df = df.drop(columns=["gene_id", "gene_id_version", "original_symbol"])
+        df = df.sort_index()
+        df = df.transpose()
+        df = df.sort_index()
+        tables["CNV"] = df
+
+        return tables
+
+    def _format_dataframes(self):
+        """Format the gbm dataframes in the self._data dict, once all the data files have been parsed."""
         formatting_msg = "Formatting dataframes..."
         print(formatting_msg, end='\r')
 
@@ -268,12 +372,12 @@ class Gbm(DataSet):
             self._data["experimental_design"] = experimental_design
             del self._data["sample_info"]
 
-        # Get a union of all dataframes' indices, with duplicates removed
-        master_index = unionize_indices(self._data)
+        # Get a union of all dataframes' indices, with duplicates removed, and where each dataframe's rows are in it
+        master_index, index_codes = unionize_indices(self._data, return_codes=True)
 
         # Use the master index to reindex the clinical dataframe, so the clinical dataframe has a record of every sample in the dataset. Rows that didn't exist before (such as the rows for normal samples) are filled with NaN.
         clinical = self._data["clinical"]
-        clinical = clinical.reindex(master_index)
+        clinical = reindex_from_codes(clinical, master_index, index_codes["clinical"])
 
         # Construct the sample status column
         sample_status_col = np.where(clinical.index.str.startswith("PT"), "Normal", "Tumor")
@@ -287,18 +391,7 @@ class Gbm(DataSet):
         self._data['clinical'] = clinical
 
         # Append a ".N" to the Patient_IDs of the normal samples, to match the other datasets
-        self._data = reformat_normal_patient_ids(self._data)
-
-        # Call function from dataframe_tools.py to sort all tables first by sample status, and then by the index
-        self._data = sort_all_rows(self._data)
-
-        # Call function from dataframe_tools.py to standardize the names of the index and column axes
-        self._data = standardize_axes_names(self._data)
+        # Then call function from dataframe_tools.py to sort all tables first by sample status, and then by the index, and standardize the names of the index and column axes
+        self._data = finalize_all_dataframes(self._data, reformat_normal_ids=True)
 
-        print(" " * len(formatting_msg), end='\r') # Erase the formatting message
-
-        # Print data embargo warning, if the date hasn't passed yet.
-        today = datetime.date.today()
-        embargo_date = datetime.date(year=2021, month=3, day=1)
-        if today < embargo_date:
-            warnings.warn("The GBM dataset is under publication embargo until March 01, 2021. CPTAC is a community resource project and data are made available rapidly after generation for community research use. The embargo allows exploring and utilizing the data, but analysis may not be published until after the embargo date. Please see https://proteomics.cancer.gov/data-portal/about/data-use-agreement or enter cptac.embargo() to open the webpage for more details.", PublicationEmbargoWarning, stacklevel=2)
+        print(" " * len(formatting_msg), end='\r') # Erase the formatting message
\ No newline at end of file
@@ -13,14 +13,24 @@ import pandas as pd
 import numpy as np
 import os
 import warnings
-from .dataset import DataSet
+from .dataset import DataSet, FileParser
 from .dataframe_tools import *
 from .exceptions import FailedReindexWarning, ReindexMapError
 
 class Hnscc(DataSet):
 
-    def __init__(self, version="latest"):
-        """Load all of the hnscc dataframes as values in the self._data dict variable, with names as keys, and format them properly."""
+    def __init__(self, version="latest", use_cache=True, lazy=False, n_jobs=1, executor=None, dtype="float64", profile=False):
+        """Load all of the hnscc dataframes as values in the self._data dict variable, with names as keys, and format them properly.
+
+        Parameters:
+        version (str, optional): The version number to load, or the string "latest" to just load the latest version. Default is "latest".
+        use_cache (bool, optional): Whether to load the formatted dataframes from the on-disk cache if a valid one exists, and to save them to the cache after parsing the data files if not. Default is True.
+        lazy (bool, optional): Whether to wait to read each dataframe from the cache until it's first used, instead of reading them all when the dataset is loaded. This saves time and memory if you only use a few of the dataframes. Requires use_cache to be True. Default is False.
+        n_jobs (int, optional): The number of threads to use to parse the data files, if they aren't loaded from the cache. -1 uses one thread per CPU. Default is 1, which parses them one at a time.
+        executor (concurrent.futures.Executor, optional): An executor to parse the data files with instead, e.g. a concurrent.futures.ProcessPoolExecutor. If passed, n_jobs is ignored, and the executor is not shut down afterwards. Default is None.
+        dtype (str, optional): "float64" to keep the omics dataframes at full precision, or "float32" to store and return them as float32, and also make the repeated string columns in the clinical, experimental_design and somatic_mutation dataframes categorical. "float32" about halves the memory the dataset uses. Default is "float64".
+        profile (bool or function, optional): Whether to measure memory use while loading, in addition to the timings that are always recorded. Get the results by calling get_load_report. If a function, it is also called with the report once the dataset is loaded, e.g. to log it. Default is False.
+        """
 
         # Set some needed variables, and pass them to the parent DataSet class __init__ function
 
@@ -47,210 +57,262 @@ class Hnscc(DataSet):
                 "SomaticMutations_maf.tsv.gz"],
         }
 
-        super().__init__(cancer_type="hnscc", version=version, valid_versions=valid_versions, data_files=data_files)
+        # Map each data file to the method that parses it, and the names of the dataframes that method returns. The first parser that matches the file name and the dataset version is used.
+        file_parsers = [
+            FileParser(file_patterns=["SCNA_gene_level.cct.gz", "SCNA_log2_gene_level.cct.gz"], versions=None, tables=["CNV"], parse=self._parse_cnv),
+            FileParser(file_patterns=["microRNA_log2_Combined.cct.gz"], versions=["2.0"], tables=["miRNA"], parse=self._parse_mirna),
+            FileParser(file_patterns=["RNAseq_RSEM_UQ_log2.cct.gz", "RNAseq_RSEM_UQ_Combined.cct.gz"], versions=None, tables=["transcriptomics"], parse=self._parse_transcriptomics),
+            FileParser(file_patterns=["RNAseq_circ_RSEM_UQ_log2.cct.gz", "circRNAseq_RSEM_UQ_log2_Combined.cct.gz"], versions=None, tables=["circular_RNA"], parse=self._parse_circular_rna),
+            FileParser(file_patterns=["HNSCC.strelka.sorted.filtered.annovar.hg19_multianno_filtered.maf.txt.gz", "SomaticMutations_maf.tsv.gz"], versions=None, tables=["somatic_mutation"], parse=self._parse_somatic_mutation),
+            FileParser(file_patterns=["clinic.tsi.gz", "Meta_table.tsv.gz"], versions=None, tables=["clinical", "derived_molecular"], parse=self._parse_clinical),
+            FileParser(file_patterns=["Proteomics_DIA_Gene_level_Normal.cct.gz"], versions=None, tables=["proteomics_normal"], parse=self._parse_proteomics),
+            FileParser(file_patterns=["Proteomics_DIA_Gene_level_Tumor.cct.gz"], versions=None, tables=["proteomics_tumor"], parse=self._parse_proteomics),
+            FileParser(file_patterns=["Proteomics_TMT_gene_level_combined_all.cct.gz"], versions=None, tables=["proteomics"], parse=self._parse_proteomics),
+            FileParser(file_patterns=["Phosphoproteomics_TMT_site_level_combined_all.cct.gz"], versions=["2.0"], tables=["phosphoproteomics"], parse=self._parse_phosphoproteomics),
+            FileParser(file_patterns=["HN_followUp_9_24.xlsx"], versions=["2.0"], tables=["followup"], parse=self._parse_followup),
+        ]
 
-        # Load the data into dataframes in the self._data dict
-        loading_msg = "Loading dataframes"
-        for file_path in self._data_files_paths: # Loops through files variable
+        super().__init__(cancer_type="hnscc", version=version, valid_versions=valid_versions, data_files=data_files, file_parsers=file_parsers, use_cache=use_cache, lazy=lazy, n_jobs=n_jobs, executor=executor, dtype=dtype, profile=profile)
 
-            # Print a loading message. We add a dot every time, so the user knows it's not frozen.
-            loading_msg = loading_msg + "."
-            print(loading_msg, end='\r')
+    def _parse_cnv(self, file_path):
+        """Parse the CNV data file."""
+        tables = {}
 
-            path_elements = file_path.split(os.sep) # Get a list of the levels of the path
-            file_name = path_elements[-1] # The last element will be the name of the file
-            df_name = file_name.split(".")[0] # Our dataframe name will be the first section of file name (i.e. proteomics.txt.gz becomes proteomics)
+        df = pd.read_csv(file_path, sep="\t")
 
-            if file_name == "SCNA_gene_level.cct.gz" or file_name == "SCNA_log2_gene_level.cct.gz":
-                df = pd.read_csv(file_path, sep="\t")
+        if self._version == "2.0":
+            df = df.set_index('gene_symbol')
 
-                if self._version == "2.0":
-                    df = df.set_index('gene_symbol')
+        df = df.sort_index()
+        df = df.transpose()
+        df = df.sort_index()
+        df.columns.name=None
+        df.index.name = "Patient_ID"
+        tables["CNV"] = df
 
-                df = df.sort_index()
-                df = df.transpose()
-                df = df.sort_index()
-                df.columns.name=None
-                df.index.name = "Patient_ID"
-                self._data["CNV"] = df
+        return tables
 
-            elif file_name == "microRNA_log2_Combined.cct.gz" and self._version == "2.0":
-                df = pd.read_csv(file_path, sep='\t', index_col=0)
-                df = df.sort_index()
-                df = df.transpose()
+    def _parse_mirna(self, file_path):
+        """Parse the miRNA data file."""
+        tables = {}
 
-                # Reformat patient ids
-                df.index = df.index.str.replace(r'-T$', '', 1)
-                df.index = df.index.str.replace(r'-N$', '.N', 1)
+        df = pd.read_csv(file_path, sep='\t', index_col=0)
+        df = df.sort_index()
+        df = df.transpose()
+
+        # Reformat patient ids
+        df.index = df.index.str.replace(r'-T$', '', 1)
+        df.index = df.index.str.replace(r'-N$', '.N', 1)
 
-                self._data["miRNA"] = df
-
-            elif file_name == "RNAseq_RSEM_UQ_log2.cct.gz" or file_name == "RNAseq_RSEM_UQ_Combined.cct.gz":
-                df = pd.read_csv(file_path, sep="\t")
-
-                if self._version == "2.0":
-                    df = df.set_index('Idx')
-
-                df = df.sort_index()
-                df = df.transpose()
-                df = df.sort_index()
-                df.columns.name=None
-
-                if self._version == "0.1":
-                    df.index = df.index.str.replace(r'\.', '-', 1)
-                    df.index = df.index.str.replace(r'\.T$', '', 1)
-                elif self._version == "2.0":
-                        df.index = df.index.str.replace(r'-T$', '', 1)
-                        df.index = df.index.str.replace(r'-N$', '.N', 1)
-
-                df.index.name = "Patient_ID"
-                self._data["transcriptomics"] = df
-
-            elif file_name == "RNAseq_circ_RSEM_UQ_log2.cct.gz" or file_name == "circRNAseq_RSEM_UQ_log2_Combined.cct.gz":
-                df = pd.read_csv(file_path, sep='\t')
-                df = df.sort_index()
-                df = df.transpose()
-                df = df.sort_index()
-                df.columns.name=None
+        tables["miRNA"] = df
 
-                if self._version == "0.1":
-                    df.index = df.index.str.replace(r'\.', '-', 1) # We want all the patientIDs to have the the format C3L-00977, and these have the form C3L.00977.N, so we need to replace the first "." with a "-"
-                    df.index = df.index.str.replace(r'\.T$', '', 1)
+        return tables
 
-                elif self._version == "2.0":
-                    df.index = df.index.str.replace(r'-T$', '', 1)
-                    df.index = df.index.str.replace(r'-N$', '.N', 1)
+    def _parse_transcriptomics(self, file_path):
+        """Parse the transcriptomics data file."""
+        tables = {}
 
-                df.index.name = "Patient_ID"
-                self._data["circular_RNA"] = df
-
-            elif file_name == "HNSCC.strelka.sorted.filtered.annovar.hg19_multianno_filtered.maf.txt.gz" or file_name == "SomaticMutations_maf.tsv.gz":
-                df = pd.read_csv(file_path, sep="\t")
-
-                if self._version == "0.1":
-                    df = df.rename(columns={"Tumor_Sample_Barcode":"Patient_ID","Hugo_Symbol_Annovar":"Gene","Variant_Classification_Annovar":"Mutation"}) #Rename the columns we want to keep to the appropriate names
-                    df['Location'] = df['Annovar_Info_protein'].str.extract(r'([^:]+$)') #The location that we care about is stored after the last colon
-                    df = df[['Patient_ID', 'Gene', 'Mutation', 'Location']]
-
-                elif self._version == "2.0":
-                    df = df[['Tumor_Sample_Barcode','Hugo_Symbol','Variant_Classification','HGVSp_Short']]
-                    df = df.rename(columns={
-                        "Tumor_Sample_Barcode":"Patient_ID",
-                        "Hugo_Symbol":"Gene",
-                        "Variant_Classification":"Mutation",
-                        "HGVSp_Short":"Location"}) #Rename the columns we want to keep to the appropriate names
-
-                df = df.sort_values(by=["Patient_ID", "Gene"])
-                df = df.set_index("Patient_ID")
-                df = df.sort_index()
-                df.columns.name=None
-                self._data["somatic_mutation"] = df
-
-            elif file_name == "clinic.tsi.gz" or file_name == "Meta_table.tsv.gz":
-                df = pd.read_csv(file_path, sep="\t")
-
-                if self._version == "2.0":
-                    df = df.set_index('case_id')
-                elif self._version == "0.1":
-                    df = df.set_index('CASE_ID')
-
-                df.columns.name=None
-                df.index.name="Patient_ID"
-
-                # Split the clinical data in to clinical data and derived molecular data
-
-                if self._version == "0.1":
-                    derived_molecular_cols = ['P53GENE_ANALYSIS', 'EGFR_AMP_STATUS']
-
-                elif self._version == "2.0":
-                    derived_molecular_cols = ['NAT_pathology_review', 'tumor_pathology_review',
-                       'ESTIMATE_stromal_score', 'ESTIMATE_immune_score', 'stemness_score',
-                       'mutation_count', 'TP53_mutation', 'CDKN2A_mutation', 'FAT1_mutation',
-                       'NOTCH1_mutation', 'CSMD3_mutation', 'DNAH5_mutation', 'KMT2D_mutation',
-                       'transcriptomic_subtype', 'chr_instability_idx', 'tumor_proportion',
-                       'normal_epithelial_proportion', 'immune_proportion',
-                       'muscle_proportion', 'fibroblast_proportion', 'EGFR_pathway',
-                       'Hypoxia_pathway', 'JAK.STAT_pathway', 'MAPK_pathway', 'NFkB_pathway',
-                       'PI3K_pathway', 'TGFb_pathway', 'TNFa_pathway', 'Trail_pathway',
-                       'VEGF_pathway', 'p53_pathway']
-
-                derived_molecular_df = df[derived_molecular_cols]
-                derived_molecular_df = derived_molecular_df.sort_index(axis='columns')
-                derived_molecular_df = derived_molecular_df.sort_index()
-
-                df = df.drop(columns=derived_molecular_cols)
-                df = df.sort_index()
-                df = df.sort_index(axis='columns')
-
-                self._data["clinical"] = df
-                self._data["derived_molecular"] = derived_molecular_df
-
-            elif file_name in ["Proteomics_DIA_Gene_level_Normal.cct.gz", "Proteomics_DIA_Gene_level_Tumor.cct.gz", "Proteomics_TMT_gene_level_combined_all.cct.gz"]:
-                df = pd.read_csv(file_path, sep="\t")
-
-                if self._version == "2.0":
-                    df = df.set_index('Index')
-
-                df = df.transpose()
-                df.columns.name=None
-                df.index.name = "Patient_ID"
-
-                if self._version == "2.0":
-                    df.index = df.index.str.replace(r'-T$', '', 1)
-                    df.index = df.index.str.replace(r'-N$', '.N', 1)
-                    df.index = df.index.str.replace(r'-C$', '.C', 1) #-C is cored NAT samples
-
-                # Once the files are formatted correctly load them into self._data
-                if file_name == "Proteomics_DIA_Gene_level_Normal.cct.gz":
-                    self._data["proteomics_normal"] = df
-
-                elif file_name == "Proteomics_DIA_Gene_level_Tumor.cct.gz":
-                    self._data["proteomics_tumor"] = df
-
-                elif file_name == "Proteomics_TMT_gene_level_combined_all.cct.gz":
-                    self._data["proteomics"] = df
-
-            elif file_name == "Phosphoproteomics_TMT_site_level_combined_all.cct.gz" and self._version == "2.0":
-                df = pd.read_csv(file_path, sep='\t')
-
-                df = df.rename(columns={"Gene": "Name"})
-
-                # Drop unlocalized sites
-                unlocalized_sites = (df["Index"].str.rsplit("_", n=1, expand=True)[1] == '0')
-                df = df[~unlocalized_sites]
-
-                # Parse a few columns out of the "Index" column that we'll need for our multiindex
-                split_ids = df["Index"].str.split('_', expand=True)
-                df = df.drop(columns="Index")
-                sites = split_ids.iloc[:, -1]
-                database_ids = split_ids[0].str.cat(split_ids[1], sep='_')
-                df = df.assign(**{"Site": sites, "Database_ID": database_ids})
-
-                # Some rows have at least one localized phosphorylation site, but also have other phosphorylations that aren't localized. We'll drop those rows, if their localized sites are duplicated in another row, to avoid creating duplicates, because we only preserve information about the localized sites in a given row. However, if the localized sites aren't duplicated in another row, we'll keep the row.
-                unlocalized_to_drop = df.index[~split_ids[4].eq(split_ids[5]) & df.duplicated(["Name", "Site", "Peptide", "Database_ID"], keep=False)] # Column 4 of the split "Index" column is number of phosphorylations detected, and column 5 is number of phosphorylations localized, so if the two values aren't equal, the row has at least one unlocalized site
-                df = df.drop(index=unlocalized_to_drop)
-
-                # Give it a multiindex
-                df = df.set_index(["Name", "Site", "Peptide", "Database_ID"]) # This will create a multiindex from these columns, in this order.
-                df = df.sort_index()
-                df = df.transpose()
+        df = pd.read_csv(file_path, sep="\t")
+
+        if self._version == "2.0":
+            df = df.set_index('Idx')
+
+        df = df.sort_index()
+        df = df.transpose()
+        df = df.sort_index()
+        df.columns.name=None
+
+        if self._version == "0.1":
+            df.index = df.index.str.replace(r'\.', '-', 1)
+            df.index = df.index.str.replace(r'\.T$', '', 1)
+        elif self._version == "2.0":
                 df.index = df.index.str.replace(r'-T$', '', 1)
                 df.index = df.index.str.replace(r'-N$', '.N', 1)
-                df.index = df.index.str.replace(r'-C$', '.C', 1) #-C is cored NAT samples
-                df = df.sort_index()
-                self._data["phosphoproteomics"] = df
 
-            elif file_name == 'HN_followUp_9_24.xlsx' and self._version == "2.0":
-                df = pd.read_excel(file_path)
+        df.index.name = "Patient_ID"
+        tables["transcriptomics"] = df
+
+        return tables
+
+    def _parse_circular_rna(self, file_path):
+        """Parse the circular RNA data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t')
+        df = df.sort_index()
+        df = df.transpose()
+        df = df.sort_index()
+        df.columns.name=None
+
+        if self._version == "0.1":
+            df.index = df.index.str.replace(r'\.', '-', 1) # We want all the patientIDs to have the the format C3L-00977, and these have the form C3L.00977.N, so we need to replace the first "." with a "-"
+            df.index = df.index.str.replace(r'\.T$', '', 1)
+
+        elif self._version == "2.0":
+            df.index = df.index.str.replace(r'-T$', '', 1)
+            df.index = df.index.str.replace(r'-N$', '.N', 1)
+
+        df.index.name = "Patient_ID"
+        tables["circular_RNA"] = df
 
-                # Rename, set, and sort by index
-                df = df.rename(columns={"CASE_ID": "Patient_ID"})
-                df = df.set_index("Patient_ID")
-                df = df.sort_index()
+        return tables
+
+    def _parse_somatic_mutation(self, file_path):
+        """Parse the somatic mutation data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep="\t")
+
+        if self._version == "0.1":
+            df = df.rename(columns={"Tumor_Sample_Barcode":"Patient_ID","Hugo_Symbol_Annovar":"Gene","Variant_Classification_Annovar":"Mutation"}) #Rename the columns we want to keep to the appropriate names
+            df['Location'] = df['Annovar_Info_protein'].str.extract(r'([^:]+$)') #The location that we care about is stored after the last colon
+            df = df[['Patient_ID', 'Gene', 'Mutation', 'Location']]
+
+        elif self._version == "2.0":
+            df = df[['Tumor_Sample_Barcode','Hugo_Symbol','Variant_Classification','HGVSp_Short']]
+            df = df.rename(columns={
+                "Tumor_Sample_Barcode":"Patient_ID",
+                "Hugo_Symbol":"Gene",
+                "Variant_Classification":"Mutation",
+                "HGVSp_Short":"Location"}) #Rename the columns we want to keep to the appropriate names
+
+        df = df.sort_values(by=["Patient_ID", "Gene"])
+        df = df.set_index("Patient_ID")
+        df = df.sort_index()
+        df.columns.name=None
+        tables["somatic_mutation"] = df
+
+        return tables
+
+    def _parse_clinical(self, file_path):
+        """Parse the clinical data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep="\t")
+
+        if self._version == "2.0":
+            df = df.set_index('case_id')
+        elif self._version == "0.1":
+            df = df.set_index('CASE_ID')
+
+        df.columns.name=None
+        df.index.name="Patient_ID"
+
+        # Split the clinical data in to clinical data and derived molecular data
+
+        if self._version == "0.1":
+            derived_molecular_cols = ['P53GENE_ANALYSIS', 'EGFR_AMP_STATUS']
 
-                self._data["followup"] = df
+        elif self._version == "2.0":
+            derived_molecular_cols = ['NAT_pathology_review', 'tumor_pathology_review',
+               'ESTIMATE_stromal_score', 'ESTIMATE_immune_score', 'stemness_score',
+               'mutation_count', 'TP53_mutation', 'CDKN2A_mutation', 'FAT1_mutation',
+               'NOTCH1_mutation', 'CSMD3_mutation', 'DNAH5_mutation', 'KMT2D_mutation',
+               'transcriptomic_subtype', 'chr_instability_idx', 'tumor_proportion',
+               'normal_epithelial_proportion', 'immune_proportion',
+               'muscle_proportion', 'fibroblast_proportion', 'EGFR_pathway',
+               'Hypoxia_pathway', 'JAK.STAT_pathway', 'MAPK_pathway', 'NFkB_pathway',
+               'PI3K_pathway', 'TGFb_pathway', 'TNFa_pathway', 'Trail_pathway',
+               'VEGF_pathway', 'p53_pathway']
 
-        print(' ' * len(loading_msg), end='\r') # Erase the loading message
+        derived_molecular_df = df[derived_molecular_cols]
+        derived_molecular_df = derived_molecular_df.sort_index(axis='columns')
+        derived_molecular_df = derived_molecular_df.sort_index()
+
+        df = df.drop(columns=derived_molecular_cols)
+        df = df.sort_index()
+        df = df.sort_index(axis='columns')
+
+        tables["clinical"] = df
+        tables["derived_molecular"] = derived_molecular_df
+
+        return tables
+
+    def _parse_proteomics(self, file_path):
+        """Parse the proteomics data file."""
+        path_elements = file_path.split(os.sep) # Get a list of the levels of the path
+        file_name = path_elements[-1] # The last element will be the name of the file
+
+        tables = {}
+
+        df = pd.read_csv(file_path, sep="\t")
+
+        if self._version == "2.0":
+            df = df.set_index('Index')
+
+        df = df.transpose()
+        df.columns.name=None
+        df.index.name = "Patient_ID"
+
+        if self._version == "2.0":
+            df.index = df.index.str.replace(r'-T$', '', 1)
+            df.index = df.index.str.replace(r'-N$', '.N', 1)
+            df.index = df.index.str.replace(r'-C$', '.C', 1) #-C is cored NAT samples
+
+        # Once the files are formatted correctly, name them based on which file they came from
+        if file_name == "Proteomics_DIA_Gene_level_Normal.cct.gz":
+            tables["proteomics_normal"] = df
+
+        elif file_name == "Proteomics_DIA_Gene_level_Tumor.cct.gz":
+            tables["proteomics_tumor"] = df
+
+        elif file_name == "Proteomics_TMT_gene_level_combined_all.cct.gz":
+            tables["proteomics"] = df
+
+        return tables
+
+    def _parse_phosphoproteomics(self, file_path):
+        """Parse the phosphoproteomics data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t')
+
+        df = df.rename(columns={"Gene": "Name"})
+
+        # Drop unlocalized sites
+        unlocalized_sites = (df["Index"].str.rsplit("_", n=1, expand=True)[1] == '0')
+        df = df[~unlocalized_sites]
+
+        # Parse a few columns out of the "Index" column that we'll need for our multiindex
+        split_ids = df["Index"].str.split('_', expand=True)
+        df = df.drop(columns="Index")
+        sites = split_ids.iloc[:, -1]
+        database_ids = split_ids[0].str.cat(split_ids[1], sep='_')
+        df = df.assign(**{"Site": sites, "Database_ID": database_ids})
+
+        # Some rows have at least one localized phosphorylation site, but also have other phosphorylations that aren't localized. We'll drop those rows, if their localized sites are duplicated in another row, to avoid creating duplicates, because we only preserve information about the localized sites in a given row. However, if the localized sites aren't duplicated in another row, we'll keep the row.
+        unlocalized_to_drop = df.index[~split_ids[4].eq(split_ids[5]) & df.duplicated(["Name", "Site", "Peptide", "Database_ID"], keep=False)] # Column 4 of the split "Index" column is number of phosphorylations detected, and column 5 is number of phosphorylations localized, so if the two values aren't equal, the row has at least one unlocalized site
+        df = df.drop(index=unlocalized_to_drop)
+
+        # Give it a multiindex
+        df = df.set_index(["Name", "Site", "Peptide", "Database_ID"]) # This will create a multiindex from these columns, in this order.
+        df = df.sort_index()
+        df = df.transpose()
+        df.index = df.index.str.replace(r'-T$', '', 1)
+        df.index = df.index.str.replace(r'-N$', '.N', 1)
+        df.index = df.index.str.replace(r'-C$', '.C', 1) #-C is cored NAT samples
+        df = df.sort_index()
+        tables["phosphoproteomics"] = df
+
+        return tables
+
+    def _parse_followup(self, file_path):
+        """Parse the followup data file."""
+        tables = {}
+
+        df = pd.read_excel(file_path)
+
+        # Rename, set, and sort by index
+        df = df.rename(columns={"CASE_ID": "Patient_ID"})
+        df = df.set_index("Patient_ID")
+        df = df.sort_index()
+
+        tables["followup"] = df
+
+        return tables
+
+    def _format_dataframes(self):
+        """Format the hnscc dataframes in the self._data dict, once all the data files have been parsed."""
         formatting_msg = "Formatting dataframes..."
         print(formatting_msg, end='\r')
 
@@ -267,11 +329,11 @@ class Hnscc(DataSet):
             del self._data["proteomics_normal"]
             del self._data["proteomics_tumor"]
 
-        # Get a union of all dataframes' indices, with duplicates removed
-        master_index = unionize_indices(self._data)
+        # Get a union of all dataframes' indices, with duplicates removed, and where each dataframe's rows are in it
+        master_index, index_codes = unionize_indices(self._data, return_codes=True)
 
         # Use the master index to reindex the clinical dataframe, so the clinical dataframe has a record of every sample in the dataset. Rows that didn't exist before (such as the rows for normal samples) are filled with NaN.
-        master_clinical = self._data['clinical'].reindex(master_index)
+        master_clinical = reindex_from_codes(self._data['clinical'], master_index, index_codes["clinical"])
 
         # Add a column called Sample_Tumor_Normal to the clinical dataframe indicating whether each sample is a tumor or normal sample. Samples with a Patient_ID ending in ".N" are normal.
         clinical_status_col = generate_sample_status_col(master_clinical, normal_test=lambda sample: sample[-2:] in ['.N', '.C'])
@@ -284,10 +346,7 @@ class Hnscc(DataSet):
         # Replace the clinical dataframe in the data dictionary with our new and improved version!
         self._data['clinical'] = master_clinical
 
-        # Call function from dataframe_tools.py to sort all tables first by sample status, and then by the index
-        self._data = sort_all_rows(self._data)
-
-        # Call function from dataframe_tools.py to standardize the names of the index and column axes
-        self._data = standardize_axes_names(self._data)
+        # Call function from dataframe_tools.py to sort all tables first by sample status, and then by the index, and standardize the names of the index and column axes
+        self._data = finalize_all_dataframes(self._data)
 
-        print(" " * len(formatting_msg), end='\r') # Erase the formatting message
+        print(" " * len(formatting_msg), end='\r') # Erase the formatting message
\ No newline at end of file
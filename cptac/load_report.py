@@ -0,0 +1,146 @@
+#   Copyright 2018 Samuel Payne sam_payne@byu.edu
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import collections
+import contextlib
+import functools
+import threading
+import time
+
+# The records that make up a LoadReport
+#   FileRecord: One data file that was parsed. peak_memory is the most memory, in bytes, allocated at once while parsing it, or None if it wasn't measured.
+#   StepRecord: One step of loading or formatting, e.g. "read_cache" or "unionize_indices". Steps that run more than once get one record each time.
+#   TableRecord: One of the final dataframes. memory is how many bytes it takes up, including the contents of string columns.
+FileRecord = collections.namedtuple("FileRecord", ["file_name", "tables", "seconds", "bytes_read", "peak_memory"])
+StepRecord = collections.namedtuple("StepRecord", ["name", "seconds"])
+TableRecord = collections.namedtuple("TableRecord", ["name", "shape", "memory"])
+
+_active = threading.local() # Holds the report that record_step and timed_step should record to, if any. Loading happens in one thread, so each thread gets its own.
+
+class LoadReport:
+    """A record of where the time and memory went while loading a dataset, for finding slow steps and tracking them across data versions. Get it from any loaded dataset by calling its get_load_report method. The timings are always recorded, but memory use is only measured if the dataset was loaded with profile=True.
+
+    Attributes:
+    cancer_type (str): The dataset that was loaded.
+    version (str): The data version that was loaded.
+    from_cache (bool): Whether the dataframes were read from the cache instead of parsed from the data files.
+    seconds (float): How long loading took in total.
+    files (list of FileRecord): The data files that were parsed, in the order they were listed. Empty if the dataframes came from the cache.
+    steps (list of StepRecord): The steps of loading, in the order they finished.
+    tables (list of TableRecord): The final dataframes. If the dataset was loaded lazily from the cache, only the ones that were in memory.
+    """
+
+    def __init__(self, cancer_type):
+        """Start an empty report.
+
+        Parameters:
+        cancer_type (str): The dataset being loaded.
+        """
+        self.cancer_type = cancer_type
+        self.version = None
+        self.from_cache = False
+        self.seconds = None
+        self.files = []
+        self.steps = []
+        self.tables = []
+
+    @contextlib.contextmanager
+    def activate(self):
+        """Make this the report that record_step and timed_step record to in this thread, for the duration of a with block, and time the whole block."""
+        previous = getattr(_active, "report", None)
+        _active.report = self
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.seconds = time.perf_counter() - start
+            _active.report = previous
+
+    def get_step_seconds(self):
+        """Get the total time spent in each step.
+
+        Returns:
+        dict: Step names as keys, and the total seconds spent in that step as values, in the order the steps first finished.
+        """
+        totals = collections.OrderedDict()
+        for step in self.steps:
+            totals[step.name] = totals.get(step.name, 0) + step.seconds
+        return totals
+
+    def to_dict(self):
+        """Get the report as a dict of plain Python types, e.g. to save as JSON to compare with later loads.
+
+        Returns:
+        dict: The report's attributes, with each record as a dict.
+        """
+        return {
+            "cancer_type": self.cancer_type,
+            "version": self.version,
+            "from_cache": self.from_cache,
+            "seconds": self.seconds,
+            "files": [dict(record._asdict()) for record in self.files],
+            "steps": [dict(record._asdict()) for record in self.steps],
+            "tables": [dict(record._asdict()) for record in self.tables],
+        }
+
+    def __str__(self):
+        lines = [f"{self.cancer_type} v{self.version} loaded {'from the cache ' if self.from_cache else ''}in {self.seconds:.2f} s"]
+
+        if len(self.files) > 0:
+            lines.append("Data files:")
+            for record in self.files:
+                peak = "" if record.peak_memory is None else f", peak {record.peak_memory / 2**20:.1f} MiB"
+                lines.append(f"    {record.file_name}: {record.seconds:.2f} s, {record.bytes_read / 2**20:.1f} MiB read{peak}")
+
+        lines.append("Steps:")
+        for name, seconds in self.get_step_seconds().items():
+            lines.append(f"    {name}: {seconds:.2f} s")
+
+        if len(self.tables) > 0:
+            lines.append("Tables:")
+            for record in self.tables:
+                lines.append(f"    {record.name} {record.shape}: {record.memory / 2**20:.1f} MiB")
+
+        return "\n".join(lines)
+
+def get_active_report():
+    """Get the report being recorded to in this thread.
+
+    Returns:
+    LoadReport: The active report, or None if there isn't one.
+    """
+    return getattr(_active, "report", None)
+
+@contextlib.contextmanager
+def record_step(name):
+    """Time the body of a with block as a step in the active report, if there is one. Otherwise, does nothing.
+
+    Parameters:
+    name (str): The name to record the step under.
+    """
+    report = get_active_report()
+    if report is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        report.steps.append(StepRecord(name=name, seconds=time.perf_counter() - start))
+
+def timed_step(func):
+    """Decorator that records each call to a function as a step, named after the function, in the active report, if there is one."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with record_step(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
@@ -13,13 +13,24 @@ import pandas as pd
 import numpy as np
 import os
 import warnings
-from .dataset import DataSet
+from .dataset import DataSet, FileParser
+from .file_tools import read_gct
 from .dataframe_tools import *
 from .exceptions import FailedReindexWarning, ReindexMapError
 class Lscc(DataSet):
 
-    def __init__(self, version="latest"):
-        """Load all of the lscc dataframes as values in the self._data dict variable, with names as keys, and format them properly."""
+    def __init__(self, version="latest", use_cache=True, lazy=False, n_jobs=1, executor=None, dtype="float64", profile=False):
+        """Load all of the lscc dataframes as values in the self._data dict variable, with names as keys, and format them properly.
+
+        Parameters:
+        version (str, optional): The version number to load, or the string "latest" to just load the latest version. Default is "latest".
+        use_cache (bool, optional): Whether to load the formatted dataframes from the on-disk cache if a valid one exists, and to save them to the cache after parsing the data files if not. Default is True.
+        lazy (bool, optional): Whether to wait to read each dataframe from the cache until it's first used, instead of reading them all when the dataset is loaded. This saves time and memory if you only use a few of the dataframes. Requires use_cache to be True. Default is False.
+        n_jobs (int, optional): The number of threads to use to parse the data files, if they aren't loaded from the cache. -1 uses one thread per CPU. Default is 1, which parses them one at a time.
+        executor (concurrent.futures.Executor, optional): An executor to parse the data files with instead, e.g. a concurrent.futures.ProcessPoolExecutor. If passed, n_jobs is ignored, and the executor is not shut down afterwards. Default is None.
+        dtype (str, optional): "float64" to keep the omics dataframes at full precision, or "float32" to store and return them as float32, and also make the repeated string columns in the clinical, experimental_design and somatic_mutation dataframes categorical. "float32" about halves the memory the dataset uses. Default is "float64".
+        profile (bool or function, optional): Whether to measure memory use while loading, in addition to the timings that are always recorded. Get the results by calling get_load_report. If a function, it is also called with the report once the dataset is loaded, e.g. to log it. Default is False.
+        """
 
         # Set some needed variables, and pass them to the parent DataSet class __init__ function
 
@@ -38,180 +49,226 @@ class Lscc(DataSet):
                 "lscc-v1.0-sample-annotation.csv.gz"] #done
         }
 
-        super().__init__(cancer_type="lscc", version=version, valid_versions=valid_versions, data_files=data_files)
-
-        # Load the data into dataframes in the self._data dict
-        loading_msg = "Loading dataframes"
-        for file_path in self._data_files_paths: # Loops through files variable
-
-            # Print a loading message. We add a dot every time, so the user knows it's not frozen.
-            loading_msg = loading_msg + "."
-            print(loading_msg, end='\r')
-
-            path_elements = file_path.split(os.sep) # Get a list of the levels of the path
-            file_name = path_elements[-1] # The last element will be the name of the file
-            df_name = file_name.split(".")[0] # Our dataframe name will be the first section of file name (i.e. proteomics.txt.gz becomes proteomics)
-
-            if file_name == "lscc-v1.0-cnv-gene-level-log2.gct.gz": #Done
-                df = pd.read_csv("lscc-v1.0-cnv-gene-level-log2.gct", sep="\t", skiprows=2, dtype=object)
-                df = df.set_index("id")
-                # df = df.apply(pd.to_numeric)
-                df = df.sort_index()
-                df = df.transpose()
-                df = df.sort_index()
-                df.index.name="Patient_ID"
-                self._data["CNV"] = df
-
-            elif file_name == "lscc-v1.0-phosphoproteome-ratio-norm-NArm.gct.gz": #Done
-                df = pd.read_csv(file_name, sep="\t", skiprows=2, dtype=object)
-                gene_filter = df['geneSymbol'] != 'na' #Drop rows of metadata
-                df = df[gene_filter]
-
-                # Prepare some columns we'll need later for the multiindex
-                df["variableSites"] = df["variableSites"].str.replace(r"[a-z\s]", "") # Get rid of all lowercase delimeters and whitespace in the sites
-                df = df.rename(columns={
-                "geneSymbol": "Name",
-                "variableSites": "Site",
-                "sequence": "Peptide", # We take this instead of sequenceVML, to match the other datasets' format
-                "accession_numbers": "Database_ID" # We take all accession numbers they have, instead of the singular accession_number column
-                })
-
-                # Some rows have at least one localized phosphorylation site, but also have other phosphorylations that aren't localized. We'll drop those rows, if their localized sites are duplicated in another row, to avoid creating duplicates, because we only preserve information about the localized sites in a given row. However, if the localized sites aren't duplicated in another row, we'll keep the row.
-                unlocalized_to_drop = df.index[~df['Best_numActualVMSites_sty'].eq(df['Best_numLocalizedVMsites_sty']) & df.duplicated(["Name", "Site", "Peptide", "Database_ID"], keep=False)] # Column 3 of the split "id" column is number of phosphorylations detected, and column 4 is number of phosphorylations localized, so if the two values aren't equal, the row has at least one unlocalized site
-                df = df.drop(index=unlocalized_to_drop)
-
-                # Give it a multiindex
-                df = df.set_index(["Name", "Site", "Peptide", "Database_ID"])
-
-
-                cols_to_drop = ['id','id.description', 'numColumnsVMsiteObserved', 'bestScore', 'bestDeltaForwardReverseScore',
-                'Best_scoreVML', 'Best_numActualVMSites_sty', 'Best_numLocalizedVMsites_sty', 'sequenceVML',
-                'accessionNumber_VMsites_numVMsitesPresent_numVMsitesLocalizedBest_earliestVMsiteAA_latestVMsiteAA', 'protein_mw', 'species',
-                'speciesMulti', 'orfCategory', 'accession_number', 'protein_group_num', 'entry_name', 'GeneSymbol']
-                df = df.drop(columns=cols_to_drop)
-                df = df.apply(pd.to_numeric)
-                df = df.sort_index()
-                df = df.transpose()
-                df = df.sort_index()
-                df.index.name="Patient_ID"
-                self._data["phosphoproteomics"] = df
-
-
-
-            elif file_name == "lscc-v1.0-proteome-ratio-norm-NArm.gct.gz": #done
-                df = pd.read_csv(file_path, skiprows=2, sep='\t', dtype=object)
-                gene_filter = df['geneSymbol'] != 'na' #Filter out rows of metadata
-                df = df[gene_filter]
-
-                df = df.rename(columns={"GeneSymbol": "Name", 'accession_numbers': "Database_ID"})
-                df = df.set_index(["Name", "Database_ID"])
-                cols_to_drop = ['id', 'id.description', 'geneSymbol', 'numColumnsProteinObserved',
-                'numSpectraProteinObserved', 'protein_mw', 'percentCoverage', 'numPepsUnique',
-                'scoreUnique', 'species', 'orfCategory', 'accession_number',
-                'subgroupNum', 'entry_name']
-                df = df.drop(columns=cols_to_drop)
-                df = df.apply(pd.to_numeric)
-                df = df.sort_index()
-                df = df.transpose()
-                df = df.sort_index()
-                df.index.name="Patient_ID"
-                df.columns.name=None
-                self._data["proteomics"] = df
-
-
-            elif file_name == "lscc-v1.0-cptac3-lscc-rna-seq-fusion-v2.2-y2.all-20190807.txt.gz": #done
-                 df = pd.read_csv(file_path, sep="\t", dtype=object)
-                 self._data['gene_fusion'] = df
-
-
-            elif file_name == "lscc-v1.0-sample-annotation.csv.gz": #done
-                df = pd.read_csv(file_path, sep=",", dtype=object)
-                filter = df['QC.status'] == "QC.pass" #There are some samples that are internal references. IRs are used for scaling purposes, and don't belong to a single patient, so we want to drop them.
-                df = df[filter]
-                df = df.drop(columns="Participant") #Get rid of the "Participant" column becuase the same information is stored in Sample.ID  which is formatted the way we want.
-                df = df.set_index("Sample.ID")
-                df.index.name="Patient_ID"
-                df = df.rename(columns={"Type":"Sample_Tumor_Normal"})
-                #Split the metadata into multiple dataframes
-                #Make experiemntal_set up dataframe
-                experimental_design_cols = ['Experiment', 'Channel', 'QC.status'] #These are the columns for the experimental_design dataframe
-                experimental_design_df = df[experimental_design_cols]
-                df = df.drop(columns=experimental_design_cols)
-                #Make a derived_molecular dataframe
-                derived_molecular_cols = ['TP53.mutation', 'CDKN2A.mutation', 'PTEN.mutation', 'PIK3CA.mutation',
-                 'KEAP1.mutation', 'HLA.A.mutation', 'NFE2L2.mutation', 'NOTCH1.mutation', 'RB1.mutation',
-                 'HRAS.mutation', 'FBXW7.mutation', 'SMARCA4.mutation', 'NF1.mutation', 'SMAD4.mutation',
-                 'EGFR.mutation', 'APC.mutation', 'BRAF.mutation', 'TNFAIP3.mutation', 'CREBBP.mutation',
-                 'TP53.mutation.status', 'CDKN2A.mutation.status', 'PTEN.mutation.status', 'PIK3CA.mutation.status',
-                 'KEAP1.mutation.status', 'HLA.A.mutation.status', 'NFE2L2.mutation.status', 'NOTCH1.mutation.status',
-                 'RB1.mutation.status', 'HRAS.mutation.status', 'FBXW7.mutation.status', 'SMARCA4.mutation.status',
-                 'NF1.mutation.status', 'SMAD4.mutation.status', 'EGFR.mutation.status', 'APC.mutation.status',
-                 'BRAF.mutation.status', 'TNFAIP3.mutation.status', 'CREBBP.mutation.status']
-                derived_molecular_df = df[derived_molecular_cols]
-                df = df.drop(columns = derived_molecular_cols)
-                self._data["clinical"]= df
-                self._data['experimental_design'] = experimental_design_df
-                self._data['derived_molecular'] = derived_molecular_df
-
-
-
-            elif file_name == "lscc-v1.0-cptac3-lscc-wxs-somatic-variant-sw-v1.5-lscc.y2-20191211.maf.gz":
-                df = pd.read_csv(file_name, sep="\t", dtype=object)
-
-                cols_to_drop = ['Hugo_Symbol', 'Entrez_Gene_Id', 'Center', 'NCBI_Build', 'Reference_Allele',
-                'Tumor_Seq_Allele1', 'Tumor_Seq_Allele2', 'dbSNP_RS', 'dbSNP_Val_Status',
-                'Tumor_Sample_Barcode', 'Matched_Norm_Sample_Barcode', 'Match_Norm_Seq_Allele1',
-                'Match_Norm_Seq_Allele2', 'Tumor_Validation_Allele1', 'Tumor_Validation_Allele2',
-                'Match_Norm_Validation_Allele1', 'Match_Norm_Validation_Allele2', 'Verification_Status',
-                'Validation_Status', 'Mutation_Status', 'Sequencing_Phase', 'Sequence_Source',
-                'Validation_Method', 'Score', 'BAM_File', 'Sequencer', 'Tumor_Sample_UUID',
-                'Matched_Norm_Sample_UUID', 'HGVSc', 'HGVSp', 'HGVSp_Short', 'Transcript_ID',
-                'Exon_Number', 't_depth', 't_ref_count', 't_alt_count', 'n_depth', 'n_ref_count',
-                'n_alt_count', 'callers', 'all_effects', 'Allele', 'Gene', 'Feature', 'Feature_type',
-                'Consequence', 'cDNA_position', 'CDS_position', 'Protein_position', 'Amino_acids',
-                'Codons', 'Existing_variation', 'ALLELE_NUM', 'DISTANCE', 'STRAND_VEP', 'SYMBOL',
-                'SYMBOL_SOURCE', 'HGNC_ID', 'BIOTYPE', 'CANONICAL', 'CCDS', 'ENSP', 'SWISSPROT',
-                'TREMBL', 'UNIPARC', 'RefSeq', 'SIFT', 'PolyPhen', 'EXON', 'INTRON', 'DOMAINS',
-                'GMAF', 'AFR_MAF', 'AMR_MAF', 'ASN_MAF', 'EAS_MAF', 'EUR_MAF', 'SAS_MAF', 'AA_MAF',
-                'EA_MAF', 'CLIN_SIG', 'SOMATIC', 'PUBMED', 'MOTIF_NAME', 'MOTIF_POS', 'HIGH_INF_POS',
-                'MOTIF_SCORE_CHANGE', 'IMPACT', 'PICK', 'VARIANT_CLASS', 'TSL', 'HGVS_OFFSET', 'PHENO',
-                'MINIMISED', 'ExAC_AF', 'ExAC_AF_AFR', 'ExAC_AF_AMR', 'ExAC_AF_EAS', 'ExAC_AF_FIN',
-                'ExAC_AF_NFE', 'ExAC_AF_OTH', 'ExAC_AF_SAS', 'GENE_PHENO', 'FILTER', 'flanking_bps',
-                'variant_id', 'variant_qual', 'ExAC_AF_Adj', 'ExAC_AC_AN_Adj', 'ExAC_AC_AN', 'ExAC_AC_AN_AFR',
-                'ExAC_AC_AN_AMR', 'ExAC_AC_AN_EAS', 'ExAC_AC_AN_FIN', 'ExAC_AC_AN_NFE', 'ExAC_AC_AN_OTH',
-                'ExAC_AC_AN_SAS', 'ExAC_FILTER']
-
-                df = df.drop(columns = cols_to_drop)
-                #self._data['somatic_mutation']
-                #not sure what to save this one as
-
-            elif file_name == "lscc-v1.0-mirna-mature-tpm-log2.gct.gz": #Done
-                df = pd.read_csv(file_name, skiprows=2, sep='\t', dtype=object)
-                gene_filter = df['Name'] != 'na' #Filter out rows of metadata
-                df = df[gene_filter]
-                df = df.set_index(["Name","ID"])
-                #df= df.apply(pd.to_numeric)
-                df = df.sort_index()
-                df = df.transpose()
-                df = df.sort_index()
-                df.index.name="Patient_ID"
-                df.columns.name=None
-                self._data["miRNA"] = df
-            elif file_name == "lscc-v1.0-any-somatic-mutation-freq-by-gene.gct.gz":
-                df = pd.read_csv(file_name, skiprows=2, sep='\t', dtype=object)
-                gene_filter = df['SYMBOL'] != 'na' #Filter out rows of metadata
-                df = df[gene_filter]
-                df = df.rename(columns={"SYMBOL": "GENE", "id":"ID"})
-                df = df.set_index("GENE")
-                df = df.sort_index()
-                self._data['somatic_mutation'] = df
-
-        print(' ' * len(loading_msg), end='\r') # Erase the loading message
+        # Map each data file to the method that parses it, and the names of the dataframes that method returns. The first parser that matches the file name and the dataset version is used.
+        file_parsers = [
+            FileParser(file_patterns=["lscc-v1.0-cnv-gene-level-log2.gct.gz"], versions=None, tables=["CNV"], parse=self._parse_cnv),
+            FileParser(file_patterns=["lscc-v1.0-phosphoproteome-ratio-norm-NArm.gct.gz"], versions=None, tables=["phosphoproteomics"], parse=self._parse_phosphoproteomics),
+            FileParser(file_patterns=["lscc-v1.0-proteome-ratio-norm-NArm.gct.gz"], versions=None, tables=["proteomics"], parse=self._parse_proteomics),
+            FileParser(file_patterns=["lscc-v1.0-cptac3-lscc-rna-seq-fusion-v2.2-y2.all-20190807.txt.gz"], versions=None, tables=["gene_fusion"], parse=self._parse_gene_fusion),
+            FileParser(file_patterns=["lscc-v1.0-sample-annotation.csv.gz"], versions=None, tables=["clinical", "experimental_design", "derived_molecular"], parse=self._parse_sample_annotation),
+            FileParser(file_patterns=["lscc-v1.0-cptac3-lscc-wxs-somatic-variant-sw-v1.5-lscc.y2-20191211.maf.gz"], versions=None, tables=[], parse=self._parse_somatic_variants),
+            FileParser(file_patterns=["lscc-v1.0-mirna-mature-tpm-log2.gct.gz"], versions=None, tables=["miRNA"], parse=self._parse_mirna),
+            FileParser(file_patterns=["lscc-v1.0-any-somatic-mutation-freq-by-gene.gct.gz"], versions=None, tables=["somatic_mutation"], parse=self._parse_somatic_mutation),
+        ]
+
+        super().__init__(cancer_type="lscc", version=version, valid_versions=valid_versions, data_files=data_files, file_parsers=file_parsers, use_cache=use_cache, lazy=lazy, n_jobs=n_jobs, executor=executor, dtype=dtype, profile=profile)
+
+    def _parse_cnv(self, file_path):
+        """Parse the CNV data file."""
+        tables = {}
+
+        df = pd.read_csv("lscc-v1.0-cnv-gene-level-log2.gct", sep="\t", skiprows=2, dtype=object)
+        df = df.set_index("id")
+        # df = df.apply(pd.to_numeric)
+        df = df.sort_index()
+        df = df.transpose()
+        df = df.sort_index()
+        df.index.name="Patient_ID"
+        tables["CNV"] = df
+
+        return tables
+
+    def _parse_phosphoproteomics(self, file_path):
+        """Parse the phosphoproteomics data file."""
+        path_elements = file_path.split(os.sep) # Get a list of the levels of the path
+        file_name = path_elements[-1] # The last element will be the name of the file
+
+        tables = {}
+
+        df = read_gct(file_name)
+        gene_filter = df['geneSymbol'] != 'na' # Drop rows without a gene name
+        df = df[gene_filter]
+
+        # Prepare some columns we'll need later for the multiindex
+        df["variableSites"] = df["variableSites"].str.replace(r"[a-z\s]", "") # Get rid of all lowercase delimeters and whitespace in the sites
+        df = df.rename(columns={
+        "geneSymbol": "Name",
+        "variableSites": "Site",
+        "sequence": "Peptide", # We take this instead of sequenceVML, to match the other datasets' format
+        "accession_numbers": "Database_ID" # We take all accession numbers they have, instead of the singular accession_number column
+        })
+
+        # Some rows have at least one localized phosphorylation site, but also have other phosphorylations that aren't localized. We'll drop those rows, if their localized sites are duplicated in another row, to avoid creating duplicates, because we only preserve information about the localized sites in a given row. However, if the localized sites aren't duplicated in another row, we'll keep the row.
+        unlocalized_to_drop = df.index[~df['Best_numActualVMSites_sty'].eq(df['Best_numLocalizedVMsites_sty']) & df.duplicated(["Name", "Site", "Peptide", "Database_ID"], keep=False)] # Column 3 of the split "id" column is number of phosphorylations detected, and column 4 is number of phosphorylations localized, so if the two values aren't equal, the row has at least one unlocalized site
+        df = df.drop(index=unlocalized_to_drop)
+
+        # Give it a multiindex
+        df = df.set_index(["Name", "Site", "Peptide", "Database_ID"])
+
+
+        cols_to_drop = ['id','id.description', 'numColumnsVMsiteObserved', 'bestScore', 'bestDeltaForwardReverseScore',
+        'Best_scoreVML', 'Best_numActualVMSites_sty', 'Best_numLocalizedVMsites_sty', 'sequenceVML',
+        'accessionNumber_VMsites_numVMsitesPresent_numVMsitesLocalizedBest_earliestVMsiteAA_latestVMsiteAA', 'protein_mw', 'species',
+        'speciesMulti', 'orfCategory', 'accession_number', 'protein_group_num', 'entry_name', 'GeneSymbol']
+        df = df.drop(columns=cols_to_drop)
+        df = df.sort_index()
+        df = df.transpose()
+        df = df.sort_index()
+        df.index.name="Patient_ID"
+        tables["phosphoproteomics"] = df
+
+        return tables
+
+    def _parse_proteomics(self, file_path):
+        """Parse the proteomics data file."""
+        tables = {}
+
+        df = read_gct(file_path)
+        gene_filter = df['geneSymbol'] != 'na' # Filter out rows without a gene name
+        df = df[gene_filter]
+
+        df = df.rename(columns={"GeneSymbol": "Name", 'accession_numbers': "Database_ID"})
+        df = df.set_index(["Name", "Database_ID"])
+        cols_to_drop = ['id', 'id.description', 'geneSymbol', 'numColumnsProteinObserved',
+        'numSpectraProteinObserved', 'protein_mw', 'percentCoverage', 'numPepsUnique',
+        'scoreUnique', 'species', 'orfCategory', 'accession_number',
+        'subgroupNum', 'entry_name']
+        df = df.drop(columns=cols_to_drop)
+        df = df.sort_index()
+        df = df.transpose()
+        df = df.sort_index()
+        df.index.name="Patient_ID"
+        df.columns.name=None
+        tables["proteomics"] = df
+
+        return tables
+
+    def _parse_gene_fusion(self, file_path):
+        """Parse the gene fusion data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep="\t", dtype=object)
+        tables['gene_fusion'] = df
+
+        return tables
+
+    def _parse_sample_annotation(self, file_path):
+        """Parse the sample annotation data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep=",", dtype=object)
+        filter = df['QC.status'] == "QC.pass" #There are some samples that are internal references. IRs are used for scaling purposes, and don't belong to a single patient, so we want to drop them.
+        df = df[filter]
+        df = df.drop(columns="Participant") #Get rid of the "Participant" column becuase the same information is stored in Sample.ID  which is formatted the way we want.
+        df = df.set_index("Sample.ID")
+        df.index.name="Patient_ID"
+        df = df.rename(columns={"Type":"Sample_Tumor_Normal"})
+        #Split the metadata into multiple dataframes
+        #Make experiemntal_set up dataframe
+        experimental_design_cols = ['Experiment', 'Channel', 'QC.status'] #These are the columns for the experimental_design dataframe
+        experimental_design_df = df[experimental_design_cols]
+        df = df.drop(columns=experimental_design_cols)
+        #Make a derived_molecular dataframe
+        derived_molecular_cols = ['TP53.mutation', 'CDKN2A.mutation', 'PTEN.mutation', 'PIK3CA.mutation',
+         'KEAP1.mutation', 'HLA.A.mutation', 'NFE2L2.mutation', 'NOTCH1.mutation', 'RB1.mutation',
+         'HRAS.mutation', 'FBXW7.mutation', 'SMARCA4.mutation', 'NF1.mutation', 'SMAD4.mutation',
+         'EGFR.mutation', 'APC.mutation', 'BRAF.mutation', 'TNFAIP3.mutation', 'CREBBP.mutation',
+         'TP53.mutation.status', 'CDKN2A.mutation.status', 'PTEN.mutation.status', 'PIK3CA.mutation.status',
+         'KEAP1.mutation.status', 'HLA.A.mutation.status', 'NFE2L2.mutation.status', 'NOTCH1.mutation.status',
+         'RB1.mutation.status', 'HRAS.mutation.status', 'FBXW7.mutation.status', 'SMARCA4.mutation.status',
+         'NF1.mutation.status', 'SMAD4.mutation.status', 'EGFR.mutation.status', 'APC.mutation.status',
+         'BRAF.mutation.status', 'TNFAIP3.mutation.status', 'CREBBP.mutation.status']
+        derived_molecular_df = df[derived_molecular_cols]
+        df = df.drop(columns = derived_molecular_cols)
+        tables["clinical"]= df
+        tables['experimental_design'] = experimental_design_df
+        tables['derived_molecular'] = derived_molecular_df
+
+        return tables
+
+    def _parse_somatic_variants(self, file_path):
+        """Parse the somatic variants data file."""
+        path_elements = file_path.split(os.sep) # Get a list of the levels of the path
+        file_name = path_elements[-1] # The last element will be the name of the file
+
+        tables = {}
+
+        df = pd.read_csv(file_name, sep="\t", dtype=object)
+
+        cols_to_drop = ['Hugo_Symbol', 'Entrez_Gene_Id', 'Center', 'NCBI_Build', 'Reference_Allele',
+        'Tumor_Seq_Allele1', 'Tumor_Seq_Allele2', 'dbSNP_RS', 'dbSNP_Val_Status',
+        'Tumor_Sample_Barcode', 'Matched_Norm_Sample_Barcode', 'Match_Norm_Seq_Allele1',
+        'Match_Norm_Seq_Allele2', 'Tumor_Validation_Allele1', 'Tumor_Validation_Allele2',
+        'Match_Norm_Validation_Allele1', 'Match_Norm_Validation_Allele2', 'Verification_Status',
+        'Validation_Status', 'Mutation_Status', 'Sequencing_Phase', 'Sequence_Source',
+        'Validation_Method', 'Score', 'BAM_File', 'Sequencer', 'Tumor_Sample_UUID',
+        'Matched_Norm_Sample_UUID', 'HGVSc', 'HGVSp', 'HGVSp_Short', 'Transcript_ID',
+        'Exon_Number', 't_depth', 't_ref_count', 't_alt_count', 'n_depth', 'n_ref_count',
+        'n_alt_count', 'callers', 'all_effects', 'Allele', 'Gene', 'Feature', 'Feature_type',
+        'Consequence', 'cDNA_position', 'CDS_position', 'Protein_position', 'Amino_acids',
+        'Codons', 'Existing_variation', 'ALLELE_NUM', 'DISTANCE', 'STRAND_VEP', 'SYMBOL',
+        'SYMBOL_SOURCE', 'HGNC_ID', 'BIOTYPE', 'CANONICAL', 'CCDS', 'ENSP', 'SWISSPROT',
+        'TREMBL', 'UNIPARC', 'RefSeq', 'SIFT', 'PolyPhen', 'EXON', 'INTRON', 'DOMAINS',
+        'GMAF', 'AFR_MAF', 'AMR_MAF', 'ASN_MAF', 'EAS_MAF', 'EUR_MAF', 'SAS_MAF', 'AA_MAF',
+        'EA_MAF', 'CLIN_SIG', 'SOMATIC', 'PUBMED', 'MOTIF_NAME', 'MOTIF_POS', 'HIGH_INF_POS',
+        'MOTIF_SCORE_CHANGE', 'IMPACT', 'PICK', 'VARIANT_CLASS', 'TSL', 'HGVS_OFFSET', 'PHENO',
+        'MINIMISED', 'ExAC_AF', 'ExAC_AF_AFR', 'ExAC_AF_AMR', 'ExAC_AF_EAS', 'ExAC_AF_FIN',
+        'ExAC_AF_NFE', 'ExAC_AF_OTH', 'ExAC_AF_SAS', 'GENE_PHENO', 'FILTER', 'flanking_bps',
+        'variant_id', 'variant_qual', 'ExAC_AF_Adj', 'ExAC_AC_AN_Adj', 'ExAC_AC_AN', 'ExAC_AC_AN_AFR',
+        'ExAC_AC_AN_AMR', 'ExAC_AC_AN_EAS', 'ExAC_AC_AN_FIN', 'ExAC_AC_AN_NFE', 'ExAC_AC_AN_OTH',
+        'ExAC_AC_AN_SAS', 'ExAC_FILTER']
+
+        df = df.drop(columns = cols_to_drop)
+        #tables['somatic_mutation']
+        #not sure what to save this one as
+
+        return tables
+
+    def _parse_mirna(self, file_path):
+        """Parse the miRNA data file."""
+        path_elements = file_path.split(os.sep) # Get a list of the levels of the path
+        file_name = path_elements[-1] # The last element will be the name of the file
+
+        tables = {}
+
+        df = pd.read_csv(file_name, skiprows=2, sep='\t', dtype=object)
+        gene_filter = df['Name'] != 'na' #Filter out rows of metadata
+        df = df[gene_filter]
+        df = df.set_index(["Name","ID"])
+        #df= df.apply(pd.to_numeric)
+        df = df.sort_index()
+        df = df.transpose()
+        df = df.sort_index()
+        df.index.name="Patient_ID"
+        df.columns.name=None
+        tables["miRNA"] = df
+
+        return tables
+
+    def _parse_somatic_mutation(self, file_path):
+        """Parse the somatic mutation frequency data file."""
+        path_elements = file_path.split(os.sep) # Get a list of the levels of the path
+        file_name = path_elements[-1] # The last element will be the name of the file
+
+        tables = {}
+
+        df = pd.read_csv(file_name, skiprows=2, sep='\t', dtype=object)
+        gene_filter = df['SYMBOL'] != 'na' #Filter out rows of metadata
+        df = df[gene_filter]
+        df = df.rename(columns={"SYMBOL": "GENE", "id":"ID"})
+        df = df.set_index("GENE")
+        df = df.sort_index()
+        tables['somatic_mutation'] = df
+
+        return tables
+
+    def _format_dataframes(self):
+        """Format the lscc dataframes in the self._data dict, once all the data files have been parsed."""
         formatting_msg = "Formatting dataframes..."
         print(formatting_msg, end='\r')
 
-        # Get a union of all dataframes' indices, with duplicates removed
-        master_index = unionize_indices(self._data)
+        # Get a union of all dataframes' indices, with duplicates removed, and where each dataframe's rows are in it
+        master_index, index_codes = unionize_indices(self._data, return_codes=True)
 
         # Sort this master_index so all the samples with an N suffix are last. Because the N is a suffix, not a prefix, this is kind of messy.
         status_col = np.where(master_index.str.endswith("N"), "Normal", "Tumor")
@@ -219,9 +276,14 @@ class Lscc(DataSet):
         status_df = status_df.sort_values(by=["Status", "Patient_ID"], ascending=[False, True]) # Sorts first by status, and in descending order, so "Tumor" samples are first
         master_index = pd.Index(status_df["Patient_ID"])
 
+        # The index of status_df still has each sample's old position in the master index, so use it to move the clinical codes to the new positions
+        new_positions = np.empty(len(master_index), dtype=np.intp)
+        new_positions[status_df.index.values] = np.arange(len(master_index))
+        clinical_codes = new_positions[index_codes["clinical"]]
+
         # Use the master index to reindex the clinical dataframe, so the clinical dataframe has a record of every sample in the dataset. Rows that didn't exist before (such as the rows for normal samples) are filled with NaN.
         clinical = self._data["clinical"]
-        clinical = clinical.reindex(master_index)
+        clinical = reindex_from_codes(clinical, master_index, clinical_codes)
 
         # Replace the clinical dataframe in the data dictionary with our new and improved version!
         self._data['clinical'] = clinical
@@ -243,10 +305,7 @@ class Lscc(DataSet):
 
             self._data[name] = df
 
-        # Call function from dataframe_tools.py to standardize the names of the index and column axes
-        self._data = standardize_axes_names(self._data)
-
-        # Call function from dataframe_tools.py to sort all tables first by sample status, and then by the index
-        self._data = sort_all_rows(self._data)
+        # Call function from dataframe_tools.py to sort all tables first by sample status, and then by the index, and standardize the names of the index and column axes
+        self._data = finalize_all_dataframes(self._data)
 
-        print(" " * len(formatting_msg), end='\r') # Erase the formatting message
+        print(" " * len(formatting_msg), end='\r') # Erase the formatting message
\ No newline at end of file
@@ -0,0 +1,134 @@
+#   Copyright 2018 Samuel Payne sam_payne@byu.edu
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import numpy as np
+import pandas as pd
+from .exceptions import InvalidParameterError
+
+class MutationMatrix:
+    """An integer coded, columnar index of a somatic_mutation dataframe. Each mutation's sample, gene and mutation type are stored as codes into the samples, genes and mutation_types indices, and the mutations are grouped by gene, so looking up the mutations for a gene doesn't have to scan the whole dataframe.
+    """
+
+    def __init__(self, somatic_mutation):
+        """Build the index from a somatic_mutation dataframe.
+
+        Parameters:
+        somatic_mutation (pandas DataFrame): The somatic_mutation dataframe, with samples as the index, and Gene and Mutation columns. Mutations without a gene are left out.
+        """
+        sample_codes, self._samples = pd.factorize(somatic_mutation.index)
+        gene_codes, genes = pd.factorize(somatic_mutation["Gene"].astype(object)) # If the column is categorical, we only want the genes that actually have mutations
+        mutation_codes, mutation_types = pd.factorize(somatic_mutation["Mutation"].astype(object))
+
+        self._genes = pd.Index(genes, name="Gene")
+        self._mutation_types = pd.Index(mutation_types, name="Mutation")
+
+        # Group the mutations by gene. The sort is stable, so each gene's mutations stay in the order they're in the dataframe.
+        rows = np.flatnonzero(gene_codes >= 0) # Codes are -1 for NaN
+        rows = rows[np.argsort(gene_codes[rows], kind="mergesort")]
+        self._rows = rows # The positions of the mutations in the dataframe
+        self._sample_codes = sample_codes[rows]
+        self._gene_codes = gene_codes[rows]
+        self._mutation_codes = mutation_codes[rows]
+
+        # The mutations for the gene with code i are self._rows[self._gene_offsets[i]:self._gene_offsets[i + 1]]
+        self._gene_offsets = np.searchsorted(self._gene_codes, np.arange(len(self._genes) + 1))
+        self._gene_positions = {gene: position for position, gene in enumerate(self._genes)}
+
+    @property
+    def samples(self):
+        """pandas Index: The samples that have mutation data. Sample codes are positions in this index."""
+        return self._samples
+
+    @property
+    def genes(self):
+        """pandas Index: The genes that have mutations. Gene codes are positions in this index."""
+        return self._genes
+
+    @property
+    def mutation_types(self):
+        """pandas Index: The mutation types in the data, e.g. Missense_Mutation. Mutation codes are positions in this index."""
+        return self._mutation_types
+
+    def has_gene(self, gene):
+        """Check whether a gene has any mutations in the data."""
+        return gene in self._gene_positions
+
+    def get_rows(self, genes):
+        """Get the positions in the somatic_mutation dataframe of all the mutations in one or more genes.
+
+        Parameters:
+        genes (str, or list or array-like of str): The gene(s) to get the mutations for. Genes without any mutations are skipped.
+
+        Returns:
+        numpy array of int: The positions of the mutations, in the order they're in the dataframe, for use with DataFrame.iloc.
+        """
+        if isinstance(genes, str):
+            genes = [genes]
+
+        slices = []
+        for gene in pd.Series(genes).drop_duplicates():
+            position = self._gene_positions.get(gene)
+            if position is not None:
+                slices.append(self._rows[self._gene_offsets[position]:self._gene_offsets[position + 1]])
+
+        if len(slices) == 0:
+            return np.array([], dtype=int)
+        return np.sort(np.concatenate(slices))
+
+    def to_sparse(self, mutation_types=None):
+        """Get a sparse matrix of the number of mutations for each sample in each gene.
+
+        Parameters:
+        mutation_types (list or array-like of str, optional): The mutation types to count. Default of None counts all of them.
+
+        Returns:
+        scipy.sparse.csr_matrix: The counts, with one row for each sample in the samples index, and one column for each gene in the genes index.
+        """
+        import scipy.sparse # Importing scipy is slow, and this is the only place we need it
+
+        mask = self._get_type_mask(mutation_types)
+        counts = np.ones(mask.sum(), dtype=np.int32)
+        shape = (len(self._samples), len(self._genes))
+        return scipy.sparse.csr_matrix((counts, (self._sample_codes[mask], self._gene_codes[mask])), shape=shape) # Duplicate entries are summed
+
+    def count_samples_mutated(self, mutation_types=None, exclude=False):
+        """Count how many samples have at least one mutation in each gene.
+
+        Parameters:
+        mutation_types (list or array-like of str, optional): Only count mutations of these types. Default of None counts all of them.
+        exclude (bool, optional): If True, count the mutations of every type except mutation_types instead, including mutations with no type. Default False.
+
+        Returns:
+        pandas Series: The number of samples mutated, indexed by gene.
+        """
+        mask = self._get_type_mask(mutation_types, exclude)
+        pairs = np.unique(self._gene_codes[mask].astype(np.int64) * len(self._samples) + self._sample_codes[mask]) # Each unique sample and gene pair gets one code
+        counts = np.bincount(pairs // len(self._samples), minlength=len(self._genes))
+        return pd.Series(counts, index=self._genes, name="Samples_Mutated")
+
+    def _get_type_mask(self, mutation_types, exclude=False):
+        """Get a boolean mask of which mutations are of the given types.
+
+        Parameters:
+        mutation_types (list or array-like of str): The mutation types to select. None selects all of them.
+        exclude (bool, optional): If True, select the mutations that aren't of the given types instead, including ones with no type. Default False.
+
+        Returns:
+        numpy array of bool: True for each mutation of one of the types, in the same order as the other arrays.
+        """
+        if mutation_types is None:
+            return np.full(len(self._rows), not exclude, dtype=bool)
+
+        if isinstance(mutation_types, str):
+            raise InvalidParameterError(f"Please pass a list or array-like of mutation types. You passed the str '{mutation_types}'.")
+
+        type_codes = self._mutation_types.get_indexer(pd.Index(mutation_types).drop_duplicates())
+        return np.isin(self._mutation_codes, type_codes[type_codes >= 0], invert=exclude) # Codes are -1 for NaN, so mutations with no type are never in the types
@@ -13,15 +13,25 @@ import pandas as pd
 import numpy as np
 import os
 import warnings
-from .dataset import DataSet
+from .dataset import DataSet, FileParser
 from .file_download import update_index
 from .dataframe_tools import *
 from .exceptions import FailedReindexWarning, ReindexMapError
 
 class Ovarian(DataSet):
 
-    def __init__(self, version="latest"):
-        """Load all the ovarian dataframes as values in the self._data dict variable, with names as keys, and format them properly."""
+    def __init__(self, version="latest", use_cache=True, lazy=False, n_jobs=1, executor=None, dtype="float64", profile=False):
+        """Load all the ovarian dataframes as values in the self._data dict variable, with names as keys, and format them properly.
+
+        Parameters:
+        version (str, optional): The version number to load, or the string "latest" to just load the latest version. Default is "latest".
+        use_cache (bool, optional): Whether to load the formatted dataframes from the on-disk cache if a valid one exists, and to save them to the cache after parsing the data files if not. Default is True.
+        lazy (bool, optional): Whether to wait to read each dataframe from the cache until it's first used, instead of reading them all when the dataset is loaded. This saves time and memory if you only use a few of the dataframes. Requires use_cache to be True. Default is False.
+        n_jobs (int, optional): The number of threads to use to parse the data files, if they aren't loaded from the cache. -1 uses one thread per CPU. Default is 1, which parses them one at a time.
+        executor (concurrent.futures.Executor, optional): An executor to parse the data files with instead, e.g. a concurrent.futures.ProcessPoolExecutor. If passed, n_jobs is ignored, and the executor is not shut down afterwards. Default is None.
+        dtype (str, optional): "float64" to keep the omics dataframes at full precision, or "float32" to store and return them as float32, and also make the repeated string columns in the clinical, experimental_design and somatic_mutation dataframes categorical. "float32" about halves the memory the dataset uses. Default is "float64".
+        profile (bool or function, optional): Whether to measure memory use while loading, in addition to the timings that are always recorded. Get the results by calling get_load_report. If a function, it is also called with the report once the dataset is loaded, e.g. to log it. Default is False.
+        """
 
         # Set some needed variables, and pass them to the parent DataSet class __init__ function
 
@@ -49,115 +59,169 @@ class Ovarian(DataSet):
                 "treatment.csv.gz"],
         }
 
-        super().__init__(cancer_type="ovarian", version=version, valid_versions=valid_versions, data_files=data_files)
-
-        # Load the data files into dataframes in the self._data dict
-        loading_msg = "Loading dataframes"
-        for file_path in self._data_files_paths:
-
-            # Print a loading message. We add a dot every time, so the user knows it's not frozen.
-            loading_msg = loading_msg + "."
-            print(loading_msg, end='\r')
-
-            path_elements = file_path.split(os.sep) # Get a list of all the levels of the path
-            file_name = path_elements[-1] # The last element will be the name of the file
-            df_name = file_name.split(".")[0] # Our dataframe name will be the first section of file name (i.e. proteomics.txt.gz becomes proteomics)
-
-            if file_name == "clinical.csv.gz" or file_name == "treatment.csv.gz":
-                df = pd.read_csv(file_path, sep=",", index_col=0)
-                df = df.rename(columns={"Participant_ID":"Patient_ID"})
-                df = df.set_index("Patient_ID")
-                self._data[df_name] = df #maps dataframe name to dataframe
-
-            elif file_name == "cnv.tsv.gz":
-                df = pd.read_csv(file_path, sep="\t", index_col=0)
-                df = df.sort_index()
-                df = df.transpose()
-                df = df.sort_index()
-                self._data["CNV"] = df #maps dataframe name to dataframe
-
-            elif file_name == "definitions.txt":
-                with open(file_path, "r", errors="ignore") as definitions_file:
-                    for line in definitions_file.readlines():
-                        line = line.strip()
-                        line = line.split("\t")
-                        term = line[0]
-                        definition = line[1]
-                        self._definitions[term] = definition
-
-            elif file_name == "phosphoproteomics.txt.gz" or file_name == "proteomics.txt.gz":
-                df = pd.read_csv(file_path, sep='\t')
-                   
-                if file_name == "proteomics.txt.gz":
-                    df = df[df["hgnc_symbol"].notnull()] # Drops all nan values in hgnc_symbol column
-
-                    # Create our column multiindex
-                    df = df.rename(columns={"hgnc_symbol": "Name", "refseq_peptide": "Database_ID"})
-                    df = df.set_index(["Name", "Database_ID"])
-
-                elif file_name == "phosphoproteomics.txt.gz":
-                    df = df[df["site"].notnull()] # Drops all rows with nan values in site column
-
-                    # Create our column multiindex
-                    split_genes = df["site"].str.rsplit("-", n=1, expand=True) # Split the genes from the sites, splitting from the right since some genes have hyphens in their names, but the genes and sites are also separated by hyphens
-                    df = df.drop(columns=["hgnc_symbol", "site"]) # hgnc_symbol is a duplicate of split_genes[0], and site is now in split_genes and will be re-inserted differently
-                    df = df.assign(Name=split_genes[0], Site=split_genes[1])
-                    df["Site"] = df["Site"].str.replace(r"[sty]", r"") # Get rid of all lowercase s, t, and y delimeters in the sites
-                    df = df.rename(columns={"refseq_peptide": "Database_ID"})
-                    df = df.set_index(["Name", "Site", "Peptide", "Database_ID"]) # Turn these columns into a multiindex
-
-                df = df.sort_index()
-                df = df.transpose()
-                df.index = df.index.where(~df.index.str.startswith('C'), df.index.str[1:]) # Take C prefix off of indices for those samples that have them (tumor samples have C, normal have N)
-                df = df.drop(index=df.index[df.index.str.startswith("OV_QC")]) # Drop all OV_QC samples--they're quality control samples not relevant for data analysis
-                self._data[df_name] = df
-
-            elif file_name == "somatic_38.maf.gz":
-                df = pd.read_csv(file_path, sep = "\t", index_col=0)
-                df = df.reset_index()
-                split_barcode = df["Tumor_Sample_Barcode"].str.split("_", n = 1, expand = True) # The first part of the barcode is the patient id, which we need to make a Patient_ID column
-                df["Tumor_Sample_Barcode"] = split_barcode[0]
-                df = df[["Tumor_Sample_Barcode","Hugo_Symbol","Variant_Classification","HGVSp_Short"]] # We only want these columns
-                df = df.rename(columns={"Tumor_Sample_Barcode":"Patient_ID","Hugo_Symbol":"Gene","Variant_Classification":"Mutation","HGVSp_Short":"Location"})
-                df = df.sort_values(by=["Patient_ID", "Gene"])
-                df = df.set_index("Patient_ID")
-                self._data['somatic_mutation'] = df
-
-            elif file_name == "transcriptomics.tsv.gz":
-                df = pd.read_csv(file_path, sep="\t", index_col=0)
-                df = df.sort_index()
-                df = df.transpose()
-                df = df.sort_index()
-                date_cols = ['1-Dec', '1-Sep', '10-Mar', '10-Sep', '11-Sep', '12-Sep', '14-Sep', '15-Sep', '2-Mar', '2-Sep', '3-Mar', '3-Sep', '4-Mar', '4-Sep', '5-Mar', '6-Mar', '6-Sep', '7-Mar', '7-Sep', '8-Mar', '8-Sep', '9-Mar', '9-Sep']
-                df = df.drop(columns=date_cols) # Drop all date values until new data is uploaded
-                self._data[df_name] = df #maps dataframe name to dataframe
-
-            elif file_name == 'Ovary_One_Year_Clinical_Data_20160927.xls' and self._version == "0.0.1":
-                df = pd.read_excel(file_path)
-
-                # Replace redundant values for "not reported" with NaN
-                nan_equivalents = ['Not Reported/ Unknown', 'Reported/ Unknown', 'Not Applicable',
-                    'na', 'unknown', 'Not Performed', 'Unknown tumor status', 'Unknown', 
-                    'Unknown Tumor Status', 'Not specified']
-
-                df = df.replace(nan_equivalents, np.nan)
-
-                # Rename PPID to Patient_ID and set as index
-                df = df.rename(columns={'PPID': 'Patient_ID'})
-                df = df.set_index("Patient_ID")
-                df = df.sort_index()
-
-                self._data["followup"] = df
-
-        print(' ' * len(loading_msg), end='\r') # Erase the loading message
+        # Map each data file to the method that parses it, and the names of the dataframes that method returns. The first parser that matches the file name and the dataset version is used.
+        file_parsers = [
+            FileParser(file_patterns=["clinical.csv.gz"], versions=None, tables=["clinical"], parse=self._parse_clinical),
+            FileParser(file_patterns=["treatment.csv.gz"], versions=None, tables=["treatment"], parse=self._parse_clinical),
+            FileParser(file_patterns=["cnv.tsv.gz"], versions=None, tables=["CNV"], parse=self._parse_cnv),
+            FileParser(file_patterns=["definitions.txt"], versions=None, tables=["definitions"], parse=self._parse_definitions),
+            FileParser(file_patterns=["phosphoproteomics.txt.gz"], versions=None, tables=["phosphoproteomics"], parse=self._parse_proteomics),
+            FileParser(file_patterns=["proteomics.txt.gz"], versions=None, tables=["proteomics"], parse=self._parse_proteomics),
+            FileParser(file_patterns=["somatic_38.maf.gz"], versions=None, tables=["somatic_mutation"], parse=self._parse_somatic_mutation),
+            FileParser(file_patterns=["transcriptomics.tsv.gz"], versions=None, tables=["transcriptomics"], parse=self._parse_transcriptomics),
+            FileParser(file_patterns=["Ovary_One_Year_Clinical_Data_20160927.xls"], versions=["0.0.1"], tables=["followup"], parse=self._parse_followup),
+        ]
+
+        super().__init__(cancer_type="ovarian", version=version, valid_versions=valid_versions, data_files=data_files, file_parsers=file_parsers, use_cache=use_cache, lazy=lazy, n_jobs=n_jobs, executor=executor, dtype=dtype, profile=profile)
+
+    def _parse_clinical(self, file_path):
+        """Parse the clinical or treatment data file."""
+        path_elements = file_path.split(os.sep) # Get a list of all the levels of the path
+        file_name = path_elements[-1] # The last element will be the name of the file
+        df_name = file_name.split(".")[0] # Our dataframe name will be the first section of file name (i.e. proteomics.txt.gz becomes proteomics)
+
+        tables = {}
+
+        df = pd.read_csv(file_path, sep=",", index_col=0)
+        df = df.rename(columns={"Participant_ID":"Patient_ID"})
+        df = df.set_index("Patient_ID")
+        tables[df_name] = df #maps dataframe name to dataframe
+
+        return tables
+
+    def _parse_cnv(self, file_path):
+        """Parse the CNV data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep="\t", index_col=0)
+        df = df.sort_index()
+        df = df.transpose()
+        df = df.sort_index()
+        tables["CNV"] = df #maps dataframe name to dataframe
+
+        return tables
+
+    def _parse_definitions(self, file_path):
+        """Parse the definitions data file."""
+        tables = {}
+
+        definitions = {}
+        with open(file_path, "r", errors="ignore") as definitions_file:
+            for line in definitions_file.readlines():
+                line = line.strip()
+                line = line.split("\t")
+                term = line[0]
+                definition = line[1]
+                definitions[term] = definition
+        tables["definitions"] = definitions # We'll move this into self._definitions when we format the dataframes
+
+        return tables
+
+    def _parse_proteomics(self, file_path):
+        """Parse the proteomics or phosphoproteomics data file."""
+        path_elements = file_path.split(os.sep) # Get a list of all the levels of the path
+        file_name = path_elements[-1] # The last element will be the name of the file
+        df_name = file_name.split(".")[0] # Our dataframe name will be the first section of file name (i.e. proteomics.txt.gz becomes proteomics)
+
+        tables = {}
+
+        df = pd.read_csv(file_path, sep='\t')
+
+        if file_name == "proteomics.txt.gz":
+            df = df[df["hgnc_symbol"].notnull()] # Drops all nan values in hgnc_symbol column
+
+            # Create our column multiindex
+            df = df.rename(columns={"hgnc_symbol": "Name", "refseq_peptide": "Database_ID"})
+            df = df.set_index(["Name", "Database_ID"])
+
+        elif file_name == "phosphoproteomics.txt.gz":
+            df = df[df["site"].notnull()] # Drops all rows with nan values in site column
+
+            # Create our column multiindex
+            split_genes = df["site"].str.rsplit("-", n=1, expand=True) # Split the genes from the sites, splitting from the right since some genes have hyphens in their names, but the genes and sites are also separated by hyphens
+            df = df.drop(columns=["hgnc_symbol", "site"]) # hgnc_symbol is a duplicate of split_genes[0], and site is now in split_genes and will be re-inserted differently
+            df = df.assign(Name=split_genes[0], Site=split_genes[1])
+            df["Site"] = df["Site"].str.replace(r"[sty]", r"") # Get rid of all lowercase s, t, and y delimeters in the sites
+            df = df.rename(columns={"refseq_peptide": "Database_ID"})
+            df = df.set_index(["Name", "Site", "Peptide", "Database_ID"]) # Turn these columns into a multiindex
+
+        df = df.sort_index()
+        df = df.transpose()
+        df.index = df.index.where(~df.index.str.startswith('C'), df.index.str[1:]) # Take C prefix off of indices for those samples that have them (tumor samples have C, normal have N)
+        df = df.drop(index=df.index[df.index.str.startswith("OV_QC")]) # Drop all OV_QC samples--they're quality control samples not relevant for data analysis
+        tables[df_name] = df
+
+        return tables
+
+    def _parse_somatic_mutation(self, file_path):
+        """Parse the somatic mutation data file."""
+        tables = {}
+
+        df = pd.read_csv(file_path, sep = "\t", index_col=0)
+        df = df.reset_index()
+        split_barcode = df["Tumor_Sample_Barcode"].str.split("_", n = 1, expand = True) # The first part of the barcode is the patient id, which we need to make a Patient_ID column
+        df["Tumor_Sample_Barcode"] = split_barcode[0]
+        df = df[["Tumor_Sample_Barcode","Hugo_Symbol","Variant_Classification","HGVSp_Short"]] # We only want these columns
+        df = df.rename(columns={"Tumor_Sample_Barcode":"Patient_ID","Hugo_Symbol":"Gene","Variant_Classification":"Mutation","HGVSp_Short":"Location"})
+        df = df.sort_values(by=["Patient_ID", "Gene"])
+        df = df.set_index("Patient_ID")
+        tables['somatic_mutation'] = df
+
+        return tables
+
+    def _parse_transcriptomics(self, file_path):
+        """Parse the transcriptomics data file."""
+        path_elements = file_path.split(os.sep) # Get a list of all the levels of the path
+        file_name = path_elements[-1] # The last element will be the name of the file
+        df_name = file_name.split(".")[0] # Our dataframe name will be the first section of file name (i.e. proteomics.txt.gz becomes proteomics)
+
+        tables = {}
+
+        df = pd.read_csv(file_path, sep="\t", index_col=0)
+        df = df.sort_index()
+        df = df.transpose()
+        df = df.sort_index()
+        date_cols = ['1-Dec', '1-Sep', '10-Mar', '10-Sep', '11-Sep', '12-Sep', '14-Sep', '15-Sep', '2-Mar', '2-Sep', '3-Mar', '3-Sep', '4-Mar', '4-Sep', '5-Mar', '6-Mar', '6-Sep', '7-Mar', '7-Sep', '8-Mar', '8-Sep', '9-Mar', '9-Sep']
+        df = df.drop(columns=date_cols) # Drop all date values until new data is uploaded
+        tables[df_name] = df #maps dataframe name to dataframe
+
+        return tables
+
+    def _parse_followup(self, file_path):
+        """Parse the followup data file."""
+        tables = {}
+
+        df = pd.read_excel(file_path)
+
+        # Replace redundant values for "not reported" with NaN
+        nan_equivalents = ['Not Reported/ Unknown', 'Reported/ Unknown', 'Not Applicable',
+            'na', 'unknown', 'Not Performed', 'Unknown tumor status', 'Unknown', 
+            'Unknown Tumor Status', 'Not specified']
+
+        df = df.replace(nan_equivalents, np.nan)
+
+        # Rename PPID to Patient_ID and set as index
+        df = df.rename(columns={'PPID': 'Patient_ID'})
+        df = df.set_index("Patient_ID")
+        df = df.sort_index()
+
+        tables["followup"] = df
+
+        return tables
+
+    def _format_dataframes(self):
+        """Format the ovarian dataframes in the self._data dict, once all the data files have been parsed."""
         formatting_msg = "Formatting dataframes..."
         print(formatting_msg, end='\r')
 
-        # Get a union of all dataframes' indices, with duplicates removed
-        master_index = unionize_indices(self._data)
+        # The definitions file was parsed along with the data files, but isn't a dataframe, so we'll take it out of the data dict
+        self._definitions = self._data.pop("definitions")
+
+        # Get a union of all dataframes' indices, with duplicates removed, and where each dataframe's rows are in it
+        master_index, index_codes = unionize_indices(self._data, return_codes=True)
 
         # Use the master index to reindex the clinical dataframe, so the clinical dataframe has a record of every sample in the dataset. Rows that didn't exist before (such as the rows for normal samples) are filled with NaN
-        master_clinical = self._data['clinical'].reindex(master_index)
+        master_clinical = reindex_from_codes(self._data['clinical'], master_index, index_codes["clinical"])
 
         # Add a column called Sample_Tumor_Normal to the clinical dataframe indicating whether each sample was a tumor or normal sample. Normal samples have a Patient_ID that begins with 'N'.
         clinical_status_col = generate_sample_status_col(master_clinical, normal_test=lambda sample: sample[0] == 'N')
@@ -167,12 +231,7 @@ class Ovarian(DataSet):
         self._data['clinical'] = master_clinical 
 
         # Edit the format of the Patient_IDs to have normal samples marked the same way as in other datasets. Currently, all the normal samples have an "N" prepended. We're going to erase that and put a ".N" at the end.
-        self._data = reformat_normal_patient_ids(self._data, existing_identifier="N", existing_identifier_location="start")
-
-        # Call function from dataframe_tools.py to sort all tables first by sample status, and then by the index
-        self._data = sort_all_rows(self._data)
-
-        # Call function from dataframe_tools.py to standardize the names of the index and column axes
-        self._data = standardize_axes_names(self._data)
+        # Then call function from dataframe_tools.py to sort all tables first by sample status, and then by the index, and standardize the names of the index and column axes
+        self._data = finalize_all_dataframes(self._data, reformat_normal_ids=True, existing_identifier="N", existing_identifier_location="start")
 
-        print(" " * len(formatting_msg), end='\r') # Erase the formatting message
+        print(" " * len(formatting_msg), end='\r') # Erase the formatting message
\ No newline at end of file
@@ -0,0 +1,132 @@
+#   Copyright 2018 Samuel Payne sam_payne@byu.edu
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import pickle
+import numpy as np
+from .bundle import layout_tables, build_dataframes
+from .load_report import LoadReport, record_step
+
+_attached = {} # The datasets this process has attached to, with the name of their data block as keys, so each process only attaches to each dataset once, no matter how many times a handle is sent to it. They stay attached until the process exits, because closing a shared memory block unmaps it even if numpy arrays are still using it.
+
+class SharedDataServer:
+    """Holds a dataset's dataframes in shared memory, for worker processes to use without each loading or being sent their own copy. Get one from a dataset's share method.
+
+    The values of the numeric dataframes, e.g. the omics dataframes, are in one shared memory block, laid out the same way as in a bundle file. Everything else, i.e. their indices and columns and the other dataframes, is pickled into a second block, which each worker reads once.
+
+    Attributes:
+    handle (SharedDataHandle): The handle to send to the worker processes.
+    """
+
+    def __init__(self, dataset):
+        """Copy a dataset's dataframes into shared memory.
+
+        Parameters:
+        dataset (DataSet): The dataset to share.
+        """
+        from multiprocessing import shared_memory # Added in Python 3.8, so we only import it when it's used
+
+        data, info = dataset._get_contents()
+        tables, arrays, size = layout_tables(data)
+        metadata = pickle.dumps({"tables": tables, "info": info}, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self._blocks = []
+        try:
+            data_block = shared_memory.SharedMemory(create=True, size=max(size, 1)) # Blocks can't be empty
+            self._blocks.append(data_block)
+            buffer = np.ndarray(size, dtype=np.uint8, buffer=data_block.buf)
+            for offset, values in arrays:
+                buffer[offset:offset + values.nbytes] = values.reshape(-1).view(np.uint8)
+            del buffer # Nothing in this process may use the block once close unmaps it
+
+            metadata_block = shared_memory.SharedMemory(create=True, size=len(metadata))
+            self._blocks.append(metadata_block)
+            metadata_block.buf[:len(metadata)] = metadata
+
+        except BaseException:
+            self.close()
+            raise
+
+        self.handle = SharedDataHandle(data_block.name, metadata_block.name, len(metadata))
+
+    def close(self):
+        """Free the shared memory. No more processes can attach to it after this. The ones that already have, including this one if it used the handle, keep their mapping of it until they exit, and the memory is freed once they all have."""
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class SharedDataHandle:
+    """A small, picklable reference to a dataset in shared memory. Send it to worker processes instead of the dataset itself. It has all the methods of the dataset, e.g. get_proteomics and join_omics_to_omics. The first time one is used in a process, it attaches to the shared memory and builds the dataset's dataframes on top of it, without copying the values of the numeric dataframes.
+
+    The shared dataframes are read-only. The dataset's get methods return copies by default, which can be edited as usual.
+
+    Only processes started by the process that shared the dataset, e.g. the workers of a ProcessPoolExecutor, should use the handle, since the shared memory is freed when that process closes the SharedDataServer.
+    """
+
+    def __init__(self, data_name, metadata_name, metadata_length):
+        """Initialize the handle. Use DataSet.share instead of calling this directly.
+
+        Parameters:
+        data_name (str): The name of the shared memory block with the values of the numeric dataframes.
+        metadata_name (str): The name of the shared memory block with the pickled layout, the other dataframes, and the dataset's other instance variables.
+        metadata_length (int): The length of the pickled data in the metadata block. The block may be bigger.
+        """
+        self._data_name = data_name
+        self._metadata_name = metadata_name
+        self._metadata_length = metadata_length
+
+    def get_dataset(self):
+        """Get the shared dataset, attaching to the shared memory if this process hasn't yet.
+
+        Returns:
+        DataSet: The dataset, e.g. a cptac.Brca object if a Brca dataset was shared.
+        """
+        dataset = _attached.get(self._data_name)
+        if dataset is None:
+            dataset = self._attach()
+            _attached[self._data_name] = dataset
+        return dataset
+
+    def __getattr__(self, name):
+        if name.startswith("_"): # Only forward the dataset's public methods. This also keeps pickle and copy from finding the dataset's special methods here.
+            raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{name}'")
+        return getattr(self.get_dataset(), name)
+
+    def _attach(self):
+        """Attach to the shared memory, and build the dataset on top of it.
+
+        Returns:
+        DataSet: The dataset.
+        """
+        from multiprocessing import shared_memory
+        from .dataset import DataSet # Imported here, because dataset.py imports this module
+
+        load_report = LoadReport(None)
+        with load_report.activate():
+            with record_step("attach_shared_memory"):
+                metadata_block = shared_memory.SharedMemory(name=self._metadata_name)
+                metadata = pickle.loads(bytes(metadata_block.buf[:self._metadata_length]))
+                metadata_block.close() # We have our own copy now
+
+                data_block = shared_memory.SharedMemory(name=self._data_name)
+                buffer = np.ndarray(data_block.size, dtype=np.uint8, buffer=data_block.buf)
+                buffer.flags.writeable = False # Every process sees the same memory, so none of them may edit it
+                data = build_dataframes(buffer, metadata["tables"])
+
+        dataset = DataSet._from_contents(data, metadata["info"], load_report)
+        dataset._shared_memory_block = data_block # The dataframes' values live in the block's memory, so it must never be closed while the dataset is in use. Keeping it here means it stays open as long as the dataset is in _attached.
+        return dataset
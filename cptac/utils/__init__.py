@@ -11,11 +11,8 @@
 
 import pandas as pd
 import numpy as np
-import scipy.stats
-import statsmodels.stats.multitest
 import re
 import sys
-import urllib3
 import json
 import operator
 import collections
@@ -64,6 +61,10 @@ the significant results will be returned as a dataframe, sorted by p-value.
 '''
 
 def wrap_ttest(df, label_column, comparison_columns=None, alpha=.05, return_all=False, correction_method='bonferroni'):
+    # scipy and statsmodels are slow to import, so we only import them when they're needed
+    import scipy.stats
+    import statsmodels.stats.multitest
+
     try:
         '''Verify precondition that label column exists and has exactly 2 unique values'''
         label_values = df[label_column].unique()
@@ -149,6 +150,7 @@ as a python list.
 
 def get_interacting_proteins_string(protein, number=25):
     '''Use urllib3 to access the string database api, gather list of interacting proteins'''
+    import urllib3 # Only imported when needed, to keep importing cptac.utils fast
     urllib3.disable_warnings()
     string_api_url = "https://string-db.org/api"
     output_format = "json"
@@ -220,6 +222,7 @@ as a python list.
 def get_interacting_proteins_biogrid(protein, number=25):
     '''Store interacting proteins in a list'''
     interacting_proteins = []
+    import urllib3 # Only imported when needed, to keep importing cptac.utils fast
     urllib3.disable_warnings()
     
     '''Configure url for request'''
@@ -376,18 +379,20 @@ def get_frequently_mutated(cancer_object, cutoff = 0.1):
     total_tumors = v['Tumor']
     total_tumor_count = int(total_tumors)
     
-    # Get mutations data frame
-    somatic_mutations = cancer_object.get_somatic_mutation() 
+    # Get the mutation matrix, so we can count the samples mutated in each gene without grouping the whole mutations dataframe
+    mutation_matrix = cancer_object.get_mutation_matrix()
+    mutation_types = mutation_matrix.mutation_types
 
     # Drop silent mutations for Ovarian and RenalCcrcc dataset, and synonymous SNV (i.e. silent) mutations in HNSCC
-    if 'Silent' in somatic_mutations['Mutation'].unique():
-        origin_df = somatic_mutations.loc[somatic_mutations['Mutation'] != 'Silent'].reset_index()
-    elif 'synonymous SNV' in somatic_mutations['Mutation'].unique():
-        origin_df = somatic_mutations.loc[somatic_mutations['Mutation'] != 'synonymous SNV'].reset_index()
+    if 'Silent' in mutation_types:
+        silent_types = ['Silent']
+    elif 'synonymous SNV' in mutation_types:
+        silent_types = ['synonymous SNV']
     else:
-        origin_df = somatic_mutations.reset_index() #prepare to count unique samples
+        silent_types = []
+    origin_types = mutation_types.drop(silent_types)
         
-    # Create two categories in Mutation column - 'M': Missense, 'T': Truncation
+    # Create two categories of mutation types - 'M': Missense, 'T': Truncation
     if cancer_object.get_cancer_type() in ('colon', 'hnscc'):
         missense_truncation_groups = {'frameshift substitution': 'T', 
             'frameshift deletion': 'T', 'frameshift insertion': 'T', 
@@ -399,57 +404,45 @@ def get_frequently_mutated(cancer_object, cutoff = 0.1):
             'Missense_Mutation': 'M', 'Frame_Shift_Del': 'T','Nonsense_Mutation': 'T', 
             'Splice_Site': 'T', 'Frame_Shift_Ins': 'T','Nonstop_Mutation':'T'}
     
-    mutations_replaced_M_T = origin_df.replace(missense_truncation_groups)
+    type_groups = np.array([missense_truncation_groups.get(mutation_type, mutation_type) for mutation_type in origin_types], dtype=object)
     
     # replace non_coding mutations for Gbm
-    unique_mutations = len(mutations_replaced_M_T['Mutation'].unique())
+    unique_mutations = len(set(type_groups))
     gbm = False
     if cancer_object.get_cancer_type() == 'gbm':
         gbm = True
         non_coding = {'Intron': 'NC', 'RNA': 'NC', "5'Flank": 'NC', "3'Flank": 'NC', 
             "5'UTR": 'NC', "3'UTR": 'NC', 'Splice_Region' : 'NC'}
-        mutations_replaced_M_T = mutations_replaced_M_T.replace(non_coding)
-        unique_mutations_2 = len(mutations_replaced_M_T['Mutation'].unique())
+        type_groups = np.array([non_coding.get(group, group) for group in type_groups], dtype=object)
         
     elif unique_mutations != 2: # Check that all mutation names are catagorized
         print('Warning: New mutation name not classified. Counts will be affected.')
     
     # Find frequently mutated genes (total fraction > cutoff)
     # Same steps will be repeated for finding the missense and truncation mutation frequencies
-    # Step 1 - group by gene and count unique samples
-    # Step 2 - format
-    # Step 3 - filter using the cutoff and create fraction 
-    count_mutations = origin_df.groupby(['Gene']).nunique()
-    count_mutations = count_mutations.rename(columns={"Patient_ID": "Unique_Samples_Mut"}) # Step 2 
-    count_mutations = count_mutations.drop(['Gene', 'Mutation', 'Location'], axis = 1)
-    fraction_mutated = count_mutations.apply(lambda x: x / total_tumor_count) # Step 3 
-    fraction_greater_than_cutoff = fraction_mutated.where(lambda x: x > cutoff) #na used when not > cutoff
-    filtered_gene_df = fraction_greater_than_cutoff.dropna() # drop genes below cutoff
+    # Step 1 - count unique samples mutated in each gene, using the mutation matrix
+    # Step 2 - create fraction
+    # Step 3 - filter using the cutoff
+    def get_fractions(types, col_name, exclude=False):
+        counts = mutation_matrix.count_samples_mutated(types, exclude=exclude) # Step 1
+        fractions = (counts / total_tumor_count).rename(col_name).to_frame() # Step 2
+        return fractions.sort_index()
+
+    fraction_mutated = get_fractions(silent_types, "Unique_Samples_Mut", exclude=True) # Mutations with no type still count here, just not in the missense or truncation columns
+    filtered_gene_df = fraction_mutated[fraction_mutated["Unique_Samples_Mut"] > cutoff] # Step 3 - drop genes below cutoff
     
     # Create and join Missense column (following similar steps as seen above)
-    miss = mutations_replaced_M_T.loc[mutations_replaced_M_T['Mutation'] == 'M']
-    count_miss = miss.groupby(['Gene']).nunique()
-    missense_df = count_miss.rename(columns={"Patient_ID": "Missense_Mut"})
-    missense_df = missense_df.drop(['Gene', 'Mutation', 'Location'], axis = 1)
-    fraction_missense = missense_df.apply(lambda x: x / total_tumor_count)
+    fraction_missense = get_fractions(origin_types[type_groups == 'M'], "Missense_Mut")
     freq_mutated_df = filtered_gene_df.join(fraction_missense, how='left').fillna(0)
     
     # Create and join Truncation column (following similar steps as seen above)
-    trunc = mutations_replaced_M_T.loc[mutations_replaced_M_T['Mutation'] == 'T']
-    count_trunc = trunc.groupby(['Gene']).nunique()
-    truncation_df = count_trunc.rename(columns={"Patient_ID": "Truncation_Mut"})
-    truncation_df = truncation_df.drop(['Gene', 'Mutation', 'Location'], axis = 1)
-    fraction_truncation = truncation_df.apply(lambda x: x / total_tumor_count)
+    fraction_truncation = get_fractions(origin_types[type_groups == 'T'], "Truncation_Mut")
     freq_mutated_df = freq_mutated_df.join(fraction_truncation, how='left').fillna(0)
     
     
     if gbm == True:
         # Create and join non-coding column (following similar steps as seen above)
-        nc = mutations_replaced_M_T.loc[mutations_replaced_M_T['Mutation'] == 'NC']
-        count_nc = nc.groupby(['Gene']).nunique()
-        nc_df = count_nc.rename(columns={"Patient_ID": "Non-Coding"})
-        nc_df = nc_df.drop(['Gene', 'Mutation', 'Location'], axis = 1)
-        fraction_nc = nc_df.apply(lambda x: x / total_tumor_count)
+        fraction_nc = get_fractions(origin_types[type_groups == 'NC'], "Non-Coding")
         freq_mutated_df = freq_mutated_df.join(fraction_nc, how='left').fillna(0)
         
     freq_mutated_df = freq_mutated_df.reset_index() #move genes to their own column
@@ -0,0 +1,40 @@
+# Fixtures shared by the tests
+
+import pytest
+from cptac import file_download, file_tools
+from cptac.dataset import DataSet
+
+@pytest.fixture
+def make_dataset():
+    """Get a function that makes a dataset out of hand-built dataframes, without loading any data files."""
+    def make(data, cancer_type="fake", definitions=None, valid_omics_dfs=None, valid_metadata_dfs=None):
+        dataset = DataSet.__new__(DataSet)
+        dataset._cancer_type = cancer_type
+        dataset._version = "1.0"
+        dataset._dtype = "float64"
+        dataset._data = data
+        dataset._definitions = definitions if definitions is not None else {}
+        dataset._gene_col_indices = {}
+        dataset._mutation_matrix = None
+        dataset._valid_omics_dfs = valid_omics_dfs if valid_omics_dfs is not None else []
+        dataset._valid_metadata_dfs = valid_metadata_dfs if valid_metadata_dfs is not None else []
+        return dataset
+    return make
+
+@pytest.fixture
+def package_dir(tmp_path, monkeypatch):
+    """Use a temporary directory in place of cptac's package directory, where the dataset directories, the hash cache, and the recorded server checks are kept, and start with empty caches.
+
+    Returns:
+    pathlib.Path: The temporary directory.
+    """
+    package_path = tmp_path / "package"
+    package_path.mkdir()
+    monkeypatch.setattr(file_tools, "__file__", str(package_path / "file_tools.py"))
+    monkeypatch.setattr(file_download, "__file__", str(package_path / "file_download.py"))
+    monkeypatch.setattr(file_tools, "_hash_cache", None)
+    monkeypatch.setattr(file_tools, "_hash_cache_pending", {})
+    monkeypatch.setattr(file_tools, "_hash_cache_batch_depth", 0)
+    monkeypatch.setattr(file_tools, "_dataset_paths", {})
+    monkeypatch.setattr(file_tools, "_index_cache", {})
+    return package_path
@@ -0,0 +1,110 @@
+# Tests for saving datasets to bundle files and loading them back
+
+import numpy as np
+import pandas as pd
+import pytest
+from cptac.bundle import write_bundle, read_bundle, BUNDLE_ALIGNMENT
+from cptac.dataset import DataSet
+from cptac.exceptions import InvalidParameterError
+
+def make_data():
+    columns = pd.MultiIndex.from_tuples([("TP53", "NP_1"), ("PTEN", "NP_2"), ("TP53", "NP_3")], names=["Name", "Database_ID"])
+    proteomics = pd.DataFrame(np.arange(12, dtype=np.float32).reshape(4, 3), index=pd.Index(["C1", "C2", "C3", "C1.N"], name="Patient_ID"), columns=columns)
+    cnv = pd.DataFrame(np.linspace(-1, 1, 10).reshape(5, 2), index=pd.Index(["C1", "C2", "C3", "C4", "C5"], name="Patient_ID"), columns=pd.Index(["TP53", "PTEN"], name="Name"))
+    counts = pd.DataFrame(np.arange(6, dtype=np.int64).reshape(2, 3), columns=pd.Index(["a", "b", "c"], name="Name"))
+    flags = pd.DataFrame({"x": [True, False], "y": [False, False]})
+
+    clinical = pd.DataFrame({
+        "Sample_Tumor_Normal": pd.Categorical(["Tumor", "Tumor", "Normal"]),
+        "age": [61.0, np.nan, 45.0],
+        "Sample_ID": ["S1", "S2", "S3"],
+    }, index=pd.Index(["C1", "C2", "C1.N"], name="Patient_ID"))
+    clinical.columns.name = "Name"
+    empty = pd.DataFrame(np.empty((0, 2)), columns=pd.Index(["x", "y"], name="Name"))
+
+    return {"proteomics": proteomics, "CNV": cnv, "counts": counts, "flags": flags, "clinical": clinical, "empty": empty}
+
+def assert_same_data(data, loaded):
+    assert set(loaded.keys()) == set(data.keys())
+    for name, df in data.items():
+        pd.testing.assert_frame_equal(loaded[name], df, check_exact=True)
+        assert loaded[name].index.names == df.index.names
+        assert loaded[name].columns.names == df.columns.names
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "data.bundle")
+    data = make_data()
+    info = {"cancer_type": "fake", "definitions": {"term": "definition"}}
+
+    write_bundle(path, data, info)
+    loaded, loaded_info = read_bundle(path)
+
+    assert loaded_info == info
+    assert_same_data(data, loaded)
+    assert loaded["proteomics"].dtypes.eq(np.float32).all()
+    assert loaded["counts"].dtypes.eq(np.int64).all()
+    assert isinstance(loaded["clinical"]["Sample_Tumor_Normal"].dtype, pd.CategoricalDtype)
+    assert list(tmp_path.iterdir()) == [tmp_path / "data.bundle"] # No temporary files left behind
+
+def test_values_are_memory_mapped(tmp_path):
+    path = str(tmp_path / "data.bundle")
+    data = make_data()
+    write_bundle(path, data, {})
+
+    loaded, info = read_bundle(path)
+    bases = []
+    base = loaded["CNV"].values
+    while base is not None:
+        bases.append(base)
+        base = getattr(base, "base", None)
+    assert any(isinstance(base, np.memmap) for base in bases) # The values are a view of the mapped file, not a copy
+
+    with open(path, "rb") as bundle_file:
+        contents = bundle_file.read()
+    for name in ["proteomics", "CNV", "counts"]:
+        offset = contents.find(np.ascontiguousarray(data[name].values.T).tobytes())
+        assert offset >= 0 and offset % BUNDLE_ALIGNMENT == 0 # Each dataframe is stored column by column, aligned
+
+    # Editing a loaded dataframe doesn't change the file
+    loaded["CNV"].iloc[0, 0] = 100
+    reloaded, info = read_bundle(path)
+    pd.testing.assert_frame_equal(reloaded["CNV"], data["CNV"])
+
+def test_replace_existing(tmp_path):
+    path = str(tmp_path / "data.bundle")
+    write_bundle(path, make_data(), {"version": 1})
+    write_bundle(path, {"CNV": make_data()["CNV"]}, {"version": 2})
+
+    loaded, info = read_bundle(path)
+    assert info == {"version": 2}
+    assert list(loaded.keys()) == ["CNV"]
+
+def test_read_errors(tmp_path):
+    with pytest.raises(InvalidParameterError):
+        read_bundle(str(tmp_path / "missing.bundle"))
+
+    path = tmp_path / "not_a.bundle"
+    path.write_bytes(b"hello")
+    with pytest.raises(InvalidParameterError):
+        read_bundle(str(path))
+
+    path = tmp_path / "other_version.bundle"
+    write_bundle(str(path), make_data(), {})
+    contents = bytearray(path.read_bytes())
+    contents[12] = 99 # The format version comes right after the magic bytes
+    path.write_bytes(bytes(contents))
+    with pytest.raises(InvalidParameterError):
+        read_bundle(str(path))
+
+def test_dataset_round_trip(tmp_path, make_dataset):
+    path = str(tmp_path / "fake.bundle")
+    dataset = make_dataset(make_data(), definitions={"term": "definition"}, valid_omics_dfs=["proteomics", "CNV"], valid_metadata_dfs=["clinical"])
+    dataset.export_bundle(path)
+
+    loaded = DataSet.from_bundle(path)
+    assert type(loaded) is DataSet
+    assert loaded.version() == "1.0"
+    assert loaded._definitions == {"term": "definition"}
+    assert_same_data(dataset._data, loaded._data)
+    pd.testing.assert_frame_equal(loaded.get_proteomics(), dataset._data["proteomics"])
+    assert loaded.get_load_report().cancer_type == "fake"
@@ -0,0 +1,118 @@
+# Tests for caching a dataset's formatted dataframes on disk, and for the cache key that decides when the cache is stale
+
+import importlib.util
+import os
+import pickle
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from cptac.exceptions import FailedCacheWriteWarning
+from cptac.file_tools import read_cache, write_cache
+
+LOADER_SOURCE = (
+    "from cptac.dataset import DataSet\n"
+    "\n"
+    "class Fake(DataSet):\n"
+    "    pass\n"
+)
+
+def make_data():
+    columns = pd.MultiIndex.from_tuples([("TP53", "NP_1"), ("PTEN", "NP_2")], names=["Name", "Database_ID"])
+    proteomics = pd.DataFrame(np.arange(6, dtype=np.float64).reshape(3, 2), index=pd.Index(["C1", "C2", "C1.N"], name="Patient_ID"), columns=columns)
+    clinical = pd.DataFrame({"Sample_Tumor_Normal": ["Tumor", "Tumor", "Normal"]}, index=pd.Index(["C1", "C2", "C1.N"], name="Patient_ID"))
+    return {"proteomics": proteomics, "clinical": clinical}
+
+def test_cache_hit_and_miss(tmp_path):
+    cache_path = str(tmp_path / "cache")
+    cache_key = {"files": {"proteomics.tsv": {"hash": "abc"}}}
+    data = make_data()
+    assert read_cache(cache_path, cache_key) == (None, None, None) # Nothing cached yet
+
+    write_cache(cache_path, cache_key, data, {"term": "definition"}, [["FailedReindexWarning", "Couldn't reindex"]])
+    loaded, definitions, parse_warnings = read_cache(cache_path, cache_key)
+    assert set(loaded.keys()) == {"proteomics", "clinical"}
+    for name, df in data.items():
+        pd.testing.assert_frame_equal(loaded[name], df)
+    assert definitions == {"term": "definition"}
+    assert parse_warnings == [["FailedReindexWarning", "Couldn't reindex"]] # So they can be issued again on every load from the cache
+
+    assert read_cache(cache_path, {"files": {"proteomics.tsv": {"hash": "def"}}}) == (None, None, None) # A different key means the cache is stale
+
+    os.remove(os.path.join(cache_path, "clinical.pkl"))
+    assert read_cache(cache_path, cache_key) == (None, None, None) # A missing table invalidates the whole cache
+
+def test_cache_replaces_stale_tables(tmp_path):
+    cache_path = str(tmp_path / "cache")
+    write_cache(cache_path, {"version": 1}, make_data(), {})
+    write_cache(cache_path, {"version": 2}, {"clinical": make_data()["clinical"]}, {})
+
+    loaded, definitions, parse_warnings = read_cache(cache_path, {"version": 2})
+    assert list(loaded.keys()) == ["clinical"]
+    assert sorted(os.listdir(cache_path)) == ["clinical.pkl", "manifest.json"]
+
+def test_failed_write_leaves_no_temp_files(tmp_path, monkeypatch):
+    cache_path = str(tmp_path / "cache")
+
+    def fail_to_pickle(df, path, *args, **kwargs):
+        with open(path, "wb") as pickle_file:
+            pickle_file.write(b"partial")
+        raise OSError("No space left on device")
+    monkeypatch.setattr(pd.DataFrame, "to_pickle", fail_to_pickle)
+    with pytest.warns(FailedCacheWriteWarning):
+        write_cache(cache_path, {"version": 1}, make_data(), {})
+    assert os.listdir(cache_path) == []
+
+    def fail_to_pickle(df, path, *args, **kwargs):
+        raise pickle.PicklingError("Can't pickle this")
+    monkeypatch.setattr(pd.DataFrame, "to_pickle", fail_to_pickle)
+    with pytest.raises(pickle.PicklingError):
+        write_cache(cache_path, {"version": 1}, make_data(), {})
+    assert os.listdir(cache_path) == []
+
+def load_loader(path, monkeypatch):
+    """Import a dataset class from a loader module at the given path."""
+    spec = importlib.util.spec_from_file_location("fake_loader", str(path))
+    module = importlib.util.module_from_spec(spec)
+    monkeypatch.setitem(sys.modules, "fake_loader", module) # So inspect can find the module's file
+    spec.loader.exec_module(module)
+    return module.Fake
+
+def make_fake_dataset(package_dir, loader_path, file_hash, monkeypatch):
+    """Set up the index and a data file for a fake dataset in the package directory, and make a dataset object for it, as if it had been loaded."""
+    dataset_path = package_dir / "data_fake"
+    version_path = dataset_path / "fake_v1.0"
+    version_path.mkdir(parents=True, exist_ok=True)
+    (dataset_path / "index.txt").write_text(f"#1.0\nproteomics.tsv\t{file_hash}\thttps://example.com/proteomics.tsv\n")
+    data_file_path = version_path / "proteomics.tsv"
+    if not data_file_path.exists():
+        data_file_path.write_text("id\tTP53\nC1\t1.5\n")
+
+    dataset_class = load_loader(loader_path, monkeypatch)
+    dataset = dataset_class.__new__(dataset_class)
+    dataset._cancer_type = "fake"
+    dataset._version = "1.0"
+    dataset._dtype = "float64"
+    dataset._data_files_paths = [str(data_file_path)]
+    return dataset
+
+def test_cache_key_invalidation(package_dir, monkeypatch):
+    loader_path = package_dir / "fake_loader.py"
+    loader_path.write_text(LOADER_SOURCE)
+    cache_key = make_fake_dataset(package_dir, loader_path, "abc", monkeypatch)._get_cache_key()
+    assert make_fake_dataset(package_dir, loader_path, "abc", monkeypatch)._get_cache_key() == cache_key # Nothing changed
+
+    # The data file's hash in the index changed
+    new_hash_key = make_fake_dataset(package_dir, loader_path, "abcdef", monkeypatch)._get_cache_key()
+    assert new_hash_key != cache_key
+    assert new_hash_key["files"]["proteomics.tsv"]["hash"] == "abcdef"
+
+    # The loader's source changed
+    loader_path.write_text(LOADER_SOURCE + "    # Parse a new file\n")
+    new_loader_key = make_fake_dataset(package_dir, loader_path, "abcdef", monkeypatch)._get_cache_key()
+    assert new_loader_key != new_hash_key
+    assert new_loader_key["loader_hashes"][1:] == new_hash_key["loader_hashes"][1:] # Just the loader's own hash changed
+
+    # The data file was replaced, even though the index didn't change
+    (package_dir / "data_fake" / "fake_v1.0" / "proteomics.tsv").write_text("id\tTP53\tPTEN\nC1\t1.5\t2.5\n")
+    assert make_fake_dataset(package_dir, loader_path, "abcdef", monkeypatch)._get_cache_key() != new_loader_key
@@ -0,0 +1,204 @@
+# Tests for the dataframe tools used to format datasets, using small hand-built dataframes
+
+import numpy as np
+import pandas as pd
+import pytest
+from cptac.dataframe_tools import finalize_all_dataframes, unionize_indices, reindex_from_codes, ReindexMap, get_reindex_map, reindex_dataframe, reindex_all_sample_id_to_patient_id
+from cptac.exceptions import CptacDevError, ReindexMapError, FailedReindexWarning
+
+def make_data_dict():
+    clinical = pd.DataFrame({
+        "Sample_Tumor_Normal": ["Tumor", "Normal", "Tumor", "Normal"],
+        "age": [2, 11, 1, 12],
+    }, index=pd.Index(["C2", "NC1", "C1", "NC2"]))
+    proteomics = pd.DataFrame({"A": [3.0, 1.0, 2.0]}, index=pd.Index(["NC2", "C1", "C2"]))
+    somatic_mutation = pd.DataFrame({"Mutation": ["m1", "m2", "m3", "m4"]}, index=pd.Index(["C2", "C1", "C2", "X9"])) # X9 isn't in the clinical dataframe
+    return {"clinical": clinical, "proteomics": proteomics, "somatic_mutation": somatic_mutation}
+
+def test_finalize_sorts_and_names_axes():
+    data = finalize_all_dataframes(make_data_dict())
+
+    clinical = data["clinical"]
+    assert list(clinical.index) == ["C1", "C2", "NC1", "NC2"] # Tumor samples first, then by patient ID
+    assert list(clinical["age"]) == [1, 2, 11, 12]
+    assert list(data["proteomics"].index) == ["C1", "C2", "NC2"]
+    assert list(data["proteomics"]["A"]) == [1.0, 2.0, 3.0]
+    assert list(data["somatic_mutation"]["Mutation"]) == ["m2", "m1", "m3", "m4"] # Rows for the same sample keep their order, and samples without a status go last
+
+    for df in data.values():
+        assert df.index.name == "Patient_ID"
+        assert df.columns.name == "Name"
+
+def test_finalize_reformats_normal_ids():
+    data = finalize_all_dataframes(make_data_dict(), reformat_normal_ids=True, existing_identifier="N", existing_identifier_location="start")
+
+    assert list(data["clinical"].index) == ["C1", "C2", "C1.N", "C2.N"]
+    assert list(data["clinical"]["age"]) == [1, 2, 11, 12]
+    assert list(data["proteomics"].index) == ["C1", "C2", "C2.N"]
+    assert list(data["proteomics"]["A"]) == [1.0, 2.0, 3.0]
+    assert list(data["somatic_mutation"].index) == ["C1", "C2", "C2", "X9"]
+
+    data = make_data_dict()
+    data["clinical"].index = ["C2", "C1-N", "C1", "C2-N"]
+    data["proteomics"].index = ["C2-N", "C1", "C2"]
+    data = finalize_all_dataframes(data, reformat_normal_ids=True, existing_identifier="-N", existing_identifier_location="end")
+    assert list(data["clinical"].index) == ["C1", "C2", "C1.N", "C2.N"]
+    assert list(data["proteomics"].index) == ["C1", "C2", "C2.N"]
+
+    data = finalize_all_dataframes(make_data_dict(), reformat_normal_ids=True)
+    assert list(data["clinical"].index) == ["C1", "C2", "NC1.N", "NC2.N"]
+
+def test_finalize_uses_own_sample_status():
+    data = make_data_dict()
+    data["derived_molecular"] = pd.DataFrame({
+        "Sample_Tumor_Normal": ["Normal", "Tumor"],
+        "value": [10, 20],
+    }, index=pd.Index(["C1", "C2"]))
+
+    data = finalize_all_dataframes(data)
+    assert list(data["derived_molecular"]["value"]) == [20, 10]
+
+def test_finalize_parameter_errors():
+    with pytest.raises(CptacDevError):
+        finalize_all_dataframes(make_data_dict(), reformat_normal_ids=True, existing_identifier="N")
+    with pytest.raises(CptacDevError):
+        finalize_all_dataframes(make_data_dict(), reformat_normal_ids=True, existing_identifier="N", existing_identifier_location="middle")
+
+def test_unionize_indices_codes():
+    dataset = {
+        "a": pd.DataFrame({"x": [1, 2]}, index=pd.Index(["b", "a"], name="Patient_ID")),
+        "b": pd.DataFrame({"y": [1.5, 2.5, 3.5]}, index=pd.Index(["c", "a", "e"], name="Patient_ID")),
+        "c": pd.DataFrame({"z": [1]}, index=pd.Index(["z"], name="Patient_ID")),
+    }
+
+    master_index, codes = unionize_indices(dataset, exclude="c", return_codes=True)
+    assert list(master_index) == ["a", "b", "c", "e"]
+    assert master_index.name == "Patient_ID"
+    assert set(codes.keys()) == {"a", "b"}
+    assert list(codes["a"]) == [1, 0]
+    assert list(codes["b"]) == [2, 0, 3]
+    assert master_index.equals(unionize_indices(dataset, exclude=["c"]))
+    assert master_index.equals(dataset["a"].index.union(dataset["b"].index))
+
+    dataset["c"].index.name = "Sample_ID"
+    assert unionize_indices(dataset).name is None # The names differ
+
+def test_unionize_indices_nan_and_duplicates():
+    dataset = {
+        "a": pd.DataFrame({"x": [1, 2, 3]}, index=pd.Index(["b", np.nan, "b"], dtype=object)),
+        "b": pd.DataFrame({"y": [1.0, 2.0]}, index=pd.Index([np.nan, "a"], dtype=object)),
+    }
+
+    master_index, codes = unionize_indices(dataset, return_codes=True)
+    assert list(master_index[:2]) == ["a", "b"]
+    assert len(master_index) == 3 and pd.isnull(master_index[2]) # One NaN, at the end
+    assert list(codes["a"]) == [1, 2, 1]
+    assert list(codes["b"]) == [2, 0]
+
+def test_unionize_indices_unsortable():
+    dataset = {
+        "a": pd.DataFrame({"x": [1, 2]}, index=pd.Index(["b", 1], dtype=object)),
+        "b": pd.DataFrame({"y": [1]}, index=pd.Index(["a"], dtype=object)),
+    }
+    master_index, codes = unionize_indices(dataset, return_codes=True)
+    assert list(master_index) == ["b", 1, "a"] # In the order they first appear
+    assert list(codes["b"]) == [2]
+
+def test_reindex_from_codes_matches_reindex():
+    df = pd.DataFrame({
+        "int": [1, 2, 3],
+        "float": [1.5, np.nan, 3.5],
+        "bool": [True, False, True],
+        "str": ["x", "y", "z"],
+        "category": pd.Categorical(["u", "v", "u"]),
+    }, index=pd.Index(["c", "a", np.nan], dtype=object, name="Patient_ID"))
+    df.columns.name = "Name"
+    other = pd.DataFrame({"w": [0.0, 1.0]}, index=pd.Index(["b", "d"], name="Patient_ID"))
+
+    master_index, codes = unionize_indices({"df": df, "other": other}, return_codes=True)
+    reindexed = reindex_from_codes(df, master_index, codes["df"])
+    pd.testing.assert_frame_equal(reindexed, df.reindex(master_index))
+    pd.testing.assert_frame_equal(reindex_from_codes(other, master_index, codes["other"]), other.reindex(master_index))
+
+    empty = pd.DataFrame({"x": pd.Series([], dtype=float)}, index=pd.Index([], dtype=object))
+    assert reindex_from_codes(empty, master_index, np.array([], dtype=np.intp)).shape == (len(master_index), 1)
+
+def test_reindex_from_codes_errors():
+    df = pd.DataFrame({"x": [1, 2]}, index=["a", "b"])
+    master_index = pd.Index(["a", "b", "c"])
+
+    with pytest.raises(CptacDevError):
+        reindex_from_codes(df, master_index, np.array([0]))
+    with pytest.raises(CptacDevError):
+        reindex_from_codes(df, master_index, np.array([0, 3]))
+    with pytest.raises(CptacDevError):
+        reindex_from_codes(df, master_index, np.array([-1, 0]))
+    with pytest.raises(CptacDevError):
+        reindex_from_codes(df, master_index, np.array([1, 1]))
+
+def old_reindex_dataframe(df, reindex_map, new_index_name, keep_old):
+    """The way reindex_dataframe worked before ReindexMap, looking up each value in a dict, to check the new way against."""
+    if not df.index.isin(reindex_map.keys()).all():
+        raise ReindexMapError(df.index[~df.index.isin(reindex_map.keys())])
+    new_index = df.index.map(reindex_map.get)
+    if keep_old:
+        df = df.reset_index()
+    df.index = new_index
+    df.index.name = new_index_name
+    return df.sort_index()
+
+def test_reindex_map_matches_dict_lookup():
+    mapping = {"S3": "P1", "S1": "P3", "S2": "P2", "S4": "P4"}
+    df = pd.DataFrame({"x": [1, 2, 3, 4]}, index=pd.Index(["S1", "S2", "S1", "S3"], name="Sample_ID")) # Duplicate IDs, e.g. several mutations in one sample
+    reindex_map = ReindexMap(mapping)
+
+    assert len(reindex_map) == 4
+    assert list(reindex_map.map_index(df.index)) == ["P3", "P2", "P3", "P1"]
+    for keep_old in [False, True]:
+        expected = old_reindex_dataframe(df.copy(), mapping, "Patient_ID", keep_old)
+        pd.testing.assert_frame_equal(reindex_dataframe(df, reindex_map, "Patient_ID", keep_old), expected)
+        pd.testing.assert_frame_equal(reindex_dataframe(df, mapping, "Patient_ID", keep_old), expected)
+        pd.testing.assert_frame_equal(reindex_dataframe(df, pd.Series(mapping), "Patient_ID", keep_old), expected)
+
+    assert list(df.index) == ["S1", "S2", "S1", "S3"] # The given dataframe isn't changed
+    assert list(reindex_dataframe(df, reindex_map, "Patient_ID", False, sort=False).index) == ["P3", "P2", "P3", "P1"]
+
+def test_reindex_map_missing_ids():
+    reindex_map = ReindexMap({"S1": "P1", "S2": "P2"})
+    df = pd.DataFrame({"x": [1, 2, 3]}, index=["S1", "S9", "S2"])
+
+    with pytest.raises(ReindexMapError):
+        reindex_map.map_index(df.index)
+    with pytest.raises(ReindexMapError):
+        old_reindex_dataframe(df.copy(), {"S1": "P1", "S2": "P2"}, "Patient_ID", False)
+    with pytest.raises(ReindexMapError):
+        reindex_dataframe(df, reindex_map, "Patient_ID", False)
+
+def test_reindex_map_not_one_to_one():
+    with pytest.raises(ReindexMapError):
+        ReindexMap(pd.Series(["P1", "P2"], index=["S1", "S1"]))
+
+    clinical_ids = pd.Series(["S1", "S2", np.nan], index=pd.Index(["P1", "P2", "P3"], name="Patient_ID"))
+    reindex_map = get_reindex_map(clinical_ids)
+    assert list(reindex_map.keys()) == ["S1", "S2"] # Patients without a sample are dropped
+    assert list(reindex_map.map_index(pd.Index(["S2", "S1"]))) == ["P2", "P1"]
+    with pytest.raises(ReindexMapError):
+        get_reindex_map(pd.Series(["S1", "S1"], index=["P1", "P2"]))
+
+def test_reindex_all_sample_id_to_patient_id():
+    data = {
+        "clinical": pd.DataFrame({"age": [1, 2]}, index=["S2", "S1"]),
+        "proteomics": pd.DataFrame({"A": [1.0, 2.0]}, index=["S1", "S2"]),
+        "bad": pd.DataFrame({"A": [1.0]}, index=["S9"]),
+        "skipped": pd.DataFrame({"A": [1.0]}, index=["S9"]),
+    }
+
+    with pytest.warns(FailedReindexWarning):
+        data = reindex_all_sample_id_to_patient_id(data, {"S1": "P1", "S2": "P2"}, skip="skipped")
+
+    assert set(data.keys()) == {"clinical", "proteomics", "skipped"} # The dataframe that couldn't be reindexed is dropped
+    assert list(data["clinical"].index) == ["P1", "P2"]
+    assert list(data["clinical"]["Sample_ID"]) == ["S1", "S2"] # The clinical dataframe keeps the old IDs
+    assert list(data["proteomics"].index) == ["P1", "P2"]
+    assert "Sample_ID" not in data["proteomics"].columns
+    assert list(data["skipped"].index) == ["S9"]
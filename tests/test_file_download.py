@@ -0,0 +1,182 @@
+# Tests for streaming downloads to .part files and resuming them, using a stubbed session instead of a server
+
+import hashlib
+import json
+import os
+import pytest
+from cptac import file_download
+from cptac.exceptions import NoInternetError
+from cptac.file_download import OFFLINE_ENV_VAR, download_file, _stream_file, _load_partial_download, _write_partial_sidecar
+
+requests = pytest.importorskip("requests")
+
+CONTENT = bytes(range(100)) * 3
+CONTENT_HASH = hashlib.md5(CONTENT).hexdigest()
+
+class FakeResponse:
+    """Stands in for a streamed requests.Response."""
+
+    def __init__(self, status_code, body=b"", headers=None, fail_after=None):
+        self.status_code = status_code
+        self.headers = headers if headers is not None else {}
+        self._body = body
+        self._fail_after = fail_after # Raise a ConnectionError after sending this many bytes, as if the connection dropped
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error")
+
+    def iter_content(self, chunk_size):
+        chunk_size = 64 # Small chunks, so the file comes in several pieces
+        end = len(self._body) if self._fail_after is None else self._fail_after
+        for start in range(0, end, chunk_size):
+            yield self._body[start:min(start + chunk_size, end)]
+        if self._fail_after is not None:
+            raise requests.ConnectionError("Connection dropped")
+
+class FakeSession:
+    """Stands in for a requests.Session. Returns the given responses in order, and records the headers of each request."""
+
+    def __init__(self, *responses):
+        self._responses = list(responses)
+        self.request_headers = []
+
+    def get(self, url, allow_redirects=True, stream=False, headers=None):
+        self.request_headers.append(headers if headers is not None else {})
+        return self._responses.pop(0)
+
+    def close(self):
+        pass
+
+@pytest.fixture(autouse=True)
+def online_with_temp_package_dir(package_dir, monkeypatch):
+    """Keep the hash cache that finished downloads are recorded in out of the real package directory, and make sure we're not in offline mode."""
+    monkeypatch.delenv(OFFLINE_ENV_VAR, raising=False)
+    monkeypatch.setattr(file_download, "_offline", None)
+
+def write_partial(path, data, bytes_received=None, server_hash=CONTENT_HASH):
+    """Leave a .part file and its sidecar, as an interrupted download would."""
+    with open(f"{path}.part", "wb") as part:
+        part.write(data)
+    _write_partial_sidecar(f"{path}.part.json", server_hash, len(data) if bytes_received is None else bytes_received)
+
+def read(path):
+    with open(path, "rb") as file_obj:
+        return file_obj.read()
+
+def has_partial(path):
+    return os.path.exists(f"{path}.part") or os.path.exists(f"{path}.part.json")
+
+def test_download(tmp_path):
+    path = str(tmp_path / "data.tsv")
+    session = FakeSession(FakeResponse(200, CONTENT))
+
+    assert _stream_file(session, "https://example.com/data.tsv", path, CONTENT_HASH, None) == path
+    assert read(path) == CONTENT
+    assert session.request_headers == [{}]
+    assert not has_partial(path) # The .part file and sidecar are gone
+
+def test_interrupted_download_is_kept(tmp_path):
+    path = str(tmp_path / "data.tsv")
+    session = FakeSession(FakeResponse(200, CONTENT, fail_after=100))
+
+    with pytest.raises(NoInternetError):
+        _stream_file(session, "https://example.com/data.tsv", path, CONTENT_HASH, None)
+    assert not os.path.exists(path)
+    assert read(f"{path}.part") == CONTENT[:100]
+    with open(f"{path}.part.json") as sidecar:
+        assert json.load(sidecar) == {"hash": CONTENT_HASH, "bytes_received": 100}
+
+def test_resume(tmp_path):
+    path = str(tmp_path / "data.tsv")
+    write_partial(path, CONTENT[:100])
+    session = FakeSession(FakeResponse(206, CONTENT[100:], headers={"Content-Range": f"bytes 100-{len(CONTENT) - 1}/{len(CONTENT)}"}))
+
+    assert _stream_file(session, "https://example.com/data.tsv", path, CONTENT_HASH, None) == path
+    assert session.request_headers == [{"Range": "bytes=100-"}]
+    assert read(path) == CONTENT
+    assert not has_partial(path)
+
+def test_resume_server_ignores_range(tmp_path):
+    path = str(tmp_path / "data.tsv")
+    write_partial(path, CONTENT[:100])
+    session = FakeSession(FakeResponse(200, CONTENT)) # The whole file, not just the rest of it
+
+    assert _stream_file(session, "https://example.com/data.tsv", path, CONTENT_HASH, None) == path
+    assert session.request_headers == [{"Range": "bytes=100-"}]
+    assert read(path) == CONTENT # Started over, rather than appending the whole file to what we had
+
+def test_resume_range_not_satisfiable(tmp_path):
+    path = str(tmp_path / "data.tsv")
+    write_partial(path, CONTENT) # We already had the whole file, but the download was interrupted before it was moved into place
+    session = FakeSession(FakeResponse(416))
+
+    assert _stream_file(session, "https://example.com/data.tsv", path, CONTENT_HASH, None) == path
+    assert read(path) == CONTENT
+
+def test_load_partial_download(tmp_path):
+    part_path = str(tmp_path / "data.tsv.part")
+    sidecar_path = f"{part_path}.json"
+
+    # Bytes written after the sidecar was last updated are dropped
+    write_partial(str(tmp_path / "data.tsv"), CONTENT[:120], bytes_received=100)
+    hasher, bytes_received = _load_partial_download(part_path, sidecar_path, CONTENT_HASH)
+    assert bytes_received == 100
+    assert hasher.hexdigest() == hashlib.md5(CONTENT[:100]).hexdigest()
+    assert read(part_path) == CONTENT[:100]
+
+    # A .part file shorter than the sidecar says can't be trusted, so it's discarded
+    write_partial(str(tmp_path / "data.tsv"), CONTENT[:50], bytes_received=100)
+    hasher, bytes_received = _load_partial_download(part_path, sidecar_path, CONTENT_HASH)
+    assert bytes_received == 0
+    assert not has_partial(str(tmp_path / "data.tsv"))
+
+    # So is one for a different version of the file
+    write_partial(str(tmp_path / "data.tsv"), CONTENT[:100], server_hash="0" * 32)
+    hasher, bytes_received = _load_partial_download(part_path, sidecar_path, CONTENT_HASH)
+    assert bytes_received == 0
+    assert not has_partial(str(tmp_path / "data.tsv"))
+
+    # No .part file at all
+    hasher, bytes_received = _load_partial_download(part_path, sidecar_path, CONTENT_HASH)
+    assert bytes_received == 0
+    assert hasher.hexdigest() == hashlib.md5().hexdigest()
+
+def test_truncated_part_file_downloads_again(tmp_path):
+    path = str(tmp_path / "data.tsv")
+    write_partial(path, CONTENT[:50], bytes_received=100)
+    session = FakeSession(FakeResponse(200, CONTENT))
+
+    assert _stream_file(session, "https://example.com/data.tsv", path, CONTENT_HASH, None) == path
+    assert session.request_headers == [{}] # No Range header, since we had nothing to resume from
+    assert read(path) == CONTENT
+
+def test_hash_mismatch(tmp_path):
+    path = str(tmp_path / "data.tsv")
+    with open(path, "wb") as old_file:
+        old_file.write(b"old")
+    session = FakeSession(FakeResponse(200, CONTENT[:-1] + b"x"))
+
+    assert _stream_file(session, "https://example.com/data.tsv", path, CONTENT_HASH, None) is None
+    assert read(path) == b"old" # The old file isn't replaced by a bad download
+    assert not has_partial(path) # The bad data is discarded, so the next try starts over
+
+def test_download_file_retries_once(tmp_path):
+    path = str(tmp_path / "data.tsv")
+    bad = CONTENT[:-1] + b"x"
+
+    session = FakeSession(FakeResponse(200, bad), FakeResponse(200, CONTENT))
+    assert download_file("https://example.com/data.tsv", path, CONTENT_HASH, session=session, verbose=False) == path
+    assert read(path) == CONTENT
+
+    os.remove(path)
+    session = FakeSession(FakeResponse(200, bad), FakeResponse(200, bad))
+    with pytest.raises(NoInternetError, match="didn't match its expected hash"):
+        download_file("https://example.com/data.tsv", path, CONTENT_HASH, session=session, verbose=False)
+    assert not os.path.exists(path)
@@ -0,0 +1,70 @@
+# Tests for read_gct from the file tools
+
+import gzip
+import numpy as np
+import pandas as pd
+import pytest
+from cptac.exceptions import FileError
+from cptac.file_tools import read_gct
+
+GCT_1_3 = (
+    "#1.3\n"
+    "2\t2\t2\t1\n"
+    "id\tGeneSymbol\tDescription\tS1\tS2\n"
+    "Sample_Type\tna\tna\tTumor\tNormal\n"
+    "g1\tTP53\tdesc1\t1.5\t-0.25\n"
+    "g2\tPTEN\tdesc2\tNA\t3\n"
+)
+
+GCT_1_2 = (
+    "#1.2\n"
+    "2\t2\n"
+    "Name\tDescription\tS1\tS1\n"
+    "TP53\tdesc1\t1\t2\n"
+    "PTEN\tdesc2\t3\t4\n"
+)
+
+def write_file(path, text):
+    with open(path, "w") as gct_file:
+        gct_file.write(text)
+    return str(path)
+
+def test_read_gct_1_3_skips_column_metadata(tmp_path):
+    df = read_gct(write_file(tmp_path / "data.gct", GCT_1_3))
+
+    assert list(df.columns) == ["id", "GeneSymbol", "Description", "S1", "S2"]
+    assert list(df["id"]) == ["g1", "g2"] # The Sample_Type row isn't read as data
+    assert df["GeneSymbol"].dtype == object
+    assert df["S1"].dtype == np.float64
+    assert df.loc[0, "S1"] == 1.5
+    assert np.isnan(df.loc[1, "S1"])
+    assert df.loc[1, "S2"] == 3
+
+def test_read_gct_dtype_and_index_col(tmp_path):
+    df = read_gct(write_file(tmp_path / "data.gct", GCT_1_3), index_col=0, dtype="float32")
+
+    assert list(df.index) == ["g1", "g2"]
+    assert list(df.columns) == ["GeneSymbol", "Description", "S1", "S2"]
+    assert (df[["S1", "S2"]].dtypes == np.float32).all()
+    assert df.loc["g1", "S2"] == np.float32(-0.25)
+
+def test_read_gct_1_2_duplicate_headers(tmp_path):
+    df = read_gct(write_file(tmp_path / "data.gct", GCT_1_2))
+
+    assert list(df.columns) == ["Name", "Description", "S1", "S1.1"] # Renamed the same way pandas.read_csv would
+    expected = pd.DataFrame({"S1": [1.0, 3.0], "S1.1": [2.0, 4.0]})
+    pd.testing.assert_frame_equal(df[["S1", "S1.1"]], expected)
+
+def test_read_gct_gzipped(tmp_path):
+    path = str(tmp_path / "data.gct.gz")
+    with gzip.open(path, "wt") as gct_file:
+        gct_file.write(GCT_1_3)
+
+    df = read_gct(path)
+    assert list(df["id"]) == ["g1", "g2"]
+    assert df.loc[0, "S1"] == 1.5
+
+def test_read_gct_unsupported_version(tmp_path):
+    path = write_file(tmp_path / "data.gct", GCT_1_3.replace("#1.3", "#1.1"))
+    with pytest.raises(FileError):
+        read_gct(path)
@@ -0,0 +1,133 @@
+# Tests for hashing files, and for the on-disk cache of file hashes
+
+import hashlib
+import json
+import os
+import threading
+import pytest
+from cptac import file_tools
+from cptac.file_tools import hash_file, record_file_hash, hash_cache_batch, HASH_CACHE_FILE
+
+def md5(data):
+    return hashlib.md5(data).hexdigest()
+
+def read_cache_file(package_dir):
+    with open(package_dir / HASH_CACHE_FILE) as cache_file:
+        return json.load(cache_file)
+
+def rewrite_keeping_mtime(path, data):
+    """Change a file's contents without changing its size, modification time, or inode, so only its hash can tell."""
+    file_stat = os.stat(path)
+    with open(path, "r+b") as file_obj:
+        file_obj.write(data)
+    os.utime(path, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns))
+
+def test_hash_file(package_dir, tmp_path):
+    path = tmp_path / "data.tsv"
+    path.write_bytes(b"a" * 10)
+
+    assert hash_file(str(path)) == md5(b"a" * 10)
+    file_stat = os.stat(path)
+    assert read_cache_file(package_dir) == {str(path): [10, file_stat.st_mtime_ns, file_stat.st_ino, md5(b"a" * 10)]}
+
+def test_cached_hash_invalidation(package_dir, tmp_path):
+    path = tmp_path / "data.tsv"
+    path.write_bytes(b"a" * 10)
+    hash_file(str(path))
+
+    # Same size, modification time, and inode, so we trust the cached hash
+    rewrite_keeping_mtime(path, b"b" * 10)
+    assert hash_file(str(path)) == md5(b"a" * 10)
+    assert hash_file(str(path), use_cache=False) == md5(b"b" * 10)
+    assert hash_file(str(path)) == md5(b"b" * 10) # Hashing without the cache updates it
+
+    # The modification time changed
+    rewrite_keeping_mtime(path, b"c" * 10)
+    file_stat = os.stat(path)
+    os.utime(path, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns + 1000000000))
+    assert hash_file(str(path)) == md5(b"c" * 10)
+
+    # The file was replaced by another with the same size and modification time, so only the inode changed
+    file_stat = os.stat(path)
+    new_path = tmp_path / "new_data.tsv"
+    new_path.write_bytes(b"d" * 10)
+    os.utime(new_path, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns))
+    os.replace(new_path, path)
+    assert os.stat(path).st_ino != file_stat.st_ino
+    assert hash_file(str(path)) == md5(b"d" * 10)
+
+    # The size changed
+    path.write_bytes(b"e" * 11)
+    assert hash_file(str(path)) == md5(b"e" * 11)
+
+def test_cache_read_from_disk(package_dir, tmp_path, monkeypatch):
+    path = tmp_path / "data.tsv"
+    path.write_bytes(b"a" * 10)
+    hash_file(str(path))
+    rewrite_keeping_mtime(path, b"b" * 10)
+
+    monkeypatch.setattr(file_tools, "_hash_cache", None) # As if this were a new session
+    assert hash_file(str(path)) == md5(b"a" * 10)
+
+    (package_dir / HASH_CACHE_FILE).write_text("not json")
+    monkeypatch.setattr(file_tools, "_hash_cache", None)
+    assert hash_file(str(path)) == md5(b"b" * 10) # A corrupted cache is ignored
+
+def test_record_file_hash(package_dir, tmp_path):
+    path = tmp_path / "data.tsv"
+    path.write_bytes(b"a" * 10)
+
+    record_file_hash(str(path), "recorded")
+    assert hash_file(str(path)) == "recorded"
+    assert read_cache_file(package_dir)[str(path)][3] == "recorded"
+
+def test_batch(package_dir, tmp_path):
+    paths = [tmp_path / f"data{i}.tsv" for i in range(3)]
+    for i, path in enumerate(paths):
+        path.write_bytes(bytes([i]) * 10)
+
+    with hash_cache_batch():
+        with hash_cache_batch():
+            hash_file(str(paths[0]))
+        hash_file(str(paths[1]))
+        assert not (package_dir / HASH_CACHE_FILE).exists() # Not written until the outermost block ends
+        assert hash_file(str(paths[1])) == md5(bytes([1]) * 10) # But already in memory
+    assert set(read_cache_file(package_dir).keys()) == {str(paths[0]), str(paths[1])}
+
+    @hash_cache_batch()
+    def hash_last():
+        return hash_file(str(paths[2]))
+    assert hash_last() == md5(bytes([2]) * 10)
+    assert set(read_cache_file(package_dir).keys()) == {str(path) for path in paths}
+
+def test_write_merges_with_disk(package_dir, tmp_path):
+    paths = [tmp_path / f"data{i}.tsv" for i in range(2)]
+    for i, path in enumerate(paths):
+        path.write_bytes(bytes([i]) * 10)
+    hash_file(str(paths[0]))
+
+    # Another process saves a hash after we read the cache
+    other_path = str(tmp_path / "other.tsv")
+    hash_cache = read_cache_file(package_dir)
+    hash_cache[other_path] = [5, 0, 0, "other"]
+    (package_dir / HASH_CACHE_FILE).write_text(json.dumps(hash_cache))
+
+    hash_file(str(paths[1]))
+    assert set(read_cache_file(package_dir).keys()) == {str(paths[0]), str(paths[1]), other_path} # Their hash wasn't dropped
+    assert file_tools._hash_cache[other_path] == [5, 0, 0, "other"] # And we picked it up
+
+def test_write_waits_for_lock(package_dir, tmp_path):
+    fcntl = pytest.importorskip("fcntl")
+    path = tmp_path / "data.tsv"
+    path.write_bytes(b"a" * 10)
+
+    with open(package_dir / f"{HASH_CACHE_FILE}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX) # As if another process were writing the cache
+        thread = threading.Thread(target=hash_file, args=(str(path),))
+        thread.start()
+        thread.join(0.2)
+        assert thread.is_alive()
+        assert not (package_dir / HASH_CACHE_FILE).exists()
+    thread.join()
+
+    assert str(path) in read_cache_file(package_dir)
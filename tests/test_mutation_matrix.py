@@ -0,0 +1,67 @@
+# Tests for the MutationMatrix, checked against a hand-built somatic_mutation dataframe
+
+import numpy as np
+import pandas as pd
+import pytest
+from cptac.exceptions import InvalidParameterError
+from cptac.mutation_matrix import MutationMatrix
+
+def make_somatic_mutation():
+    rows = [
+        ("S1", "TP53", "Missense_Mutation"),
+        ("S2", "PTEN", "Silent"),
+        ("S1", "TP53", "Nonsense_Mutation"),
+        ("S3", np.nan, "Missense_Mutation"), # No gene, so it's left out
+        ("S2", "TP53", np.nan), # No mutation type
+        ("S3", "PTEN", "Missense_Mutation"),
+        ("S1", "PTEN", "Silent"),
+    ]
+    return pd.DataFrame(rows, columns=["Patient_ID", "Gene", "Mutation"]).set_index("Patient_ID")
+
+def test_indices():
+    matrix = MutationMatrix(make_somatic_mutation())
+
+    assert list(matrix.samples) == ["S1", "S2", "S3"]
+    assert list(matrix.genes) == ["TP53", "PTEN"]
+    assert list(matrix.mutation_types) == ["Missense_Mutation", "Silent", "Nonsense_Mutation"]
+    assert matrix.has_gene("PTEN")
+    assert not matrix.has_gene("KRAS")
+
+def test_get_rows():
+    somatic_mutation = make_somatic_mutation()
+    matrix = MutationMatrix(somatic_mutation)
+
+    assert list(matrix.get_rows("TP53")) == [0, 2, 4]
+    assert list(matrix.get_rows(["PTEN", "KRAS", "TP53", "PTEN"])) == [0, 1, 2, 4, 5, 6] # In dataframe order, skipping genes without mutations
+    assert len(matrix.get_rows(["KRAS"])) == 0
+
+    # Categorical Gene columns give the same result, without empty genes
+    somatic_mutation["Gene"] = pd.Categorical(somatic_mutation["Gene"], categories=["KRAS", "PTEN", "TP53"])
+    categorical_matrix = MutationMatrix(somatic_mutation)
+    assert list(categorical_matrix.genes) == ["TP53", "PTEN"]
+    assert list(categorical_matrix.get_rows("PTEN")) == [1, 5, 6]
+
+def test_count_samples_mutated():
+    somatic_mutation = make_somatic_mutation()
+    matrix = MutationMatrix(somatic_mutation)
+
+    assert matrix.count_samples_mutated().to_dict() == {"TP53": 2, "PTEN": 3}
+    assert matrix.count_samples_mutated(["Missense_Mutation", "Nonsense_Mutation"]).to_dict() == {"TP53": 1, "PTEN": 1}
+    assert matrix.count_samples_mutated(["Silent"]).to_dict() == {"TP53": 0, "PTEN": 2}
+    assert matrix.count_samples_mutated(["Not_A_Mutation"]).to_dict() == {"TP53": 0, "PTEN": 0}
+
+    # Excluding types still counts mutations with no type, like dropping rows of those types from the dataframe would
+    assert matrix.count_samples_mutated(["Silent"], exclude=True).to_dict() == {"TP53": 2, "PTEN": 1}
+    expected = somatic_mutation[somatic_mutation["Mutation"] != "Silent"].reset_index().groupby("Gene")["Patient_ID"].nunique()
+    assert matrix.count_samples_mutated(["Silent"], exclude=True).to_dict() == expected.reindex(matrix.genes, fill_value=0).to_dict()
+
+    with pytest.raises(InvalidParameterError):
+        matrix.count_samples_mutated("Silent")
+
+def test_to_sparse():
+    pytest.importorskip("scipy")
+    matrix = MutationMatrix(make_somatic_mutation())
+
+    counts = matrix.to_sparse().toarray()
+    assert counts.tolist() == [[2, 1], [1, 1], [0, 1]] # Samples by genes
+    assert matrix.to_sparse(["Silent"]).toarray().tolist() == [[0, 1], [0, 1], [0, 0]]
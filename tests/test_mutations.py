@@ -0,0 +1,160 @@
+# Tests for selecting and filtering mutations, using small hand-built dataframes instead of a real dataset
+
+import numpy as np
+import pandas as pd
+import pytest
+from cptac.exceptions import InvalidParameterError, ParameterWarning
+
+def make_somatic_mutation():
+    rows = [
+        ("S1", "TP53", "Missense_Mutation", "p.R175H"),
+        ("S1", "TP53", "Nonsense_Mutation", "p.R306*"),
+        ("S1", "PTEN", "Frame_Shift_Del", "p.K6fs"),
+        ("S2", "TP53", "Missense_Mutation", "p.R273H"),
+        ("S2", "PTEN", "Missense_Mutation", "p.R130Q"),
+        ("S2", "PTEN", "Missense_Mutation", "p.C124S"),
+        ("S3", "PTEN", "Silent", "p.L70L"),
+        ("S4", "KRAS", "Missense_Mutation", "p.G12D"),
+    ]
+    df = pd.DataFrame(rows, columns=["Patient_ID", "Gene", "Mutation", "Location"]).set_index("Patient_ID")
+    df.columns.name = "Name"
+    return df
+
+def test_genes_mutations_lists(make_dataset):
+    dataset = make_dataset({"somatic_mutation": make_somatic_mutation()}, cancer_type="endometrial")
+    df = dataset._get_genes_mutations(["TP53", "PTEN"], mutations_filter=None)
+
+    assert list(df.columns) == ["TP53_Mutation", "TP53_Location", "TP53_Mutation_Status", "PTEN_Mutation", "PTEN_Location", "PTEN_Mutation_Status"]
+    assert list(df.index) == ["S1", "S2", "S3", "S4"] # Every sample with mutation data, even without mutations in these genes
+    assert df.index.name == "Patient_ID"
+    assert (df.dtypes == object).all()
+
+    assert df.at["S1", "TP53_Mutation"] == ["Missense_Mutation", "Nonsense_Mutation"]
+    assert df.at["S1", "TP53_Location"] == ["p.R175H", "p.R306*"]
+    assert df.at["S1", "TP53_Mutation_Status"] == "Multiple_mutation"
+    assert df.at["S2", "TP53_Mutation"] == ["Missense_Mutation"]
+    assert df.at["S2", "TP53_Mutation_Status"] == "Single_mutation"
+    assert df.at["S2", "PTEN_Location"] == ["p.R130Q", "p.C124S"] # In the order they're in the dataframe
+    assert df.at["S3", "PTEN_Mutation"] == ["Silent"]
+    assert pd.isnull(df.at["S3", "TP53_Mutation"])
+    assert pd.isnull(df.at["S4", "PTEN_Mutation_Status"])
+
+def test_genes_mutations_filtered(make_dataset):
+    dataset = make_dataset({"somatic_mutation": make_somatic_mutation()}, cancer_type="endometrial")
+    df = dataset._get_genes_mutations(["TP53", "PTEN"], mutations_filter=[])
+
+    assert df.at["S1", "TP53_Mutation"] == "Nonsense_Mutation" # Truncations beat missenses
+    assert df.at["S1", "TP53_Location"] == "p.R306*"
+    assert df.at["S1", "TP53_Mutation_Status"] == "Multiple_mutation"
+    assert df.at["S2", "PTEN_Location"] == "p.C124S" # The earlier one in the sequence
+    assert df.at["S3", "PTEN_Mutation"] == "Silent"
+
+    df = dataset._get_genes_mutations("TP53", mutations_filter=["Missense_Mutation"])
+    assert list(df.columns) == ["TP53_Mutation", "TP53_Location", "TP53_Mutation_Status"]
+    assert df.at["S1", "TP53_Mutation"] == "Missense_Mutation"
+    assert df.at["S1", "TP53_Location"] == "p.R175H"
+
+def test_genes_mutations_errors(make_dataset):
+    dataset = make_dataset({"somatic_mutation": make_somatic_mutation()}, cancer_type="endometrial")
+
+    with pytest.raises(InvalidParameterError):
+        dataset._get_genes_mutations(["TP53", "BRCA1"], mutations_filter=None)
+    with pytest.raises(InvalidParameterError):
+        dataset._get_genes_mutations("TP53", mutations_filter=["Not_A_Mutation"])
+    with pytest.warns(ParameterWarning):
+        dataset._get_genes_mutations("PTEN", mutations_filter=["Nonsense_Mutation"]) # Only TP53 has one
+
+def filter_groups(make_dataset, mutations_filter, groups, cancer_type="endometrial"):
+    """Run _filter_multiple_mutations on groups of (mutation, location) pairs, and return the chosen pair for each group."""
+    rows = [(name, mutation, location) for name, group in groups.items() for mutation, location in group]
+    mutations = pd.DataFrame(rows, columns=["group", "Mutation", "Location"])
+    dataset = make_dataset({}, cancer_type=cancer_type)
+    filtered = dataset._filter_multiple_mutations(mutations_filter, mutations, [mutations["group"].values])
+    return {key[0]: (row["Mutation"], row["Location"]) for key, row in filtered.iterrows()}
+
+def test_filter_default_priority(make_dataset):
+    chosen = filter_groups(make_dataset, [], {
+        "truncation_first": [("Missense_Mutation", "p.A10B"), ("Frame_Shift_Del", "p.K90fs"), ("Missense_Mutation", "p.A5B")],
+        "earliest": [("Missense_Mutation", "p.A50B"), ("Missense_Mutation", "p.A10B")],
+        "no_location_last": [("Missense_Mutation", np.nan), ("Missense_Mutation", "p.A90B")],
+        "missense_over_silent": [("Silent", "p.A1A"), ("In_Frame_Del", "p.A80del")],
+        "single": [("Nonsense_Mutation", "p.R306*")],
+    })
+
+    assert chosen["truncation_first"] == ("Frame_Shift_Del", "p.K90fs")
+    assert chosen["earliest"] == ("Missense_Mutation", "p.A10B")
+    assert chosen["no_location_last"] == ("Missense_Mutation", "p.A90B")
+    assert chosen["missense_over_silent"] == ("In_Frame_Del", "p.A80del")
+    assert chosen["single"] == ("Nonsense_Mutation", "p.R306*")
+
+def test_filter_values_first_in_order(make_dataset):
+    groups = {"group": [("Missense_Mutation", "p.A50B"), ("Frame_Shift_Del", "p.K90fs"), ("Nonsense_Mutation", "p.A70*")]}
+
+    assert filter_groups(make_dataset, ["Missense_Mutation"], groups)["group"] == ("Missense_Mutation", "p.A50B")
+    assert filter_groups(make_dataset, ["Nonsense_Mutation", "Missense_Mutation"], groups)["group"] == ("Nonsense_Mutation", "p.A70*")
+    assert filter_groups(make_dataset, ["p.K90fs", "Missense_Mutation"], groups)["group"] == ("Frame_Shift_Del", "p.K90fs") # Filter values can be locations, too
+    assert filter_groups(make_dataset, ["In_Frame_Del"], groups)["group"] == ("Nonsense_Mutation", "p.A70*") # Falls back to the default priority, so the earliest truncation
+
+def test_filter_dataset_vocabulary(make_dataset):
+    colon_groups = {"group": [("nonsynonymous SNV", "p.A10B"), ("stopgain", "p.A60*")]}
+    assert filter_groups(make_dataset, [], colon_groups, cancer_type="colon")["group"] == ("stopgain", "p.A60*")
+
+    gbm_groups = {"group": [("Silent", "p.A5A"), ("Intron", "p.A20B"), ("Missense_Mutation", "p.A90B")]}
+    assert filter_groups(make_dataset, [], gbm_groups, cancer_type="gbm")["group"] == ("Missense_Mutation", "p.A90B")
+    gbm_groups = {"group": [("Silent", "p.A5A"), ("Intron", "p.A20B")]}
+    assert filter_groups(make_dataset, [], gbm_groups, cancer_type="gbm")["group"] == ("Intron", "p.A20B") # Noncodings beat silent mutations
+
+def test_filter_unknown_mutation_type(make_dataset):
+    with pytest.warns(ParameterWarning, match="Unknown mutation type Weird"):
+        chosen = filter_groups(make_dataset, [], {"group": [("Weird", "p.A20X"), ("Silent", "p.A30X")]})
+    assert chosen["group"] == ("Weird", "p.A20X")
+
+def make_genotype_dataset(make_dataset):
+    clinical = pd.DataFrame({"Sample_Tumor_Normal": ["Tumor", "Tumor", "Tumor", "Normal"]}, index=pd.Index(["S1", "S2", "S3", "S4"], name="Patient_ID"))
+    cnv = pd.DataFrame({
+        "TP53": [0.0, -0.5, 0.5, 0.0, 0.9],
+        "PTEN": [0.1, 0.0, 0.0, -0.3, 0.0],
+    }, index=pd.Index(["S1", "S2", "S3", "S4", "S5"], name="Patient_ID")) # S5 has no clinical data, so no status
+    cnv.columns.name = "Name"
+    return make_dataset({"somatic_mutation": make_somatic_mutation(), "clinical": clinical, "CNV": cnv}, cancer_type="endometrial")
+
+def test_genotype_all_vars_genes_list(make_dataset):
+    df = make_genotype_dataset(make_dataset).get_genotype_all_vars(["TP53", "PTEN"])
+
+    assert list(df.index.names) == ["Patient_ID", "Gene"]
+    assert list(df.columns) == ["Mutation", "Location", "Mutation_Status"]
+    assert len(df.index) == 10 # Every sample, for each gene
+
+    def genotype(sample, gene):
+        return tuple(df.loc[(sample, gene)])
+
+    assert genotype("S1", "TP53") == ("Nonsense_Mutation", "p.R306*", "Multiple_mutation") # Truncations beat missenses
+    assert genotype("S2", "TP53") == ("Deletion", "Deletion", "Multiple_mutation") # The CNV deletion counts as another mutation
+    assert genotype("S3", "TP53") == ("Amplification", "Amplification", "Single_mutation") # The only mutation, with the wildtype
+    assert genotype("S4", "TP53") == ("Wildtype_Normal", "No_mutation", "Wildtype_Normal")
+    assert df.loc[("S5", "TP53")].isnull().all() # No status, so no genotype
+    assert genotype("S1", "PTEN") == ("Frame_Shift_Del", "p.K6fs", "Single_mutation")
+    assert genotype("S2", "PTEN") == ("Missense_Mutation", "p.R130Q", "Multiple_mutation") # Same priority, so the first one
+    assert genotype("S3", "PTEN") == ("Silent", "p.L70L", "Single_mutation")
+    assert genotype("S4", "PTEN") == ("Deletion", "Deletion", "Single_mutation")
+
+def test_genotype_all_vars_single_gene(make_dataset):
+    df = make_genotype_dataset(make_dataset).get_genotype_all_vars("TP53", show_location=False)
+
+    assert list(df.index) == ["S1", "S2", "S3", "S4", "S5"]
+    assert list(df.columns) == ["Mutation", "Mutation_Status"]
+    assert df.at["S1", "Mutation"] == ["Nonsense_Mutation"] # One item lists, as for a single gene
+    assert df.at["S4", "Mutation_Status"] == "Wildtype_Normal"
+    assert pd.isnull(df.at["S5", "Mutation"])
+
+def test_genotype_all_vars_filter_and_hotspot(make_dataset):
+    dataset = make_genotype_dataset(make_dataset)
+
+    df = dataset.get_genotype_all_vars(["TP53"], mutations_filter=["Missense_Mutation_hotspot"], mutation_hotspot=["p.R175H"])
+    assert tuple(df.loc[("S1", "TP53"), ["Mutation", "Location"]]) == ("Missense_Mutation_hotspot", "p.R175H")
+
+    df = dataset.get_genotype_all_vars(["TP53"], mutations_filter=["Missense_Mutation"])
+    assert tuple(df.loc[("S2", "TP53"), ["Mutation", "Location"]]) == ("Missense_Mutation", "p.R273H") # Deletion isn't in this filter
+
+    with pytest.raises(InvalidParameterError):
+        dataset.get_genotype_all_vars(["TP53", "BRCA1"])
@@ -0,0 +1,123 @@
+# Tests for offline mode, and for trusting recent server checks instead of checking again
+
+import hashlib
+import time
+import pytest
+from cptac import file_download
+from cptac.exceptions import InvalidParameterError, NoInternetError
+from cptac.file_download import OFFLINE_ENV_VAR, CHECK_TTL_ENV_VAR, DEFAULT_CHECK_TTL, set_offline, is_offline, set_check_ttl, get_check_ttl, get_recent_check, record_check, update_index, download_file, download_text
+
+INDEX = "#1.0\nproteomics.tsv\tabc\thttps://example.com/proteomics.tsv\n"
+INDEX_HASH = hashlib.md5(INDEX.encode()).hexdigest()
+
+@pytest.fixture(autouse=True)
+def default_settings(package_dir, monkeypatch):
+    """Start each test with the default settings, and put the recorded checks and hash cache in a temporary package directory."""
+    monkeypatch.delenv(OFFLINE_ENV_VAR, raising=False)
+    monkeypatch.delenv(CHECK_TTL_ENV_VAR, raising=False)
+    monkeypatch.setattr(file_download, "_offline", None)
+    monkeypatch.setattr(file_download, "_check_ttl", None)
+
+@pytest.fixture
+def server(monkeypatch):
+    """Stand in for the server's index hash file, and record each request for it."""
+    requested_urls = []
+    def fake_download_text(url):
+        requested_urls.append(url)
+        return INDEX_HASH
+    monkeypatch.setattr(file_download, "download_text", fake_download_text)
+    return requested_urls
+
+def make_dataset_dir(package_dir):
+    """Set up the index files for a fake dataset in the package directory."""
+    dataset_path = package_dir / "data_fake"
+    dataset_path.mkdir()
+    (dataset_path / "index_urls.tsv").write_text("index_hash.txt\thttps://example.com/index_hash.txt\nindex.txt\thttps://example.com/index.txt\n")
+    (dataset_path / "index.txt").write_text(INDEX)
+
+def test_offline_settings(monkeypatch):
+    assert not is_offline()
+    monkeypatch.setenv(OFFLINE_ENV_VAR, "yes")
+    assert is_offline()
+
+    set_offline(False) # Overrides the environment variable
+    assert not is_offline()
+    set_offline(None)
+    assert is_offline()
+    set_offline()
+    monkeypatch.delenv(OFFLINE_ENV_VAR)
+    assert is_offline()
+
+    with pytest.raises(InvalidParameterError):
+        set_offline("no")
+
+def test_offline_makes_no_requests(package_dir, tmp_path):
+    class NoSession:
+        def get(self, *args, **kwargs):
+            raise AssertionError("Made a request in offline mode")
+
+    set_offline()
+    with pytest.raises(NoInternetError):
+        download_file("https://example.com/data.tsv", str(tmp_path / "data.tsv"), "abc", session=NoSession(), verbose=False)
+    with pytest.raises(NoInternetError):
+        download_text("https://example.com/index_hash.txt")
+
+    make_dataset_dir(package_dir)
+    with pytest.raises(NoInternetError):
+        update_index("fake")
+
+def test_check_ttl_settings(monkeypatch):
+    assert get_check_ttl() == DEFAULT_CHECK_TTL
+    monkeypatch.setenv(CHECK_TTL_ENV_VAR, "60")
+    assert get_check_ttl() == 60
+    set_check_ttl(0)
+    assert get_check_ttl() == 0
+    set_check_ttl(None)
+    assert get_check_ttl() == 60
+
+    for seconds in [-1, "60", True]:
+        with pytest.raises(InvalidParameterError):
+            set_check_ttl(seconds)
+
+def test_record_check(monkeypatch):
+    assert get_recent_check("package_version") is None
+    record_check("package_version", "1.0")
+    assert get_recent_check("package_version") == "1.0"
+
+    set_check_ttl(60)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert get_recent_check("package_version") is None # Too old to trust
+
+def test_fresh_check_skips_server(package_dir, server):
+    make_dataset_dir(package_dir)
+    record_check("fake_index_hash", INDEX_HASH)
+
+    assert update_index("fake")
+    assert server == []
+
+    set_offline() # Works offline, too
+    assert update_index("fake")
+    set_offline(None)
+
+    assert update_index("fake", force=True)
+    assert server == ["https://example.com/index_hash.txt"]
+
+def test_expired_check_asks_server(package_dir, server):
+    make_dataset_dir(package_dir)
+    record_check("fake_index_hash", INDEX_HASH)
+
+    set_check_ttl(0)
+    assert update_index("fake")
+    assert server == ["https://example.com/index_hash.txt"]
+
+    set_check_ttl(None)
+    assert update_index("fake") # The check was recorded again, so now it's fresh
+    assert server == ["https://example.com/index_hash.txt"]
+
+def test_check_for_changed_index_asks_server(package_dir, server):
+    make_dataset_dir(package_dir)
+    record_check("fake_index_hash", "0" * 32) # The index has changed since we checked
+
+    assert update_index("fake")
+    assert server == ["https://example.com/index_hash.txt"]
@@ -0,0 +1,101 @@
+# Tests for sharing a dataset with worker processes through shared memory
+
+import concurrent.futures
+import multiprocessing
+import os
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+from cptac.dataset import DataSet
+from cptac.shared_data import SharedDataHandle
+
+pytest.importorskip("multiprocessing.shared_memory") # Added in Python 3.8
+
+@pytest.fixture
+def dataset(make_dataset):
+    index = pd.Index(["C1", "C2", "C3"], name="Patient_ID")
+    columns = pd.MultiIndex.from_tuples([("TP53", "NP_1"), ("PTEN", "NP_2")], names=["Name", "Database_ID"])
+    data = {
+        "proteomics": pd.DataFrame(np.arange(6, dtype=np.float32).reshape(3, 2), index=index, columns=columns),
+        "CNV": pd.DataFrame(np.linspace(-1, 1, 6).reshape(3, 2), index=index, columns=pd.Index(["TP53", "PTEN"], name="Name")),
+        "clinical": pd.DataFrame({"Sample_Tumor_Normal": pd.Categorical(["Tumor", "Tumor", "Normal"]), "age": [50.0, 60.0, 70.0]}, index=index),
+    }
+    return make_dataset(data, valid_omics_dfs=["proteomics", "CNV"], valid_metadata_dfs=["clinical"])
+
+def use_handle(handle):
+    """Run in a worker process: use the shared dataset, and report what it saw."""
+    proteomics = handle.get_proteomics()
+    cnv = handle.get_CNV(copy=False)
+    return {
+        "pid": os.getpid(),
+        "dataset_id": id(handle.get_dataset()),
+        "proteomics_sum": float(proteomics.values.sum()),
+        "cnv": cnv,
+        "clinical_ages": list(handle.get_clinical()["age"]),
+    }
+
+def test_share_with_workers(dataset):
+    with dataset.share() as server:
+        handle = server.handle
+        assert isinstance(handle, SharedDataHandle)
+        assert len(pickle.dumps(handle)) < 1000 # Sending the handle doesn't send the data
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn")) as executor:
+            results = list(executor.map(use_handle, [handle] * 6))
+
+    for result in results:
+        assert result["proteomics_sum"] == 15.0
+        pd.testing.assert_frame_equal(result["cnv"], dataset._data["CNV"])
+        assert result["clinical_ages"] == [50.0, 60.0, 70.0]
+
+    # Each process attached once, no matter how many times it got the handle
+    dataset_ids = {}
+    for result in results:
+        dataset_ids.setdefault(result["pid"], set()).add(result["dataset_id"])
+    assert all(len(ids) == 1 for ids in dataset_ids.values())
+
+def test_attach_in_process(dataset):
+    server = dataset.share()
+    try:
+        handle = pickle.loads(pickle.dumps(server.handle))
+        shared = handle.get_dataset()
+        assert type(shared) is DataSet
+        assert pickle.loads(pickle.dumps(server.handle)).get_dataset() is shared # Attached only once
+        assert handle.version() == "1.0" # The dataset's methods are available on the handle
+        with pytest.raises(AttributeError):
+            handle._data
+
+        pd.testing.assert_frame_equal(shared.get_proteomics(), dataset._data["proteomics"])
+        pd.testing.assert_frame_equal(shared.get_clinical(), dataset._data["clinical"])
+
+        # The shared values can't be edited, but copies of them can
+        cnv = shared.get_CNV(copy=False)
+        block_values = cnv.values
+        while block_values.base is not None and isinstance(block_values.base, np.ndarray):
+            block_values = block_values.base
+        assert not block_values.flags.writeable
+        with pytest.raises(ValueError):
+            block_values[0] = 5
+
+        cnv_copy = shared.get_CNV()
+        cnv_copy.iloc[0, 0] = 5
+        assert shared.get_CNV().iloc[0, 0] == dataset._data["CNV"].iloc[0, 0]
+
+    finally:
+        server.close()
+
+    # The process that attached keeps its mapping after the server is closed
+    assert shared.get_CNV().equals(dataset._data["CNV"])
+
+def test_close_frees_memory(dataset):
+    from multiprocessing import shared_memory
+
+    server = dataset.share()
+    names = [server.handle._data_name, server.handle._metadata_name]
+    server.close()
+    server.close() # Closing twice is fine
+
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)